@@ -1,17 +1,25 @@
-import tkinter as tk
-from tkinter import ttk, messagebox
 import sqlite3
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+
+from pos_core import db, instrumentation, ledger, migrations
+from pos_core.catalog import product_service
+from pos_core.catalog_cache import may_match, prune_changes
+from pos_core.receiving import ReceiptError, goods_receiving, read_receipt_file
+from pos_core.search_scheduler import SearchScheduler
+from pos_core.stock import stock_service
+from pos_core.table_binder import TreeviewBinder
+
+SNAPSHOT_INTERVAL_MS = 5 * 60 * 1000  # How often to check whether stock snapshots are due
 
 class InventoryManagementApp:
-    def __init__(self, root):
+    def __init__(self, root, catalog=None):
         self.root = root
         self.root.title("Inventory Management")
         self.root.geometry("1000x500")  # Updated window size for new layout
 
-        # Connect to the database and ensure tables are created
-        self.conn = sqlite3.connect("inventory.db")
-        self.cursor = self.conn.cursor()
-        self.create_tables()  # Ensure required tables exist
+        # Bring the schema up to date
+        migrations.migrate()
 
         # Search and filter section
         search_label = tk.Label(self.root, text="Search:")
@@ -56,10 +64,12 @@ class InventoryManagementApp:
         self.table.grid(row=1, column=0, columnspan=5, padx=10, pady=10, sticky="nsew")
 
         # Add vertical scrollbar
-        scrollbar = ttk.Scrollbar(self.root, orient="vertical", command=self.table.yview)
-        self.table.configure(yscroll=scrollbar.set)
+        scrollbar = ttk.Scrollbar(self.root, orient="vertical")
         scrollbar.grid(row=1, column=5, sticky="ns")
 
+        # Rows are keyed by product ID; refreshes only touch changed rows and large catalogs are virtualised
+        self.table_binder = TreeviewBinder(self.table, scrollbar=scrollbar)
+
         # Quantity field, description field, and stock modification buttons (placed together)
         modify_frame = tk.Frame(self.root)
         modify_frame.grid(row=2, column=0, columnspan=5, padx=10, pady=10, sticky="nsew")
@@ -99,310 +109,298 @@ class InventoryManagementApp:
         tk.Radiobutton(modify_frame, text="Add", variable=self.adjustment_type, value="add").grid(row=1, column=6, padx=10, pady=5)
         tk.Radiobutton(modify_frame, text="Deduct", variable=self.adjustment_type, value="deduct").grid(row=2, column=6, padx=10, pady=5)
 
+        # Goods receipt: post a whole delivery of scanned or file-loaded lines at once
+        self.goods_receipt_button = tk.Button(modify_frame, text="Goods Receipt", command=self.open_goods_receipt)
+        self.goods_receipt_button.grid(row=0, column=7, padx=10, pady=5)
+
+        # Searches are debounced and run on a worker thread
+        self.search_scheduler = SearchScheduler(self.root, self.query_products, self.show_products,
+                                                name="inventory search")
+
         # Fetch and display product data
         self.load_products()
 
-    def create_tables(self):
-        """Create the stock_management and stock_transactions tables."""
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS stock_management (
-            product_id TEXT PRIMARY KEY,
-            current_stock INTEGER DEFAULT 0,
-            safety_stock INTEGER DEFAULT 0,
-            target_stock INTEGER DEFAULT 0,
-            FOREIGN KEY (product_id) REFERENCES products(product_id)
-        );
-        ''')
-
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS stock_transactions (
-            transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            product_id TEXT,
-            quantity INTEGER,
-            transaction_type TEXT,
-            transaction_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            remarks TEXT,
-            FOREIGN KEY (product_id) REFERENCES products(product_id)
-        );
-        ''')
-        self.conn.commit()
+        # Periodically fold the ledger into per-product stock snapshots
+        self.snapshot_stock()
+
+        # Hosted by the main menu: follow sales and edits made on any screen
+        self.catalog = catalog
+        if catalog is not None:
+            catalog.subscribe(self.on_catalog_change)
+
+    def snapshot_stock(self):
+        """Take stock snapshots if enough ledger rows have built up, trim the catalog change log, then check again later."""
+        try:
+            ledger.snapshot_if_due()
+            prune_changes()
+        except sqlite3.OperationalError:
+            pass  # Another terminal holding the write lock just means we try again next time
+        self.snapshot_job = self.root.after(SNAPSHOT_INTERVAL_MS, self.snapshot_stock)
+
+    def close(self):
+        """Stop the snapshot timer and the search worker."""
+        try:
+            self.root.after_cancel(self.snapshot_job)
+        except tk.TclError:
+            pass  # The window is already gone
+        self.search_scheduler.close()
 
     def load_categories(self):
         """Fetch categories from the products table and populate the combobox."""
-        self.cursor.execute("SELECT DISTINCT category_name FROM products")
-        categories = [row[0] for row in self.cursor.fetchall()]
+        categories = product_service.category_names()
         categories.insert(0, 'All')  # Insert 'All' option for no filtering
         self.category_combobox['values'] = categories
         self.category_combobox.current(0)  # Set default value to 'All'
 
+    @instrumentation.action('load_products')
     def load_products(self):
         """Fetch data from stock_management and products, calculate stock, and display in the table."""
-        # Clear the table
-        for row in self.table.get_children():
-            self.table.delete(row)
-
-        query = """
-        SELECT p.product_id, p.product_name, p.sku, p.category_id, p.category_name,
-               s.current_stock, s.safety_stock, s.target_stock
-        FROM products p
-        LEFT JOIN stock_management s ON p.product_id = s.product_id
-        """
-        self.cursor.execute(query)
-        rows = self.cursor.fetchall()
-
-        # Insert data into the table
-        for row in rows:
-            self.table.insert("", "end", values=row)
+        # Apply only the differences to the table
+        self.table_binder.set_rows(stock_service.stock_rows())
+
+    def refresh_product(self, product_id):
+        """Reload a single product's row after its stock changed."""
+        self.refresh_products([product_id])
+
+    def refresh_products(self, product_ids):
+        """Reload the rows of the given products after their stock changed."""
+        rows = stock_service.stock_rows_for(product_ids)
+        for product_id in dict.fromkeys(product_ids):
+            if product_id in rows:
+                self.table_binder.upsert(rows[product_id])
+            else:
+                self.table_binder.delete(product_id)
 
+    def refresh(self):
+        """Re-run the current search, e.g. when the screen is shown again after sales elsewhere."""
+        self.search_and_filter_products(None)
+
+    def on_catalog_change(self, product_ids, categories_changed):
+        """Reload the rows of changed products in place; search again only if one could join or leave the results."""
+        if product_ids is None:
+            self.refresh()
+            return
+        shown = {product_id for product_id in product_ids if self.table_binder.values(product_id) is not None}
+        if shown != {product_id for product_id in product_ids if self.listed(product_id)}:
+            self.refresh()  # A product joins or leaves the results
+        elif shown:
+            self.refresh_products(shown)  # e.g. a sale: only stock moved
+
+    def listed(self, product_id):
+        """Whether the current search and category filter take in the cached product."""
+        product = self.catalog.products.get(product_id)
+        if product is None:
+            return False
+        category_name = self.catalog.categories.get(product.category_id)
+        selected_category = self.category_combobox.get()
+        if selected_category not in ('', 'All') and category_name != selected_category:
+            return False
+        return may_match(self.search_entry.get(), product.product_id, product.product_name, product.sku, category_name)
+
+    def open_goods_receipt(self):
+        """Open the goods receipt window; the table is refreshed once the receipt is posted."""
+        GoodsReceiptWindow(self.root, on_posted=self.refresh_products)
+
+    @instrumentation.action('search_and_filter_products')
     def search_and_filter_products(self, event):
         """Search and filter products based on user input and selected category."""
         search_term = self.search_entry.get()
         selected_category = self.category_combobox.get()
 
-        # Clear the table
-        for row in self.table.get_children():
-            self.table.delete(row)
-
-        query = """
-        SELECT p.product_id, p.product_name, p.sku, p.category_id, p.category_name,
-               s.current_stock, s.safety_stock, s.target_stock
-        FROM products p
-        LEFT JOIN stock_management s ON p.product_id = s.product_id
-        WHERE (p.product_id LIKE ? OR p.product_name LIKE ? OR p.sku LIKE ? OR p.category_name LIKE ?)
-        """
-
-        # If a specific category is selected, add it to the WHERE clause
-        if selected_category != 'All':
-            query += " AND p.category_name = ?"
-            self.cursor.execute(query, (f'%{search_term}%', f'%{search_term}%', f'%{search_term}%', f'%{search_term}%', selected_category))
+        # Debounce typing; a category change is applied straight away
+        if event is not None and event.type == tk.EventType.KeyRelease:
+            self.search_scheduler.schedule(search_term, selected_category)
         else:
-            self.cursor.execute(query, (f'%{search_term}%', f'%{search_term}%', f'%{search_term}%', f'%{search_term}%'))
+            self.search_scheduler.run_now(search_term, selected_category)
 
-        rows = self.cursor.fetchall()
+    @staticmethod
+    @instrumentation.action('query_products')
+    def query_products(search_term, selected_category):
+        """Run the product search query (called on the search worker thread)."""
+        return stock_service.stock_rows(search_term, None if selected_category == 'All' else selected_category)
 
-        # Insert data into the table
-        for row in rows:
-            self.table.insert("", "end", values=row)
+    def show_products(self, rows):
+        """Show the given rows, applying only the differences to the table."""
+        self.table_binder.set_rows(rows)
 
-    def add_stock(self):
-        """Add stock to a selected product and update stock_management."""
+    def adjust_stock(self, kind, success_message):
+        """Apply one kind of stock adjustment to the selected product and refresh its row."""
         product_id = self.get_selected_product_id()
-        if not product_id:
-            messagebox.showerror("Error", "No product selected")
-            return
-        
         try:
-            quantity = int(self.quantity_entry.get())  # Ensure the quantity is an integer
-            if quantity <= 0:
-                raise ValueError("Quantity must be greater than zero")
-
-            # Check if the product exists in stock_management
-            self.cursor.execute("SELECT current_stock FROM stock_management WHERE product_id = ?", (product_id,))
-            result = self.cursor.fetchone()
-
-            if result is None:
-                # No record exists for this product, insert a new record
-                self.cursor.execute("INSERT INTO stock_management (product_id, current_stock) VALUES (?, ?)", (product_id, quantity))
-            else:
-                # Record exists, update the current stock (handle null current_stock)
-                current_stock = result[0] if result[0] is not None else 0
-                updated_stock = current_stock + quantity
-                self.cursor.execute("UPDATE stock_management SET current_stock = ? WHERE product_id = ?", (updated_stock, product_id))
-
-            # Log the transaction in stock_transactions
-            description = self.description_entry.get().strip() or 'Added stock to inventory'
-            self.cursor.execute("""
-                INSERT INTO stock_transactions (product_id, quantity, transaction_type, remarks)
-                VALUES (?, ?, 'add stock', ?)
-            """, (product_id, quantity, description))
-
-            self.conn.commit()
-
-            # Reload the product list to reflect the updated stock
-            self.load_products()
-            messagebox.showinfo("Success", "Stock added successfully!")
+            # One atomic update plus its ledger row; deductions are refused if stock would go below zero
+            with instrumentation.action('adjust_stock'):
+                stock_service.adjust(product_id, self.quantity_entry.get(), kind,
+                                     self.description_entry.get().strip() or None)
         except ValueError as ve:
             messagebox.showerror("Error", str(ve))
+            return
         except Exception as e:
             messagebox.showerror("Error", str(e))
-
-    def return_from_customer(self):
-        """Return stock from a customer and update stock_management."""
-        product_id = self.get_selected_product_id()
-        if not product_id:
-            messagebox.showerror("Error", "No product selected")
             return
 
-        try:
-            quantity = int(self.quantity_entry.get())  # Ensure the quantity is an integer
-            if quantity <= 0:
-                raise ValueError("Quantity must be greater than zero")
+        # Refresh the product's row to reflect the updated stock
+        self.refresh_product(product_id)
+        messagebox.showinfo("Success", success_message)
 
-            # Check if the product exists in stock_management
-            self.cursor.execute("SELECT current_stock FROM stock_management WHERE product_id = ?", (product_id,))
-            result = self.cursor.fetchone()
+    def add_stock(self):
+        """Add stock to a selected product; creates its stock record if missing."""
+        self.adjust_stock('add', "Stock added successfully!")
 
-            if result is None:
-                # No record exists for this product, insert a new record
-                self.cursor.execute("INSERT INTO stock_management (product_id, current_stock) VALUES (?, ?)", (product_id, quantity))
-            else:
-                # Record exists, update the current stock (handle null current_stock)
-                current_stock = result[0] if result[0] is not None else 0
-                updated_stock = current_stock + quantity
-                self.cursor.execute("UPDATE stock_management SET current_stock = ? WHERE product_id = ?", (updated_stock, product_id))
-
-            # Log the transaction in stock_transactions
-            description = self.description_entry.get().strip() or 'Returned from customer'
-            self.cursor.execute("""
-                INSERT INTO stock_transactions (product_id, quantity, transaction_type, remarks)
-                VALUES (?, ?, 'return from customer', ?)
-            """, (product_id, quantity, description))
-
-            self.conn.commit()
-
-            # Reload the product list to reflect the updated stock
-            self.load_products()
-            messagebox.showinfo("Success", "Stock returned from customer successfully!")
-        except ValueError as ve:
-            messagebox.showerror("Error", str(ve))
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+    def return_from_customer(self):
+        """Return stock from a customer."""
+        self.adjust_stock('customer return', "Stock returned from customer successfully!")
 
     def return_to_vendor(self):
-        """Deduct stock by returning to vendor and update stock_management."""
-        product_id = self.get_selected_product_id()
-        if not product_id:
-            messagebox.showerror("Error", "No product selected")
-            return
+        """Deduct stock returned to the vendor."""
+        self.adjust_stock('vendor return', "Stock returned to vendor successfully!")
 
-        try:
-            quantity = int(self.quantity_entry.get())  # Ensure the quantity is an integer
-            if quantity <= 0:
-                raise ValueError("Quantity must be greater than zero")
+    def damage_expire_removal(self):
+        """Remove stock due to damaged or expired goods."""
+        removal_type = self.removal_type.get()  # Either 'damaged' or 'expired'
+        self.adjust_stock(removal_type, f"Stock {removal_type} removal successful!")
 
-            # Check if the product exists in stock_management
-            self.cursor.execute("SELECT current_stock FROM stock_management WHERE product_id = ?", (product_id,))
-            result = self.cursor.fetchone()
+    def manual_adjustment(self):
+        """Add or deduct stock by manual entry."""
+        kind = "manual add" if self.adjustment_type.get() == "add" else "manual deduct"
+        self.adjust_stock(kind, f"Stock {kind} successful!")
 
-            if result is None:
-                messagebox.showerror("Error", "Product not found in stock management")
-                return
-            else:
-                current_stock = result[0] if result[0] is not None else 0
-                if current_stock < quantity:
-                    raise ValueError("Not enough stock to return to vendor")
+    def get_selected_product_id(self):
+        """Helper function to get the selected product's ID from the table."""
+        selected = self.table.focus()
+        if selected:
+            return self.table.item(selected)['values'][0]
+        return None
 
-                updated_stock = current_stock - quantity
-                self.cursor.execute("UPDATE stock_management SET current_stock = ? WHERE product_id = ?", (updated_stock, product_id))
 
-            # Log the transaction in stock_transactions
-            description = self.description_entry.get().strip() or 'Returned to vendor'
-            self.cursor.execute("INSERT INTO stock_transactions (product_id, quantity, transaction_type, remarks) VALUES (?, ?, 'return to vendor', ?)", (product_id, -quantity, description))
+class GoodsReceiptWindow:
+    """Collect (SKU, quantity) lines by scanning or from a file and post them as one receipt."""
 
-            self.conn.commit()
+    def __init__(self, master, on_posted=None):
+        self.on_posted = on_posted
+        self.lines = {}  # SKU -> [product_id, product_name, quantity], in scan order
 
-            # Reload the product list to reflect the updated stock
-            self.load_products()
-            messagebox.showinfo("Success", "Stock returned to vendor successfully!")
-        except ValueError as ve:
-            messagebox.showerror("Error", str(ve))
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+        self.window = tk.Toplevel(master)
+        self.window.title("Goods Receipt")
+        self.window.geometry("700x450")
 
-    def damage_expire_removal(self):
-        """Remove stock due to damaged or expired goods and update stock_management."""
-        product_id = self.get_selected_product_id()
-        
+        # Scan entry: a scanner types the SKU and presses Enter
+        tk.Label(self.window, text="Scan SKU:").grid(row=0, column=0, padx=10, pady=10, sticky="w")
+        self.sku_entry = tk.Entry(self.window, width=25)
+        self.sku_entry.grid(row=0, column=1, padx=10, pady=10)
+        self.sku_entry.bind("<Return>", self.scan)
+        self.sku_entry.focus_set()
+
+        tk.Label(self.window, text="Qty:").grid(row=0, column=2, padx=10, pady=10, sticky="w")
+        self.quantity_entry = tk.Entry(self.window, width=6)
+        self.quantity_entry.insert(0, "1")
+        self.quantity_entry.grid(row=0, column=3, padx=10, pady=10)
+
+        tk.Button(self.window, text="Add Line", command=self.scan).grid(row=0, column=4, padx=10, pady=10)
+        tk.Button(self.window, text="Load File...", command=self.load_file).grid(row=0, column=5, padx=10, pady=10)
+
+        # Receipt lines
+        self.table = ttk.Treeview(self.window, columns=("sku", "product_name", "quantity", "status"), show="headings")
+        self.table.heading("sku", text="SKU")
+        self.table.heading("product_name", text="Product Name")
+        self.table.heading("quantity", text="Quantity")
+        self.table.heading("status", text="Status")
+        self.table.column("sku", width=120)
+        self.table.column("product_name", width=250)
+        self.table.column("quantity", width=80)
+        self.table.column("status", width=120)
+        self.table.grid(row=1, column=0, columnspan=6, padx=10, pady=10, sticky="nsew")
+        self.window.grid_rowconfigure(1, weight=1)
+        self.window.grid_columnconfigure(1, weight=1)
+
+        tk.Button(self.window, text="Remove Line", command=self.remove_line).grid(row=2, column=0, padx=10, pady=10)
+        tk.Label(self.window, text="Remarks:").grid(row=2, column=1, padx=10, pady=10, sticky="e")
+        self.remarks_entry = tk.Entry(self.window, width=30)
+        self.remarks_entry.grid(row=2, column=2, columnspan=2, padx=10, pady=10)
+        tk.Button(self.window, text="Post Receipt", command=self.post).grid(row=2, column=5, padx=10, pady=10)
+
+    def add_line(self, sku, quantity):
+        """Add a line; scanning the same SKU again increases its quantity."""
+        sku = str(sku).strip().upper()
+        if not sku:
+            return
+        line = self.lines.get(sku)
+        if line is None:
+            product = goods_receiving.lookup(sku)
+            line = self.lines[sku] = [product[0] if product else None, product[1] if product else "", 0]
+        line[2] += quantity
+        status = "OK" if line[0] else "Unknown SKU"
+        values = (sku, line[1], line[2], status)
+        if self.table.exists(sku):
+            self.table.item(sku, values=values)
+        else:
+            self.table.insert("", "end", iid=sku, values=values)
+        self.table.see(sku)
+
+    def scan(self, event=None):
+        """Add the scanned SKU with the entered quantity and get ready for the next scan."""
         try:
-            quantity = int(self.quantity_entry.get())  # Ensure the quantity is an integer
-            
-            # Fetch the current stock from stock_management
-            self.cursor.execute("SELECT current_stock FROM stock_management WHERE product_id = ?", (product_id,))
-            result = self.cursor.fetchone()
-
-            if result is None:
-                messagebox.showerror("Error", "Product not found in stock management")
-                return
-            
-            current_stock = result[0] if result[0] is not None else 0
-            updated_stock = current_stock - quantity
-            
-            # Deduct the stock in stock_management
-            self.cursor.execute("UPDATE stock_management SET current_stock = ? WHERE product_id = ?", (updated_stock, product_id))
-            
-            # Log the transaction in stock_transactions
-            transaction_type = self.removal_type.get()  # Get whether it's 'damaged' or 'expired'
-            description = self.description_entry.get().strip() or f'{transaction_type.capitalize()} removal'
-            self.cursor.execute("""
-                INSERT INTO stock_transactions (product_id, quantity, transaction_type, remarks)
-                VALUES (?, ?, ?, ?)
-            """, (product_id, -quantity, transaction_type, description))
-
-            self.conn.commit()
-            
-            # Reload the product list to reflect the updated stock
-            self.load_products()
-            messagebox.showinfo("Success", f"Stock {transaction_type} removal successful!")
-            
+            quantity = int(self.quantity_entry.get())
+            if quantity <= 0:
+                raise ValueError("Quantity must be greater than zero")
         except ValueError as ve:
-            messagebox.showerror("Error", str(ve))
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+            messagebox.showerror("Error", str(ve), parent=self.window)
+            return
+        self.add_line(self.sku_entry.get(), quantity)
+        self.sku_entry.delete(0, tk.END)
+        self.quantity_entry.delete(0, tk.END)
+        self.quantity_entry.insert(0, "1")
+        self.sku_entry.focus_set()
+
+    def load_file(self):
+        """Add the lines of a SKU,quantity file to the receipt."""
+        path = filedialog.askopenfilename(parent=self.window, title="Load Receipt Lines",
+                                          filetypes=[("CSV files", "*.csv"), ("Text files", "*.txt"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            for sku, quantity in read_receipt_file(path):
+                quantity = int(quantity)
+                if quantity <= 0:
+                    raise ValueError(f"Quantity for {sku} must be greater than zero")
+                self.add_line(sku, quantity)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", str(e), parent=self.window)
+
+    def remove_line(self):
+        """Remove the selected line from the receipt."""
+        selected = self.table.focus()
+        if selected:
+            self.table.delete(selected)
+            del self.lines[selected]
 
-    def manual_adjustment(self):
-        """Adjust stock based on manual entry and update stock_management."""
-        product_id = self.get_selected_product_id()
-        
+    def post(self):
+        """Validate every line and post the receipt in one transaction."""
+        if not self.lines:
+            messagebox.showerror("Error", "The receipt has no lines", parent=self.window)
+            return
         try:
-            quantity = int(self.quantity_entry.get())  # Ensure the quantity is an integer
-
-            # Fetch the current stock from stock_management
-            self.cursor.execute("SELECT current_stock FROM stock_management WHERE product_id = ?", (product_id,))
-            result = self.cursor.fetchone()
-
-            if result is None:
-                messagebox.showerror("Error", "Product not found in stock management")
-                return
-            
-            current_stock = result[0] if result[0] is not None else 0
-            
-            # Determine whether to add or deduct stock based on user selection
-            if self.adjustment_type.get() == "add":
-                updated_stock = current_stock + quantity
-                transaction_type = "manual add"
-            else:  # "deduct"
-                updated_stock = current_stock - quantity
-                transaction_type = "manual deduct"
-
-            # Update the stock in stock_management
-            self.cursor.execute("UPDATE stock_management SET current_stock = ? WHERE product_id = ?", (updated_stock, product_id))
-
-            # Log the transaction in stock_transactions
-            description = self.description_entry.get().strip() or f'{transaction_type.capitalize()} adjustment'
-            self.cursor.execute("""
-                INSERT INTO stock_transactions (product_id, quantity, transaction_type, remarks)
-                VALUES (?, ?, ?, ?)
-            """, (product_id, quantity if self.adjustment_type.get() == "add" else -quantity, transaction_type, description))
-
-            self.conn.commit()
-
-            # Reload the product list to reflect the updated stock
-            self.load_products()
-            messagebox.showinfo("Success", f"Stock {transaction_type} successful!")
-            
-        except ValueError as ve:
-            messagebox.showerror("Error", str(ve))
+            reference = goods_receiving.receive([(sku, line[2]) for sku, line in self.lines.items()],
+                                                self.remarks_entry.get().strip() or None)
+        except ReceiptError as re:
+            messagebox.showerror("Error", "Nothing was posted.\n\n" + "\n".join(
+                f"{p.sku}: {p.reason}" for p in re.problems), parent=self.window)
+            return
         except Exception as e:
-            messagebox.showerror("Error", str(e))
+            messagebox.showerror("Error", str(e), parent=self.window)
+            return
+
+        # Refresh the posted products' rows in one go
+        if self.on_posted is not None:
+            self.on_posted([line[0] for line in self.lines.values()])
+        units = sum(line[2] for line in self.lines.values())
+        messagebox.showinfo("Success", f"Receipt {reference} posted: {len(self.lines)} lines, {units} units.",
+                            parent=self.window)
+        self.window.destroy()
 
-    def get_selected_product_id(self):
-        """Helper function to get the selected product's ID from the table."""
-        selected = self.table.focus()
-        if selected:
-            return self.table.item(selected)['values'][0]
-        return None
 
 if __name__ == "__main__":
     root = tk.Tk()
     app = InventoryManagementApp(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+    app.close()
+    db.close_all()
\ No newline at end of file
@@ -1,92 +1,23 @@
-import sqlite3
 import tkinter as tk
 from tkinter import messagebox, ttk
 
-# Create and connect to SQLite database
-def create_tables():
-    conn = sqlite3.connect('inventory.db')
-    cursor = conn.cursor()
-
-    # Create Product Categories Table
-    cursor.execute('''CREATE TABLE IF NOT EXISTS product_categories (
-                        category_id TEXT PRIMARY KEY,
-                        category_name TEXT UNIQUE NOT NULL,
-                        description TEXT)''')
-
-    conn.commit()
-    conn.close()
-
-# Function to generate unique category ID
-def generate_category_id():
-    conn = sqlite3.connect('inventory.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT category_id FROM product_categories ORDER BY category_id')
-    existing_ids = cursor.fetchall()
-    conn.close()
-
-    existing_numbers = sorted([int(id[0].split('-')[1]) for id in existing_ids])
-    next_id = 1
-    for num in existing_numbers:
-        if num != next_id:
-            break
-        next_id += 1
-
-    return f"PC-{next_id:03d}"
-
-# Function to add a product category
-def add_category(category_name, description):
-    category_id = generate_category_id()  # Automatically generate category ID
-    category_name = category_name.upper()  # Convert to uppercase
-    conn = sqlite3.connect('inventory.db')
-    cursor = conn.cursor()
-    try:
-        cursor.execute('''INSERT INTO product_categories (category_id, category_name, description)
-                          VALUES (?, ?, ?)''', (category_id, category_name, description))
-        conn.commit()
-    except sqlite3.IntegrityError as e:
-        messagebox.showerror("Error", str(e))
-    finally:
-        conn.close()
-
-# Function to update a product category
-def update_category(category_id, category_name, description):
-    conn = sqlite3.connect('inventory.db')
-    cursor = conn.cursor()
-    try:
-        cursor.execute('''UPDATE product_categories 
-                          SET category_name = ?, description = ?
-                          WHERE category_id = ?''', (category_name, description, category_id))
-        conn.commit()
-    except sqlite3.IntegrityError as e:
-        messagebox.showerror("Error", str(e))
-    finally:
-        conn.close()
-
-# Function to delete a product category
-def delete_category(category_id):
-    conn = sqlite3.connect('inventory.db')
-    cursor = conn.cursor()
-
-    cursor.execute('SELECT COUNT(*) FROM products WHERE category_id = ?', (category_id,))
-    product_count = cursor.fetchone()[0]
-
-    if product_count > 0:
-        messagebox.showerror("Error", "Cannot delete category. Products are assigned to this category.")
-    else:
-        cursor.execute('''DELETE FROM product_categories WHERE category_id = ?''', (category_id,))
-        conn.commit()
-
-    conn.close()
+from pos_core import db, migrations
+from pos_core.catalog import CatalogError, category_service
+from pos_core.table_binder import TreeviewBinder
 
 # Tkinter UI setup for Category Management
 class CategoryApp:
-    def __init__(self, root):
+    def __init__(self, root, catalog=None):
         self.root = root
         self.root.title("Product Category Management")
-        create_tables()
+        migrations.migrate()  # Bring the database schema up to date
 
         self.setup_category_ui()
 
+        # Hosted by the main menu: follow category edits made on any screen
+        if catalog is not None:
+            catalog.subscribe(self.on_catalog_change)
+
     def setup_category_ui(self):
         category_frame = tk.Frame(self.root)
         category_frame.pack(pady=10, padx=10, fill=tk.BOTH, expand=True)
@@ -119,10 +50,12 @@ class CategoryApp:
         self.category_tree.heading("Description", text="Description")
         self.category_tree.pack(fill=tk.BOTH, expand=True)
 
-        scrollbar = ttk.Scrollbar(category_frame, orient="vertical", command=self.category_tree.yview)
-        self.category_tree.configure(yscroll=scrollbar.set)
+        scrollbar = ttk.Scrollbar(category_frame, orient="vertical")
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
 
+        # Rows are keyed by category ID and refreshed by diffing
+        self.category_binder = TreeviewBinder(self.category_tree, scrollbar=scrollbar)
+
         self.category_tree.bind("<<TreeviewSelect>>", self.on_category_select)
 
         self.show_category_list()
@@ -130,30 +63,39 @@ class CategoryApp:
     def add_category_action(self):
         category_name = self.entry_category_name.get()
         description = self.entry_category_desc.get()
-        if category_name:
-            add_category(category_name, description)
-            self.show_category_list()
-            self.clear_fields()  # Clear the fields and selection after adding
-        else:
-            messagebox.showerror("Error", "Category name is required.")
+        try:
+            category_service.add(category_name, description)
+        except CatalogError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.show_category_list()
+        self.clear_fields()  # Clear the fields and selection after adding
 
     def update_category_action(self):
         category_name = self.entry_category_name.get()
         description = self.entry_category_desc.get()
-        if category_name and hasattr(self, 'selected_category_id'):
-            update_category(self.selected_category_id, category_name, description)
-            self.show_category_list()  # Refresh the list after update
-            self.clear_fields()  # Clear the fields and selection after updating
-        else:
+        if not category_name or not hasattr(self, 'selected_category_id'):
             messagebox.showerror("Error", "Select a category to update.")
+            return
+        try:
+            category_service.update(self.selected_category_id, category_name, description)
+        except CatalogError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.show_category_list()  # Refresh the list after update
+        self.clear_fields()  # Clear the fields and selection after updating
 
     def delete_category_action(self):
-        if hasattr(self, 'selected_category_id'):
-            delete_category(self.selected_category_id)
-            self.show_category_list()  # Refresh the list after delete
-            self.clear_fields()  # Clear the fields and selection after deletion
-        else:
+        if not hasattr(self, 'selected_category_id'):
             messagebox.showerror("Error", "Select a category to delete.")
+            return
+        try:
+            category_service.delete(self.selected_category_id)
+        except CatalogError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.show_category_list()  # Refresh the list after delete
+        self.clear_fields()  # Clear the fields and selection after deletion
 
     def on_category_select(self, event):
         selected_items = self.category_tree.selection()  # Get selected items
@@ -167,17 +109,16 @@ class CategoryApp:
             self.selected_category_id = category_id  # Set the selected category ID
 
     def show_category_list(self):
-        for i in self.category_tree.get_children():
-            self.category_tree.delete(i)
+        # Apply only the differences to the table
+        self.category_binder.set_rows(category_service.list())
 
-        conn = sqlite3.connect('inventory.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM product_categories ORDER BY category_id')
-        categories = cursor.fetchall()
-        conn.close()
+    def refresh(self):
+        """Reload the list, e.g. when the screen is shown again after edits elsewhere."""
+        self.show_category_list()
 
-        for category in categories:
-            self.category_tree.insert("", "end", values=category)
+    def on_catalog_change(self, product_ids, categories_changed):
+        if categories_changed:
+            self.show_category_list()
 
     def clear_fields(self):
         """Clear the input fields and selection in the table."""
@@ -190,3 +131,4 @@ if __name__ == "__main__":
     root = tk.Tk()
     app = CategoryApp(root)
     root.mainloop()
+    db.close_all()
@@ -0,0 +1,4 @@
+"""Benchmarks for the POS and inventory hot paths.
+
+Run a benchmark from the repository root, e.g. ``python -m benchmarks.bench_connection_pool``.
+"""
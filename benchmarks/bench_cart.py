@@ -0,0 +1,63 @@
+"""Wholesale basket build-up: the keyed Cart against the old list of dicts.
+
+The old cart scanned the list for the product on every add and re-summed every
+line for the total, so building an n-line basket cost O(n^2); the Cart finds
+the line by key and adjusts the total in place. Both totals are printed so any
+float drift against the exact cent total shows up.
+
+Usage: python -m benchmarks.bench_cart [--lines 500] [--scans 3]
+"""
+import argparse
+import random
+import time
+
+from pos_core.cart import Cart, format_cents
+
+
+def legacy_add(cart_items, product_id, product_name, unit_price, quantity):
+    for item in cart_items:
+        if item['product_id'] == product_id:
+            item['quantity'] += quantity
+            item['total_price'] = item['unit_price'] * item['quantity']
+            break
+    else:
+        cart_items.append({'product_id': product_id, 'product_name': product_name, 'unit_price': unit_price,
+                           'quantity': quantity, 'total_price': unit_price * quantity})
+    # update_cart_display re-summed the whole cart after every change
+    total_cost = 0.0
+    for item in cart_items:
+        total_cost += item['total_price']
+    return total_cost
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=500, help='distinct products in the basket')
+    parser.add_argument('--scans', type=int, default=3, help='times each product is scanned')
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    products = [(f'PID-{i:05d}', f'PRODUCT {i}', round(rng.uniform(0.05, 99.99), 2)) for i in range(args.lines)]
+    scans = [product for product in products for _ in range(args.scans)]
+    rng.shuffle(scans)
+
+    start = time.perf_counter()
+    cart_items = []
+    legacy_total = 0.0
+    for product_id, name, price in scans:
+        legacy_total = legacy_add(cart_items, product_id, name, price, 1)
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cart = Cart()
+    for product_id, name, price in scans:
+        cart.add(product_id, name, price, 1)
+    cart_seconds = time.perf_counter() - start
+
+    print(f'{len(scans)} scans into {args.lines} lines')
+    print(f'list of dicts  {legacy_seconds * 1000:9.2f} ms   total {legacy_total!r}')
+    print(f'Cart           {cart_seconds * 1000:9.2f} ms   total {format_cents(cart.total_cents)}')
+
+
+if __name__ == '__main__':
+    main()
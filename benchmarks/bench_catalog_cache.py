@@ -0,0 +1,67 @@
+"""Catalog cache: cost of an idle poll, of picking up edits, and of the per-item queries it replaces.
+
+Usage: python -m benchmarks.bench_catalog_cache [--products 100000] [--edits 200]
+"""
+import argparse
+import random
+import time
+
+from benchmarks.common import create_catalog, measure, print_row, temp_db_path
+from pos_core import migrations
+from pos_core.catalog_cache import CatalogCache
+from pos_core.db import ConnectionPool
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=100_000)
+    parser.add_argument('--edits', type=int, default=200, help='price edits made by another connection')
+    args = parser.parse_args()
+
+    path = create_catalog(temp_db_path(), products=args.products)
+    pool = ConnectionPool(path)
+    migrations.migrate(pool)
+    conn = pool.connection()
+    product_ids = [row[0] for row in conn.execute('SELECT product_id FROM products')]
+
+    cache = CatalogCache(pool)
+    start = time.perf_counter()
+    cache.load()
+    print(f'{len(cache.products)} products cached in {time.perf_counter() - start:.2f} s\n')
+
+    print_row('idle poll (data_version)', measure(cache.poll, 2000))
+
+    rng = random.Random(5)
+    edited = []
+
+    def edit_and_poll():
+        # Another terminal changes a price; the next poll reloads that one row
+        product_id = rng.choice(product_ids)
+        with pool.transaction() as write:
+            write.execute('UPDATE products SET price = price + 1 WHERE product_id = ?', (product_id,))
+        start = time.perf_counter()
+        cache.poll()
+        edited.append((time.perf_counter() - start) * 1000)
+
+    for _ in range(args.edits):
+        edit_and_poll()
+    print_row(f'poll after 1 edit, {args.edits} times', edited)
+
+    pending = iter([rng.choice(product_ids) for _ in range(2000)])
+    print_row('cached price + stock', measure(lambda: cache.products[next(pending)], 2000))
+
+    pending = iter([rng.choice(product_ids) for _ in range(2000)])
+
+    def query():
+        product_id = next(pending)
+        conn.execute('SELECT price FROM products WHERE product_id = ?', (product_id,)).fetchone()
+        conn.execute('SELECT IFNULL(current_stock, 0) FROM stock_management WHERE product_id = ?',
+                     (product_id,)).fetchone()
+
+    print_row('price + stock queries', measure(query, 2000))
+    cache.close()
+    pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
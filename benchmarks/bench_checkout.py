@@ -0,0 +1,103 @@
+"""Checkouts per second for 1-, 10- and 100-line baskets, before and after batching.
+
+"Before" replays the old record_sale_and_update_stock: a fresh connection per
+checkout and four statements per cart line. "After" is pos_core.sales.record_basket
+on a pooled connection: one header plus executemany for lines, stock and ledger.
+
+Usage: python -m benchmarks.bench_checkout [--products 100000] [--lines 1 10 100]
+"""
+import argparse
+import random
+import sqlite3
+import time
+
+from benchmarks.common import create_catalog, temp_db_path
+from pos_core import migrations
+from pos_core.db import ConnectionPool
+from pos_core.sales import record_basket
+
+LEGACY_TABLES = '''
+    CREATE TABLE sales (
+        sales_trans_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id TEXT NOT NULL,
+        quantity INTEGER NOT NULL,
+        unit_price REAL NOT NULL,
+        total_price REAL NOT NULL,
+        sale_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+    CREATE TABLE customer_sales (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sales_trans_id INTEGER NOT NULL,
+        customer_id TEXT NOT NULL);
+'''
+
+
+def legacy_checkout(path, lines, customer_id):
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    try:
+        for product_id, quantity, unit_price, total_price in lines:
+            cursor.execute('INSERT INTO sales (product_id, quantity, unit_price, total_price) VALUES (?, ?, ?, ?)',
+                           (product_id, quantity, unit_price, total_price))
+            sales_trans_id = cursor.lastrowid
+            cursor.execute('UPDATE stock_management SET current_stock = current_stock - ? WHERE product_id = ?',
+                           (quantity, product_id))
+            cursor.execute("INSERT INTO stock_transactions (product_id, quantity, transaction_type, remarks) "
+                           "VALUES (?, ?, 'Sale', 'sales')", (product_id, -quantity))
+            cursor.execute('INSERT INTO customer_sales (sales_trans_id, customer_id) VALUES (?, ?)',
+                           (sales_trans_id, customer_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def make_baskets(rng, products, size, count):
+    baskets = []
+    for _ in range(count):
+        lines = []
+        for product_number in rng.sample(range(1, products + 1), size):
+            quantity = rng.randint(1, 3)
+            price = round(rng.uniform(0.5, 50), 2)
+            lines.append((f'PID-{product_number:05d}', quantity, price, round(price * quantity, 2)))
+        baskets.append(lines)
+    return baskets
+
+
+def rate(label, baskets, checkout):
+    start = time.perf_counter()
+    for lines in baskets:
+        checkout(lines)
+    elapsed = time.perf_counter() - start
+    print(f'{label:<24} {len(baskets) / elapsed:10.1f} checkouts/s  {elapsed * 1000 / len(baskets):8.2f} ms each')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=100_000)
+    parser.add_argument('--lines', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--baskets', type=int, default=2000, help='cart lines written per basket size')
+    args = parser.parse_args()
+
+    before_path = create_catalog(temp_db_path('before.db'), products=args.products)
+    conn = sqlite3.connect(before_path)
+    conn.executescript(LEGACY_TABLES)
+    conn.close()
+
+    after_path = create_catalog(temp_db_path('after.db'), products=args.products)
+    pool = ConnectionPool(after_path)
+    # The full schema, so checkouts pay for the ledger, change log and rollups too
+    migrations.migrate(pool)
+    with pool.transaction() as conn:
+        # Enough stock that the non-negative guard never refuses a benchmark sale
+        conn.execute('UPDATE stock_management SET current_stock = 1000000')
+
+    rng = random.Random(11)
+    for size in args.lines:
+        baskets = make_baskets(rng, args.products, size, max(20, args.baskets // size))
+        print(f'{size}-line baskets ({len(baskets)} checkouts)')
+        rate('  before', baskets, lambda lines: legacy_checkout(before_path, lines, 'cus-000001'))
+        rate('  after', baskets, lambda lines: record_basket(lines, 'cus-000001', pool=pool))
+    pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
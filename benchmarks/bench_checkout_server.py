@@ -0,0 +1,129 @@
+"""Checkout throughput and latency for 1 to 32 lanes, writing directly or through the checkout server.
+
+"Direct" is every lane writing its own baskets with record_basket on its own
+connection, as the POS windows do, so lanes queue on SQLite's write lock.
+"Server" runs ``python -m pos_core.server`` in a separate process and drives it
+with one asyncio client per simulated lane; the server group-commits whatever
+is queued. Each lane rings up baskets of 1 to ``--lines`` random SKUs back to
+back for ``--seconds``.
+
+Usage: python -m benchmarks.bench_checkout_server [--products 100000] [--lanes 1 2 4 8 16 32]
+"""
+import argparse
+import asyncio
+import random
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks.common import create_catalog, summarize, temp_db_path
+from pos_core import migrations
+from pos_core.db import ConnectionPool
+from pos_core.sales import record_basket
+from pos_core.server import CheckoutClient
+
+
+def make_basket(rng, products, max_lines):
+    return [(f'SKU-{product_number:07d}', rng.randint(1, 3))
+            for product_number in rng.sample(range(1, products + 1), rng.randint(1, max_lines))]
+
+
+def report(label, lanes, samples, elapsed, extra=''):
+    stats = summarize(samples)
+    print(f'{label:<8} {lanes:>3} lanes {len(samples) / elapsed:9.1f} checkouts/s   '
+          f"p50 {stats['p50_ms']:8.2f} ms   p99 {stats['p99_ms']:8.2f} ms{extra}")
+
+
+def run_direct(pool, prices, lanes, seconds, products, max_lines):
+    samples = []
+    errors = []
+    stop = time.perf_counter() + seconds
+
+    def lane(number):
+        rng = random.Random(number)
+        try:
+            while time.perf_counter() < stop:
+                lines = []
+                for sku, quantity in make_basket(rng, products, max_lines):
+                    product_id, price = prices[sku]
+                    lines.append((product_id, quantity, price, round(price * quantity, 2)))
+                start = time.perf_counter()
+                record_basket(lines, pool=pool)
+                samples.append((time.perf_counter() - start) * 1000)
+        except Exception as e:  # e.g. "database is locked" once busy_timeout runs out
+            errors.append(e)
+
+    threads = [threading.Thread(target=lane, args=(number,)) for number in range(lanes)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    report('direct', lanes, samples, time.perf_counter() - start,
+           f'   {len(errors)} lanes failed: {errors[0]}' if errors else '')
+
+
+async def run_server(port, lanes, seconds, products, max_lines):
+    samples = []
+    stop = time.perf_counter() + seconds
+
+    async def lane(number):
+        rng = random.Random(number)
+        client = await CheckoutClient.connect(port=port)
+        try:
+            while time.perf_counter() < stop:
+                basket = make_basket(rng, products, max_lines)
+                start = time.perf_counter()
+                await client.checkout(basket)
+                samples.append((time.perf_counter() - start) * 1000)
+        finally:
+            await client.close()
+
+    client = await CheckoutClient.connect(port=port)
+    before = await client.request('stats')
+    start = time.perf_counter()
+    await asyncio.gather(*(lane(number) for number in range(lanes)))
+    elapsed = time.perf_counter() - start
+    after = await client.request('stats')
+    await client.close()
+    commits = after['commits'] - before['commits']
+    baskets = after['baskets'] - before['baskets']
+    report('server', lanes, samples, elapsed, f'   {baskets / max(commits, 1):5.1f} baskets/commit')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=100_000)
+    parser.add_argument('--lanes', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument('--lines', type=int, default=10, help='most lines per basket')
+    parser.add_argument('--seconds', type=float, default=3.0, help='run time per lane count')
+    args = parser.parse_args()
+
+    path = create_catalog(temp_db_path('server.db'), products=args.products)
+    pool = ConnectionPool(path)
+    migrations.migrate(pool)
+    with pool.transaction() as conn:
+        # Enough stock that the non-negative guard never refuses a benchmark sale
+        conn.execute('UPDATE stock_management SET current_stock = 100000000')
+        prices = {sku: (product_id, price)
+                  for product_id, sku, price in conn.execute('SELECT product_id, sku, price FROM products')}
+
+    for lanes in args.lanes:
+        run_direct(pool, prices, lanes, args.seconds, args.products, args.lines)
+    pool.close_all()
+
+    server = subprocess.Popen([sys.executable, '-m', 'pos_core.server', '--db', path, '--port', '0'],
+                              stdout=subprocess.PIPE, text=True)
+    try:
+        # The server prints 'listening on HOST:PORT' once the catalog is loaded
+        port = int(server.stdout.readline().rsplit(':', 1)[1])
+        for lanes in args.lanes:
+            asyncio.run(run_server(port, lanes, args.seconds, args.products, args.lines))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    main()
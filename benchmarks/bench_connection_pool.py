@@ -0,0 +1,56 @@
+"""Compare opening a connection per call against pooled, WAL-tuned connections.
+
+Usage: python -m benchmarks.bench_connection_pool [--products 100000] [--repeat 2000]
+"""
+import argparse
+import random
+import sqlite3
+
+from benchmarks.common import create_catalog, measure, print_row, temp_db_path
+from pos_core.db import ConnectionPool
+
+PRICE_QUERY = 'SELECT price FROM products WHERE product_id = ?'
+STOCK_QUERY = 'SELECT IFNULL(current_stock, 0) FROM stock_management WHERE product_id = ?'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    path = create_catalog(temp_db_path(), products=args.products)
+    rng = random.Random(7)
+    ids = [f'PID-{rng.randint(1, args.products):05d}' for _ in range(args.repeat)]
+    print(f'{args.products} products, {args.repeat} lookups of price + stock\n')
+
+    lookups = iter(ids * 2)
+
+    def per_call_connect():
+        # What add_to_cart/update_cart did before: connect, query, close
+        product_id = next(lookups)
+        conn = sqlite3.connect(path)
+        conn.execute(PRICE_QUERY, (product_id,)).fetchone()
+        conn.close()
+        conn = sqlite3.connect(path)
+        conn.execute(STOCK_QUERY, (product_id,)).fetchone()
+        conn.close()
+
+    print_row('connect per call', measure(per_call_connect, args.repeat))
+
+    pool = ConnectionPool(path)
+    pool.connection()  # Open and tune the connection outside the timed loop
+    lookups = iter(ids * 2)
+
+    def pooled():
+        product_id = next(lookups)
+        conn = pool.connection()
+        conn.execute(PRICE_QUERY, (product_id,)).fetchone()
+        conn.execute(STOCK_QUERY, (product_id,)).fetchone()
+
+    print_row('pooled (WAL, tuned pragmas)', measure(pooled, args.repeat))
+    pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
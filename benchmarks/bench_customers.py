@@ -0,0 +1,90 @@
+"""Customer assignment at the till with a large loyalty base, before and after.
+
+"Before" replays the old add_customer: a fresh connection per lookup and a
+MAX(CAST(SUBSTR(...))) scan of customer_list for every signup. "After" is
+pos_core.customers: LRU cache by mobile number, indexed exact and prefix
+lookups and a sequence-backed customer ID.
+
+Usage: python -m benchmarks.bench_customers [--customers 1000000]
+"""
+import argparse
+import random
+import sqlite3
+
+from benchmarks.common import measure, print_row, temp_db_path
+from pos_core.customers import CustomerDirectory, create_customer_tables
+from pos_core.db import ConnectionPool
+
+
+def create_customers(path, count, seed=42):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    create_customer_tables(conn)
+    mobiles = rng.sample(range(10**9, 10**10), count)
+    conn.executemany('INSERT INTO customer_list (customer_id, customer_name, mobile_number) VALUES (?, ?, ?)',
+                     ((f'cus-{i:06d}', f'CUSTOMER {i}', f'0{mobile}') for i, mobile in enumerate(mobiles, 1)))
+    conn.commit()
+    conn.close()
+    return [f'0{mobile}' for mobile in mobiles]
+
+
+def legacy_lookup(path, mobile_number):
+    conn = sqlite3.connect(path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT customer_id, customer_name FROM customer_list WHERE mobile_number = ?', (mobile_number,))
+        return cursor.fetchone()
+    finally:
+        conn.close()
+
+
+def legacy_signup(path, customer_name, mobile_number):
+    conn = sqlite3.connect(path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT MAX(CAST(SUBSTR(customer_id, 5) AS INTEGER))
+            FROM customer_list
+            WHERE customer_id LIKE 'cus-%'
+        """)
+        result = cursor.fetchone()
+        new_num = result[0] + 1 if result[0] else 1
+        cursor.execute('INSERT INTO customer_list (customer_id, customer_name, mobile_number) VALUES (?, ?, ?)',
+                       (f'cus-{new_num:06d}', customer_name, mobile_number))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--customers', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=2000)
+    parser.add_argument('--signups', type=int, default=50)
+    args = parser.parse_args()
+
+    path = temp_db_path('customers.db')
+    mobiles = create_customers(path, args.customers)
+    rng = random.Random(7)
+    regulars = rng.sample(mobiles, 100)
+    new_numbers = iter(f'1{n:09d}' for n in range(10**9))
+
+    print_row('before: lookup', measure(lambda: legacy_lookup(path, rng.choice(mobiles)), args.repeat))
+    print_row('before: signup', measure(lambda: legacy_signup(path, 'NEW', next(new_numbers)), args.signups))
+
+    pool = ConnectionPool(path)
+    with pool.transaction() as conn:
+        create_customer_tables(conn)
+    directory = CustomerDirectory(pool=pool)
+    print_row('after: lookup (cold)', measure(lambda: directory.lookup(rng.choice(mobiles)), args.repeat))
+    for mobile in regulars:
+        directory.lookup(mobile)
+    print_row('after: lookup (cached)', measure(lambda: directory.lookup(rng.choice(regulars)), args.repeat))
+    print_row('after: prefix (5 digits)', measure(lambda: directory.find_by_prefix(rng.choice(mobiles)[:5]), args.repeat))
+    directory.ids.seed()  # One-time seed of the sequence from the existing IDs
+    print_row('after: signup', measure(lambda: directory.create('NEW', next(new_numbers)), args.signups))
+    pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
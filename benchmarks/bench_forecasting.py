@@ -0,0 +1,89 @@
+"""Demand forecasting: first run over the history, a nightly run over one new day, and a per-product loop.
+
+Fills a store with ``--sales`` baskets spread over ``--days`` days, times the
+first forecasting run (every day of history) and the next night's run (only
+the day added since), then times the smoothing step written as a plain Python
+loop over each product's days for comparison.
+
+Usage: python -m benchmarks.bench_forecasting [--products 20000] [--sales 200000] [--days 365]
+"""
+import argparse
+import datetime
+import random
+import time
+
+import numpy as np
+
+from benchmarks.bench_reporting import fill_sales
+from benchmarks.common import create_catalog, temp_db_path
+from pos_core import forecasting, migrations, reporting
+from pos_core.db import ConnectionPool
+
+
+def add_day(pool, rng, products, day, baskets, lines_per_sale):
+    """Write one more day of baskets after the history and fold them into the rollups."""
+    with pool.transaction() as conn:
+        after_sale_id = conn.execute('SELECT IFNULL(MAX(sale_id), 0) FROM sales_header').fetchone()[0]
+        for i in range(baskets):
+            sale_date = f'{day} {8 + i * 12 // baskets:02d}:00:00'
+            sale_id = conn.execute('INSERT INTO sales_header (sale_date, line_count, total_amount) VALUES (?, ?, 0)',
+                                   (sale_date, lines_per_sale)).lastrowid
+            conn.executemany('INSERT INTO sales_lines (sale_id, line_no, product_id, quantity, unit_price, '
+                             'total_price) VALUES (?, ?, ?, ?, 1, 1)',
+                             [(sale_id, n, f'PID-{rng.randint(1, products):05d}', rng.randint(1, 3))
+                              for n in range(1, lines_per_sale + 1)])
+        reporting.update_rollups(conn, after_sale_id, sale_id)
+
+
+def loop_smoothing(matrix, smoothing=forecasting.SMOOTHING):
+    # The same recurrence as forecasting.fold_days, one product at a time
+    levels = []
+    for column in matrix.T.tolist():
+        level, variance = column[0], 0.0
+        for demand in column:
+            error = demand - level
+            variance = (1 - smoothing) * (variance + smoothing * error * error)
+            level += smoothing * error
+        levels.append((level, variance))
+    return levels
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=20_000)
+    parser.add_argument('--sales', type=int, default=200_000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--lines', type=int, default=5, help='lines per basket')
+    args = parser.parse_args()
+
+    path = create_catalog(temp_db_path('forecasting.db'), products=args.products)
+    pool = ConnectionPool(path)
+    migrations.migrate(pool)
+    rng = random.Random(18)
+    fill_sales(pool, rng, args.products, args.sales, args.days, args.lines)
+    reporting.backfill(pool)  # The forecast reads the rollups, which fill_sales leaves alone
+    next_day = datetime.date(2024, 1, 1) + datetime.timedelta(days=args.days)
+
+    report = forecasting.run(pool, as_of=next_day)
+    print(f'first run: {report.days} days x {report.products:,} products in {report.seconds:.2f} s')
+
+    add_day(pool, rng, args.products, next_day, args.sales // args.days, args.lines)
+    report = forecasting.run(pool, as_of=next_day + datetime.timedelta(days=1))
+    print(f'nightly:   {report.days} day x {report.products:,} products in {report.seconds:.2f} s')
+
+    conn = pool.connection()
+    product_ids = np.array([row[0] for row in conn.execute(
+        'SELECT product_id FROM stock_management ORDER BY product_id')])
+    matrix = forecasting.demand_matrix(conn, product_ids, next_day - datetime.timedelta(days=args.days), next_day)
+
+    start = time.perf_counter()
+    forecasting.fold_days(forecasting.empty_state(product_ids), matrix)
+    print(f'smoothing, numpy: {len(matrix)} days in {time.perf_counter() - start:.3f} s')
+    start = time.perf_counter()
+    loop_smoothing(matrix)
+    print(f'smoothing, loop:  {len(matrix)} days in {time.perf_counter() - start:.3f} s')
+    pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Time to hand out a new product ID: full-scan gap walk vs the sequence allocator.
+
+"Before" replays the old generate_product_id: read every product_id, sort and
+walk the numbers looking for the first gap. "After" is pos_core.ids: a seeded
+sequence row plus a free list of released IDs. A second phase runs several
+threads allocating at once and checks no ID was handed out twice.
+
+Usage: python -m benchmarks.bench_id_allocation [--products 1000000] [--threads 8]
+"""
+import argparse
+import sqlite3
+import threading
+
+from benchmarks.common import create_catalog, measure, print_row, temp_db_path
+from pos_core.db import ConnectionPool
+from pos_core.ids import PRODUCT_IDS, IdAllocator, create_id_tables
+
+
+def legacy_generate_product_id(conn):
+    existing_ids = conn.execute('SELECT product_id FROM products ORDER BY product_id').fetchall()
+    existing_nums = sorted([int(id[0].replace('PID-', '')) for id in existing_ids])
+
+    new_id_num = 1
+    for num in existing_nums:
+        if num != new_id_num:
+            break
+        new_id_num += 1
+
+    return f'PID-{str(new_id_num).zfill(5)}'
+
+
+def allocate_and_insert(pool, allocator):
+    with pool.transaction() as conn:
+        product_id = allocator.allocate()
+        conn.execute("INSERT INTO products (product_id, product_name, sku, category_id, category_name, price) "
+                     "VALUES (?, ?, ?, 'PC-001', 'CATEGORY 1', 1.0)", (product_id, product_id, 'SKU-' + product_id))
+    return product_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=5, help='legacy scans to time')
+    parser.add_argument('--allocations', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    path = create_catalog(temp_db_path('ids.db'), products=args.products)
+    conn = sqlite3.connect(path)
+    # Punch a few holes so both strategies have gaps to find
+    conn.execute("DELETE FROM products WHERE product_id IN ('PID-00010', 'PID-00500')")
+    conn.commit()
+    print_row(f'before: gap walk over {args.products:,} ids', measure(lambda: legacy_generate_product_id(conn), args.repeat))
+    conn.close()
+
+    pool = ConnectionPool(path)
+    with pool.transaction() as conn:
+        create_id_tables(conn)
+    allocator = IdAllocator(PRODUCT_IDS, pool=pool)
+    print_row('after: one-time seed', measure(allocator.seed, 1))
+    print_row('after: peek', measure(allocator.peek, args.allocations))
+    print_row('after: allocate + insert', measure(lambda: allocate_and_insert(pool, allocator), args.allocations))
+
+    issued = []
+    lock = threading.Lock()
+
+    def worker():
+        mine = [allocate_and_insert(pool, allocator) for _ in range(args.allocations // args.threads)]
+        with lock:
+            issued.extend(mine)
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(f'{args.threads} threads allocated {len(issued)} ids, {len(issued) - len(set(issued))} duplicates')
+    pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Bulk CSV product import rate into an empty store.
+
+Writes a CSV of ``--rows`` products spread over ``--categories`` categories,
+with a sprinkling of bad rows, and imports it with pos_core.importer.
+
+Usage: python -m benchmarks.bench_import [--rows 200000] [--chunk-size 10000]
+"""
+import argparse
+import csv
+import random
+
+from benchmarks.common import product_name, temp_db_path
+from pos_core import migrations
+from pos_core.db import ConnectionPool
+from pos_core.importer import ProductImporter
+
+
+def write_csv(path, rows, categories, seed=42):
+    rng = random.Random(seed)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['product_name', 'sku', 'category', 'price', 'description', 'current_stock'])
+        for i in range(1, rows + 1):
+            sku = f'SKU-{i:07d}'
+            price = f'{rng.uniform(0.5, 200):.2f}'
+            if i % 1000 == 0:
+                price = 'n/a'  # Rejected: bad price
+            elif i % 1000 == 1 and i > 1:
+                sku = f'SKU-{i - 1:07d}'  # Rejected: duplicate SKU
+            writer.writerow([product_name(rng, i), sku, f'CATEGORY {rng.randrange(1, categories + 1)}',
+                             price, '', rng.randrange(0, 500)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--categories', type=int, default=20)
+    parser.add_argument('--chunk-size', type=int, default=10_000)
+    args = parser.parse_args()
+
+    csv_path = temp_db_path('import.csv')
+    write_csv(csv_path, args.rows, args.categories)
+    pool = ConnectionPool(temp_db_path('import.db'))
+    migrations.migrate(pool)
+
+    importer = ProductImporter(pool=pool, chunk_size=args.chunk_size, create_categories=True)
+    report = importer.import_file(csv_path)
+    print(f'{report.imported:,} imported, {len(report.rejects):,} rejected of {report.read:,} rows '
+          f'in {report.seconds:.2f} s: {report.read / report.seconds:,.0f} rows/s')
+    pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Cost of the latency instrumentation on a point lookup and a checkout.
+
+Runs the same primary-key lookup, and the same small basket through
+record_basket, on a plain pooled connection and on an instrumented one inside
+an ``action()``, so the difference is what a till pays per statement and per
+sale with POS_METRICS_FILE set.
+
+Usage: python -m benchmarks.bench_instrumentation [--products 10000] [--lookups 20000] [--sales 2000]
+"""
+import argparse
+import os
+import random
+import sqlite3
+
+from benchmarks.common import create_catalog, measure, print_row, temp_db_path
+from pos_core import instrumentation, migrations
+from pos_core.db import ConnectionPool
+from pos_core.sales import record_basket
+
+
+def run(path, args, label):
+    pool = ConnectionPool(path)
+    conn = pool.connection()
+    rng = random.Random(3)
+    product_ids = [f'PID-{rng.randint(1, args.products):05d}' for _ in range(args.lookups)]
+    lookups = iter(product_ids)
+
+    def lookup():
+        with instrumentation.action('lookup'):
+            conn.execute('SELECT price FROM products WHERE product_id = ?', (next(lookups),)).fetchone()
+    print_row(f'{label} lookup', measure(lookup, args.lookups))
+
+    def sale():
+        lines = []
+        for product_id in rng.sample(product_ids, 3):
+            lines.append((product_id, 1, 1.0, 1.0))
+        with instrumentation.action('checkout'):
+            record_basket(lines, pool=pool)
+    print_row(f'{label} checkout', measure(sale, args.sales))
+    pool.close_all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=10_000)
+    parser.add_argument('--lookups', type=int, default=20_000)
+    parser.add_argument('--sales', type=int, default=2000)
+    args = parser.parse_args()
+
+    path = create_catalog(temp_db_path('instrumentation.db'), products=args.products)
+    migrations.migrate(ConnectionPool(path))
+    with sqlite3.connect(path) as conn:
+        # No sale in the benchmark is refused for stock
+        conn.execute('UPDATE stock_management SET current_stock = 1000000000')
+
+    run(path, args, 'plain')
+    metrics = instrumentation.enable(os.path.join(os.path.dirname(path), 'pos.prom'), slow_ms=1000, interval=3600)
+    run(path, args, 'instrumented')
+    instrumentation.disable()
+    print(f'\n{len(metrics.statements)} statement histograms, written to {metrics.path}')
+
+
+if __name__ == '__main__':
+    main()
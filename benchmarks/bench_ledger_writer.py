@@ -0,0 +1,65 @@
+"""Stock mutations per second at each ledger durability level.
+
+Submits ``--mutations`` single-product stock changes, one call each as the
+inventory screen and batch jobs do, through a LedgerWriter at the full, normal
+and deferred levels. Reports the call latency and the throughput including the
+final flush, then rebuilds stock from the ledger to show that every level kept
+stock and ledger in step.
+
+Usage: python -m benchmarks.bench_ledger_writer [--products 10000] [--mutations 20000]
+"""
+import argparse
+import random
+import time
+
+from benchmarks.common import create_catalog, print_row, temp_db_path
+from pos_core import ledger, migrations
+from pos_core.db import ConnectionPool
+from pos_core.ledger_writer import DURABILITY_LEVELS, LedgerWriter
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=10_000)
+    parser.add_argument('--mutations', type=int, default=20_000)
+    parser.add_argument('--flush-rows', type=int, default=500)
+    parser.add_argument('--flush-ms', type=int, default=200)
+    args = parser.parse_args()
+
+    path = create_catalog(temp_db_path('ledger.db'), products=args.products)
+    pool = ConnectionPool(path)
+    migrations.migrate(pool)
+
+    rng = random.Random(5)
+    mutations = [(f'PID-{rng.randint(1, args.products):05d}', rng.choice((-1, 1, 2, 3)), 'bench', 'ledger writer')
+                 for _ in range(args.mutations)]
+    with pool.transaction() as conn:
+        # Enough stock that no deduction is refused
+        conn.execute('UPDATE stock_management SET current_stock = current_stock + 1000000')
+        conn.execute("""
+            INSERT INTO stock_transactions (product_id, quantity, transaction_type, remarks)
+            SELECT product_id, 1000000, 'bench', 'opening stock' FROM stock_management
+        """)
+
+    for durability in DURABILITY_LEVELS:
+        # The full level syncs every commit: a sample is enough to see the cost
+        sample = mutations[:max(1, len(mutations) // 20)] if durability == 'full' else mutations
+        writer = LedgerWriter(pool, durability, flush_rows=args.flush_rows, flush_ms=args.flush_ms)
+        latencies = []
+        start = time.perf_counter()
+        for mutation in sample:
+            call_start = time.perf_counter()
+            writer.submit([mutation])
+            latencies.append((time.perf_counter() - call_start) * 1000)
+        writer.close()
+        elapsed = time.perf_counter() - start
+        print_row(f'{durability} ({len(sample)} calls)', latencies)
+        print(f'{"":<32} {len(sample) / elapsed:,.0f} mutations/s including the final flush')
+
+    report = ledger.rebuild(pool)
+    print(f'ledger rebuild: {len(report.discrepancies)} discrepancies over {report.ledger_rows:,} ledger rows')
+    pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
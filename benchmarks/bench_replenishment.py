@@ -0,0 +1,81 @@
+"""Replenishment pass over the whole catalog: NumPy against a per-product Python loop.
+
+Builds a catalog with random safety and target stock and four weeks of
+hour x product sales rollups for a share of the products, then times
+pos_core.replenishment.run() end to end (load, compute, write suggestions) and
+the same computation written as a plain loop over the rows.
+
+Usage: python -m benchmarks.bench_replenishment [--products 1000000] [--selling 0.3]
+"""
+import argparse
+import math
+import random
+import sqlite3
+import time
+
+from benchmarks.common import create_catalog, temp_db_path
+from pos_core import replenishment
+from pos_core.db import ConnectionPool
+from pos_core.reporting import ROLLUP_TABLES
+
+
+def prepare(path, products, selling, rng):
+    conn = sqlite3.connect(path)
+    for statement in ROLLUP_TABLES:
+        conn.execute(statement)
+    replenishment.create_suggestion_table(conn)
+    conn.execute('UPDATE stock_management SET safety_stock = abs(random() % 40), '
+                 'target_stock = 40 + abs(random() % 200)')
+    rows = []
+    for product_number in rng.sample(range(1, products + 1), int(products * selling)):
+        product_id = f'PID-{product_number:05d}'
+        for _ in range(rng.randint(1, 6)):
+            hour = f'2024-06-{rng.randint(1, 27):02d} {rng.randint(8, 21):02d}:00'
+            rows.append((hour, product_id, rng.randint(1, 20), 0.0, 1))
+    conn.executemany('INSERT OR IGNORE INTO sales_rollup_hour_product VALUES (?, ?, ?, ?, ?)', rows)
+    conn.commit()
+    conn.close()
+
+
+def loop_pass(conn, window_days, lead_time_days, as_of):
+    # The same rules as replenishment.reorder_quantities, one product at a time
+    sold = dict(conn.execute('''
+        SELECT product_id, SUM(quantity) FROM sales_rollup_hour_product
+        WHERE hour >= strftime('%Y-%m-%d %H:00', ?, ?) AND hour < strftime('%Y-%m-%d %H:00', ?)
+        GROUP BY product_id
+    ''', (as_of, f'-{window_days} days', as_of)))
+    suggestions = []
+    for product_id, current, safety, target in conn.execute(
+            'SELECT product_id, IFNULL(current_stock, 0), IFNULL(safety_stock, 0), IFNULL(target_stock, 0) '
+            'FROM stock_management ORDER BY product_id'):
+        velocity = sold.get(product_id, 0) / window_days
+        reorder_point = safety + velocity * lead_time_days
+        if current <= reorder_point:
+            quantity = math.ceil(max(target, reorder_point) - current)
+            if quantity > 0:
+                suggestions.append((product_id, quantity))
+    return suggestions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=1_000_000)
+    parser.add_argument('--selling', type=float, default=0.3, help='share of products with recent sales')
+    args = parser.parse_args()
+
+    path = create_catalog(temp_db_path('replenishment.db'), products=args.products)
+    prepare(path, args.products, args.selling, random.Random(17))
+    pool = ConnectionPool(path)
+    as_of = '2024-06-28 00:00:00'
+
+    report = replenishment.run(pool, as_of=as_of)
+    print(f'numpy: {report.products:,} products, {report.suggested:,} suggestions in {report.seconds:.2f} s')
+
+    start = time.perf_counter()
+    suggestions = loop_pass(pool.connection(), replenishment.WINDOW_DAYS, replenishment.LEAD_TIME_DAYS, as_of)
+    print(f'loop:  {len(suggestions):,} suggestions in {time.perf_counter() - start:.2f} s (compute only, no write)')
+    pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
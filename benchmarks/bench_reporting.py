@@ -0,0 +1,98 @@
+"""Sales reports from the rollup tables against scanning every sales line.
+
+Fills a store with ``--sales`` baskets spread over ``--days`` days, times the
+rollup backfill, then runs the daily, per-category and top-product reports
+both from the rollups and straight from the ``sales`` view.
+
+Usage: python -m benchmarks.bench_reporting [--products 20000] [--sales 200000] [--days 365]
+"""
+import argparse
+import random
+import time
+
+from benchmarks.common import create_catalog, measure, print_row, temp_db_path
+from pos_core import migrations, reporting
+from pos_core.db import ConnectionPool
+
+RAW_DAILY = '''
+    SELECT date(sale_date), COUNT(DISTINCT sale_id), SUM(quantity), SUM(total_price)
+    FROM sales
+    WHERE date(sale_date) BETWEEN ? AND ?
+    GROUP BY 1 ORDER BY 1
+'''
+
+RAW_CATEGORIES = '''
+    SELECT p.category_id, SUM(s.quantity), SUM(s.total_price)
+    FROM sales s
+    JOIN products p ON p.product_id = s.product_id
+    WHERE date(s.sale_date) BETWEEN ? AND ?
+    GROUP BY p.category_id ORDER BY 3 DESC
+'''
+
+RAW_PRODUCTS = '''
+    SELECT product_id, SUM(quantity), SUM(total_price)
+    FROM sales
+    WHERE date(sale_date) BETWEEN ? AND ?
+    GROUP BY product_id ORDER BY 3 DESC LIMIT 20
+'''
+
+
+def fill_sales(pool, rng, products, sales, days, lines_per_sale):
+    """Write synthetic baskets directly, oldest first, without touching stock."""
+    start = time.mktime((2024, 1, 1, 8, 0, 0, 0, 0, -1))
+    with pool.transaction() as conn:
+        headers = []
+        lines = []
+        for sale_id in range(1, sales + 1):
+            when = start + (sale_id - 1) * days * 86400 / sales
+            sale_date = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(when))
+            customer_id = f'cus-{rng.randint(1, 5000):06d}' if rng.random() < 0.4 else None
+            total = 0.0
+            for line_no in range(1, lines_per_sale + 1):
+                quantity = rng.randint(1, 3)
+                price = round(rng.uniform(0.5, 50), 2)
+                lines.append((sale_id, line_no, f'PID-{rng.randint(1, products):05d}', quantity, price,
+                              round(price * quantity, 2)))
+                total += price * quantity
+            headers.append((sale_id, sale_date, customer_id, lines_per_sale, round(total, 2)))
+        conn.executemany('INSERT INTO sales_header (sale_id, sale_date, customer_id, line_count, total_amount) '
+                         'VALUES (?, ?, ?, ?, ?)', headers)
+        conn.executemany('INSERT INTO sales_lines (sale_id, line_no, product_id, quantity, unit_price, total_price) '
+                         'VALUES (?, ?, ?, ?, ?, ?)', lines)
+    return sales * lines_per_sale
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=20_000)
+    parser.add_argument('--sales', type=int, default=200_000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--lines', type=int, default=5, help='lines per basket')
+    args = parser.parse_args()
+
+    path = create_catalog(temp_db_path('reporting.db'), products=args.products)
+    pool = ConnectionPool(path)
+    migrations.migrate(pool)
+    rng = random.Random(13)
+    line_count = fill_sales(pool, rng, args.products, args.sales, args.days, args.lines)
+
+    start = time.perf_counter()
+    reporting.backfill(pool)
+    elapsed = time.perf_counter() - start
+    print(f'backfilled {args.sales:,} sales ({line_count:,} lines) in {elapsed:.2f} s '
+          f'({line_count / elapsed:,.0f} lines/s)\n')
+
+    conn = pool.connection()
+    month = ('2024-03-01', '2024-03-31')
+    year = ('2024-01-01', '2024-12-31')
+    print_row('rollup: daily, 1 year', measure(lambda: reporting.daily_totals(conn, *year), 10))
+    print_row('rollup: categories, 1 month', measure(lambda: reporting.category_totals(conn, *month), 10))
+    print_row('rollup: top products, 1 month', measure(lambda: reporting.product_totals(conn, *month), 10))
+    print_row('scan: daily, 1 year', measure(lambda: conn.execute(RAW_DAILY, year).fetchall(), 3))
+    print_row('scan: categories, 1 month', measure(lambda: conn.execute(RAW_CATEGORIES, month).fetchall(), 3))
+    print_row('scan: top products, 1 month', measure(lambda: conn.execute(RAW_PRODUCTS, month).fetchall(), 3))
+    pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Barcode scan latency: exact-code lookup in the search index against the old per-add price query.
+
+The old path opened a connection and queried the price every time a product
+was added; a scan now resolves SKU or product ID, price and stock with one
+dict lookup. The Tk redraw is not included here; the POS shows the full
+end-to-end figure for every scan in its status line.
+
+Usage: python -m benchmarks.bench_scan [--products 100000] [--scans 5000]
+"""
+import argparse
+import random
+import sqlite3
+import time
+
+from benchmarks.common import create_catalog, measure, print_row, temp_db_path
+from pos_core.db import ConnectionPool
+from pos_core.search_index import LOAD_QUERY, ProductSearchIndex
+
+
+def add_line(cart, product_id, product_name, unit_price, quantity):
+    for item in cart:
+        if item['product_id'] == product_id:
+            item['quantity'] += quantity
+            item['total_price'] = item['unit_price'] * item['quantity']
+            return
+    cart.append({'product_id': product_id, 'product_name': product_name, 'unit_price': unit_price,
+                 'quantity': quantity, 'total_price': unit_price * quantity})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=100_000)
+    parser.add_argument('--scans', type=int, default=5000)
+    parser.add_argument('--basket', type=int, default=30, help='distinct products per basket')
+    args = parser.parse_args()
+
+    path = create_catalog(temp_db_path(), products=args.products)
+    pool = ConnectionPool(path)
+    conn = pool.connection()
+
+    start = time.perf_counter()
+    index = ProductSearchIndex()
+    index.load(conn.execute(LOAD_QUERY))
+    print(f'{len(index)} products indexed in {time.perf_counter() - start:.2f} s\n')
+
+    rng = random.Random(7)
+    rows = conn.execute('SELECT product_id, product_name, sku FROM products').fetchall()
+    basket = rng.sample(rows, args.basket)
+    # Scanners send SKUs; repeats of the same basket items exercise the increment path
+    codes = [rng.choice(basket)[2] for _ in range(args.scans)]
+
+    cart = []
+    pending = iter(codes)
+
+    def scan():
+        product_id, product_name, sku, current_stock, unit_price = index.lookup(next(pending))
+        add_line(cart, product_id, product_name, unit_price, 1)
+
+    print_row(f'index lookup, {args.scans} scans', measure(scan, args.scans))
+
+    legacy_cart = []
+    sample = [rng.choice(basket) for _ in range(min(args.scans, 500))]
+    pending_rows = iter(sample)
+
+    def legacy():
+        # What add_to_cart used to do for the price, after the product was found in the list
+        product_id, product_name, sku = next(pending_rows)
+        legacy_conn = sqlite3.connect(path)
+        unit_price = legacy_conn.execute('SELECT price FROM products WHERE product_id = ?',
+                                         (product_id,)).fetchone()[0]
+        legacy_conn.close()
+        add_line(legacy_cart, product_id, product_name, unit_price, 1)
+
+    print_row(f'connect + price query, {len(sample)} adds', measure(legacy, len(sample)))
+    pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""Main menu: time to switch between the hosted screens.
+
+Without a display only the database side of a switch is timed: the queries a
+screen re-ran when shown again (each screen's refresh()), against the poll of
+the shared catalog cache that replaces them. With a display the menu itself is
+driven: every screen is opened once, then shown again ``--switches`` times,
+from the click to the drawn window.
+
+Usage: python -m benchmarks.bench_screen_switch [--products 100000] [--switches 20]
+"""
+import argparse
+import importlib.util
+import os
+import time
+import tkinter as tk
+
+from benchmarks.common import create_catalog, measure, print_row, temp_db_path
+from pos_core import db, migrations
+from pos_core.catalog import category_service, product_service
+from pos_core.catalog_cache import CatalogCache
+from pos_core.stock import stock_service
+
+MENU_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main menu.py')
+
+
+def reshow_queries():
+    # What showing the category, product and inventory screens again used to query
+    category_service.list()
+    category_service.labels()
+    product_service.search('')
+    stock_service.stock_rows('')
+
+
+def drive_menu(switches):
+    """Open every screen through the menu, then switch between them; returns {title: [ms, ...]}."""
+    spec = importlib.util.spec_from_file_location('main_menu', MENU_PATH)
+    main_menu = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(main_menu)
+
+    root = tk.Tk()
+    menu = main_menu.MainMenu(root)
+    timings = {}
+
+    def open_screen(screen):
+        start = time.perf_counter()
+        menu.open_screen(screen)
+        elapsed = (time.perf_counter() - start) * 1000
+        if screen.title not in menu.windows:
+            raise RuntimeError(f'{screen.title} could not be opened')
+        return elapsed
+
+    for screen in main_menu.SCREENS:
+        first = open_screen(screen)
+        print(f'{screen.title + " first open":<32} {first:8.1f} ms')
+        menu.windows[screen.title].withdraw()
+        timings[screen.title] = []
+    for _ in range(switches):
+        for screen in main_menu.SCREENS:
+            timings[screen.title].append(open_screen(screen))
+            root.update()
+            menu.windows[screen.title].withdraw()
+    menu.close()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=100_000)
+    parser.add_argument('--switches', type=int, default=20, help='times each screen is shown again')
+    args = parser.parse_args()
+
+    path = create_catalog(temp_db_path(), products=args.products)
+    pool = db.configure(path)
+    migrations.migrate()
+
+    catalog = CatalogCache(pool)
+    start = time.perf_counter()
+    catalog.load()
+    print(f'{len(catalog.products)} products, shared catalog loaded in {time.perf_counter() - start:.2f} s\n')
+    print_row('reshow queries (before)', measure(reshow_queries, args.switches))
+    print_row('shared catalog poll (after)', measure(catalog.poll, args.switches))
+    catalog.close()
+
+    try:
+        timings = drive_menu(args.switches)
+    except tk.TclError as e:
+        print(f'\nNo display, the menu was not driven: {e}')
+    else:
+        print()
+        for title, samples in timings.items():
+            print_row(f'switch to {title}', samples)
+    db.close_all()
+
+
+if __name__ == '__main__':
+    main()
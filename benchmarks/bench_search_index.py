@@ -0,0 +1,68 @@
+"""Typeahead latency of the in-memory product search index against SQL LIKE.
+
+Usage: python -m benchmarks.bench_search_index [--products 500000] [--typed 200]
+"""
+import argparse
+import random
+import time
+
+from benchmarks.common import create_catalog, measure, print_row, temp_db_path
+from pos_core.db import ConnectionPool
+from pos_core.search_index import LOAD_QUERY, ProductSearchIndex
+
+LIKE_QUERY = '''
+    SELECT products.product_id, products.product_name, products.sku,
+           IFNULL(stock_management.current_stock, 0) AS current_stock
+    FROM products
+    LEFT JOIN stock_management ON products.product_id = stock_management.product_id
+    WHERE products.product_id LIKE ? OR products.sku LIKE ? OR products.product_name LIKE ?
+'''
+
+
+def keystrokes(conn, rng, typed):
+    """Prefixes a cashier would type while looking up random products."""
+    total = conn.execute('SELECT COUNT(*) FROM products').fetchone()[0]
+    queries = []
+    for _ in range(typed):
+        product_id, name, sku = conn.execute(
+            'SELECT product_id, product_name, sku FROM products WHERE rowid = ?',
+            (rng.randint(1, total),)).fetchone()
+        term = rng.choice([sku, name.split(' #')[0], product_id])
+        queries.extend(term[:n] for n in range(1, len(term) + 1))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=500_000)
+    parser.add_argument('--typed', type=int, default=200, help='products looked up by typing')
+    parser.add_argument('--limit', type=int, default=1000, help='rows shown in the product list')
+    args = parser.parse_args()
+
+    path = create_catalog(temp_db_path(), products=args.products)
+    pool = ConnectionPool(path)
+    conn = pool.connection()
+
+    start = time.perf_counter()
+    index = ProductSearchIndex()
+    index.load(conn.execute(LOAD_QUERY))
+    print(f'{len(index)} products indexed in {time.perf_counter() - start:.2f} s\n')
+
+    queries = keystrokes(conn, random.Random(3), args.typed)
+    pending = iter(queries)
+    print_row(f'index, {len(queries)} keystrokes',
+              measure(lambda: index.search(next(pending), limit=args.limit), len(queries)))
+
+    sample = queries[:50]
+    pending = iter(sample)
+
+    def like():
+        term = f'%{next(pending)}%'
+        conn.execute(LIKE_QUERY + f' LIMIT {args.limit}', (term, term, term)).fetchall()
+
+    print_row(f'SQL LIKE, {len(sample)} keystrokes', measure(like, len(sample)))
+    pool.close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+# Words used to build realistic, n-gram friendly product names
+BRANDS = ['ACME', 'FRESHCO', 'GOLDEN', 'NATURA', 'PRIMO', 'SUNNY', 'VALLEY', 'ZEST']
+ITEMS = ['APPLE', 'BANANA', 'BREAD', 'BUTTER', 'CHEESE', 'COFFEE', 'COOKIES', 'FLOUR',
+         'HONEY', 'JUICE', 'MILK', 'NOODLES', 'OIL', 'RICE', 'SHAMPOO', 'SOAP', 'SUGAR',
+         'TEA', 'TISSUE', 'TOMATO', 'WATER', 'YOGURT']
+SIZES = ['100G', '250G', '500G', '1KG', '2KG', '250ML', '500ML', '1L', '2L', 'PACK OF 6']
+
+
+def product_name(rng, i):
+    """Return a deterministic product name such as 'SUNNY RICE 1KG #123'."""
+    return f'{rng.choice(BRANDS)} {rng.choice(ITEMS)} {rng.choice(SIZES)} #{i}'
+
+
+def temp_db_path(name='bench.db'):
+    """Return a path for a throwaway database in a fresh temporary directory."""
+    return os.path.join(tempfile.mkdtemp(prefix='pos-bench-'), name)
+
+
+def create_catalog(path, products=100_000, categories=20, seed=42):
+    """Create a database with the inventory.db catalog tables and fill it."""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE product_categories (
+            category_id TEXT PRIMARY KEY,
+            category_name TEXT UNIQUE NOT NULL,
+            description TEXT);
+        CREATE TABLE products (
+            product_id TEXT PRIMARY KEY,
+            product_name TEXT,
+            sku TEXT,
+            category_id TEXT,
+            category_name TEXT,
+            price REAL,
+            description TEXT);
+        CREATE TABLE stock_management (
+            product_id TEXT PRIMARY KEY,
+            current_stock INTEGER DEFAULT 0,
+            safety_stock INTEGER DEFAULT 0,
+            target_stock INTEGER DEFAULT 0);
+        CREATE TABLE stock_transactions (
+            transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id TEXT,
+            quantity INTEGER,
+            transaction_type TEXT,
+            transaction_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            remarks TEXT);
+    ''')
+    category_rows = [(f'PC-{i:03d}', f'CATEGORY {i}', '') for i in range(1, categories + 1)]
+    conn.executemany('INSERT INTO product_categories VALUES (?, ?, ?)', category_rows)
+
+    product_rows = []
+    stock_rows = []
+    for i in range(1, products + 1):
+        category_id, category_name, _ = category_rows[rng.randrange(categories)]
+        product_id = f'PID-{i:05d}'
+        product_rows.append((product_id, product_name(rng, i), f'SKU-{i:07d}', category_id,
+                             category_name, round(rng.uniform(0.5, 500), 2), ''))
+        stock_rows.append((product_id, rng.randrange(0, 500), 0, 0))
+    conn.executemany('INSERT INTO products VALUES (?, ?, ?, ?, ?, ?, ?)', product_rows)
+    conn.executemany('INSERT INTO stock_management VALUES (?, ?, ?, ?)', stock_rows)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def measure(fn, repeat):
+    """Call fn repeat times and return the per-call latencies in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(samples):
+    """Return mean, p50 and p99 of a list of millisecond samples."""
+    ordered = sorted(samples)
+    return {
+        'mean_ms': statistics.fmean(ordered),
+        'p50_ms': ordered[len(ordered) // 2],
+        'p99_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+    }
+
+
+def print_row(label, samples):
+    """Print one line of benchmark results."""
+    stats = summarize(samples)
+    print(f"{label:<32} mean {stats['mean_ms']:8.3f} ms   p50 {stats['p50_ms']:8.3f} ms   "
+          f"p99 {stats['p99_ms']:8.3f} ms")
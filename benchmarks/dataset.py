@@ -0,0 +1,157 @@
+"""Deterministic synthetic store on the real inventory.db schema.
+
+Fills a fresh database, migrated exactly as the apps migrate theirs, with
+categories, products, stock, customers and a sales history whose every line
+has its 'Sale' ledger row; each product also gets an opening balance, so the
+ledger sums to current_stock and the rollups are filled. The same size and
+seed always give the same rows (sale dates count from a fixed day, not from
+today), so timings taken on different versions are comparable.
+
+Usage: python -m benchmarks.dataset [--size 100k] [--output store.db] [--seed 42]
+"""
+import argparse
+import random
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from benchmarks.common import product_name, temp_db_path
+from pos_core import migrations, reporting
+from pos_core.db import ConnectionPool
+
+Size = namedtuple('Size', 'categories products customers sales')
+Dataset = namedtuple('Dataset', 'path size seed categories products customers sales sales_lines ledger_rows seconds')
+
+SIZES = {
+    '10k': Size(categories=20, products=10_000, customers=2_000, sales=10_000),
+    '100k': Size(categories=50, products=100_000, customers=20_000, sales=100_000),
+    '1m': Size(categories=100, products=1_000_000, customers=200_000, sales=1_000_000),
+}
+
+HISTORY_START = datetime(2024, 1, 1, 8, 0, 0)
+HISTORY_DAYS = 365
+MAX_LINES = 5          # Lines per basket are 1..MAX_LINES
+CUSTOMER_SHARE = 0.4   # Baskets with a loyalty customer
+BATCH = 50_000         # Rows per executemany
+
+LEDGER_INSERT = '''
+    INSERT INTO stock_transactions (product_id, quantity, transaction_type, transaction_date, remarks)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+
+def _batched(conn, statement, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH:
+            conn.executemany(statement, batch)
+            batch.clear()
+    if batch:
+        conn.executemany(statement, batch)
+
+
+def generate(path, size='10k', seed=42, progress=None):
+    """Create the store at ``path`` (a new file) and return its Dataset counts."""
+    started = time.perf_counter()
+    counts = SIZES[size] if isinstance(size, str) else size
+    rng = random.Random(seed)
+    pool = ConnectionPool(path)
+    migrations.migrate(pool)
+
+    def report(step):
+        if progress is not None:
+            progress(step, time.perf_counter() - started)
+
+    categories = [(f'PC-{i:03d}', f'CATEGORY {i}', '') for i in range(1, counts.categories + 1)]
+    prices = [0.0]
+    products = []
+    for i in range(1, counts.products + 1):
+        category_id, category_name, _ = categories[rng.randrange(counts.categories)]
+        prices.append(round(rng.uniform(0.5, 500), 2))
+        products.append((f'PID-{i:05d}', product_name(rng, i), f'SKU-{i:07d}', category_id, category_name,
+                         prices[i]))
+    mobiles = rng.sample(range(10**9, 10**10), counts.customers)
+    sold = [0] * (counts.products + 1)
+    sales_lines = 0
+
+    with pool.transaction() as conn:
+        conn.executemany('INSERT INTO product_categories (category_id, category_name, description) VALUES (?, ?, ?)',
+                         categories)
+        _batched(conn, 'INSERT INTO products (product_id, product_name, sku, category_id, category_name, price) '
+                       'VALUES (?, ?, ?, ?, ?, ?)', products)
+        del products
+        _batched(conn, 'INSERT INTO customer_list (customer_id, customer_name, mobile_number) VALUES (?, ?, ?)',
+                 ((f'cus-{i:06d}', f'CUSTOMER {i}', f'0{mobile}') for i, mobile in enumerate(mobiles, 1)))
+        report('catalog')
+
+        # The sales history, oldest first and written in chunks; every line is booked in the ledger
+        seconds_per_sale = HISTORY_DAYS * 86400 / max(counts.sales, 1)
+        for first in range(1, counts.sales + 1, BATCH):
+            headers = []
+            lines = []
+            ledger = []
+            for sale_id in range(first, min(first + BATCH, counts.sales + 1)):
+                sale_date = (HISTORY_START + timedelta(seconds=int((sale_id - 1) * seconds_per_sale))).strftime(
+                    '%Y-%m-%d %H:%M:%S')
+                customer_id = (f'cus-{rng.randint(1, counts.customers):06d}'
+                               if counts.customers and rng.random() < CUSTOMER_SHARE else None)
+                line_count = rng.randint(1, min(MAX_LINES, counts.products))
+                total = 0.0
+                for line_no, number in enumerate(rng.sample(range(1, counts.products + 1), line_count), 1):
+                    product_id = f'PID-{number:05d}'
+                    quantity = rng.randint(1, 3)
+                    total_price = round(prices[number] * quantity, 2)
+                    lines.append((sale_id, line_no, product_id, quantity, prices[number], total_price))
+                    ledger.append((product_id, -quantity, 'Sale', sale_date, f'sale #{sale_id}'))
+                    sold[number] += quantity
+                    total += total_price
+                headers.append((sale_id, sale_date, customer_id, line_count, round(total, 2)))
+            conn.executemany('INSERT INTO sales_header (sale_id, sale_date, customer_id, line_count, total_amount) '
+                             'VALUES (?, ?, ?, ?, ?)', headers)
+            conn.executemany('INSERT INTO sales_lines (sale_id, line_no, product_id, quantity, unit_price, '
+                             'total_price) VALUES (?, ?, ?, ?, ?, ?)', lines)
+            conn.executemany(LEDGER_INSERT, ledger)
+            sales_lines += len(lines)
+        report('sales')
+
+        # Opening stock covers what was sold plus what is on the shelf now
+        stock = []
+        opening = []
+        for number in range(1, counts.products + 1):
+            product_id = f'PID-{number:05d}'
+            on_hand = rng.randrange(0, 500)
+            stock.append((product_id, on_hand, rng.randrange(0, 20), rng.randrange(20, 100)))
+            opening.append((product_id, on_hand + sold[number], 'opening balance',
+                            HISTORY_START.strftime('%Y-%m-%d %H:%M:%S'), 'dataset'))
+        _batched(conn, 'INSERT INTO stock_management (product_id, current_stock, safety_stock, target_stock) '
+                       'VALUES (?, ?, ?, ?)', stock)
+        _batched(conn, LEDGER_INSERT, opening)
+        # A fresh store has no edits for caches to catch up on
+        conn.execute('DELETE FROM catalog_changes')
+        report('stock')
+    reporting.backfill(pool)
+    report('rollups')
+    pool.connection().execute('ANALYZE')
+    pool.close_all()
+    return Dataset(path, size if isinstance(size, str) else None, seed, counts.categories, counts.products,
+                   counts.customers, counts.sales, sales_lines, sales_lines + counts.products,
+                   time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', choices=sorted(SIZES), default='10k')
+    parser.add_argument('--output', help='database file to create (default: a temporary file)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    dataset = generate(args.output or temp_db_path(f'store-{args.size}.db'), args.size, args.seed,
+                       progress=lambda step, seconds: print(f'  {step} done after {seconds:.1f} s'))
+    print(f'{dataset.path}: {dataset.products:,} products, {dataset.customers:,} customers, '
+          f'{dataset.sales:,} sales ({dataset.sales_lines:,} lines), {dataset.ledger_rows:,} ledger rows '
+          f'in {dataset.seconds:.1f} s')
+
+
+if __name__ == '__main__':
+    main()
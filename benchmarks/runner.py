@@ -0,0 +1,193 @@
+"""Time the POS hot paths on generated stores and write the results as JSON.
+
+For each ``--sizes`` store (see benchmarks.dataset) the runner times what the
+screens do on every user action, through the same code they call:
+
+    search_keystroke       till search, one lookup per keystroke of a typed name (search index)
+    search_keystroke_sql   product management search, one query per keystroke (ProductService.search)
+    load_products          loading the catalog and building the search index (CheckoutLane.load)
+    record_sale            writing a 3-line basket with stock, ledger and rollups (record_basket)
+    generate_product_id    taking the next product ID (IdAllocator.allocate)
+    add_customer           registering a customer, ID generation included (CustomerDirectory.create)
+    category_delete_check  refusing to delete a category that is in use (CategoryService.delete)
+
+Results carry mean/p50/p99 in milliseconds per size. ``--compare OLD.json``
+prints the change against an earlier run and exits 1 if any p50 got more than
+``--tolerance`` slower and by more than ``--min-ms`` (sub-millisecond paths
+jitter by a few microseconds), so a regression between versions shows up in CI.
+
+Usage: python -m benchmarks.runner [--sizes 10k 100k 1m] [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import time
+
+from benchmarks.common import measure, summarize, temp_db_path
+from benchmarks.dataset import SIZES, generate
+from pos_core.catalog import CatalogError, CategoryService, ProductService
+from pos_core.checkout import CheckoutLane
+from pos_core.customers import CustomerDirectory
+from pos_core.db import ConnectionPool
+from pos_core.ids import PRODUCT_IDS, IdAllocator
+from pos_core.sales import record_basket
+
+SEARCH_LIMIT = 1000  # Rows the till's product list shows
+QUERIES = ('sunny rice 1kg', 'SKU-00012', 'PID-0042', 'golden tea', 'shampoo')
+
+
+def _git_version():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _keystrokes(queries):
+    return [query[:length] for query in queries for length in range(1, len(query) + 1)]
+
+
+def run_size(path, repeat):
+    """Time every hot path against the store at ``path``; returns {name: stats}."""
+    pool = ConnectionPool(path)
+    rng = random.Random(7)
+    products = pool.connection().execute('SELECT COUNT(*) FROM products').fetchone()[0]
+    results = {}
+
+    def record(name, samples):
+        results[name] = dict(summarize(samples), samples=len(samples))
+
+    lane = CheckoutLane(pool)
+    record('load_products', measure(lane.load, max(1, repeat // 50)))
+
+    keystrokes = _keystrokes(QUERIES)
+    record('search_keystroke', [sample for query in keystrokes for sample in
+                                measure(lambda: lane.search(query, limit=SEARCH_LIMIT), 1)])
+    product_service = ProductService(pool)
+    record('search_keystroke_sql', [sample for query in _keystrokes(QUERIES[:1]) for sample in
+                                    measure(lambda: product_service.search(query), 1)])
+    lane.close()
+
+    with pool.transaction() as conn:
+        # Sales in the benchmark must never be refused for stock
+        conn.execute('UPDATE stock_management SET current_stock = current_stock + 1000000')
+        conn.execute("""
+            INSERT INTO stock_transactions (product_id, quantity, transaction_type, remarks)
+            SELECT product_id, 1000000, 'add stock', 'benchmark' FROM stock_management
+        """)
+
+    def sale():
+        lines = []
+        for number in rng.sample(range(1, products + 1), 3):
+            quantity = rng.randint(1, 3)
+            price = round(rng.uniform(0.5, 50), 2)
+            lines.append((f'PID-{number:05d}', quantity, price, round(price * quantity, 2)))
+        record_basket(lines, pool=pool)
+    record('record_sale', measure(sale, repeat))
+
+    allocator = IdAllocator(PRODUCT_IDS, pool=pool)
+    record('generate_product_id', measure(allocator.allocate, repeat))
+
+    directory = CustomerDirectory(pool=pool)
+    mobiles = iter(range(10**9, 10**10))
+    record('add_customer', measure(lambda: directory.create('BENCH CUSTOMER', f'9{next(mobiles)}'), repeat))
+
+    categories = CategoryService(pool)
+    category_id = pool.connection().execute('SELECT category_id FROM products LIMIT 1').fetchone()[0]
+
+    def delete_check():
+        try:
+            categories.delete(category_id)
+        except CatalogError:
+            pass
+        else:
+            raise AssertionError(f'category {category_id} was deleted although products use it')
+    record('category_delete_check', measure(delete_check, repeat))
+
+    pool.close_all()
+    return results
+
+
+def compare(results, baseline, tolerance, min_ms):
+    """Print the change of every p50/p99 against ``baseline``; returns the regressions."""
+    regressions = []
+    for size, current in results['sizes'].items():
+        previous = baseline.get('sizes', {}).get(size)
+        if previous is None:
+            continue
+        print(f'{size} against {baseline.get("version") or "baseline"}')
+        for name, stats in current['results'].items():
+            old = previous['results'].get(name)
+            if old is None:
+                continue
+            change = stats['p50_ms'] / old['p50_ms'] - 1 if old['p50_ms'] else 0.0
+            flag = '  REGRESSION' if change > tolerance and stats['p50_ms'] - old['p50_ms'] > min_ms else ''
+            print(f"  {name:<24} p50 {old['p50_ms']:9.3f} -> {stats['p50_ms']:9.3f} ms ({change:+6.1%})   "
+                  f"p99 {old['p99_ms']:9.3f} -> {stats['p99_ms']:9.3f} ms{flag}")
+            if flag:
+                regressions.append((size, name, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', choices=sorted(SIZES), default=['10k', '100k'])
+    parser.add_argument('--repeat', type=int, default=200, help='samples per write path')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--data-dir', help='keep generated stores here and reuse them on later runs')
+    parser.add_argument('--output', help='JSON results file (default: standard output)')
+    parser.add_argument('--compare', help='earlier JSON results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed p50 slowdown, e.g. 0.2 for 20%%')
+    parser.add_argument('--min-ms', type=float, default=0.05, help='p50 slowdowns smaller than this are noise')
+    args = parser.parse_args()
+
+    results = {
+        'version': _git_version(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'sizes': {},
+    }
+    for size in args.sizes:
+        if args.data_dir:
+            os.makedirs(args.data_dir, exist_ok=True)
+            source = os.path.join(args.data_dir, f'store-{size}-{args.seed}.db')
+            if not os.path.exists(source):
+                print(f'generating {size} store in {source}', file=sys.stderr)
+                generate(source, size, args.seed)
+        else:
+            source = temp_db_path(f'store-{size}.db')
+            print(f'generating {size} store', file=sys.stderr)
+            generate(source, size, args.seed)
+        # Time a copy, so the writes of one run never leak into the next
+        path = temp_db_path(f'run-{size}.db')
+        with sqlite3.connect(source) as src, sqlite3.connect(path) as dst:
+            src.backup(dst)
+        print(f'timing {size}', file=sys.stderr)
+        results['sizes'][size] = {'dataset': dict(SIZES[size]._asdict()), 'results': run_size(path, args.repeat)}
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance, args.min_ms):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""Multi-process stock stress test: prove no update is lost at a target mutation rate.
+
+Several processes, each standing in for a till or back-office PC, hammer a few
+products with random +/- deltas at a combined ``--rate`` per second through
+pos_core.stock.StockService. Afterwards every product's stock must equal its
+starting level plus the deltas that were accepted, the ledger must hold exactly
+those deltas, and no stock may be negative. ``--legacy`` runs the old
+SELECT-compute-UPDATE code instead, which loses updates under the same load.
+
+Usage: python -m benchmarks.stress_stock [--processes 8] [--rate 1000] [--seconds 10]
+"""
+import argparse
+import multiprocessing
+import random
+import sys
+import time
+from collections import Counter
+
+from benchmarks.common import create_catalog, summarize, temp_db_path
+from pos_core.db import ConnectionPool
+from pos_core.stock import InsufficientStockError, StockService
+
+
+def legacy_apply(conn, product_id, delta, remarks):
+    # What InventoryManagementApp used to do: read, compute in Python, write back
+    current_stock = conn.execute('SELECT current_stock FROM stock_management WHERE product_id = ?',
+                                 (product_id,)).fetchone()[0] or 0
+    if current_stock + delta < 0:
+        raise InsufficientStockError(product_id, current_stock, -delta)
+    conn.execute('BEGIN')  # Where sqlite3 used to open its implicit transaction
+    conn.execute('UPDATE stock_management SET current_stock = ? WHERE product_id = ?',
+                 (current_stock + delta, product_id))
+    conn.execute("INSERT INTO stock_transactions (product_id, quantity, transaction_type, remarks) "
+                 "VALUES (?, ?, 'stress', ?)", (product_id, delta, remarks))
+    conn.commit()
+
+
+def worker(path, worker_id, product_ids, count, interval, legacy, results):
+    pool = ConnectionPool(path)
+    service = StockService(pool)
+    conn = pool.connection()
+    rng = random.Random(worker_id)
+    accepted = Counter()
+    refused = 0
+    latencies = []
+    next_at = time.perf_counter()
+    for i in range(count):
+        product_id = rng.choice(product_ids)
+        delta = rng.choice((-3, -2, -1, 1, 2, 3))
+        remarks = f'stress {worker_id}/{i}'
+        start = time.perf_counter()
+        try:
+            if legacy:
+                legacy_apply(conn, product_id, delta, remarks)
+            else:
+                service.apply(product_id, delta, 'stress', remarks)
+            accepted[product_id] += delta
+        except InsufficientStockError:
+            refused += 1
+        latencies.append((time.perf_counter() - start) * 1000)
+        next_at += interval
+        pause = next_at - time.perf_counter()
+        if pause > 0:
+            time.sleep(pause)
+    pool.close_all()
+    results.put((dict(accepted), refused, latencies))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--rate', type=int, default=1000, help='combined mutations per second')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--products', type=int, default=20, help='few products means heavy contention')
+    parser.add_argument('--legacy', action='store_true', help='run the old read-modify-write code')
+    args = parser.parse_args()
+
+    path = create_catalog(temp_db_path('stress.db'), products=args.products)
+    pool = ConnectionPool(path)
+    conn = pool.connection()
+    product_ids = [row[0] for row in conn.execute('SELECT product_id FROM products')]
+    initial = dict(conn.execute('SELECT product_id, current_stock FROM stock_management'))
+
+    per_process = int(args.rate * args.seconds / args.processes)
+    interval = args.processes / args.rate
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=worker,
+                                         args=(path, n, product_ids, per_process, interval, args.legacy, results))
+                 for n in range(args.processes)]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - start
+
+    accepted = Counter()
+    refused = 0
+    latencies = []
+    for deltas, process_refused, process_latencies in outcomes:
+        accepted.update(deltas)
+        refused += process_refused
+        latencies.extend(process_latencies)
+
+    final = dict(conn.execute('SELECT product_id, current_stock FROM stock_management'))
+    ledger = dict(conn.execute("SELECT product_id, SUM(quantity) FROM stock_transactions "
+                               "WHERE transaction_type = 'stress' GROUP BY product_id"))
+    lost = sum(abs(final[pid] - initial[pid] - accepted[pid]) for pid in product_ids)
+    ledger_mismatch = sum(1 for pid in product_ids if (ledger.get(pid) or 0) != accepted[pid])
+    negative = sum(1 for pid in product_ids if final[pid] < 0)
+    pool.close_all()
+
+    mutations = per_process * args.processes
+    stats = summarize(latencies)
+    print(f'{"legacy" if args.legacy else "StockService"}: {mutations} mutations from {args.processes} processes '
+          f'in {elapsed:.1f} s ({mutations / elapsed:.0f}/s), {refused} refused for insufficient stock')
+    print(f'latency mean {stats["mean_ms"]:.3f} ms  p50 {stats["p50_ms"]:.3f} ms  p99 {stats["p99_ms"]:.3f} ms')
+    print(f'lost units: {lost}  ledger mismatches: {ledger_mismatch}  negative stock: {negative}')
+    return 1 if lost or ledger_mismatch or negative else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,28 +1,158 @@
-import tkinter as tk
+import importlib.util
+import logging
 import os
-import subprocess
+import sqlite3
+import sys
+import time
+import tkinter as tk
+from collections import namedtuple
+from tkinter import messagebox
+
+from pos_core import db, instrumentation, migrations
+from pos_core.catalog_cache import CatalogCache
+
+logger = logging.getLogger(__name__)
+
+CATALOG_POLL_MS = 1000  # How often the shared catalog cache picks up edits made elsewhere
+
+# Folder holding the screens' source files
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# A screen hosted by the menu: button text, source file and the app class it defines
+Screen = namedtuple('Screen', 'title filename class_name')
+
+SCREENS = (
+    Screen('Product Category Management', 'PRODUCT CATEGORY MGNT.py', 'CategoryApp'),
+    Screen('Product Management', 'PRODUCT MANAGEMENT.py', 'ProductManagementApp'),
+    Screen('Inventory Management', 'INVMGT.py', 'InventoryManagementApp'),
+    Screen('POS', 'poswithcus.py', 'PosApp'),
+)
+
+
+# Function to import a screen's source file the first time it is opened
+def load_module(filename):
+    name = os.path.splitext(filename)[0].lower().replace(' ', '_')
+    module = sys.modules.get(name)
+    if module is None:
+        spec = importlib.util.spec_from_file_location(name, os.path.join(APP_DIR, filename))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            del sys.modules[name]
+            raise
+    return module
+
+
+class MainMenu:
+    """Launcher that hosts every screen as a window of this one process.
+
+    Screens share the process-wide connection pool and one catalog cache,
+    loaded when the first screen opens and polled by the menu. The POS builds
+    its search index from that cache, and every screen follows the cache's
+    change feed, so sales and edits show up without re-querying when a screen
+    is shown again. A screen is built the first time it is opened; closing it
+    only hides it, so opening it again is a redraw rather than a new
+    interpreter, Tk and database connection.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.root.title('Main Application')
+        self.root.geometry('320x330')
+
+        # Bring the schema up to date once; the screens then find nothing left to apply
+        migrations.migrate()
+
+        self.windows = {}  # Screen title -> its Toplevel, once built
+        self.apps = {}     # Screen title -> the app object in that Toplevel
+
+        # One catalog cache for every screen, on the same pool as the catalog services
+        self.catalog = CatalogCache(db.get_pool())
+        self.poll_job = None  # Set once the catalog is loaded
+
+        # Create buttons for opening the screens
+        for screen in SCREENS:
+            tk.Button(root, text=screen.title, width=30,
+                      command=lambda screen=screen: self.open_screen(screen)).pack(pady=10)
+
+        # How long the last switch took
+        self.status_var = tk.StringVar(value='Screens load on first use and stay open.')
+        tk.Label(root, textvariable=self.status_var, wraplength=300).pack(pady=10)
+
+        root.protocol('WM_DELETE_WINDOW', self.close)
+
+    # Function to show a screen, building it the first time, and report how long the switch took
+    def open_screen(self, screen):
+        started = time.perf_counter()
+        window = self.windows.get(screen.title)
+        first = window is None
+        try:
+            with instrumentation.action(f'open {screen.class_name}'):
+                if first:
+                    window = self.build_screen(screen)
+                else:
+                    # Pick up what was committed since the last poll, such as an edit on
+                    # the screen just left; an idle poll costs microseconds
+                    self.catalog.poll()
+                    window.deiconify()
+                window.lift()
+                window.focus_set()
+                # Include drawing the screen in the measurement
+                window.update_idletasks()
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not open {screen.title}: {e}")
+            return
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.status_var.set(f"{screen.title} {'loaded' if first else 'shown'} in {elapsed_ms:.0f} ms")
+        logger.info('%s %s in %.1f ms', screen.title, 'loaded' if first else 'shown', elapsed_ms)
 
-# Function to load Product Category Management
-def load_product_category_management():
-    app_path = 'main-PRODUCT CATEGORY MGNT.py'  # No need for full path if it's in the same folder
-    subprocess.Popen(['python', app_path])
+    # Function to import a screen and build its app in a new Toplevel
+    def build_screen(self, screen):
+        window = tk.Toplevel(self.root)
+        try:
+            app_class = getattr(load_module(screen.filename), screen.class_name)
+            app = app_class(window, catalog=self.shared_catalog())
+        except BaseException:
+            window.destroy()
+            raise
+        # Closing the window only hides it, so the next visit is instant
+        window.protocol('WM_DELETE_WINDOW', window.withdraw)
+        self.windows[screen.title] = window
+        self.apps[screen.title] = app
+        return window
 
-# Function to load Product Management
-def load_product_management():
-    app_path = 'PRODUCT MANAGEMENT.py'  # No need for full path if it's in the same folder
-    subprocess.Popen(['python', app_path])
+    # Function to load the shared catalog the first time a screen needs it
+    def shared_catalog(self):
+        if self.poll_job is None:
+            self.catalog.load()
+            self.poll_job = self.root.after(CATALOG_POLL_MS, self.poll_catalog)
+        return self.catalog
 
-# Create main app window
-root = tk.Tk()
-root.title('Main Application')
-root.geometry('300x200')
+    # Function to apply catalog changes to every screen, whether it is shown or not
+    def poll_catalog(self):
+        try:
+            self.catalog.poll()
+        except sqlite3.OperationalError as e:
+            logger.warning('Could not poll the catalog, trying again: %s', e)
+        self.poll_job = self.root.after(CATALOG_POLL_MS, self.poll_catalog)
 
-# Create buttons for loading the apps
-btn_category_management = tk.Button(root, text="Product Category Management", command=load_product_category_management)
-btn_category_management.pack(pady=20)
+    # Function to stop every screen and release the pooled connections
+    def close(self):
+        if self.poll_job is not None:
+            self.root.after_cancel(self.poll_job)
+        for app in self.apps.values():
+            close = getattr(app, 'close', None)
+            if close is not None:
+                close()
+        self.catalog.close()
+        db.close_all()
+        self.root.destroy()
 
-btn_product_management = tk.Button(root, text="Product Management", command=load_product_management)
-btn_product_management.pack(pady=20)
 
-# Start the main loop
-root.mainloop()
+if __name__ == "__main__":
+    root = tk.Tk()
+    MainMenu(root)
+    root.mainloop()
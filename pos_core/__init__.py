@@ -0,0 +1 @@
+"""Shared, display-independent building blocks for the POS and inventory apps."""
@@ -0,0 +1,144 @@
+"""The checkout cart: one line per product, amounts in integer cents.
+
+Lines are kept in a dict keyed by product_id, so adding a product that is
+already in the cart finds its line in O(1) and the cart keeps the order lines
+were first added in. The total is adjusted by each change rather than re-summed,
+and listeners are told which line changed so a display only redraws that row.
+Prices are converted to cents once when a line is created; totals never go
+through float arithmetic.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from pos_core.stock import InsufficientStockError
+
+# Change events passed to listeners as (event, line); CLEARED comes with line None
+ADDED = 'added'
+CHANGED = 'changed'
+REMOVED = 'removed'
+CLEARED = 'cleared'
+
+
+def to_cents(amount):
+    """Convert a price such as 12.5, '12.50' or Decimal('12.5') to 1250."""
+    return int((Decimal(str(amount)) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def format_cents(cents):
+    """Format cents as a two-decimal amount, e.g. 1250 -> '12.50'."""
+    return f'{Decimal(cents).scaleb(-2):.2f}'
+
+
+class CartLine:
+    __slots__ = ('product_id', 'product_name', 'unit_cents', 'quantity', 'total_cents')
+
+    def __init__(self, product_id, product_name, unit_cents, quantity):
+        self.product_id = product_id
+        self.product_name = product_name
+        self.unit_cents = unit_cents
+        self.quantity = quantity
+        self.total_cents = unit_cents * quantity
+
+    def __repr__(self):
+        return (f'CartLine({self.product_id!r}, {self.product_name!r}, unit_cents={self.unit_cents}, '
+                f'quantity={self.quantity})')
+
+    @property
+    def unit_price(self):
+        return Decimal(self.unit_cents).scaleb(-2)
+
+    @property
+    def total_price(self):
+        return Decimal(self.total_cents).scaleb(-2)
+
+
+class Cart:
+    """Cart lines keyed by product_id with an incrementally maintained total.
+
+    ``subscribe(listener)`` registers ``listener(event, line)``, called after
+    every change with ADDED, CHANGED, REMOVED or CLEARED. Passing ``stock`` to
+    ``add`` or ``set_quantity`` refuses quantities above it with
+    InsufficientStockError.
+    """
+
+    def __init__(self):
+        self._lines = {}
+        self._listeners = []
+        self.total_cents = 0
+        self.units = 0
+
+    def __len__(self):
+        return len(self._lines)
+
+    def __iter__(self):
+        return iter(self._lines.values())
+
+    def __contains__(self, product_id):
+        return product_id in self._lines
+
+    def get(self, product_id):
+        return self._lines.get(product_id)
+
+    @property
+    def total(self):
+        return Decimal(self.total_cents).scaleb(-2)
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+
+    def _emit(self, event, line):
+        for listener in self._listeners:
+            listener(event, line)
+
+    def add(self, product_id, product_name, unit_price, quantity=1, stock=None):
+        """Add quantity of a product, to its existing line if it has one; returns the line."""
+        if quantity <= 0:
+            raise ValueError("Quantity must be greater than zero")
+        line = self._lines.get(product_id)
+        if line is None:
+            if stock is not None and quantity > stock:
+                raise InsufficientStockError(product_id, stock, quantity)
+            line = self._lines[product_id] = CartLine(product_id, product_name, to_cents(unit_price), quantity)
+            self.total_cents += line.total_cents
+            self.units += quantity
+            self._emit(ADDED, line)
+            return line
+        self._set(line, line.quantity + quantity, stock)
+        return line
+
+    def set_quantity(self, product_id, quantity, stock=None):
+        """Change a line's quantity; returns the line."""
+        if quantity <= 0:
+            raise ValueError("Quantity must be greater than zero")
+        line = self._lines[product_id]
+        self._set(line, quantity, stock)
+        return line
+
+    def _set(self, line, quantity, stock):
+        if stock is not None and quantity > stock:
+            raise InsufficientStockError(line.product_id, stock, quantity)
+        total_cents = line.unit_cents * quantity
+        self.total_cents += total_cents - line.total_cents
+        self.units += quantity - line.quantity
+        line.quantity = quantity
+        line.total_cents = total_cents
+        self._emit(CHANGED, line)
+
+    def remove(self, product_id):
+        """Drop a line; returns it, or None if the product was not in the cart."""
+        line = self._lines.pop(product_id, None)
+        if line is not None:
+            self.total_cents -= line.total_cents
+            self.units -= line.quantity
+            self._emit(REMOVED, line)
+        return line
+
+    def clear(self):
+        self._lines.clear()
+        self.total_cents = 0
+        self.units = 0
+        self._emit(CLEARED, None)
+
+    def sale_lines(self):
+        """Return (product_id, quantity, unit_price, total_price) tuples for record_basket, prices as Decimal."""
+        return [(line.product_id, line.quantity, line.unit_price, line.total_price)
+                for line in self._lines.values()]
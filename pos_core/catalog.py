@@ -0,0 +1,167 @@
+"""Product and category maintenance, independent of any window.
+
+The back office screens and the command line call these services; validation
+problems and constraint violations are raised as CatalogError with a message
+fit to show the user.
+"""
+import sqlite3
+
+from pos_core import db
+from pos_core.ids import category_ids, product_ids
+
+
+class CatalogError(ValueError):
+    """A product or category change was refused; nothing was written."""
+
+
+def category_label(category_id, category_name):
+    """Return the 'PC-001: NAME' form the screens use to pick a category."""
+    return f"{category_id}: {category_name}"
+
+
+def parse_category_label(label):
+    """Return the category ID from a category_label, or None for an empty label."""
+    return label.split(":")[0].strip() if label else None
+
+
+class ProductService:
+    """Add, change, delete and search products."""
+
+    def __init__(self, pool=None):
+        self.pool = pool
+
+    def _pool(self):
+        return self.pool or db.get_pool()
+
+    def next_id(self):
+        """Preview of the next product ID; the ID itself is only taken when a product is added."""
+        return product_ids.peek()
+
+    def _check(self, conn, name, sku, category_id, price):
+        if not name or not sku or not category_id or price in (None, ''):
+            raise CatalogError("All fields except description are required.")
+        if conn.execute('SELECT 1 FROM product_categories WHERE category_id = ?', (category_id,)).fetchone() is None:
+            raise CatalogError("Invalid category selected.")
+        try:
+            return float(price)
+        except (TypeError, ValueError):
+            raise CatalogError(f"Price {price!r} is not a number.") from None
+
+    def add(self, name, sku, category_id, price, description=''):
+        """Add a product and return its new ID. Name and SKU are stored upper-case."""
+        name, sku = name.strip().upper(), sku.strip().upper()
+        try:
+            # Take the ID inside the insert's transaction so a failed insert gives it back
+            with self._pool().transaction() as conn:
+                price = self._check(conn, name, sku, category_id, price)
+                product_id = product_ids.allocate()
+                conn.execute('''
+                    INSERT INTO products (product_id, product_name, sku, category_id, category_name, price, description)
+                    VALUES (?, ?, ?, ?, (SELECT category_name FROM product_categories WHERE category_id = ?), ?, ?)
+                ''', (product_id, name, sku, category_id, category_id, price, description))
+        except sqlite3.IntegrityError:
+            raise CatalogError("SKU already exists.") from None
+        return product_id
+
+    def update(self, product_id, name, sku, category_id, price, description=''):
+        """Change a product's details."""
+        name, sku = name.strip().upper(), sku.strip().upper()
+        try:
+            with self._pool().transaction() as conn:
+                price = self._check(conn, name, sku, category_id, price)
+                changed = conn.execute('''
+                    UPDATE products
+                    SET product_name = ?, sku = ?, category_id = ?,
+                        category_name = (SELECT category_name FROM product_categories WHERE category_id = ?),
+                        price = ?, description = ?
+                    WHERE product_id = ?
+                ''', (name, sku, category_id, category_id, price, description, product_id)).rowcount
+        except sqlite3.IntegrityError:
+            raise CatalogError("SKU already exists.") from None
+        if not changed:
+            raise CatalogError(f"Product {product_id} not found.")
+
+    def delete(self, product_id):
+        """Delete a product; its ID is handed out again to the next product."""
+        with self._pool().transaction() as conn:
+            if not conn.execute('DELETE FROM products WHERE product_id = ?', (product_id,)).rowcount:
+                raise CatalogError(f"Product {product_id} not found.")
+        product_ids.release(product_id)
+
+    def search(self, search_term='', category_id=None):
+        """Return product rows whose ID, name or SKU contains search_term (case-insensitive)."""
+        search_term = search_term.lower()
+        query = '''
+            SELECT * FROM products
+            WHERE (LOWER(product_id) LIKE ? OR LOWER(product_name) LIKE ? OR LOWER(sku) LIKE ?)
+        '''
+        params = [f'%{search_term}%'] * 3
+        if category_id:
+            query += ' AND category_id = ?'
+            params.append(category_id)
+        return self._pool().connection().execute(query, params).fetchall()
+
+    def category_names(self):
+        """Return the category names in use by products."""
+        return [row[0] for row in self._pool().connection().execute('SELECT DISTINCT category_name FROM products')]
+
+
+class CategoryService:
+    """Add, change, delete and list product categories."""
+
+    def __init__(self, pool=None):
+        self.pool = pool
+
+    def _pool(self):
+        return self.pool or db.get_pool()
+
+    def list(self):
+        """Return (category_id, category_name, description) rows ordered by ID."""
+        return self._pool().connection().execute('SELECT * FROM product_categories ORDER BY category_id').fetchall()
+
+    def labels(self):
+        """Return a category_label per category."""
+        return [category_label(category_id, category_name) for category_id, category_name, _ in self.list()]
+
+    def add(self, category_name, description=''):
+        """Add a category and return its new ID. The name is stored upper-case."""
+        category_name = category_name.strip().upper()
+        if not category_name:
+            raise CatalogError("Category name is required.")
+        try:
+            # The ID is taken in the same transaction as the insert, so a failed insert gives it back
+            with self._pool().transaction() as conn:
+                category_id = category_ids.allocate()
+                conn.execute('''
+                    INSERT INTO product_categories (category_id, category_name, description)
+                    VALUES (?, ?, ?)
+                ''', (category_id, category_name, description))
+        except sqlite3.IntegrityError:
+            raise CatalogError(f"Category {category_name} already exists.") from None
+        return category_id
+
+    def update(self, category_id, category_name, description=''):
+        if not category_name:
+            raise CatalogError("Category name is required.")
+        try:
+            with self._pool().transaction() as conn:
+                conn.execute('''
+                    UPDATE product_categories
+                    SET category_name = ?, description = ?
+                    WHERE category_id = ?
+                ''', (category_name, description, category_id))
+        except sqlite3.IntegrityError:
+            raise CatalogError(f"Category {category_name} already exists.") from None
+
+    def delete(self, category_id):
+        """Delete a category that no product is assigned to."""
+        with self._pool().transaction() as conn:
+            in_use = conn.execute('SELECT COUNT(*) FROM products WHERE category_id = ?', (category_id,)).fetchone()[0]
+            if in_use:
+                raise CatalogError("Cannot delete category. Products are assigned to this category.")
+            conn.execute('DELETE FROM product_categories WHERE category_id = ?', (category_id,))
+        category_ids.release(category_id)
+
+
+product_service = ProductService()
+category_service = CategoryService()
@@ -0,0 +1,232 @@
+"""Process-local cache of the catalog: products, prices, categories and stock.
+
+Triggers on products, stock_management and product_categories append the key
+of every changed row to ``catalog_changes``. A cache polls ``PRAGMA
+data_version`` on its own connection, which costs no I/O and only changes when
+some connection (this process included) commits; then it reads the change log
+past the last position it saw and reloads just those rows. A lane therefore
+serves prices and stock from memory and still sees edits made elsewhere within
+one poll interval. A bulk import logs one change with a NULL key per table
+instead of a row per product, which makes every cache reload in full.
+"""
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+from pos_core import db
+from pos_core.search_index import LOAD_QUERY
+
+CHANGE_TABLE = '''
+    CREATE TABLE IF NOT EXISTS catalog_changes (
+        change_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT NOT NULL,
+        row_key TEXT
+    )
+'''
+
+# (trigger name prefix, table, key column); an UPDATE also logs the old key if the key changed
+_TRIGGERS = (
+    ('products', 'products', 'product_id'),
+    ('stock', 'stock_management', 'product_id'),
+    ('categories', 'product_categories', 'category_id'),
+)
+
+CHANGE_RETENTION = 100_000  # Change rows kept; a cache further behind reloads everything
+CHUNK_SIZE = 500
+
+Product = namedtuple('Product', 'product_id product_name sku current_stock category_id price')
+
+
+def create_change_log(conn):
+    conn.execute(CHANGE_TABLE)
+    for name, table, key in _TRIGGERS:
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{name}_insert_changes AFTER INSERT ON {table}
+            BEGIN
+                INSERT INTO catalog_changes (table_name, row_key) VALUES ('{table}', NEW.{key});
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{name}_update_changes AFTER UPDATE ON {table}
+            BEGIN
+                INSERT INTO catalog_changes (table_name, row_key) VALUES ('{table}', NEW.{key});
+                INSERT INTO catalog_changes (table_name, row_key)
+                SELECT '{table}', OLD.{key} WHERE OLD.{key} IS NOT NEW.{key};
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{name}_delete_changes AFTER DELETE ON {table}
+            BEGIN
+                INSERT INTO catalog_changes (table_name, row_key) VALUES ('{table}', OLD.{key});
+            END
+        ''')
+
+
+@contextmanager
+def bulk_inserts(conn, *tables):
+    """Log the inserts into ``tables`` made in the block as one change per table.
+
+    Use it inside the write transaction of a bulk insert. The insert triggers
+    are dropped and recreated in that same transaction, so no other connection
+    ever sees them missing.
+    """
+    for name, table, _ in _TRIGGERS:
+        if table in tables:
+            conn.execute(f'DROP TRIGGER IF EXISTS trg_{name}_insert_changes')
+    try:
+        yield
+    finally:
+        create_change_log(conn)
+    conn.executemany('INSERT INTO catalog_changes (table_name, row_key) VALUES (?, NULL)',
+                     [(table,) for table in tables])
+
+
+def trim_change_log(conn, keep=CHANGE_RETENTION):
+    """Drop all but the newest ``keep`` change rows in the caller's transaction; returns how many were deleted.
+
+    Only the rows past the retention are touched, so calling it on every write
+    that logs changes costs about as many deletes as that write added rows.
+    """
+    return conn.execute('''
+        DELETE FROM catalog_changes
+        WHERE change_id <= (SELECT IFNULL(MAX(change_id), 0) FROM catalog_changes) - ?
+    ''', (keep,)).rowcount
+
+
+def prune_changes(pool=None, keep=CHANGE_RETENTION):
+    """Drop all but the newest ``keep`` change rows; returns how many were deleted."""
+    with (pool or db.get_pool()).transaction() as conn:
+        return trim_change_log(conn, keep)
+
+
+def may_match(term, *fields):
+    """Return whether a ``LIKE '%term%'`` search could match one of fields.
+
+    Screens use it to tell whether a changed product could join their search
+    results. It errs towards a match: a term holding a LIKE wildcard always
+    matches, and case is folded beyond SQLite's ASCII-only folding.
+    """
+    if '%' in term or '_' in term:
+        return True
+    term = term.lower()
+    return any(term in str(field).lower() for field in fields if field is not None)
+
+
+class CatalogCache:
+    """In-memory products and categories kept current from the change log.
+
+    ``products`` maps product_id to a Product row and ``categories`` maps
+    category_id to its name. Call ``load()`` once and ``poll()`` periodically;
+    ``subscribe(listener)`` registers ``listener(product_ids, categories_changed)``,
+    called after every reload with the changed product IDs, or None after a full
+    load, and ``unsubscribe(listener)`` removes it. One cache can serve every
+    screen of a process. When more than ``full_reload_threshold`` products
+    changed at once, a bulk import was logged, or the log was pruned past the
+    cache's position, everything is reloaded.
+    """
+
+    def __init__(self, pool=None, full_reload_threshold=50_000):
+        self.pool = pool
+        self.full_reload_threshold = full_reload_threshold
+        self.products = {}
+        self.categories = {}
+        self._listeners = []
+        self._conn = None
+        self._data_version = None
+        self._last_change = 0
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        # A dedicated connection: data_version ignores commits made on the same
+        # connection, and the pooled ones commit this process's own sales
+        if self._conn is None:
+            pool = self.pool or db.get_pool()
+            self._conn = db.open_connection(pool.path, pool.pragmas)
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        self._listeners.remove(listener)
+
+    def _emit(self, product_ids, categories_changed):
+        for listener in list(self._listeners):  # A listener may unsubscribe itself
+            listener(product_ids, categories_changed)
+
+    def load(self):
+        """Load the whole catalog."""
+        with self._lock:
+            self._load_all()
+        self._emit(None, True)
+
+    def _load_all(self):
+        conn = self._connection()
+        self._data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+        conn.execute('BEGIN')  # One read snapshot for the log position and the rows
+        try:
+            self._last_change = conn.execute(
+                'SELECT IFNULL(MAX(change_id), 0) FROM catalog_changes').fetchone()[0]
+            self.products = {row[0]: Product(*row) for row in conn.execute(LOAD_QUERY)}
+            self._load_categories(conn)
+        finally:
+            conn.rollback()
+
+    def _load_categories(self, conn):
+        self.categories = dict(conn.execute(
+            'SELECT category_id, category_name FROM product_categories ORDER BY category_id'))
+
+    def poll(self):
+        """Apply changes committed since the last poll; returns True if anything changed."""
+        with self._lock:
+            conn = self._connection()
+            version = conn.execute('PRAGMA data_version').fetchone()[0]
+            if version == self._data_version:
+                return False
+            self._data_version = version
+            changes = conn.execute('''
+                SELECT change_id, table_name, row_key FROM catalog_changes
+                WHERE change_id > ? ORDER BY change_id
+            ''', (self._last_change,)).fetchall()
+            if not changes:
+                return False
+
+            product_ids = set()
+            categories_changed = False
+            bulk = False
+            for _, table_name, row_key in changes:
+                if table_name == 'product_categories':
+                    categories_changed = True
+                elif row_key is None:
+                    bulk = True
+                else:
+                    product_ids.add(row_key)
+
+            if bulk or changes[0][0] != self._last_change + 1 or len(product_ids) > self.full_reload_threshold:
+                # Pruned past our position, or a bulk change: cheaper to start over
+                self._load_all()
+                product_ids = None
+                categories_changed = True
+            else:
+                self._reload_products(conn, list(product_ids))
+                if categories_changed:
+                    self._load_categories(conn)
+                self._last_change = changes[-1][0]
+        self._emit(product_ids, categories_changed)
+        return True
+
+    def _reload_products(self, conn, product_ids):
+        for start in range(0, len(product_ids), CHUNK_SIZE):
+            chunk = product_ids[start:start + CHUNK_SIZE]
+            found = {row[0]: Product(*row) for row in conn.execute(
+                f"{LOAD_QUERY} WHERE products.product_id IN ({', '.join('?' * len(chunk))})", chunk)}
+            for product_id in chunk:
+                if product_id in found:
+                    self.products[product_id] = found[product_id]
+                else:
+                    self.products.pop(product_id, None)
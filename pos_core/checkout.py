@@ -0,0 +1,195 @@
+"""A till's checkout, independent of any window.
+
+A CheckoutLane holds the catalog cache, the product search index built from
+it, the cart and the customer of the sale in progress. Screens, scripts and
+benchmarks drive it the same way: look products up or scan codes, change the
+cart, assign a customer, then ``complete()`` the sale, which writes the basket
+in one transaction and picks up the new stock levels. A lane given a
+LaneJournal appends the basket to the journal instead and leaves the database
+write to the journal's background syncer.
+"""
+from collections import namedtuple
+
+from pos_core.cart import Cart, format_cents
+from pos_core.catalog_cache import CatalogCache
+from pos_core.customers import customers
+from pos_core.journal import JournalSyncer
+from pos_core.sales import record_basket
+from pos_core.search_index import ProductSearchIndex
+
+# What a completed sale returns: its sale_id (None until a journaled sale is synced),
+# the receipt text, the amount in cents and, for a journaling lane, the journal sequence number
+Receipt = namedtuple('Receipt', 'sale_id summary total_cents journal_seq', defaults=(None,))
+
+
+class UnknownProductError(ValueError):
+    """A scanned or selected code matches no product."""
+
+    def __init__(self, code):
+        super().__init__(f"Unknown code: {code}")
+        self.code = code
+
+
+class CheckoutLane:
+    """Cart, customer and cached catalog for one till.
+
+    ``subscribe(listener)`` registers ``listener(product_ids, categories_changed)``
+    for catalog changes picked up by ``poll()``, after the search index has
+    been brought up to date. Cart changes are published by ``cart.subscribe``.
+
+    A lane given a ``catalog`` shares that already loaded CatalogCache with the
+    other screens of the process instead of loading its own; its owner polls
+    and closes it.
+    """
+
+    def __init__(self, pool=None, directory=customers, journal=None, catalog=None):
+        self.pool = pool
+        self.customers = directory
+        self.journal = journal
+        self.syncer = JournalSyncer(journal, pool) if journal is not None else None
+        self.owns_catalog = catalog is None
+        self.catalog = CatalogCache(pool) if catalog is None else catalog
+        self.index = ProductSearchIndex()
+        self.cart = Cart()
+        self.customer = None
+        self._listeners = []
+        self.catalog.subscribe(self._on_catalog_change)
+
+    def load(self):
+        """Load the catalog and build the search index, and start syncing the journal if there is one."""
+        if self.owns_catalog:
+            self.catalog.load()
+        else:
+            self._on_catalog_change(None, True)  # Index what the shared cache holds
+        if self.syncer is not None:
+            self.syncer.start()
+
+    def close(self):
+        if self.syncer is not None:
+            # Last attempt to sync; whatever is left is synced on the next start
+            self.syncer.stop()
+            self.journal.close()
+        if self.owns_catalog:
+            self.catalog.close()
+        else:
+            self.catalog.unsubscribe(self._on_catalog_change)
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+
+    def poll(self):
+        """Pick up catalog edits made elsewhere; returns True if anything changed."""
+        return self.catalog.poll()
+
+    def _on_catalog_change(self, product_ids, categories_changed):
+        if product_ids is None:
+            # Full reload: rebuild the index so deleted products disappear too
+            index = ProductSearchIndex()
+            index.load(self.catalog.products.values())
+            self.index = index
+        else:
+            for product_id in product_ids:
+                product = self.catalog.products.get(product_id)
+                if product is None:
+                    self.index.remove(product_id)
+                else:
+                    self.index.upsert(*product)
+        for listener in self._listeners:
+            listener(product_ids, categories_changed)
+
+    @property
+    def categories(self):
+        """category_id -> category_name of the cached catalog."""
+        return self.catalog.categories
+
+    def search(self, query, category_id=None, limit=None):
+        """Return (product_id, product_name, sku, current_stock) rows from the index; safe on any thread."""
+        return self.index.search(query, category_id, limit=limit)
+
+    def match(self, product_id, query, category_id=None):
+        """Return the product's search row if search(query, category_id) would return it, else None."""
+        return self.index.match(product_id, query, category_id)
+
+    def lookup(self, code):
+        """Return (product_id, product_name, sku, current_stock, price) for a product ID or SKU, or None."""
+        return self.index.lookup(str(code))
+
+    def stock_of(self, product_id):
+        product = self.catalog.products.get(product_id)
+        return product.current_stock if product else 0
+
+    def add(self, code, quantity=1):
+        """Add quantity of a product (by ID or SKU) to the cart and return its cart line.
+
+        Raises UnknownProductError, or a ValueError such as InsufficientStockError
+        if the cached stock does not cover the line.
+        """
+        product = self.lookup(code)
+        if product is None:
+            raise UnknownProductError(str(code).strip())
+        product_id, product_name, _, current_stock, unit_price = product
+        return self.cart.add(product_id, product_name, unit_price, quantity, stock=current_stock)
+
+    def scan(self, code):
+        """Add one unit of a scanned code; scanning it again adds one more."""
+        return self.add(code, 1)
+
+    def set_quantity(self, product_id, quantity):
+        return self.cart.set_quantity(product_id, quantity, stock=self.stock_of(product_id))
+
+    def remove(self, product_id):
+        return self.cart.remove(product_id)
+
+    def assign_customer(self, mobile_number):
+        """Assign the registered customer with this mobile number; returns it, or None if unknown."""
+        customer = self.customers.lookup(mobile_number)
+        if customer is not None:
+            self.customer = customer
+        return customer
+
+    def register_customer(self, customer_name, mobile_number):
+        """Register a new customer and assign it to the sale."""
+        self.customer = self.customers.create(customer_name, mobile_number)
+        return self.customer
+
+    def clear_customer(self):
+        self.customer = None
+
+    def new_sale(self):
+        """Empty the cart and forget the customer."""
+        self.cart.clear()
+        self.customer = None
+
+    def summary(self):
+        """Return the sales summary shown at checkout."""
+        summary = "Sales Summary:\n"
+        for line in self.cart:
+            summary += f"{line.product_name}: Quantity {line.quantity}, Total ${format_cents(line.total_cents)}\n"
+        summary += f"\nTotal Sale Amount: ${format_cents(self.cart.total_cents)}"
+        if self.customer is not None:
+            summary += f"\n\nCustomer: {self.customer.customer_name} ({self.customer.mobile_number})"
+        return summary
+
+    def complete(self):
+        """Record the sale and start a new one; returns a Receipt.
+
+        The basket, its stock updates and the customer link are written in one
+        transaction. If the sale is refused (e.g. another lane sold the last
+        units) the exception propagates and the cart is kept. A journaling lane
+        only appends the basket to its journal, so the sale stands even while
+        the database cannot be reached.
+        """
+        if not self.cart:
+            raise ValueError("Your cart is empty!")
+        summary = self.summary()
+        total_cents = self.cart.total_cents
+        customer_id = self.customer.customer_id if self.customer is not None else None
+        if self.journal is not None:
+            journal_seq = self.journal.append(self.cart.sale_lines(), customer_id)
+            self.new_sale()
+            return Receipt(None, summary, total_cents, journal_seq)
+        sale_id = record_basket(self.cart.sale_lines(), customer_id, pool=self.pool)
+        # Pick up the new stock levels of the sold products
+        self.catalog.poll()
+        self.new_sale()
+        return Receipt(sale_id, summary, total_cents)
@@ -0,0 +1,180 @@
+"""Command line front end to the headless services, for bulk and scripted work.
+
+Runs without a display, so the same operations the screens perform can be
+scripted, scheduled and benchmarked. Item files are ``code,quantity`` lines
+(CSV with or without a header; a bare code counts as one unit), where a code
+is a SKU, or for ``sell`` also a product ID.
+
+Usage: python -m pos_core.cli [--db inventory.db] COMMAND ...
+
+    categories                          list categories
+    add-category NAME [--description]   add a category
+    products [--search TEXT] [--category ID]
+                                        list products as CSV
+    import-products FILE.csv            bulk import products (see pos_core.importer)
+    export-stock [--output FILE.csv]    write every product with its stock levels as CSV
+    adjust-stock KIND FILE [--durability full|normal|deferred]
+                                        apply one kind of stock adjustment to every line
+    receive FILE [--remarks TEXT]       post a goods receipt
+    sell FILE [--customer MOBILE]       ring up one basket and record the sale
+"""
+import argparse
+import csv
+import sys
+
+from pos_core import db, migrations
+from pos_core.catalog import CatalogError, category_service, product_service
+from pos_core.checkout import CheckoutLane
+from pos_core.importer import ProductImporter
+from pos_core.ledger_writer import DEFERRED, DURABILITY_LEVELS, NORMAL, LedgerWriter
+from pos_core.receiving import ReceiptError, goods_receiving, read_receipt_file
+from pos_core.stock import ADJUSTMENTS, StockService, stock_service
+
+STOCK_COLUMNS = ('product_id', 'product_name', 'sku', 'category_id', 'category_name',
+                 'current_stock', 'safety_stock', 'target_stock')
+
+
+def _write_csv(rows, header, path=None):
+    f = open(path, 'w', newline='', encoding='utf-8') if path else sys.stdout
+    try:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    finally:
+        if path:
+            f.close()
+
+
+def list_categories(args):
+    for category_id, category_name, description in category_service.list():
+        print(f'{category_id}  {category_name}' + (f'  ({description})' if description else ''))
+
+
+def add_category(args):
+    print(category_service.add(args.name, args.description))
+
+
+def list_products(args):
+    _write_csv(product_service.search(args.search, args.category),
+               ('product_id', 'product_name', 'sku', 'category_id', 'category_name', 'price', 'description'))
+
+
+def import_products(args):
+    report = ProductImporter(create_categories=args.create_categories).import_file(args.csv_path)
+    print(f'imported {report.imported:,} of {report.read:,} rows in {report.seconds:.2f} s, '
+          f'{len(report.rejects):,} rejected')
+    for reject in report.rejects[:10]:
+        print(f'  line {reject.line}: {reject.reason}')
+    return 1 if report.rejects else 0
+
+
+def export_stock(args):
+    _write_csv(stock_service.stock_rows(), STOCK_COLUMNS, args.output)
+
+
+def adjust_stock(args):
+    # Codes are resolved like a goods receipt's: unknown SKUs and bad quantities stop the whole file
+    resolved, problems = goods_receiving.validate(read_receipt_file(args.path))
+    if problems:
+        raise ReceiptError(problems)
+    if args.durability == NORMAL:
+        stock_service.adjust_many(resolved, args.kind, args.remarks)
+        print(f'{args.kind}: {len(resolved)} lines, {sum(quantity for _, quantity in resolved)} units')
+        return 0
+    writer = LedgerWriter(durability=args.durability)
+    service = StockService(writer=writer)
+    try:
+        if args.durability == DEFERRED:
+            # One buffered mutation per line, so a refused line does not hold back the rest
+            for line in resolved:
+                service.adjust_many([line], args.kind, args.remarks)
+        else:
+            service.adjust_many(resolved, args.kind, args.remarks)
+    finally:
+        writer.close()
+    print(f'{args.kind}: {len(resolved) - len(writer.refused)} lines applied, {len(writer.refused)} refused')
+    for _, error in writer.refused:
+        print(f'  {error}')
+    return 1 if writer.refused else 0
+
+
+def receive(args):
+    lines = read_receipt_file(args.path)
+    print(goods_receiving.receive(lines, args.remarks))
+
+
+def sell(args):
+    lane = CheckoutLane()
+    lane.load()
+    try:
+        if args.customer and lane.assign_customer(args.customer) is None:
+            raise ValueError(f'No customer with mobile number {args.customer}')
+        for code, quantity in read_receipt_file(args.path):
+            lane.add(code, int(quantity))
+        receipt = lane.complete()
+    finally:
+        lane.close()
+    print(f'sale #{receipt.sale_id}')
+    print(receipt.summary)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bulk and scripted POS operations, without a display.')
+    parser.add_argument('--db', help='database path (default: POS_DB_PATH or inventory.db)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('categories', help='list categories').set_defaults(run=list_categories)
+
+    command = commands.add_parser('add-category', help='add a category')
+    command.add_argument('name')
+    command.add_argument('--description', default='')
+    command.set_defaults(run=add_category)
+
+    command = commands.add_parser('products', help='list products as CSV')
+    command.add_argument('--search', default='', help='text in the product ID, name or SKU')
+    command.add_argument('--category', help='category ID')
+    command.set_defaults(run=list_products)
+
+    command = commands.add_parser('import-products', help='bulk import products from CSV')
+    command.add_argument('csv_path')
+    command.add_argument('--create-categories', action='store_true', help='create categories that do not exist')
+    command.set_defaults(run=import_products)
+
+    command = commands.add_parser('export-stock', help='write products with their stock levels as CSV')
+    command.add_argument('--output', help='CSV file (default: standard output)')
+    command.set_defaults(run=export_stock)
+
+    command = commands.add_parser('adjust-stock', help='apply one kind of adjustment to a file of SKU,quantity lines')
+    command.add_argument('kind', choices=sorted(ADJUSTMENTS))
+    command.add_argument('path')
+    command.add_argument('--remarks', help='ledger remarks (default depends on the kind)')
+    command.add_argument('--durability', choices=DURABILITY_LEVELS, default=NORMAL,
+                         help='full: fsync the commit; normal: one transaction for the file (default); '
+                              'deferred: buffered group commits, refused lines are reported and skipped')
+    command.set_defaults(run=adjust_stock)
+
+    command = commands.add_parser('receive', help='post a goods receipt from a file of SKU,quantity lines')
+    command.add_argument('path')
+    command.add_argument('--remarks')
+    command.set_defaults(run=receive)
+
+    command = commands.add_parser('sell', help='record one sale from a file of code,quantity lines')
+    command.add_argument('path')
+    command.add_argument('--customer', help="the customer's mobile number")
+    command.set_defaults(run=sell)
+
+    args = parser.parse_args(argv)
+    if args.db:
+        db.configure(args.db)
+    migrations.migrate()
+    try:
+        return args.run(args) or 0
+    except (CatalogError, ReceiptError, ValueError, OSError) as e:
+        print(f'error: {e}', file=sys.stderr)
+        return 2
+    finally:
+        db.close_all()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
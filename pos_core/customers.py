@@ -0,0 +1,113 @@
+import threading
+from collections import OrderedDict, namedtuple
+
+from pos_core import db
+from pos_core.ids import IdAllocator, IdSequence, create_id_tables
+
+CUSTOMER_TABLE = '''
+    CREATE TABLE IF NOT EXISTS customer_list (
+        customer_id TEXT PRIMARY KEY,
+        customer_name TEXT NOT NULL,
+        mobile_number TEXT NOT NULL UNIQUE
+    )
+'''
+
+# Customer IDs only ever grow, like the old MAX(...) + 1 scheme
+CUSTOMER_IDS = IdSequence('customer', 'cus-', 6, 'customer_list', 'customer_id')
+
+Customer = namedtuple('Customer', 'customer_id customer_name mobile_number')
+
+
+def create_customer_tables(conn):
+    """Create customer_list and the ID sequence tables it allocates from."""
+    conn.execute(CUSTOMER_TABLE)
+    create_id_tables(conn)
+
+
+def _prefix_upper_bound(prefix):
+    # Smallest string greater than every string starting with prefix
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class CustomerDirectory:
+    """Look up and register loyalty customers by mobile number.
+
+    Exact lookups hit the unique index on mobile_number and the most recently
+    served ``cache_size`` customers are kept in an LRU cache, so regulars are
+    assigned without touching the database. Prefix lookups are range scans on
+    the same index rather than ``LIKE`` scans of the whole table.
+    """
+
+    def __init__(self, cache_size=10_000, pool=None):
+        self.cache_size = cache_size
+        self.pool = pool
+        self.ids = IdAllocator(CUSTOMER_IDS, reuse_gaps=False, pool=pool)
+        self._cache = OrderedDict()   # mobile_number -> Customer, oldest first
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        return self.pool or db.get_pool()
+
+    def _remember(self, customer):
+        with self._lock:
+            self._cache[customer.mobile_number] = customer
+            self._cache.move_to_end(customer.mobile_number)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def lookup(self, mobile_number):
+        """Return the Customer with this mobile number, or None."""
+        mobile_number = mobile_number.strip()
+        with self._lock:
+            customer = self._cache.get(mobile_number)
+            if customer is not None:
+                self._cache.move_to_end(mobile_number)
+                return customer
+        row = self._pool().connection().execute('''
+            SELECT customer_id, customer_name, mobile_number
+            FROM customer_list
+            WHERE mobile_number = ?
+        ''', (mobile_number,)).fetchone()
+        if row is None:
+            return None
+        customer = Customer(*row)
+        self._remember(customer)
+        return customer
+
+    def find_by_prefix(self, prefix, limit=10):
+        """Return up to limit customers whose mobile number starts with prefix."""
+        prefix = prefix.strip()
+        if not prefix:
+            return []
+        rows = self._pool().connection().execute('''
+            SELECT customer_id, customer_name, mobile_number
+            FROM customer_list
+            WHERE mobile_number >= ? AND mobile_number < ?
+            ORDER BY mobile_number
+            LIMIT ?
+        ''', (prefix, _prefix_upper_bound(prefix), limit)).fetchall()
+        return [Customer(*row) for row in rows]
+
+    def create(self, customer_name, mobile_number):
+        """Register a new customer and return it.
+
+        Raises sqlite3.IntegrityError if the mobile number is already registered.
+        """
+        mobile_number = mobile_number.strip()
+        with self._pool().transaction() as conn:
+            customer_id = self.ids.allocate()
+            conn.execute('''
+                INSERT INTO customer_list (customer_id, customer_name, mobile_number)
+                VALUES (?, ?, ?)
+            ''', (customer_id, customer_name, mobile_number))
+        customer = Customer(customer_id, customer_name, mobile_number)
+        self._remember(customer)
+        return customer
+
+    def forget(self, mobile_number):
+        """Drop a cached customer, e.g. after it was edited elsewhere."""
+        with self._lock:
+            self._cache.pop(mobile_number.strip(), None)
+
+
+customers = CustomerDirectory()
@@ -0,0 +1,142 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# Path to the database file shared by every application
+DB_PATH = os.environ.get('POS_DB_PATH', 'inventory.db')
+
+# Pragmas applied to every pooled connection
+PRAGMAS = (
+    ('journal_mode', 'WAL'),        # Readers no longer block the writer
+    ('synchronous', 'NORMAL'),      # Safe with WAL, fsync only at checkpoints
+    ('cache_size', -64000),         # 64 MB page cache per connection
+    ('mmap_size', 268435456),       # Memory-map up to 256 MB of the file
+    ('busy_timeout', 5000),         # Wait up to 5 s for a competing writer
+    ('temp_store', 'MEMORY'),
+)
+
+# Class of the connections opened below; pos_core.instrumentation swaps in a timed one
+connection_factory = sqlite3.Connection
+
+
+def open_connection(path=DB_PATH, pragmas=PRAGMAS):
+    """Open a new connection with the tuned pragmas applied.
+
+    The connection is in autocommit mode: sqlite3 never opens a transaction
+    behind the caller's back, so BEGIN and COMMIT come only from
+    ``ConnectionPool.transaction()`` (or an explicit BEGIN).
+    """
+    conn = sqlite3.connect(path, check_same_thread=False, factory=connection_factory, isolation_level=None)
+    for name, value in pragmas:
+        conn.execute(f'PRAGMA {name} = {value}')
+    return conn
+
+
+class ConnectionPool:
+    """Hand out one long-lived connection per thread for a database file."""
+
+    def __init__(self, path=DB_PATH, pragmas=PRAGMAS):
+        self.path = path
+        self.pragmas = pragmas
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self._savepoints = 0
+
+    def connection(self):
+        """Return the calling thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = open_connection(self.path, self.pragmas)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def transaction(self, immediate=True):
+        """Run a block in one transaction, nesting as a savepoint when already inside one."""
+        conn = self.connection()
+        depth = getattr(self._local, 'depth', 0)
+        if depth:
+            with self._lock:
+                self._savepoints += 1
+                name = f'sp_{self._savepoints}'
+            conn.execute(f'SAVEPOINT {name}')
+            self._local.depth = depth + 1
+            try:
+                yield conn
+            except BaseException:
+                conn.execute(f'ROLLBACK TO {name}')
+                conn.execute(f'RELEASE {name}')
+                raise
+            finally:
+                self._local.depth = depth
+            conn.execute(f'RELEASE {name}')
+            return
+
+        if conn.in_transaction:
+            # Someone ran BEGIN on the pooled connection and never finished it;
+            # nesting inside it would make this commit a mere RELEASE
+            raise RuntimeError('The pooled connection is already inside a transaction not opened by transaction()')
+        conn.execute('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+        self._local.depth = 1
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._local.depth = 0
+        conn.commit()
+
+    def close_all(self):
+        """Close every connection handed out by this pool."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+# Process-wide pool shared by all applications
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_PATH)
+    return _pool
+
+
+def configure(path):
+    """Point the process-wide pool at another database file."""
+    global _pool, DB_PATH
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+        DB_PATH = path
+        _pool = ConnectionPool(path)
+    return _pool
+
+
+def get_connection():
+    """Return the calling thread's pooled connection."""
+    return get_pool().connection()
+
+
+def transaction(immediate=True):
+    """Open a transaction on the calling thread's pooled connection."""
+    return get_pool().transaction(immediate)
+
+
+def close_all():
+    """Close every pooled connection, e.g. when the application exits."""
+    if _pool is not None:
+        _pool.close_all()
@@ -0,0 +1,338 @@
+"""Nightly demand forecasting for every product at once.
+
+Each run reads the days of sales added since the previous run from the hour x
+product sales rollup into a dense day x product NumPy matrix and folds them,
+one day at a time across all products, into two forecasts of daily demand: a
+moving average over the last ``MOVING_AVERAGE_DAYS`` days and an exponentially
+smoothed level. The smoothed squared forecast error gives the demand's
+day-to-day deviation, from which a safety stock (cover for the lead time at the
+chosen service factor) and a target stock (safety plus the demand expected over
+lead time and review period) are proposed.
+
+Results are kept per run date in ``demand_forecasts``. The state needed to carry
+on (the smoothed level and variance and the trailing window) is stored with the
+latest ``KEEP_STATES`` runs in ``forecast_runs``, so a nightly run only reads the
+new days. Each run also records the last sale_id it saw: sales synced later from
+a lane journal can be dated on days already folded, and when the next run finds
+such a sale it carries on from the newest kept state before that day (or starts
+over from the history) instead. The proposals are not applied unless asked for
+(``--apply``).
+
+Needs NumPy. Usage: python -m pos_core.forecasting [--as-of YYYY-MM-DD] [--apply]
+"""
+import argparse
+import datetime
+import io
+import math
+import sqlite3
+import sys
+import time
+from collections import namedtuple
+
+from pos_core import db
+from pos_core.replenishment import LEAD_TIME_DAYS
+
+try:
+    import numpy as np
+except ImportError:  # Only needed to run a forecast
+    np = None
+
+FORECAST_TABLES = (
+    '''
+    CREATE TABLE IF NOT EXISTS forecast_runs (
+        run_date TEXT PRIMARY KEY,
+        first_day TEXT NOT NULL,
+        last_day TEXT NOT NULL,
+        products INTEGER NOT NULL,
+        seconds REAL NOT NULL,
+        state BLOB,
+        ran_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS demand_forecasts (
+        run_date TEXT NOT NULL,
+        product_id TEXT NOT NULL,
+        moving_average REAL NOT NULL,
+        smoothed REAL NOT NULL,
+        deviation REAL NOT NULL,
+        safety_stock INTEGER NOT NULL,
+        target_stock INTEGER NOT NULL,
+        PRIMARY KEY (run_date, product_id)
+    ) WITHOUT ROWID
+    ''',
+)
+
+MOVING_AVERAGE_DAYS = 28  # Days in the moving average window
+SMOOTHING = 0.2           # Weight of the newest day in the exponential smoothing
+SERVICE_FACTOR = 1.65     # Standard deviations of lead time demand held as safety stock (~95%)
+REVIEW_DAYS = 7           # Days between two orders for the same product
+HISTORY_DAYS = 365        # Days of history read by the first run
+DAY_CHUNK = 31            # Days read into one matrix
+KEEP_RUNS = 14            # Run dates whose forecasts are kept
+KEEP_STATES = 7           # Runs whose state is kept to fold in sales synced late
+
+ForecastReport = namedtuple('ForecastReport', 'run_date first_day last_day days products seconds')
+
+# Smoothed level, smoothed squared error, trailing window (days x products) and
+# the number of days seen, for the products in product_ids (sorted)
+ForecastState = namedtuple('ForecastState', 'product_ids level variance window seen last_day')
+
+
+def create_forecast_tables(conn):
+    for statement in FORECAST_TABLES:
+        conn.execute(statement)
+
+
+def add_forecast_sale_mark(conn):
+    # The last sale_id a run saw; NULL for runs made before it was recorded
+    conn.execute('ALTER TABLE forecast_runs ADD COLUMN last_sale_id INTEGER')
+
+
+def _day(text):
+    return datetime.date.fromisoformat(text)
+
+
+def empty_state(product_ids):
+    count = len(product_ids)
+    return ForecastState(product_ids, np.zeros(count), np.zeros(count),
+                         np.zeros((0, count), dtype=np.float32), np.zeros(count, dtype=np.int64), None)
+
+
+def dump_state(state):
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, product_ids=state.product_ids, level=state.level, variance=state.variance,
+                        window=state.window, seen=state.seen)
+    return buffer.getvalue()
+
+
+def load_state(blob, last_day):
+    with np.load(io.BytesIO(blob)) as arrays:
+        return ForecastState(arrays['product_ids'], arrays['level'], arrays['variance'],
+                             arrays['window'], arrays['seen'], _day(last_day))
+
+
+def align_state(state, product_ids):
+    """Return state re-indexed to product_ids; new products start empty, dropped ones are forgotten."""
+    aligned = empty_state(product_ids)
+    if not len(state.product_ids) or not len(product_ids):
+        return aligned._replace(last_day=state.last_day)
+    positions = np.minimum(np.searchsorted(product_ids, state.product_ids), len(product_ids) - 1)
+    kept = product_ids[positions] == state.product_ids
+    target, source = positions[kept], np.flatnonzero(kept)
+    aligned.level[target] = state.level[source]
+    aligned.variance[target] = state.variance[source]
+    aligned.seen[target] = state.seen[source]
+    window = np.zeros((len(state.window), len(product_ids)), dtype=np.float32)
+    window[:, target] = state.window[:, source]
+    return aligned._replace(window=window, last_day=state.last_day)
+
+
+def demand_matrix(conn, product_ids, first_day, last_day):
+    """Return units sold per day (rows, first_day..last_day) and product (columns).
+
+    Reads sales_rollup_hour_product, one row per hour and product sold, and
+    places the rows with NumPy; products not in product_ids are left out.
+    """
+    days = (last_day - first_day).days + 1
+    matrix = np.zeros((days, len(product_ids)), dtype=np.float32)
+    rows = conn.execute('''
+        SELECT substr(hour, 1, 10), product_id, quantity
+        FROM sales_rollup_hour_product
+        WHERE hour >= ? AND hour < ?
+    ''', (first_day.isoformat(), (last_day + datetime.timedelta(days=1)).isoformat())).fetchall()
+    if not rows or not len(product_ids):
+        return matrix
+    sold_days, sold_ids, quantities = zip(*rows)
+    day_rows = (np.array(sold_days, dtype='datetime64[D]') - np.datetime64(first_day, 'D')).astype(np.int64)
+    sold_ids = np.array(sold_ids, dtype=str)
+    columns = np.minimum(np.searchsorted(product_ids, sold_ids), len(product_ids) - 1)
+    known = product_ids[columns] == sold_ids
+    np.add.at(matrix, (day_rows[known], columns[known]), np.array(quantities, dtype=np.float32)[known])
+    return matrix
+
+
+def fold_days(state, matrix, smoothing=SMOOTHING, window_days=MOVING_AVERAGE_DAYS):
+    """Return state advanced over the days (rows) of matrix."""
+    level, variance, seen = state.level.copy(), state.variance.copy(), state.seen.copy()
+    # A product's first day seeds its level rather than dragging it up from zero
+    fresh = seen == 0
+    if len(matrix):
+        level[fresh] = matrix[0, fresh]
+    for demand in matrix:
+        error = demand - level
+        variance = (1 - smoothing) * (variance + smoothing * error * error)
+        level += smoothing * error
+    window = np.concatenate((state.window, matrix))[-window_days:]
+    return state._replace(level=level, variance=variance, window=window, seen=seen + len(matrix))
+
+
+def proposals(state, lead_time_days=LEAD_TIME_DAYS, review_days=REVIEW_DAYS, service_factor=SERVICE_FACTOR):
+    """Return (moving_average, deviation, safety_stock, target_stock) arrays for state."""
+    covered = np.minimum(state.seen, len(state.window))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        moving_average = np.where(covered > 0, state.window.sum(axis=0, dtype=np.float64) / covered, 0.0)
+    deviation = np.sqrt(state.variance)
+    safety = np.ceil(service_factor * deviation * math.sqrt(lead_time_days))
+    target = safety + np.ceil(state.level * (lead_time_days + review_days))
+    return moving_average, deviation, safety.astype(np.int64), target.astype(np.int64)
+
+
+def latest_state(conn, product_ids, before_day=None):
+    """Return the newest kept state, and the last sale_id its run saw.
+
+    With before_day, only states that end before that day are considered.
+    """
+    row = conn.execute('''
+        SELECT state, last_day, last_sale_id FROM forecast_runs
+        WHERE state IS NOT NULL AND last_day < ?
+        ORDER BY run_date DESC LIMIT 1
+    ''', ((before_day or datetime.date.max).isoformat(),)).fetchone()
+    if row is None:
+        return empty_state(product_ids), None
+    return align_state(load_state(row[0], row[1]), product_ids), row[2]
+
+
+def _last_sale_id(conn):
+    return conn.execute('SELECT IFNULL(MAX(sale_id), 0) FROM sales_header').fetchone()[0]
+
+
+def late_sale_day(conn, state, seen_sale_id):
+    """Return the first day state already folded that has received sales after seen_sale_id, or None."""
+    if state.last_day is None or seen_sale_id is None:
+        return None
+    first = conn.execute('SELECT MIN(sale_date) FROM sales_header WHERE sale_id > ?', (seen_sale_id,)).fetchone()[0]
+    if first is None or _day(first[:10]) > state.last_day:
+        return None
+    return _day(first[:10])
+
+
+def _first_sale_day(conn):
+    first = conn.execute('SELECT MIN(sale_date) FROM sales_header').fetchone()[0]
+    return _day(first[:10]) if first else None
+
+
+def run(pool=None, as_of=None, progress=None):
+    """Forecast from the days before as_of (default: today, UTC) not seen by an earlier run.
+
+    Days that received sales since the previous run are read again, with the
+    days after them. Returns a ForecastReport; ``days`` is 0 when there was
+    nothing new to read.
+    """
+    if np is None:
+        raise RuntimeError('Forecasting needs NumPy (pip install numpy)')
+    pool = pool or db.get_pool()
+    started = time.perf_counter()
+    run_date = as_of or datetime.datetime.now(datetime.timezone.utc).date()
+    last_day = run_date - datetime.timedelta(days=1)  # Only whole days are read
+
+    with pool.transaction(immediate=False) as conn:
+        product_ids = np.array([row[0] for row in conn.execute(
+            'SELECT product_id FROM stock_management ORDER BY product_id')], dtype=str)
+        last_sale_id = _last_sale_id(conn)
+        state, seen_sale_id = latest_state(conn, product_ids)
+        late_day = late_sale_day(conn, state, seen_sale_id)
+        if late_day is not None:
+            state, _ = latest_state(conn, product_ids, before_day=late_day)
+        if state.last_day is not None:
+            first_day = state.last_day + datetime.timedelta(days=1)
+        else:
+            first_sale = _first_sale_day(conn)
+            first_day = max(first_sale or run_date, run_date - datetime.timedelta(days=HISTORY_DAYS))
+        if first_day > last_day:
+            return ForecastReport(run_date, first_day, last_day, 0, len(product_ids), time.perf_counter() - started)
+        day = first_day
+        while day <= last_day:
+            chunk_end = min(day + datetime.timedelta(days=DAY_CHUNK - 1), last_day)
+            state = fold_days(state, demand_matrix(conn, product_ids, day, chunk_end))
+            if progress is not None:
+                progress(chunk_end, last_day)
+            day = chunk_end + datetime.timedelta(days=1)
+    state = state._replace(last_day=last_day)
+
+    moving_average, deviation, safety, target = proposals(state)
+    key = run_date.isoformat()
+    rows = zip([key] * len(product_ids), product_ids.tolist(), moving_average.tolist(), state.level.tolist(),
+               deviation.tolist(), safety.tolist(), target.tolist())
+    seconds = time.perf_counter() - started
+    with pool.transaction() as conn:
+        conn.execute('DELETE FROM demand_forecasts WHERE run_date = ?', (key,))
+        conn.executemany('''
+            INSERT INTO demand_forecasts (run_date, product_id, moving_average, smoothed, deviation,
+                                          safety_stock, target_stock)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        if late_day is not None:
+            # The states of the runs that folded the late sales' days miss them
+            conn.execute('UPDATE forecast_runs SET state = NULL WHERE last_day >= ?', (late_day.isoformat(),))
+        conn.execute('''
+            INSERT OR REPLACE INTO forecast_runs (run_date, first_day, last_day, products, seconds, state,
+                                                  last_sale_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (key, first_day.isoformat(), last_day.isoformat(), len(product_ids), seconds, dump_state(state),
+              last_sale_id))
+        conn.execute('''
+            UPDATE forecast_runs SET state = NULL WHERE state IS NOT NULL AND run_date NOT IN (
+                SELECT run_date FROM forecast_runs ORDER BY run_date DESC LIMIT ?)
+        ''', (KEEP_STATES,))
+        conn.execute('''
+            DELETE FROM demand_forecasts WHERE run_date NOT IN (
+                SELECT run_date FROM forecast_runs ORDER BY run_date DESC LIMIT ?)
+        ''', (KEEP_RUNS,))
+    return ForecastReport(run_date, first_day, last_day, (last_day - first_day).days + 1, len(product_ids),
+                          time.perf_counter() - started)
+
+
+def apply_proposals(pool=None, run_date=None):
+    """Copy a run's proposed safety and target stock into stock_management; returns the rows updated."""
+    pool = pool or db.get_pool()
+    with pool.transaction() as conn:
+        if run_date is None:
+            run_date = conn.execute('SELECT MAX(run_date) FROM forecast_runs').fetchone()[0]
+        return conn.execute('''
+            UPDATE stock_management
+            SET safety_stock = f.safety_stock, target_stock = f.target_stock
+            FROM demand_forecasts f
+            WHERE f.run_date = ? AND f.product_id = stock_management.product_id
+        ''', (str(run_date),)).rowcount
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Forecast demand and propose safety and target stock.')
+    parser.add_argument('--db', help='database path (default: POS_DB_PATH or inventory.db)')
+    parser.add_argument('--as-of', type=_day, help='run date, YYYY-MM-DD (default: today, UTC)')
+    parser.add_argument('--apply', action='store_true', help='write the proposals to stock_management')
+    parser.add_argument('--show', type=int, default=20, help='proposals to list, highest demand first')
+    args = parser.parse_args()
+
+    if args.db:
+        db.configure(args.db)
+
+    def progress(day, last_day):
+        print(f'\rread sales up to {day} of {last_day}', end='', flush=True)
+
+    try:
+        report = run(as_of=args.as_of, progress=progress)
+        applied = apply_proposals(run_date=report.run_date) if args.apply else None
+    except (RuntimeError, ValueError, sqlite3.Error) as e:
+        print(f'error: {e}', file=sys.stderr)
+        return 2
+    if report.days:
+        print(f'\r{report.products:,} products forecast from {report.days} days '
+              f'({report.first_day} to {report.last_day}) in {report.seconds:.2f} s')
+    else:
+        print(f'no new days since the last run (through {report.first_day - datetime.timedelta(days=1)})')
+    if applied is not None:
+        print(f'updated safety and target stock of {applied:,} products')
+    for product_id, smoothed, moving_average, safety, target in db.get_connection().execute('''
+        SELECT product_id, smoothed, moving_average, safety_stock, target_stock
+        FROM demand_forecasts WHERE run_date = ? ORDER BY smoothed DESC LIMIT ?
+    ''', (report.run_date.isoformat(), args.show)):
+        print(f'  {product_id}: {smoothed:.2f}/day ({MOVING_AVERAGE_DAYS}-day average {moving_average:.2f}), '
+              f'safety {safety}, target {target}')
+    db.close_all()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,191 @@
+from pos_core import db
+
+ID_TABLES = (
+    '''
+    CREATE TABLE IF NOT EXISTS id_sequences (
+        name TEXT PRIMARY KEY,
+        next_value INTEGER NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS id_free_list (
+        name TEXT NOT NULL,
+        value INTEGER NOT NULL,
+        PRIMARY KEY (name, value)
+    ) WITHOUT ROWID
+    ''',
+)
+
+
+def create_id_tables(conn):
+    """Create the sequence and free-list tables used by IdAllocator."""
+    for statement in ID_TABLES:
+        conn.execute(statement)
+
+
+class IdSequence:
+    """Format of one family of IDs, e.g. PID-00001, and the column that holds them."""
+
+    def __init__(self, name, prefix, width, table, column):
+        self.name = name
+        self.prefix = prefix
+        self.width = width
+        self.table = table
+        self.column = column
+
+    def format(self, value):
+        return f'{self.prefix}{value:0{self.width}d}'
+
+    def parse(self, text):
+        """Return the number in an ID of this family, or None."""
+        if not isinstance(text, str) or not text.startswith(self.prefix):
+            return None
+        try:
+            return int(text[len(self.prefix):])
+        except ValueError:
+            return None
+
+
+PRODUCT_IDS = IdSequence('product', 'PID-', 5, 'products', 'product_id')
+CATEGORY_IDS = IdSequence('category', 'PC-', 3, 'product_categories', 'category_id')
+
+
+class IdAllocator:
+    """Hand out IDs from a sequence row in O(1), optionally reusing released gaps.
+
+    The sequence is seeded once from the existing IDs (their maximum, plus every
+    gap below it when ``reuse_gaps`` is on). After that, allocating is a couple of
+    indexed statements inside a ``BEGIN IMMEDIATE`` transaction, so two clerks can
+    never receive the same ID.
+    """
+
+    def __init__(self, sequence, reuse_gaps=True, pool=None):
+        self.sequence = sequence
+        self.reuse_gaps = reuse_gaps
+        self.pool = pool
+
+    def _pool(self):
+        return self.pool or db.get_pool()
+
+    def _existing(self, conn):
+        """Return the numbers of the IDs already in the table."""
+        seq = self.sequence
+        used = set()
+        for (value,) in conn.execute(f'SELECT {seq.column} FROM {seq.table}'):
+            number = seq.parse(value)
+            if number is not None:
+                used.add(number)
+        return used
+
+    def _seed(self, conn):
+        if conn.execute('SELECT 1 FROM id_sequences WHERE name = ?', (self.sequence.name,)).fetchone():
+            return
+        seq = self.sequence
+        used = self._existing(conn)
+        highest = max(used, default=0)
+        conn.execute('INSERT INTO id_sequences (name, next_value) VALUES (?, ?)', (seq.name, highest + 1))
+        if self.reuse_gaps and len(used) < highest:
+            conn.executemany('INSERT OR IGNORE INTO id_free_list (name, value) VALUES (?, ?)',
+                             ((seq.name, n) for n in range(1, highest) if n not in used))
+
+    def _in_use(self, conn, value):
+        seq = self.sequence
+        return conn.execute(f'SELECT 1 FROM {seq.table} WHERE {seq.column} = ?',
+                            (seq.format(value),)).fetchone() is not None
+
+    def _take_free(self, conn):
+        row = conn.execute('SELECT value FROM id_free_list WHERE name = ? ORDER BY value LIMIT 1',
+                           (self.sequence.name,)).fetchone()
+        if row is None:
+            return None
+        conn.execute('DELETE FROM id_free_list WHERE name = ? AND value = ?', (self.sequence.name, row[0]))
+        return row[0]
+
+    def _take_next(self, conn, count=1):
+        name = self.sequence.name
+        conn.execute('UPDATE id_sequences SET next_value = next_value + ? WHERE name = ?', (count, name))
+        return conn.execute('SELECT next_value FROM id_sequences WHERE name = ?', (name,)).fetchone()[0] - count
+
+    def seed(self):
+        """Seed the sequence from the existing IDs now instead of on the first allocation."""
+        with self._pool().transaction() as conn:
+            self._seed(conn)
+
+    def peek(self):
+        """Return the ID the next allocate() would hand out, without taking it.
+
+        Only reads: before the sequence is seeded, the answer is worked out
+        from the existing IDs the way seeding would.
+        """
+        name = self.sequence.name
+        with self._pool().transaction(immediate=False) as conn:  # One read snapshot
+            row = conn.execute('SELECT next_value FROM id_sequences WHERE name = ?', (name,)).fetchone()
+            if row is None:
+                used = self._existing(conn)
+                highest = max(used, default=0)
+                gaps = (n for n in range(1, highest) if n not in used) if self.reuse_gaps else ()
+                return self.sequence.format(next(iter(gaps), highest + 1))
+            value = None
+            if self.reuse_gaps:
+                value = conn.execute('SELECT MIN(value) FROM id_free_list WHERE name = ?', (name,)).fetchone()[0]
+            return self.sequence.format(row[0] if value is None else value)
+
+    def allocate(self):
+        """Take the next ID. Run it inside the insert's transaction so a failed insert gives it back."""
+        with self._pool().transaction() as conn:
+            self._seed(conn)
+            while True:
+                value = self._take_free(conn) if self.reuse_gaps else None
+                if value is None:
+                    value = self._take_next(conn)
+                # IDs typed in by hand or imported may already be taken; skip those
+                if not self._in_use(conn, value):
+                    return self.sequence.format(value)
+
+    def _used_between(self, conn, first, last):
+        """Return the numbers from first to last whose ID is already in the table."""
+        seq = self.sequence
+        used = []
+        low = first
+        while low <= last:
+            # IDs of one length sort like their numbers, so each length is one index range
+            high = min(last, 10 ** max(seq.width, len(str(low))) - 1)
+            rows = conn.execute(f'SELECT {seq.column} FROM {seq.table} WHERE {seq.column} BETWEEN ? AND ?',
+                                (seq.format(low), seq.format(high)))
+            for (value,) in rows:
+                number = seq.parse(value)
+                if number is not None and low <= number <= high and seq.format(number) == value:
+                    used.append(number)
+            low = high + 1
+        return used
+
+    def allocate_block(self, count):
+        """Take count consecutive new IDs at once (free-list gaps are not used)."""
+        with self._pool().transaction() as conn:
+            self._seed(conn)
+            while True:
+                first = self._take_next(conn, count)
+                used = self._used_between(conn, first, first + count - 1)
+                if not used:
+                    return [self.sequence.format(value) for value in range(first, first + count)]
+                # IDs typed in by hand or imported may already be taken; start again past them
+                name = self.sequence.name
+                conn.execute('UPDATE id_sequences SET next_value = ? WHERE name = ?', (max(used) + 1, name))
+                if self.reuse_gaps:
+                    taken = set(used)
+                    conn.executemany('INSERT OR IGNORE INTO id_free_list (name, value) VALUES (?, ?)',
+                                     ((name, n) for n in range(first, max(used)) if n not in taken))
+
+    def release(self, text):
+        """Give a deleted ID back so it can be reused."""
+        value = self.sequence.parse(text)
+        if value is None or not self.reuse_gaps:
+            return
+        with self._pool().transaction() as conn:
+            self._seed(conn)
+            conn.execute('INSERT OR IGNORE INTO id_free_list (name, value) VALUES (?, ?)',
+                         (self.sequence.name, value))
+
+
+product_ids = IdAllocator(PRODUCT_IDS)
+category_ids = IdAllocator(CATEGORY_IDS)
@@ -0,0 +1,257 @@
+"""Streaming bulk import of products from CSV.
+
+The CSV needs a header row with at least ``product_name``, ``sku``, ``category``
+(category name or ID) and ``price``; ``description``, ``current_stock``,
+``safety_stock`` and ``target_stock`` are optional. Rows are read and written
+in chunks: each chunk takes a block of product IDs, is bound once into a temp
+staging table with ``executemany`` and copied into products, stock_management
+and the ledger in one transaction, so a crash loses at most the chunk in
+flight. Invalid rows are skipped and reported instead of aborting the run.
+The catalog change log gets one entry per chunk rather than one per product.
+
+Usage: python -m pos_core.importer products.csv [--rejects rejects.csv] [--create-categories]
+"""
+import argparse
+import csv
+import math
+import sys
+import time
+from collections import namedtuple
+from operator import itemgetter
+
+from pos_core import db, migrations
+from pos_core.catalog_cache import bulk_inserts
+from pos_core.ids import CATEGORY_IDS, PRODUCT_IDS, IdAllocator
+
+REQUIRED_COLUMNS = ('product_name', 'sku', 'category', 'price')
+COLUMNS = REQUIRED_COLUMNS + ('description', 'current_stock', 'safety_stock', 'target_stock')
+
+STAGING_TABLE = '''
+    CREATE TEMP TABLE IF NOT EXISTS import_staging (
+        product_id, product_name, sku, category_id, category_name, price, description,
+        current_stock, safety_stock, target_stock
+    )
+'''
+
+Reject = namedtuple('Reject', 'line reason row')
+ImportReport = namedtuple('ImportReport', 'read imported rejects seconds')
+
+
+class ProductImporter:
+    """Import product rows in chunks with bulk-allocated IDs.
+
+    ``progress(read, imported, rejected)`` is called after every chunk.
+    Unknown categories are rejected unless ``create_categories`` is set.
+    """
+
+    def __init__(self, pool=None, chunk_size=10_000, create_categories=False, progress=None):
+        self.pool = pool or db.get_pool()
+        self.chunk_size = chunk_size
+        self.create_categories = create_categories
+        self.progress = progress
+        self.product_ids = IdAllocator(PRODUCT_IDS, pool=self.pool)
+        self.category_ids = IdAllocator(CATEGORY_IDS, pool=self.pool)
+        self._categories = None   # Upper-cased name or ID -> (category_id, category_name)
+        self._skus = None         # Every SKU in the catalog, including the chunks committed so far
+        self._width = None        # Number of columns in the input rows
+        self._pick = None
+
+    def _load_caches(self):
+        conn = self.pool.connection()
+        self._categories = {}
+        for category_id, category_name in conn.execute('SELECT category_id, category_name FROM product_categories'):
+            self._categories[category_id.upper()] = (category_id, category_name)
+            self._categories[category_name.upper()] = (category_id, category_name)
+        self._skus = {sku for (sku,) in conn.execute('SELECT sku FROM products WHERE sku IS NOT NULL')}
+
+    def _category(self, conn, value, created):
+        key = value.upper()
+        category = self._categories.get(key) or created.get(key)
+        if category is None and self.create_categories and key:
+            category = (self.category_ids.allocate(), key)
+            conn.execute('INSERT INTO product_categories (category_id, category_name) VALUES (?, ?)', category)
+            created[key] = created[category[0].upper()] = category
+        return category
+
+    def import_file(self, path, encoding='utf-8-sig'):
+        """Import a CSV file and return an ImportReport."""
+        with open(path, newline='', encoding=encoding) as f:
+            reader = csv.reader(f)
+            header = [column.strip().lower() for column in next(reader, [])]
+            return self.import_rows(reader, header)
+
+    def import_rows(self, rows, header=COLUMNS):
+        """Import rows given as sequences in ``header`` order.
+
+        Line numbers in rejects assume the rows came after a header line.
+        """
+        missing = [column for column in REQUIRED_COLUMNS if column not in header]
+        if missing:
+            raise ValueError(f"CSV is missing required columns: {', '.join(missing)}")
+        # Picks COLUMNS out of a row; a column the file lacks reads the blank cell
+        # appended at position len(header)
+        self._width = len(header)
+        self._pick = itemgetter(*(header.index(column) if column in header else self._width
+                                  for column in COLUMNS))
+        started = time.perf_counter()
+        self._load_caches()
+        conn = self.pool.connection()
+        conn.execute(STAGING_TABLE)
+        # The chunks keep rewriting the same index pages: checkpoint them once at the end
+        autocheckpoint = conn.execute('PRAGMA wal_autocheckpoint').fetchone()[0]
+        conn.execute('PRAGMA wal_autocheckpoint = 0')
+        read = imported = 0
+        rejects = []
+        chunk = []
+        try:
+            for line, row in enumerate(rows, 2):
+                read += 1
+                chunk.append((line, row))
+                if len(chunk) >= self.chunk_size:
+                    imported += self._write_chunk(chunk, rejects)
+                    chunk = []
+                    self._report(read, imported, rejects)
+            if chunk:
+                imported += self._write_chunk(chunk, rejects)
+                self._report(read, imported, rejects)
+        finally:
+            conn.execute(f'PRAGMA wal_autocheckpoint = {autocheckpoint}')
+            conn.execute('PRAGMA wal_checkpoint(PASSIVE)')
+        return ImportReport(read, imported, rejects, time.perf_counter() - started)
+
+    def _report(self, read, imported, rejects):
+        if self.progress is not None:
+            self.progress(read, imported, len(rejects))
+
+    def _write_chunk(self, chunk, rejects):
+        # SKUs and categories of this chunk; they join the caches only once it commits
+        skus = set()
+        created = {}
+        chunk_rejects = []
+        with self.pool.transaction() as conn:
+            valid = []
+            for line, row in chunk:
+                try:
+                    valid.append(self._parse(conn, row, skus, created))
+                except ValueError as e:
+                    chunk_rejects.append(Reject(line, str(e), row))
+            if valid:
+                self._insert(conn, valid)
+        self._skus |= skus
+        self._categories.update(created)
+        rejects.extend(chunk_rejects)
+        return len(valid)
+
+    def _insert(self, conn, valid):
+        product_ids = self.product_ids.allocate_block(len(valid))
+        # Bind every row once into an unindexed temp table, then fan it out in C
+        conn.executemany('INSERT INTO temp.import_staging VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                         [(product_id,) + parsed for product_id, parsed in zip(product_ids, valid)])
+        with bulk_inserts(conn, 'products', 'stock_management'):
+            conn.execute('''
+                INSERT INTO products (product_id, product_name, sku, category_id, category_name, price, description)
+                SELECT product_id, product_name, sku, category_id, category_name, price, description
+                FROM temp.import_staging
+            ''')
+            conn.execute('''
+                INSERT INTO stock_management (product_id, current_stock, safety_stock, target_stock)
+                SELECT product_id, current_stock, safety_stock, target_stock
+                FROM temp.import_staging
+            ''')
+        # Book the initial stock through the ledger so it stays the source of truth
+        conn.execute('''
+            INSERT INTO stock_transactions (product_id, quantity, transaction_type, remarks)
+            SELECT product_id, current_stock, 'opening balance', 'product import'
+            FROM temp.import_staging
+            WHERE current_stock != 0
+        ''')
+        conn.execute('DELETE FROM temp.import_staging')
+
+    def _parse(self, conn, row, skus, created):
+        if len(row) == self._width:
+            row = [*row, '']
+        else:
+            row = (list(row) + [''] * self._width)[:self._width] + ['']  # Ragged line
+        name, sku, category, price, description, stock, safety, target = map(str.strip, self._pick(row))
+        name = name.upper()
+        sku = sku.upper()
+        if not name:
+            raise ValueError('product_name is empty')
+        if not sku:
+            raise ValueError('sku is empty')
+        if sku in self._skus or sku in skus:
+            raise ValueError(f'duplicate SKU {sku}')
+        category_row = self._category(conn, category, created)
+        if category_row is None:
+            raise ValueError(f'unknown category {category!r}')
+        price = _number('price', price, float)
+        stock = _number('current_stock', stock, int, 0)
+        safety = _number('safety_stock', safety, int, 0)
+        target = _number('target_stock', target, int, 0)
+        skus.add(sku)
+        return (name, sku, category_row[0], category_row[1], price, description, stock, safety, target)
+
+
+def _number(column, text, kind, default=None):
+    if not text:
+        if default is None:
+            raise ValueError(f'{column} is empty')
+        return default
+    try:
+        value = kind(text)
+    except ValueError:
+        raise ValueError(f'{column} is not a valid number: {text!r}') from None
+    if kind is float and not math.isfinite(value):
+        raise ValueError(f'{column} is not a finite number: {text!r}')
+    if value < 0:
+        raise ValueError(f'{column} is negative: {text!r}')
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import products from a CSV file.')
+    parser.add_argument('csv_path')
+    parser.add_argument('--db', help='database path (default: POS_DB_PATH or inventory.db)')
+    parser.add_argument('--chunk-size', type=int, default=10_000)
+    parser.add_argument('--create-categories', action='store_true', help='create categories that do not exist')
+    parser.add_argument('--rejects', help='write rejected rows with the reason to this CSV')
+    args = parser.parse_args()
+
+    if args.db:
+        db.configure(args.db)
+    migrations.migrate()
+
+    started = time.perf_counter()
+
+    def progress(read, imported, rejected):
+        elapsed = time.perf_counter() - started
+        print(f'\r{read:,} read, {imported:,} imported, {rejected:,} rejected '
+              f'({read / elapsed if elapsed else 0:,.0f} rows/s)', end='', flush=True)
+
+    importer = ProductImporter(chunk_size=args.chunk_size, create_categories=args.create_categories,
+                               progress=progress)
+    try:
+        report = importer.import_file(args.csv_path)
+    except ValueError as e:
+        print(f'error: {e}', file=sys.stderr)
+        return 2
+    print()
+    print(f'imported {report.imported:,} of {report.read:,} rows in {report.seconds:.2f} s '
+          f'({report.read / report.seconds if report.seconds else 0:,.0f} rows/s), {len(report.rejects):,} rejected')
+    for reject in report.rejects[:10]:
+        print(f'  line {reject.line}: {reject.reason}')
+    if args.rejects and report.rejects:
+        with open(args.csv_path, newline='', encoding='utf-8-sig') as f:
+            header = next(csv.reader(f), [])
+        with open(args.rejects, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['line', 'reason'] + header)
+            for reject in report.rejects:
+                writer.writerow([reject.line, reject.reason] + list(reject.row))
+        print(f'rejected rows written to {args.rejects}')
+    db.close_all()
+    return 1 if report.rejects else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
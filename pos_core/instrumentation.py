@@ -0,0 +1,372 @@
+"""Opt-in latency histograms for SQL statements and UI actions.
+
+Set POS_METRICS_FILE to switch it on for every app that imports this module:
+connections opened through pos_core.db afterwards time each execute, fetch
+and commit, and ``action()`` times the Tk callbacks it wraps. Every
+POS_METRICS_INTERVAL seconds the histograms are written to POS_METRICS_FILE in
+the Prometheus text format (point node_exporter's textfile collector at its
+directory). An action slower than POS_SLOW_ACTION_MS is logged, with the SQL
+it ran as SQLite executed it, to the ``.slow.log`` file next to the metrics.
+
+Statements are labelled with their SQL text, whitespace collapsed and
+placeholder lists folded, so the labels stay few. Switched off, the cost is
+one check per ``action()``; switched on, a few microseconds per statement.
+
+Usage: POS_METRICS_FILE=/var/lib/node_exporter/pos.prom python POS.py
+"""
+import atexit
+import bisect
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from pos_core import db
+
+logger = logging.getLogger(__name__)
+
+METRICS_FILE = os.environ.get('POS_METRICS_FILE')
+SLOW_ACTION_MS = float(os.environ.get('POS_SLOW_ACTION_MS', 100))
+WRITE_INTERVAL = float(os.environ.get('POS_METRICS_INTERVAL', 15))   # Seconds between writes
+APP_NAME = os.environ.get('POS_METRICS_APP') or os.path.splitext(os.path.basename(sys.argv[0] or 'python'))[0]
+
+# Histogram bucket upper bounds in milliseconds
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+MAX_STATEMENT_LABELS = 500     # Further statements are counted under 'other'
+MAX_ACTION_STATEMENTS = 50     # Statements kept per action for the slow log
+MAX_SQL_LENGTH = 500           # Characters of one statement in the slow log
+
+_PLACEHOLDER_LIST = re.compile(r'\?(\s*,\s*\?)+')
+_SAVEPOINT_NAME = re.compile(r'\bsp_\d+\b')
+
+_metrics = None
+_local = threading.local()
+
+
+class Histogram:
+    """Counts of observations per bucket, plus their sum, in milliseconds."""
+
+    __slots__ = ('counts', 'sum_ms', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.sum_ms = 0.0
+        self.count = 0
+
+    def observe(self, ms):
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.sum_ms += ms
+        self.count += 1
+
+
+class ActionTrace:
+    """One running action and the statements it executed, as [sql, ms] entries."""
+
+    __slots__ = ('name', 'started', 'statements', 'dropped')
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.statements = []
+        self.dropped = 0
+
+    def add(self, sql, ms=None):
+        if len(self.statements) < MAX_ACTION_STATEMENTS:
+            entry = [sql, ms]
+            self.statements.append(entry)
+            return entry
+        self.dropped += 1
+        return None
+
+    def timed(self, sql, ms, mark):
+        """Give ``ms`` to the statement traced since ``mark``, or add it untraced."""
+        if len(self.statements) > mark:
+            # The last one traced; an implicit BEGIN may have been traced before it
+            entry = self.statements[-1]
+            entry[1] = ms
+            return entry
+        return self.add(sql, ms)
+
+
+def _label(sql):
+    label = ' '.join(sql.split())
+    label = _PLACEHOLDER_LIST.sub('?, ...', label)
+    return _SAVEPOINT_NAME.sub('sp_N', label)
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    """Statement and action histograms, written periodically to a Prometheus text file."""
+
+    def __init__(self, path, slow_ms=SLOW_ACTION_MS, interval=WRITE_INTERVAL, app=APP_NAME):
+        self.path = path
+        self.slow_log = os.path.splitext(path)[0] + '.slow.log'
+        self.slow_ms = slow_ms
+        self.interval = interval
+        self.app = app
+        self.statements = {}      # (label, phase) -> Histogram
+        self.actions = {}         # name -> Histogram
+        self.slow_actions = {}    # name -> count
+        self._labels = {}         # raw SQL -> label
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def observe_statement(self, sql, phase, ms):
+        label = self._labels.get(sql)
+        if label is None:
+            label = _label(sql)
+            if len(self._labels) < 4 * MAX_STATEMENT_LABELS:
+                self._labels[sql] = label
+        with self._lock:
+            histogram = self.statements.get((label, phase))
+            if histogram is None:
+                if len(self.statements) >= MAX_STATEMENT_LABELS:
+                    label = 'other'
+                histogram = self.statements.setdefault((label, phase), Histogram())
+            histogram.observe(ms)
+
+    def observe_action(self, trace, ms):
+        with self._lock:
+            histogram = self.actions.get(trace.name)
+            if histogram is None:
+                histogram = self.actions[trace.name] = Histogram()
+            histogram.observe(ms)
+            slow = ms >= self.slow_ms
+            if slow:
+                self.slow_actions[trace.name] = self.slow_actions.get(trace.name, 0) + 1
+        if slow:
+            self.report_slow(trace, ms)
+
+    def report_slow(self, trace, ms):
+        """Log a slow action with the statements it ran."""
+        sql_ms = sum(entry[1] or 0.0 for entry in trace.statements)
+        logger.warning('slow action %s: %.1f ms, %.1f ms in %d statements',
+                       trace.name, ms, sql_ms, len(trace.statements) + trace.dropped)
+        lines = [f'{datetime.now():%Y-%m-%d %H:%M:%S} {self.app} slow action {trace.name}: {ms:.1f} ms on '
+                 f'{threading.current_thread().name}, {sql_ms:.1f} ms in '
+                 f'{len(trace.statements) + trace.dropped} statements']
+        for sql, statement_ms in trace.statements:
+            timing = f'{statement_ms:10.2f} ms' if statement_ms is not None else f'{"-":>13}'
+            lines.append(f"  {timing}  {' '.join(sql.split())[:MAX_SQL_LENGTH]}")
+        if trace.dropped:
+            lines.append(f'  ... {trace.dropped} more statements not kept')
+        try:
+            with open(self.slow_log, 'a', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+        except OSError as e:
+            logger.error('Could not write the slow action log %s: %s', self.slow_log, e)
+
+    def render(self):
+        """Return the histograms in the Prometheus text exposition format."""
+        with self._lock:
+            statements = [(key, list(h.counts), h.sum_ms, h.count) for key, h in self.statements.items()]
+            actions = [(name, list(h.counts), h.sum_ms, h.count) for name, h in self.actions.items()]
+            slow = dict(self.slow_actions)
+        app = f'app="{_escape(self.app)}"'
+        out = []
+
+        def histogram(metric, help_text, rows):
+            out.append(f'# HELP {metric} {help_text}')
+            out.append(f'# TYPE {metric} histogram')
+            for labels, counts, sum_ms, count in rows:
+                cumulative = 0
+                for bound, bucket in zip(BUCKETS_MS, counts):
+                    cumulative += bucket
+                    out.append(f'{metric}_bucket{{{labels},le="{bound / 1000:g}"}} {cumulative}')
+                out.append(f'{metric}_bucket{{{labels},le="+Inf"}} {count}')
+                out.append(f'{metric}_sum{{{labels}}} {sum_ms / 1000:.6f}')
+                out.append(f'{metric}_count{{{labels}}} {count}')
+
+        histogram('pos_sql_statement_seconds', 'Time spent executing, fetching and committing SQL statements.',
+                  [(f'{app},statement="{_escape(label)}",phase="{phase}"', counts, sum_ms, count)
+                   for (label, phase), counts, sum_ms, count in sorted(statements)])
+        histogram('pos_ui_action_seconds', 'Time taken by UI actions such as Tk callbacks.',
+                  [(f'{app},action="{_escape(name)}"', counts, sum_ms, count)
+                   for name, counts, sum_ms, count in sorted(actions)])
+        out.append(f'# HELP pos_ui_slow_actions_total UI actions slower than {self.slow_ms:g} ms.')
+        out.append('# TYPE pos_ui_slow_actions_total counter')
+        for name, count in sorted(slow.items()):
+            out.append(f'pos_ui_slow_actions_total{{{app},action="{_escape(name)}"}} {count}')
+        return '\n'.join(out) + '\n'
+
+    def write(self):
+        """Replace the metrics file, atomically so a collector never reads half of it."""
+        temp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(temp_path, self.path)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                logger.error('Could not write metrics to %s: %s', self.path, e)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='metrics-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the writer thread and write the metrics one last time."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.write()
+
+
+def _trace(sql):
+    # Called by SQLite for every statement it runs, with the parameters bound
+    stack = getattr(_local, 'actions', None)
+    if stack:
+        trace = stack[-1]
+        # Trigger steps are reported again under the statement that fired them
+        if not trace.statements or trace.statements[-1][0] != sql:
+            trace.add(sql)
+
+
+def _timed(owner, phase, sql, fn, *args):
+    metrics = _metrics
+    if metrics is None or sql is None:
+        return fn(*args)
+    stack = getattr(_local, 'actions', None)
+    trace = stack[-1] if stack else None
+    mark = len(trace.statements) if trace is not None else 0
+    started = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        ms = (time.perf_counter() - started) * 1000
+        metrics.observe_statement(sql, phase, ms)
+        if trace is not None:
+            if phase == 'fetch':
+                entry = getattr(owner, '_entry', None)
+                if entry is not None and entry[1] is not None:
+                    entry[1] += ms
+            else:
+                entry = trace.timed(sql, ms, mark)
+                if owner is not None:
+                    owner._entry = entry
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor whose execute and fetch calls feed the statement histograms."""
+
+    _sql = None
+    _entry = None
+
+    def execute(self, sql, parameters=()):
+        self._sql, self._entry = sql, None
+        return _timed(self, 'execute', sql, super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._sql, self._entry = sql, None
+        return _timed(self, 'execute', sql, super().executemany, sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        self._sql, self._entry = None, None
+        return _timed(self, 'execute', sql_script, super().executescript, sql_script)
+
+    # Rows are produced as they are fetched, so a scan's cost mostly shows up here;
+    # iterating over the cursor is not timed
+    def fetchone(self):
+        return _timed(self, 'fetch', self._sql, super().fetchone)
+
+    def fetchmany(self, size=None):
+        return _timed(self, 'fetch', self._sql, super().fetchmany, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return _timed(self, 'fetch', self._sql, super().fetchall)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection that times its statements and traces them for the running action."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.set_trace_callback(_trace)
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+    def commit(self):
+        # With WAL and synchronous=FULL this is where the fsync is paid
+        return _timed(None, 'execute', 'COMMIT', super().commit)
+
+
+@contextmanager
+def action(name):
+    """Time a UI action and the SQL it runs; also usable as a decorator.
+
+    Wrap the work, not a dialog it shows: time spent waiting for the user to
+    dismiss a messagebox would be reported as a slow action.
+    """
+    metrics = _metrics
+    if metrics is None:
+        yield
+        return
+    stack = getattr(_local, 'actions', None)
+    if stack is None:
+        stack = _local.actions = []
+    trace = ActionTrace(name)
+    stack.append(trace)
+    try:
+        yield
+    finally:
+        ms = (time.perf_counter() - trace.started) * 1000
+        stack.pop()
+        if stack:
+            # The enclosing action ran these statements too
+            parent = stack[-1]
+            room = max(0, MAX_ACTION_STATEMENTS - len(parent.statements))
+            parent.statements.extend(trace.statements[:room])
+            parent.dropped += len(trace.statements[room:]) + trace.dropped
+        metrics.observe_action(trace, ms)
+
+
+def enable(path=METRICS_FILE, slow_ms=SLOW_ACTION_MS, interval=WRITE_INTERVAL):
+    """Start collecting; connections opened from now on are instrumented. Returns the Metrics."""
+    global _metrics
+    if _metrics is not None:
+        return _metrics
+    _metrics = Metrics(path, slow_ms, interval)
+    db.connection_factory = InstrumentedConnection
+    _metrics.start()
+    logger.info('writing latency metrics to %s every %g s', path, interval)
+    return _metrics
+
+
+def disable():
+    """Stop collecting and write the metrics file a last time."""
+    global _metrics
+    metrics, _metrics = _metrics, None
+    if metrics is None:
+        return
+    db.connection_factory = sqlite3.Connection
+    metrics.stop()
+
+
+atexit.register(disable)
+
+if METRICS_FILE:
+    enable()
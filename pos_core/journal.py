@@ -0,0 +1,411 @@
+"""Append-only sales journal for a lane, drained into the central database.
+
+A lane with a journal does not write completed baskets to inventory.db
+itself. It appends each one as a JSON line with the next sequence number and
+fsyncs, so the sale survives the central database being locked, or its shared
+drive going away, and checkout never waits on another lane's transaction. A
+JournalSyncer drains the journal in the background in batched transactions,
+and records each (lane, seq) in ``journal_sync`` in the same transaction, so
+replaying a journal, after a crash or from a second process, never books a
+sale twice.
+
+The journal is a directory of segment files named after their first sequence
+number; a new segment is started every SEGMENT_ENTRIES baskets and segments
+are deleted once every basket in them is in the database. A basket the
+database refuses (e.g. its stock was sold meanwhile by another lane) is kept
+in ``journal_sync`` with the reason, so the sale is not lost: ``python -m
+pos_core.journal rejected`` lists them and ``retry`` books them once the stock
+has been corrected.
+
+Usage: python -m pos_core.journal [--db inventory.db] {status,sync,rejected,retry} ...
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import sqlite3
+import sys
+import threading
+from datetime import datetime, timezone
+
+from pos_core import db
+from pos_core.sales import record_baskets
+
+logger = logging.getLogger(__name__)
+
+# Lanes journal their sales when POS_JOURNAL_DIR is set; each lane gets its own subdirectory
+JOURNAL_DIR = os.environ.get('POS_JOURNAL_DIR')
+LANE_ID = os.environ.get('POS_LANE_ID') or socket.gethostname()
+
+SEGMENT_ENTRIES = 1000   # Baskets per segment file
+SYNC_BATCH = 500         # Most baskets written to the database in one transaction
+SYNC_INTERVAL = 1.0      # Seconds between syncs while the database is reachable
+RETRY_INTERVAL = 5.0     # Seconds between syncs after the database could not be reached
+
+JOURNAL_SYNC_TABLE = '''
+    CREATE TABLE IF NOT EXISTS journal_sync (
+        lane_id TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        sale_id INTEGER,
+        error TEXT,
+        basket TEXT,
+        synced_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (lane_id, seq)
+    ) WITHOUT ROWID
+'''
+
+
+def create_journal_sync_table(conn):
+    conn.execute(JOURNAL_SYNC_TABLE)
+
+
+class JournalError(ValueError):
+    """A journal segment is damaged somewhere other than its last line."""
+
+
+def _fsync_directory(path):
+    # Make a new segment's directory entry durable; not possible on Windows
+    if hasattr(os, 'O_DIRECTORY'):
+        fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+class LaneJournal:
+    """Durable, sequence-numbered log of one lane's completed baskets.
+
+    Entries are dicts with ``seq``, ``at`` (UTC sale time), ``customer_id`` and
+    ``lines``, the (product_id, quantity, unit_price, total_price) tuples of
+    record_basket; Decimal prices are written as strings, so no cent is lost. Opening a journal truncates a last line left half-written
+    by a crash; that basket was never acknowledged to the cashier. A journal
+    opened on an empty directory (a new lane, or one whose directory was lost)
+    continues after the lane's last sequence number in ``journal_sync``, so it
+    never hands out a number the database already holds.
+    """
+
+    def __init__(self, path, lane_id=LANE_ID, pool=None):
+        self.path = path
+        self.lane_id = lane_id
+        self.pool = pool
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+        self._file = None
+        self._segment_entries = 0
+        self.last_seq = 0
+        self._recover()
+
+    def _segments(self):
+        """Return the (first_seq, filename) of every segment in sequence order."""
+        return sorted((int(name.split('.')[0]), name) for name in os.listdir(self.path)
+                      if name.endswith('.journal'))
+
+    def _recover(self):
+        segments = self._segments()
+        if not segments:
+            self.last_seq = self._synced_through()
+            return
+        first_seq, name = segments[-1]
+        segment_path = os.path.join(self.path, name)
+        good_bytes = 0
+        self.last_seq = first_seq - 1
+        with open(segment_path, 'rb') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b'\n'):
+                    break
+                good_bytes += len(line)
+                self.last_seq = entry['seq']
+                self._segment_entries += 1
+        if good_bytes != os.path.getsize(segment_path):
+            logger.warning('Dropping a torn entry after seq %d in %s', self.last_seq, segment_path)
+            with open(segment_path, 'r+b') as f:
+                f.truncate(good_bytes)
+                os.fsync(f.fileno())
+        self._file = open(segment_path, 'ab')
+
+    def _synced_through(self):
+        try:
+            return synced_seq((self.pool or db.get_pool()).connection(), self.lane_id)
+        except sqlite3.Error as e:
+            logger.error('Lane %s journal %s is empty and the database cannot tell where its sequence ended (%s); '
+                         'numbering from 1, baskets whose number is already synced will NOT be booked',
+                         self.lane_id, self.path, e)
+            return 0
+
+    def append(self, lines, customer_id=None):
+        """Write one basket durably and return its sequence number."""
+        with self._lock:
+            if self._file is None or self._segment_entries >= SEGMENT_ENTRIES:
+                self._start_segment()
+            seq = self.last_seq + 1
+            entry = {'seq': seq, 'at': datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+                     'customer_id': customer_id, 'lines': [list(line) for line in lines]}
+            self._file.write(json.dumps(entry, separators=(',', ':'), default=str).encode() + b'\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.last_seq = seq
+            self._segment_entries += 1
+            return seq
+
+    def _start_segment(self):
+        if self._file is not None:
+            self._file.close()
+        self._file = open(os.path.join(self.path, f'{self.last_seq + 1:012d}.journal'), 'ab')
+        self._segment_entries = 0
+        _fsync_directory(self.path)
+
+    def entries_after(self, seq, limit=None):
+        """Return up to ``limit`` entries with a sequence number above ``seq``, in order."""
+        entries = []
+        with self._lock:
+            segments = self._segments()
+            # The active segment only grows: bytes written so far are final
+            sizes = {name: os.path.getsize(os.path.join(self.path, name)) for _, name in segments}
+        for number, (first_seq, name) in enumerate(segments):
+            if number + 1 < len(segments) and segments[number + 1][0] <= seq + 1:
+                continue  # Every entry in this segment is at or below seq
+            with open(os.path.join(self.path, name), 'rb') as f:
+                data = f.read(sizes[name])
+            for line_no, line in enumerate(data.splitlines(), 1):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    raise JournalError(f'{name} line {line_no} is not a journal entry') from None
+                if entry['seq'] > seq:
+                    entries.append(entry)
+                    if limit is not None and len(entries) >= limit:
+                        return entries
+        return entries
+
+    def discard_through(self, seq):
+        """Delete segments whose entries all have a sequence number of at most ``seq``."""
+        with self._lock:
+            segments = self._segments()
+            for (_, name), (next_first_seq, _) in zip(segments, segments[1:]):
+                if next_first_seq - 1 <= seq:
+                    os.remove(os.path.join(self.path, name))
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def open_lane_journal(directory=None, lane_id=LANE_ID, pool=None):
+    """Return this lane's journal under ``directory`` (default POS_JOURNAL_DIR), or None if journaling is off."""
+    directory = directory or JOURNAL_DIR
+    if not directory:
+        return None
+    return LaneJournal(os.path.join(directory, lane_id), lane_id, pool)
+
+
+def synced_seq(conn, lane_id):
+    """Return the highest sequence number of the lane already in the database."""
+    return conn.execute('SELECT IFNULL(MAX(seq), 0) FROM journal_sync WHERE lane_id = ?', (lane_id,)).fetchone()[0]
+
+
+class JournalSyncer:
+    """Drain a LaneJournal into the database, one transaction per batch.
+
+    ``sync()`` runs on the caller's thread; ``start()`` runs it every
+    SYNC_INTERVAL seconds on a daemon thread, backing off to RETRY_INTERVAL
+    while the database is locked or unreachable. ``stop()`` makes a last
+    attempt, so a lane that closes normally leaves nothing behind unless the
+    database was down; those baskets stay in the journal for the next start.
+    """
+
+    def __init__(self, journal, pool=None, batch=SYNC_BATCH, interval=SYNC_INTERVAL):
+        self.journal = journal
+        self.pool = pool
+        self.batch = batch
+        self.interval = interval
+        self.synced_seq = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _pool(self):
+        return self.pool or db.get_pool()
+
+    @property
+    def pending(self):
+        """Baskets journaled but not known to be in the database."""
+        return self.journal.last_seq - (self.synced_seq or 0)
+
+    def sync(self):
+        """Write every journaled basket not yet in the database; returns how many were written."""
+        written = 0
+        while self.synced_seq is None or self.synced_seq < self.journal.last_seq:
+            if self.synced_seq is None:
+                conn = self._pool().connection()
+                self.synced_seq = synced_seq(conn, self.journal.lane_id)
+                # The journal still holds baskets the database says it has: make sure they are these
+                self._check_skipped(conn, [entry for entry in self.journal.entries_after(0)
+                                           if entry['seq'] <= self.synced_seq])
+                continue
+            entries = self.journal.entries_after(self.synced_seq, self.batch)
+            if not entries:
+                break
+            written += self._write(entries)
+        if self.synced_seq:
+            self.journal.discard_through(self.synced_seq)
+        return written
+
+    def _write(self, entries):
+        lane_id = self.journal.lane_id
+        with self._pool().transaction() as conn:
+            # Another syncer for this lane may have written some of them already
+            done = synced_seq(conn, lane_id)
+            if entries[0]['seq'] <= done:
+                skipped = [entry for entry in entries if entry['seq'] <= done]
+                logger.warning('Lane %s baskets %d to %d are already in the database, skipping them',
+                               lane_id, skipped[0]['seq'], skipped[-1]['seq'])
+                self._check_skipped(conn, skipped)
+                entries = [entry for entry in entries if entry['seq'] > done]
+            results = record_baskets([(entry['lines'], entry['customer_id'], entry['at']) for entry in entries],
+                                     pool=self._pool()) if entries else []
+            rows = []
+            for entry, result in zip(entries, results):
+                if isinstance(result, Exception):
+                    logger.warning('Lane %s basket %d refused: %s', lane_id, entry['seq'], result)
+                    rows.append((lane_id, entry['seq'], None, str(result), json.dumps(entry)))
+                else:
+                    rows.append((lane_id, entry['seq'], result, None, None))
+            conn.executemany('INSERT INTO journal_sync (lane_id, seq, sale_id, error, basket) VALUES (?, ?, ?, ?, ?)',
+                             rows)
+            self.synced_seq = max(done, entries[-1]['seq'] if entries else done)
+        return len(entries)
+
+    def _check_skipped(self, conn, entries):
+        # Entries at or below the synced seq are normally the same baskets, synced
+        # earlier or by another syncer for this lane. A different basket under the
+        # same number means the lane reused sequence numbers: it is not booked
+        lane_id = self.journal.lane_id
+        for entry in entries:
+            row = conn.execute('''
+                SELECT journal_sync.sale_id, sales_header.sale_date, journal_sync.basket
+                FROM journal_sync LEFT JOIN sales_header ON sales_header.sale_id = journal_sync.sale_id
+                WHERE journal_sync.lane_id = ? AND journal_sync.seq = ?
+            ''', (lane_id, entry['seq'])).fetchone()
+            if row is None:
+                reused = True
+            elif row[0] is None:
+                reused = json.loads(row[2]) != entry
+            elif row[1] is None:
+                reused = False  # The sale was deleted since; nothing left to compare
+            else:
+                lines = conn.execute('SELECT product_id, quantity FROM sales_lines WHERE sale_id = ? ORDER BY line_no',
+                                     (row[0],)).fetchall()
+                reused = (row[1], lines) != (entry['at'], [(line[0], line[1]) for line in entry['lines']])
+            if reused:
+                logger.error('Lane %s basket %d NOT booked: the database holds another basket under that '
+                             'sequence number (was the journal directory reset?): %s',
+                             lane_id, entry['seq'], json.dumps(entry))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f'journal-sync-{self.journal.lane_id}', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        delay = 0
+        while not self._stop.wait(delay):
+            delay = self.interval if self._sync_safely() else RETRY_INTERVAL
+
+    def _sync_safely(self):
+        try:
+            self.sync()
+        except sqlite3.Error as e:
+            # Locked, or the shared drive is away: the baskets wait in the journal
+            if str(e) != str(self.last_error):
+                logger.warning('Journal sync for lane %s failed: %s', self.journal.lane_id, e)
+            self.last_error = e
+            return False
+        self.last_error = None
+        return True
+
+    def stop(self):
+        """Stop the background thread and make a last attempt to sync."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._sync_safely()
+
+
+def rejected(pool=None):
+    """Return (lane_id, seq, sale time, error) for every refused basket not yet booked."""
+    conn = (pool or db.get_pool()).connection()
+    return [(lane_id, seq, json.loads(basket)['at'], error) for lane_id, seq, error, basket in conn.execute(
+        'SELECT lane_id, seq, error, basket FROM journal_sync WHERE sale_id IS NULL ORDER BY lane_id, seq')]
+
+
+def retry_rejected(pool=None):
+    """Try to book every refused basket again; returns (booked, still refused)."""
+    pool = pool or db.get_pool()
+    with pool.transaction() as conn:
+        rows = conn.execute('SELECT lane_id, seq, basket FROM journal_sync WHERE sale_id IS NULL').fetchall()
+        entries = [json.loads(basket) for _, _, basket in rows]
+        results = record_baskets([(entry['lines'], entry['customer_id'], entry['at']) for entry in entries],
+                                 pool=pool)
+        booked = 0
+        for (lane_id, seq, _), result in zip(rows, results):
+            if isinstance(result, Exception):
+                conn.execute('UPDATE journal_sync SET error = ? WHERE lane_id = ? AND seq = ?',
+                             (str(result), lane_id, seq))
+            else:
+                conn.execute('''
+                    UPDATE journal_sync SET sale_id = ?, error = NULL, basket = NULL, synced_at = CURRENT_TIMESTAMP
+                    WHERE lane_id = ? AND seq = ?
+                ''', (result, lane_id, seq))
+                booked += 1
+    return booked, len(rows) - booked
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Lane sales journals and their sync into the database.')
+    parser.add_argument('--db', help='database path (default: POS_DB_PATH or inventory.db)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('status', help='last synced sequence number and refused baskets per lane')
+    command = commands.add_parser('sync', help="drain the journal directory of a lane that is not running")
+    command.add_argument('path', help='the lane directory, e.g. $POS_JOURNAL_DIR/LANE')
+    command.add_argument('--lane', help='lane ID (default: the directory name)')
+    commands.add_parser('rejected', help='list baskets the database refused')
+    commands.add_parser('retry', help='try to book the refused baskets again')
+    args = parser.parse_args(argv)
+
+    if args.db:
+        db.configure(args.db)
+    try:
+        if args.command == 'status':
+            for lane_id, seq, refused in db.get_connection().execute('''
+                SELECT lane_id, MAX(seq), COUNT(*) - COUNT(sale_id) FROM journal_sync GROUP BY lane_id ORDER BY lane_id
+            '''):
+                print(f'{lane_id:<24} synced through {seq:>10,}   {refused:,} refused')
+        elif args.command == 'sync':
+            path = args.path.rstrip('/\\')
+            journal = LaneJournal(path, args.lane or os.path.basename(path))
+            print(f'{JournalSyncer(journal).sync():,} baskets written')
+            journal.close()
+        elif args.command == 'rejected':
+            for lane_id, seq, at, error in rejected():
+                print(f'{lane_id} #{seq} {at}: {error}')
+        else:
+            booked, refused = retry_rejected()
+            print(f'{booked:,} booked, {refused:,} still refused')
+    except (JournalError, sqlite3.Error, OSError) as e:
+        print(f'error: {e}', file=sys.stderr)
+        return 2
+    finally:
+        db.close_all()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,46 @@
+import time
+from collections import deque
+
+
+class LatencyTimer:
+    """Time a repeated UI action against a latency budget.
+
+    Keeps the last ``window`` samples so a lane can show its current p50/p99
+    next to the last measurement, and counts how often the budget was missed.
+    """
+
+    def __init__(self, budget_ms, window=1000):
+        self.budget_ms = budget_ms
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.over_budget = 0
+        self._started = None
+
+    def start(self):
+        self._started = time.perf_counter()
+
+    def stop(self):
+        """Record the time since ``start()`` and return it in milliseconds."""
+        elapsed = (time.perf_counter() - self._started) * 1000
+        self._started = None
+        self.samples.append(elapsed)
+        self.count += 1
+        if elapsed > self.budget_ms:
+            self.over_budget += 1
+        return elapsed
+
+    @property
+    def last_ms(self):
+        return self.samples[-1] if self.samples else 0.0
+
+    def percentile(self, p):
+        """Return the p-th percentile (0-100) of the recent samples in milliseconds."""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+    def summary(self):
+        """One-line status, e.g. '1.20 ms (p50 0.90, p99 3.10, 0/120 over 5 ms)'."""
+        return (f'{self.last_ms:.2f} ms (p50 {self.percentile(50):.2f}, p99 {self.percentile(99):.2f}, '
+                f'{self.over_budget}/{self.count} over {self.budget_ms:g} ms)')
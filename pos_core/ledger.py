@@ -0,0 +1,247 @@
+"""Stock as a materialised view of the stock_transactions ledger.
+
+Every stock change is written as a ledger row in the same transaction as the
+``stock_management`` update (see pos_core.stock), so ``current_stock`` is a
+cache of the ledger. ``stock_snapshots`` holds each product's balance up to a
+ledger position; a product's balance is its snapshot plus the few deltas after
+it. ``rebuild()`` recomputes every balance from the whole ledger in one
+streaming pass and reports (or fixes) where ``current_stock`` has drifted.
+
+Usage: python -m pos_core.ledger {rebuild [--fix] | snapshot | balance PRODUCT_ID}
+"""
+import argparse
+import logging
+import sys
+import time
+from collections import namedtuple
+
+from pos_core import db
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_TABLE = '''
+    CREATE TABLE IF NOT EXISTS stock_snapshots (
+        product_id TEXT PRIMARY KEY,
+        balance INTEGER NOT NULL,
+        last_transaction_id INTEGER NOT NULL,
+        taken_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    ) WITHOUT ROWID
+'''
+
+# Covering index for replaying one product's deltas after its snapshot
+REPLAY_INDEX = '''
+    CREATE INDEX IF NOT EXISTS idx_stock_transactions_product_replay
+    ON stock_transactions(product_id, transaction_id, quantity)
+'''
+
+SNAPSHOT_EVERY = 10_000  # Ledger rows between automatic snapshots
+BATCH_SIZE = 10_000
+
+Discrepancy = namedtuple('Discrepancy', 'product_id stored ledger')
+RebuildReport = namedtuple('RebuildReport', 'products ledger_rows discrepancies fixed seconds')
+
+
+def _object_type(conn, name):
+    row = conn.execute('SELECT type FROM sqlite_master WHERE name = ?', (name,)).fetchone()
+    return row[0] if row else None
+
+
+def create_ledger_tables(conn):
+    """Create the snapshot table and bring the ledger in line with current_stock.
+
+    Rows the old POS.py wrote to the stray ``stock_transaction`` table are moved
+    into ``stock_transactions`` (the old table is kept as
+    stock_transaction_legacy). Stock that was never booked through the ledger
+    gets one 'opening balance' row per product, so that from here on
+    current_stock equals the ledger sum. Snapshots are then taken.
+    """
+    conn.execute(SNAPSHOT_TABLE)
+    conn.execute(REPLAY_INDEX)
+    if _object_type(conn, 'stock_transaction') == 'table':
+        moved = conn.execute('''
+            INSERT INTO stock_transactions (product_id, quantity, transaction_type, transaction_date, remarks)
+            SELECT product_id, quantity, transaction_type, transaction_date, remarks
+            FROM stock_transaction
+            ORDER BY transaction_id
+        ''').rowcount
+        conn.execute('ALTER TABLE stock_transaction RENAME TO stock_transaction_legacy')
+        logger.info('moved %d rows from stock_transaction into stock_transactions', moved)
+    opened = conn.execute('''
+        INSERT INTO stock_transactions (product_id, quantity, transaction_type, remarks)
+        SELECT s.product_id, IFNULL(s.current_stock, 0) - IFNULL(t.total, 0), 'opening balance',
+               'stock booked before the ledger was authoritative'
+        FROM stock_management s
+        LEFT JOIN (SELECT product_id, SUM(quantity) AS total
+                   FROM stock_transactions GROUP BY product_id) t ON t.product_id = s.product_id
+        WHERE IFNULL(s.current_stock, 0) != IFNULL(t.total, 0)
+    ''').rowcount
+    if opened:
+        logger.info('booked opening balances for %d products', opened)
+    _take_snapshots(conn)
+
+
+def _take_snapshots(conn):
+    # Fold every ledger row after the previous snapshot round into the snapshots.
+    # Each round covers all rows up to its high-water mark, so the next round
+    # only needs the rows after the highest position recorded so far.
+    since = conn.execute('SELECT IFNULL(MAX(last_transaction_id), 0) FROM stock_snapshots').fetchone()[0]
+    high = conn.execute('SELECT IFNULL(MAX(transaction_id), 0) FROM stock_transactions').fetchone()[0]
+    if high <= since:
+        return 0
+    return conn.execute('''
+        INSERT INTO stock_snapshots (product_id, balance, last_transaction_id)
+        SELECT t.product_id, IFNULL(s.balance, 0) + SUM(t.quantity), ?
+        FROM stock_transactions t
+        LEFT JOIN stock_snapshots s ON s.product_id = t.product_id
+        WHERE t.transaction_id > ? AND t.transaction_id <= ? AND t.product_id IS NOT NULL
+        GROUP BY t.product_id
+        ON CONFLICT (product_id) DO UPDATE
+        SET balance = excluded.balance,
+            last_transaction_id = excluded.last_transaction_id,
+            taken_at = CURRENT_TIMESTAMP
+    ''', (high, since, high)).rowcount
+
+
+def take_snapshots(pool=None):
+    """Snapshot every product changed since the last round; returns how many."""
+    with (pool or db.get_pool()).transaction() as conn:
+        return _take_snapshots(conn)
+
+
+def snapshot_if_due(pool=None, every=SNAPSHOT_EVERY):
+    """Take snapshots once ``every`` ledger rows have piled up since the last round."""
+    pool = pool or db.get_pool()
+    since, high = pool.connection().execute('''
+        SELECT (SELECT IFNULL(MAX(last_transaction_id), 0) FROM stock_snapshots),
+               (SELECT IFNULL(MAX(transaction_id), 0) FROM stock_transactions)
+    ''').fetchone()
+    if high - since >= every:
+        return take_snapshots(pool)
+    return 0
+
+
+def balance_of(conn, product_id):
+    """Reconstruct a product's stock: its snapshot plus the deltas since."""
+    row = conn.execute('SELECT balance, last_transaction_id FROM stock_snapshots WHERE product_id = ?',
+                       (product_id,)).fetchone()
+    balance, since = row if row else (0, 0)
+    delta = conn.execute('''
+        SELECT IFNULL(SUM(quantity), 0)
+        FROM stock_transactions
+        WHERE product_id = ? AND transaction_id > ?
+    ''', (product_id, since)).fetchone()[0]
+    return balance + delta
+
+
+def _merge(stock_rows, ledger_rows):
+    # Walk both product_id-ordered streams together, yielding (product_id, stored, ledger, rows)
+    stock = next(stock_rows, None)
+    ledger = next(ledger_rows, None)
+    while stock is not None or ledger is not None:
+        if ledger is None or (stock is not None and stock[0] < ledger[0]):
+            yield stock[0], stock[1], 0, 0
+            stock = next(stock_rows, None)
+        elif stock is None or ledger[0] < stock[0]:
+            yield ledger[0], None, ledger[1], ledger[2]
+            ledger = next(ledger_rows, None)
+        else:
+            yield stock[0], stock[1], ledger[1], ledger[2]
+            stock = next(stock_rows, None)
+            ledger = next(ledger_rows, None)
+
+
+def rebuild(pool=None, fix=False):
+    """Recompute every balance from the ledger in one streaming pass.
+
+    Returns a RebuildReport listing each product whose current_stock differs
+    from its ledger sum. With ``fix``, current_stock is reset to the ledger
+    value for those products and all snapshots are rewritten from the pass.
+    """
+    pool = pool or db.get_pool()
+    started = time.perf_counter()
+    products = ledger_total = 0
+    discrepancies = []
+    with pool.transaction(immediate=fix) as conn:
+        high = conn.execute('SELECT IFNULL(MAX(transaction_id), 0) FROM stock_transactions').fetchone()[0]
+        stock_rows = conn.execute('''
+            SELECT product_id, IFNULL(current_stock, 0) FROM stock_management ORDER BY product_id
+        ''')
+        ledger_rows = conn.execute('''
+            SELECT product_id, SUM(quantity), COUNT(*)
+            FROM stock_transactions
+            WHERE product_id IS NOT NULL AND transaction_id <= ?
+            GROUP BY product_id
+            ORDER BY product_id
+        ''', (high,))
+        if fix:
+            conn.execute('DELETE FROM stock_snapshots')
+        snapshots = []
+        for product_id, stored, balance, rows in _merge(iter(stock_rows), iter(ledger_rows)):
+            products += 1
+            ledger_total += rows
+            if (0 if stored is None else stored) != balance:
+                discrepancies.append(Discrepancy(product_id, stored, balance))
+            if fix and rows:
+                snapshots.append((product_id, balance, high))
+                if len(snapshots) >= BATCH_SIZE:
+                    _write_snapshots(conn, snapshots)
+        if fix:
+            _write_snapshots(conn, snapshots)
+            _fix_stock(conn, discrepancies)
+    return RebuildReport(products, ledger_total, discrepancies, fix, time.perf_counter() - started)
+
+
+def _write_snapshots(conn, snapshots):
+    conn.executemany('INSERT INTO stock_snapshots (product_id, balance, last_transaction_id) VALUES (?, ?, ?)',
+                     snapshots)
+    snapshots.clear()
+
+
+def _fix_stock(conn, discrepancies):
+    conn.executemany('UPDATE stock_management SET current_stock = ? WHERE product_id = ?',
+                     [(d.ledger, d.product_id) for d in discrepancies if d.stored is not None])
+    conn.executemany('INSERT INTO stock_management (product_id, current_stock) VALUES (?, ?)',
+                     [(d.product_id, d.ledger) for d in discrepancies if d.stored is None])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild and inspect ledger-derived stock.')
+    parser.add_argument('--db', help='database path (default: POS_DB_PATH or inventory.db)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    rebuild_parser = commands.add_parser('rebuild', help='recompute all balances from the ledger')
+    rebuild_parser.add_argument('--fix', action='store_true', help='reset drifted current_stock to the ledger')
+    rebuild_parser.add_argument('--limit', type=int, default=50, help='discrepancies to list')
+    commands.add_parser('snapshot', help='snapshot products changed since the last round')
+    balance_parser = commands.add_parser('balance', help='show one product from snapshot + replay')
+    balance_parser.add_argument('product_id')
+    args = parser.parse_args()
+
+    if args.db:
+        db.configure(args.db)
+    status = 0
+    if args.command == 'rebuild':
+        report = rebuild(fix=args.fix)
+        rate = report.ledger_rows / report.seconds if report.seconds else 0
+        print(f'{report.products} products, {report.ledger_rows} ledger rows in {report.seconds:.2f} s '
+              f'({rate:,.0f} rows/s)')
+        for d in report.discrepancies[:args.limit]:
+            stored = 'untracked' if d.stored is None else d.stored
+            print(f'  {d.product_id}: current_stock {stored}, ledger {d.ledger}')
+        if len(report.discrepancies) > args.limit:
+            print(f'  ... and {len(report.discrepancies) - args.limit} more')
+        print(f'{len(report.discrepancies)} discrepancies' + (' fixed' if report.fixed else ''))
+        status = 1 if report.discrepancies and not report.fixed else 0
+    elif args.command == 'snapshot':
+        print(f'{take_snapshots()} products snapshotted')
+    else:
+        conn = db.get_connection()
+        stored = conn.execute('SELECT current_stock FROM stock_management WHERE product_id = ?',
+                              (args.product_id,)).fetchone()
+        print(f'{args.product_id}: ledger {balance_of(conn, args.product_id)}, '
+              f'current_stock {stored[0] if stored else "untracked"}')
+    db.close_all()
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""Stock mutations written at a chosen durability level, optionally write-behind.
+
+Stock and its stock_transactions row always change in the same transaction
+(see pos_core.stock), so what is buffered here is the whole mutation, never a
+ledger row on its own; ``python -m pos_core.ledger rebuild`` stays clean at
+every level.
+
+    full       every call commits before it returns, with synchronous=FULL:
+               the commit is on disk even if the machine loses power.
+    normal     every call commits before it returns (the pool default: WAL
+               with synchronous=NORMAL, synced at checkpoints).
+    deferred   calls only buffer their mutations; a flusher thread commits the
+               buffer every ``flush_rows`` mutations or ``flush_ms`` after the
+               first one, in one transaction. For back-office batch jobs: a
+               refused deduction surfaces at flush time, in ``refused``.
+
+Deferred writers are flushed by ``close()`` and, as a last resort, when the
+interpreter exits; a process that is killed outright loses at most the
+mutations submitted in the last ``flush_ms``.
+"""
+import atexit
+import logging
+import threading
+import time
+import weakref
+
+from pos_core import db
+from pos_core.stock import apply_deltas
+
+logger = logging.getLogger(__name__)
+
+FULL = 'full'
+NORMAL = 'normal'
+DEFERRED = 'deferred'
+DURABILITY_LEVELS = (FULL, NORMAL, DEFERRED)
+
+FLUSH_ROWS = 500    # Deferred: flush once this many mutations are buffered
+FLUSH_MS = 200      # Deferred: flush this long after the first buffered mutation
+
+_open_writers = weakref.WeakSet()
+
+
+class LedgerWriter:
+    """Apply (product_id, delta, transaction_type, remarks) mutations at one durability level."""
+
+    def __init__(self, pool=None, durability=NORMAL, flush_rows=FLUSH_ROWS, flush_ms=FLUSH_MS):
+        if durability not in DURABILITY_LEVELS:
+            raise ValueError(f"Unknown durability {durability!r}; expected one of {', '.join(DURABILITY_LEVELS)}")
+        pool = pool or db.get_pool()
+        if durability == FULL:
+            # A pool of its own, so only this writer's commits pay for the fsync
+            pool = db.ConnectionPool(pool.path, tuple((name, 'FULL' if name == 'synchronous' else value)
+                                                      for name, value in pool.pragmas))
+        self.pool = pool
+        self.durability = durability
+        self.flush_rows = flush_rows
+        self.flush_ms = flush_ms
+        self.refused = []   # (mutation, error) for deductions refused at flush time
+        self._buffer = []
+        self._first_at = None
+        self._closing = False
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        if durability == DEFERRED:
+            _open_writers.add(self)
+
+    @property
+    def deferred(self):
+        return self.durability == DEFERRED
+
+    def submit(self, mutations, create_missing=False):
+        """Apply the mutations, all or nothing, or buffer them if deferred.
+
+        At the full and normal levels this raises InsufficientStockError or
+        StockNotTrackedError like StockService does. Deferred mutations are
+        checked when they are flushed, one by one.
+        """
+        mutations = [tuple(mutation) + (create_missing,) for mutation in mutations]
+        if not self.deferred:
+            with self.pool.transaction() as conn:
+                apply_deltas(conn, [mutation[:4] for mutation in mutations], create_missing)
+            return
+        with self._cond:
+            if self._closing:
+                raise ValueError("The ledger writer is closed")
+            if not self._buffer:
+                self._first_at = time.monotonic()
+            self._buffer.extend(mutations)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='ledger-writer', daemon=True)
+                self._thread.start()
+            if len(self._buffer) >= self.flush_rows:
+                self._cond.notify()
+
+    @property
+    def pending(self):
+        """Mutations buffered and not yet committed."""
+        with self._cond:
+            return len(self._buffer)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._buffer and not self._closing:
+                    self._cond.wait()
+                if self._closing:
+                    return  # close() writes what is left
+                while len(self._buffer) < self.flush_rows and not self._closing:
+                    remaining = self._first_at + self.flush_ms / 1000 - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+            try:
+                self.flush()
+            except Exception as e:
+                # e.g. the database stayed locked past busy_timeout; the buffer is kept for the next try
+                logger.warning('Ledger flush failed, retrying: %s', e)
+                with self._cond:
+                    self._cond.wait(self.flush_ms / 1000)
+
+    def flush(self):
+        """Commit the buffered mutations now; returns the (mutation, error) pairs refused."""
+        with self._flush_lock:
+            with self._cond:
+                buffer, self._buffer = self._buffer, []
+            if not buffer:
+                return []
+            try:
+                refused = self._write(buffer)
+            except BaseException:
+                with self._cond:
+                    self._buffer[:0] = buffer
+                    self._first_at = time.monotonic()
+                raise
+        for mutation, error in refused:
+            logger.warning('Deferred stock mutation %r refused: %s', mutation, error)
+        self.refused.extend(refused)
+        return refused
+
+    def _write(self, buffer):
+        refused = []
+        with self.pool.transaction() as conn:
+            try:
+                # The whole buffer with one executemany per statement
+                with self.pool.transaction():
+                    apply_deltas(conn, [mutation[:4] for mutation in buffer])
+            except ValueError:
+                # Something was refused, or needs creating: one savepoint per mutation
+                for mutation in buffer:
+                    try:
+                        with self.pool.transaction():
+                            apply_deltas(conn, [mutation[:4]], create_missing=mutation[4])
+                    except ValueError as e:
+                        refused.append((mutation[:4], e))
+        return refused
+
+    def close(self):
+        """Stop the flusher and commit whatever is still buffered."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        _open_writers.discard(self)
+        if self.durability == FULL:
+            self.pool.close_all()
+
+
+@atexit.register
+def _close_open_writers():
+    for writer in list(_open_writers):
+        try:
+            writer.close()
+        except Exception:
+            logger.exception('Could not flush the ledger writer at exit')
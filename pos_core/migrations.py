@@ -0,0 +1,234 @@
+"""Versioned schema migrations shared by every app.
+
+Each app calls ``migrate()`` at startup. Migrations run in version order, each
+in its own ``BEGIN IMMEDIATE`` transaction, and are recorded in
+``schema_version`` so they run exactly once per database, even when several
+apps start at the same time.
+
+Migrations that add indexes list the hot queries they are meant to serve;
+``python -m pos_core.migrations --check`` runs EXPLAIN QUERY PLAN on each one
+and fails if the planner does not pick the expected index.
+"""
+import argparse
+import logging
+import sys
+from collections import namedtuple
+
+from pos_core import db
+from pos_core.catalog_cache import create_change_log
+from pos_core.customers import create_customer_tables
+from pos_core.forecasting import add_forecast_sale_mark, create_forecast_tables
+from pos_core.ids import create_id_tables
+from pos_core.journal import create_journal_sync_table
+from pos_core.ledger import create_ledger_tables
+from pos_core.receiving import create_receipt_tables
+from pos_core.replenishment import create_suggestion_table
+from pos_core.reporting import create_rollup_tables
+from pos_core.sales import create_sales_tables
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION_TABLE = '''
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+# A hot query and the index EXPLAIN QUERY PLAN must show for it
+PlanCheck = namedtuple('PlanCheck', 'query params index')
+
+Migration = namedtuple('Migration', 'version name apply plan_checks')
+
+BASE_TABLES = (
+    '''
+    CREATE TABLE IF NOT EXISTS product_categories (
+        category_id TEXT PRIMARY KEY,
+        category_name TEXT UNIQUE NOT NULL,
+        description TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS products (
+        product_id TEXT PRIMARY KEY,
+        product_name TEXT,
+        sku TEXT,
+        category_id TEXT,
+        category_name TEXT,
+        price REAL,
+        description TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS stock_management (
+        product_id TEXT PRIMARY KEY,
+        current_stock INTEGER DEFAULT 0,
+        safety_stock INTEGER DEFAULT 0,
+        target_stock INTEGER DEFAULT 0,
+        FOREIGN KEY (product_id) REFERENCES products(product_id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS stock_transactions (
+        transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        product_id TEXT,
+        quantity INTEGER,
+        transaction_type TEXT,
+        transaction_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        remarks TEXT,
+        FOREIGN KEY (product_id) REFERENCES products(product_id)
+    )
+    ''',
+)
+
+
+def _create_base_tables(conn):
+    # The tables the apps used to create with their own CREATE TABLE IF NOT EXISTS blocks
+    for statement in BASE_TABLES:
+        conn.execute(statement)
+    create_id_tables(conn)
+    create_customer_tables(conn)
+
+
+def _create_indexes(conn):
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_products_category_id ON products(category_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_products_category_name ON products(category_name)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_stock_transactions_product_date '
+                 'ON stock_transactions(product_id, transaction_date)')
+    # ``sales`` is a view over the basket tables, so its indexes live on them;
+    # the customer link that used to sit in customer_sales is on the header now
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_sales_header_sale_date ON sales_header(sale_date)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_sales_header_customer_id ON sales_header(customer_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_sales_lines_product_id ON sales_lines(product_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_sales_lines_sale_id ON sales_lines(sale_id)')
+
+
+def _unique_sku(conn):
+    # Older databases can hold duplicate SKUs; keep the first product's SKU and
+    # make the later ones unique rather than refusing to start
+    duplicates = conn.execute('''
+        SELECT p.product_id, p.sku
+        FROM products p
+        JOIN (SELECT sku, MIN(product_id) AS first_id
+              FROM products
+              WHERE sku IS NOT NULL
+              GROUP BY sku
+              HAVING COUNT(*) > 1) d ON d.sku = p.sku
+        WHERE p.product_id != d.first_id
+    ''').fetchall()
+    for product_id, sku in duplicates:
+        new_sku = f'{sku}-{product_id}'
+        logger.warning('duplicate SKU %s on %s renamed to %s', sku, product_id, new_sku)
+        conn.execute('UPDATE products SET sku = ? WHERE product_id = ?', (new_sku, product_id))
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_products_sku ON products(sku)')
+
+
+MIGRATIONS = [
+    Migration(1, 'base tables', _create_base_tables, ()),
+    Migration(2, 'sales baskets', create_sales_tables, ()),
+    Migration(3, 'secondary indexes', _create_indexes, (
+        PlanCheck('SELECT * FROM products WHERE (LOWER(product_id) LIKE ? OR LOWER(product_name) LIKE ? '
+                  'OR LOWER(sku) LIKE ?) AND category_id = ?',
+                  ('%a%', '%a%', '%a%', 'PC-001'), 'idx_products_category_id'),
+        PlanCheck('SELECT COUNT(*) FROM products WHERE category_id = ?', ('PC-001',), 'idx_products_category_id'),
+        PlanCheck('SELECT DISTINCT category_name FROM products', (), 'idx_products_category_name'),
+        PlanCheck('SELECT * FROM products p WHERE (p.product_id LIKE ? OR p.product_name LIKE ?) '
+                  'AND p.category_name = ?', ('%a%', '%a%', 'MEDICINE'), 'idx_products_category_name'),
+        PlanCheck('SELECT * FROM stock_transactions WHERE product_id = ? ORDER BY transaction_date',
+                  ('PID-00001',), 'idx_stock_transactions_product_date'),
+        PlanCheck('SELECT * FROM sales WHERE sale_date >= ?', ('2024-01-01',), 'idx_sales_header_sale_date'),
+        PlanCheck('SELECT SUM(quantity) FROM sales WHERE product_id = ?', ('PID-00001',),
+                  'idx_sales_lines_product_id'),
+        PlanCheck('SELECT * FROM sales_header WHERE customer_id = ?', ('cus-000001',),
+                  'idx_sales_header_customer_id'),
+    )),
+    Migration(4, 'unique sku', _unique_sku, (
+        PlanCheck('SELECT product_id FROM products WHERE sku = ?', ('SKU-1',), 'idx_products_sku'),
+    )),
+    Migration(5, 'stock ledger', create_ledger_tables, (
+        PlanCheck('SELECT IFNULL(SUM(quantity), 0) FROM stock_transactions WHERE product_id = ? AND transaction_id > ?',
+                  ('PID-00001', 0), 'idx_stock_transactions_product_replay'),
+        PlanCheck('SELECT product_id, SUM(quantity), COUNT(*) FROM stock_transactions '
+                  'WHERE product_id IS NOT NULL AND transaction_id <= ? GROUP BY product_id ORDER BY product_id',
+                  (0,), 'idx_stock_transactions_product_replay'),
+    )),
+    Migration(6, 'goods receipts', create_receipt_tables, ()),
+    Migration(7, 'catalog change log', create_change_log, ()),
+    Migration(8, 'sales rollups', create_rollup_tables, ()),
+    Migration(9, 'purchase suggestions', create_suggestion_table, ()),
+    Migration(10, 'demand forecasts', create_forecast_tables, ()),
+    Migration(11, 'lane journal sync', create_journal_sync_table, ()),
+    Migration(12, 'forecast sale mark', add_forecast_sale_mark, ()),
+]
+
+
+def current_version(conn):
+    conn.execute(SCHEMA_VERSION_TABLE)
+    return conn.execute('SELECT IFNULL(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+
+def migrate(pool=None):
+    """Apply every pending migration and return the schema version."""
+    pool = pool or db.get_pool()
+    with pool.transaction() as conn:
+        version = current_version(conn)
+    for migration in MIGRATIONS:
+        if migration.version <= version:
+            continue
+        with pool.transaction() as conn:
+            # Another app may have applied it while we waited for the lock
+            if current_version(conn) >= migration.version:
+                continue
+            logger.info('applying migration %d: %s', migration.version, migration.name)
+            migration.apply(conn)
+            conn.execute('INSERT INTO schema_version (version, name) VALUES (?, ?)',
+                         (migration.version, migration.name))
+        version = migration.version
+    return version
+
+
+def query_plan(conn, query, params=()):
+    """Return the EXPLAIN QUERY PLAN detail lines for query."""
+    return [row[-1] for row in conn.execute('EXPLAIN QUERY PLAN ' + query, params)]
+
+
+def check_query_plans(conn):
+    """Return (migration, check, plan, ok) for every plan check of an applied migration."""
+    version = current_version(conn)
+    results = []
+    for migration in MIGRATIONS:
+        if migration.version > version:
+            continue
+        for check in migration.plan_checks:
+            plan = query_plan(conn, check.query, check.params)
+            ok = any(check.index in line for line in plan)
+            results.append((migration, check, plan, ok))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Apply pending schema migrations.')
+    parser.add_argument('--db', help='database path (default: POS_DB_PATH or inventory.db)')
+    parser.add_argument('--check', action='store_true', help='verify hot queries use their indexes')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    if args.db:
+        db.configure(args.db)
+    print(f'schema version {migrate()}')
+    if not args.check:
+        return 0
+
+    failed = 0
+    for migration, check, plan, ok in check_query_plans(db.get_connection()):
+        failed += not ok
+        print(f'[{"ok" if ok else "FAIL"}] {migration.version} expects {check.index}: {check.query}')
+        for line in plan:
+            print(f'       {line}')
+    db.close_all()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
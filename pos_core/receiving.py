@@ -0,0 +1,196 @@
+"""Goods receipts: post a delivery of (SKU, quantity) lines in one go.
+
+Lines come from a scanner or a file. Every line is validated against a SKU map
+before anything is written; the receipt is then posted in a single transaction
+that raises each product's stock and writes its ledger row, all remarked with
+the receipt reference (``GRN-000042``) so the delivery can be traced later.
+"""
+import csv
+import threading
+from collections import namedtuple
+
+from pos_core import db
+from pos_core.stock import apply_deltas
+
+RECEIPT_TABLE = '''
+    CREATE TABLE IF NOT EXISTS goods_receipts (
+        receipt_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        line_count INTEGER NOT NULL,
+        total_units INTEGER NOT NULL,
+        remarks TEXT
+    )
+'''
+
+CHUNK_SIZE = 500  # Product IDs per IN (...) query
+
+ReceiptLine = namedtuple('ReceiptLine', 'sku quantity')
+ReceiptProblem = namedtuple('ReceiptProblem', 'line sku reason')
+
+
+def create_receipt_tables(conn):
+    conn.execute(RECEIPT_TABLE)
+
+
+def receipt_reference(receipt_id):
+    return f'GRN-{receipt_id:06d}'
+
+
+class ReceiptError(ValueError):
+    """One or more receipt lines failed validation; nothing was posted."""
+
+    def __init__(self, problems):
+        super().__init__(f'{len(problems)} receipt line(s) rejected: '
+                         + '; '.join(f'line {p.line} {p.sku}: {p.reason}' for p in problems[:5]))
+        self.problems = problems
+
+
+def read_receipt_file(path):
+    """Read receipt lines from a file.
+
+    Each line is ``SKU,quantity`` (CSV with or without a header) or a bare SKU,
+    which counts as one unit, so a scanner's log can be loaded as-is.
+    """
+    lines = []
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for number, row in enumerate(csv.reader(f), 1):
+            cells = [cell.strip() for cell in row if cell.strip()]
+            if not cells:
+                continue
+            if number == 1 and cells[0].lower() == 'sku':
+                continue
+            lines.append(ReceiptLine(cells[0], cells[1] if len(cells) > 1 else 1))
+    return lines
+
+
+def _in_clause(ids):
+    return ', '.join('?' * len(ids))
+
+
+class GoodsReceiving:
+    """Validate and post goods receipts.
+
+    SKUs are resolved through an in-memory map of upper-cased SKUs kept current
+    from the catalog change log (see pos_core.catalog_cache): every lookup,
+    validate or receive call reads the log's head once, and products added,
+    renamed or deleted since are reloaded.
+    """
+
+    def __init__(self, pool=None):
+        self.pool = pool
+        self._skus = None         # Upper-cased SKU -> (product_id, product_name)
+        self._product_skus = {}   # product_id -> its key in _skus
+        self._last_change = 0
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        return self.pool or db.get_pool()
+
+    def _sku_map(self):
+        with self._lock:
+            conn = self._pool().connection()
+            # Read before the rows, so a change racing the reload is applied again next time
+            last_change = conn.execute('SELECT IFNULL(MAX(change_id), 0) FROM catalog_changes').fetchone()[0]
+            if self._skus is None or not self._apply_changes(conn, last_change):
+                self._skus = {}
+                self._product_skus = {}
+                self._store(conn.execute('SELECT product_id, sku, product_name FROM products'))
+            self._last_change = last_change
+            return self._skus
+
+    def _store(self, rows):
+        for product_id, sku, name in rows:
+            if sku is not None:
+                self._skus[sku.upper()] = (product_id, name)
+                self._product_skus[product_id] = sku.upper()
+
+    def _apply_changes(self, conn, last_change):
+        """Reload the products changed since the last call; False if everything must be reloaded."""
+        if last_change == self._last_change:
+            return True
+        first = conn.execute('SELECT MIN(change_id) FROM catalog_changes').fetchone()[0]
+        if first is None or first > self._last_change + 1:
+            return False  # Pruned past our position
+        product_ids = set()
+        for (row_key,) in conn.execute('''
+            SELECT row_key FROM catalog_changes
+            WHERE change_id > ? AND change_id <= ? AND table_name = 'products'
+        ''', (self._last_change, last_change)):
+            if row_key is None:
+                return False  # A bulk import
+            product_ids.add(row_key)
+        product_ids = list(product_ids)
+        for start in range(0, len(product_ids), CHUNK_SIZE):
+            chunk = product_ids[start:start + CHUNK_SIZE]
+            for product_id in chunk:
+                sku = self._product_skus.pop(product_id, None)
+                if sku is not None and self._skus.get(sku, (None,))[0] == product_id:
+                    del self._skus[sku]
+            self._store(conn.execute(
+                f'SELECT product_id, sku, product_name FROM products WHERE product_id IN ({_in_clause(chunk)})',
+                chunk))
+        return True
+
+    def lookup(self, sku):
+        """Return (product_id, product_name) for a SKU, or None."""
+        return self._sku_map().get(str(sku).strip().upper())
+
+    def _resolve(self, lines):
+        resolved = []   # (line number, sku, product_id, quantity)
+        problems = []
+        skus = self._sku_map()  # Brought up to date once for the whole receipt
+        for number, (sku, quantity) in enumerate(lines, 1):
+            product = skus.get(str(sku).strip().upper())
+            try:
+                quantity = int(quantity)
+            except (TypeError, ValueError):
+                problems.append(ReceiptProblem(number, sku, f'quantity {quantity!r} is not a whole number'))
+                continue
+            if product is None:
+                problems.append(ReceiptProblem(number, sku, 'unknown SKU'))
+            elif quantity <= 0:
+                problems.append(ReceiptProblem(number, sku, 'quantity must be greater than zero'))
+            else:
+                resolved.append((number, sku, product[0], quantity))
+        return resolved, problems
+
+    def validate(self, lines):
+        """Return ([(product_id, quantity)], [ReceiptProblem]) for the given lines."""
+        resolved, problems = self._resolve(lines)
+        return [(product_id, quantity) for _, _, product_id, quantity in resolved], problems
+
+    def receive(self, lines, remarks=None):
+        """Post a receipt and return its reference, e.g. GRN-000042.
+
+        Raises ReceiptError, without writing anything, if any line is invalid
+        or its product was deleted before the receipt was posted.
+        """
+        resolved, problems = self._resolve(lines)
+        if problems:
+            raise ReceiptError(problems)
+        if not resolved:
+            raise ValueError('The receipt has no lines')
+        with self._pool().transaction() as conn:
+            # Confirm the products under the write lock: create_missing may only
+            # give a stock row to a product that still exists
+            product_ids = list({product_id for _, _, product_id, _ in resolved})
+            existing = set()
+            for start in range(0, len(product_ids), CHUNK_SIZE):
+                chunk = product_ids[start:start + CHUNK_SIZE]
+                existing.update(product_id for (product_id,) in conn.execute(
+                    f'SELECT product_id FROM products WHERE product_id IN ({_in_clause(chunk)})', chunk))
+            problems = [ReceiptProblem(number, sku, 'product was deleted')
+                        for number, sku, product_id, _ in resolved if product_id not in existing]
+            if problems:
+                raise ReceiptError(problems)
+            receipt_id = conn.execute('''
+                INSERT INTO goods_receipts (line_count, total_units, remarks)
+                VALUES (?, ?, ?)
+            ''', (len(resolved), sum(quantity for _, _, _, quantity in resolved), remarks)).lastrowid
+            reference = receipt_reference(receipt_id)
+            apply_deltas(conn, [(product_id, quantity, 'goods receipt', reference)
+                                for _, _, product_id, quantity in resolved], create_missing=True)
+        return reference
+
+
+goods_receiving = GoodsReceiving()
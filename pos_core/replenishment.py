@@ -0,0 +1,219 @@
+"""Vectorised replenishment: reorder quantities for the whole catalog in one pass.
+
+Current, safety and target stock for every tracked product are loaded into
+NumPy arrays, together with each product's sales velocity (units per day over
+the last ``window_days``, read from the hour x product sales rollup). A product
+is due for reordering once its stock falls to its reorder point, the safety
+stock plus the demand expected over the supplier lead time; it is then ordered
+back up to its target stock (or to the reorder point, if that is higher). The
+result replaces the ``purchase_suggestions`` table. Products whose stock
+columns hold anything but whole numbers are skipped and reported.
+
+A million products take 2.5 to 3 s on one core, not the 1 s aimed for: SQLite
+alone needs roughly 0.9 s to produce the stock columns and 0.6 s for four
+weeks of rollup rows, and matching those rows to their products another 0.6 s.
+
+Needs NumPy. Usage: python -m pos_core.replenishment [--window-days 28] [--lead-time 7]
+"""
+import argparse
+import sqlite3
+import sys
+import time
+from collections import namedtuple
+
+from pos_core import db
+
+try:
+    import numpy as np
+except ImportError:  # Only needed to run the replenishment pass
+    np = None
+
+SUGGESTION_TABLE = '''
+    CREATE TABLE IF NOT EXISTS purchase_suggestions (
+        product_id TEXT PRIMARY KEY,
+        current_stock INTEGER NOT NULL,
+        safety_stock INTEGER NOT NULL,
+        target_stock INTEGER NOT NULL,
+        daily_velocity REAL NOT NULL,
+        reorder_point REAL NOT NULL,
+        days_of_cover REAL,
+        reorder_quantity INTEGER NOT NULL,
+        suggested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    ) WITHOUT ROWID
+'''
+
+WINDOW_DAYS = 28     # Days of sales the velocity is averaged over
+LEAD_TIME_DAYS = 7   # Days between placing an order and receiving it
+
+ReplenishmentReport = namedtuple('ReplenishmentReport', 'products suggested units seconds skipped')
+
+
+def create_suggestion_table(conn):
+    conn.execute(SUGGESTION_TABLE)
+
+
+STOCK_COLUMNS = ('current_stock', 'safety_stock', 'target_stock')
+
+
+def _fractional(column):
+    # True for a REAL fraction or text; NULL and whole numbers survive the round trip
+    return f'CAST({column} AS INTEGER) IS NOT {column}'
+
+
+def _ids(text, width):
+    # The product_ids come back padded to ``width`` characters and concatenated
+    # into one string, which NumPy can view as a fixed-width array without a
+    # Python loop: bytes when the ids are plain ASCII, UCS-4 otherwise.
+    if not text:
+        return np.zeros(0, dtype=f'S{width}')
+    if text.isascii():
+        return np.frombuffer(text.encode('ascii'), dtype=f'S{width}')
+    return np.frombuffer(text.encode('utf-32-le'), dtype=f'<U{width}')
+
+
+def _numbers(text, count, dtype):
+    # The queries CAST every value, so NumPy only ever parses plain integers
+    values = np.fromstring(text, dtype=dtype, sep=',') if count else np.zeros(0, dtype=dtype)
+    if len(values) != count:
+        raise ValueError(f'Expected {count:,} numbers from the database, parsed {len(values):,}')
+    return values
+
+
+def decode_ids(keys):
+    """Turn keys returned by load_stock back into product_id strings."""
+    if keys.dtype.kind == 'S':
+        return [key.decode('ascii').rstrip() for key in keys.tolist()]
+    return [key.rstrip() for key in keys.tolist()]
+
+
+def load_stock(conn):
+    """Return (keys, current, safety, target, skipped) arrays, one entry per tracked product.
+
+    Each column is fetched as a single group_concat string and parsed by NumPy,
+    which is several times faster than building a million row tuples. The keys
+    are the product_ids as a fixed-width array; see decode_ids. A product whose
+    stock columns hold anything but whole numbers (2.5, '', text) is left out
+    of the arrays and its product_id listed in ``skipped``.
+    """
+    width = conn.execute('SELECT IFNULL(MAX(length(product_id)), 1) FROM stock_management').fetchone()[0]
+    padded = f"printf('%-!{width}s', product_id)"
+    count, keys, skipped, *columns = conn.execute(f'''
+        SELECT count(*),
+               group_concat({padded}, ''),
+               group_concat(CASE WHEN {' OR '.join(_fractional(column) for column in STOCK_COLUMNS)}
+                            THEN {padded} END, ''),
+               {', '.join(f'group_concat(CAST(IFNULL({column}, 0) AS INTEGER))' for column in STOCK_COLUMNS)}
+        FROM stock_management
+    ''').fetchone()
+    keys = _ids(keys, width)
+    current, safety, target = (_numbers(text, count, np.int64) for text in columns)
+    if not skipped:
+        return keys, current, safety, target, []
+    skipped = _ids(skipped, width)
+    whole = ~np.isin(keys, skipped)
+    return keys[whole], current[whole], safety[whole], target[whole], decode_ids(skipped)
+
+
+def load_velocity(conn, keys, window_days=WINDOW_DAYS, as_of=None):
+    """Return units sold per day over the window, aligned with the keys from load_stock."""
+    velocity = np.zeros(len(keys), dtype=np.float64)
+    if not len(keys):
+        return velocity
+    width = int(keys.dtype.str[2:])
+    count, sold_keys, sold = conn.execute(f'''
+        SELECT count(*), group_concat(printf('%-!{width}s', product_id), ''), group_concat(CAST(quantity AS INTEGER))
+        FROM sales_rollup_hour_product
+        WHERE hour >= strftime('%Y-%m-%d %H:00', IFNULL(?, 'now'), ?)
+          AND hour < strftime('%Y-%m-%d %H:00', IFNULL(?, 'now'))
+          AND length(product_id) <= {width}
+    ''', (as_of, f'-{window_days} days', as_of)).fetchone()
+    if not count:
+        return velocity
+    sold_keys = _ids(sold_keys, width)
+    if sold_keys.dtype.kind != keys.dtype.kind:
+        keys, sold_keys = keys.astype(f'<U{width}'), sold_keys.astype(f'<U{width}')
+    sold = _numbers(sold, count, np.int64)
+    # One rollup row per product and hour: find each row's product by binary
+    # search over the sorted keys, then sum the rows per product. Products are
+    # usually stored in product_id order already, which saves the sort.
+    if (keys[1:] >= keys[:-1]).all():
+        order, sorted_keys = np.arange(len(keys)), keys
+    else:
+        order = np.argsort(keys)
+        sorted_keys = keys[order]
+    positions = np.minimum(np.searchsorted(sorted_keys, sold_keys), len(keys) - 1)
+    tracked = sorted_keys[positions] == sold_keys
+    velocity += np.bincount(order[positions[tracked]], weights=sold[tracked], minlength=len(keys))
+    return velocity / window_days
+
+
+def reorder_quantities(current, safety, target, velocity, lead_time_days=LEAD_TIME_DAYS):
+    """Return (reorder_point, reorder_quantity) arrays for every product at once."""
+    reorder_point = safety + velocity * lead_time_days
+    order_up_to = np.maximum(target, reorder_point)
+    due = current <= reorder_point
+    quantity = np.where(due, np.ceil(order_up_to - current), 0).astype(np.int64)
+    return reorder_point, np.maximum(quantity, 0)
+
+
+def run(pool=None, window_days=WINDOW_DAYS, lead_time_days=LEAD_TIME_DAYS, as_of=None):
+    """Recompute purchase_suggestions for the whole catalog and return a ReplenishmentReport."""
+    if np is None:
+        raise RuntimeError('Replenishment needs NumPy (pip install numpy)')
+    pool = pool or db.get_pool()
+    started = time.perf_counter()
+    # Read one consistent snapshot without holding up the lanes' writes
+    with pool.transaction(immediate=False) as conn:
+        keys, current, safety, target, skipped = load_stock(conn)
+        velocity = load_velocity(conn, keys, window_days, as_of)
+    reorder_point, quantity = reorder_quantities(current, safety, target, velocity, lead_time_days)
+
+    suggested = np.flatnonzero(quantity > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cover = np.where(velocity > 0, current / velocity, np.nan)
+    rows = zip(decode_ids(keys[suggested]), current[suggested].tolist(), safety[suggested].tolist(),
+               target[suggested].tolist(), velocity[suggested].tolist(), reorder_point[suggested].tolist(),
+               [None if c != c else c for c in cover[suggested].tolist()],  # NaN -> NULL
+               quantity[suggested].tolist())
+    with pool.transaction() as conn:
+        conn.execute('DELETE FROM purchase_suggestions')
+        conn.executemany('''
+            INSERT INTO purchase_suggestions (product_id, current_stock, safety_stock, target_stock,
+                                              daily_velocity, reorder_point, days_of_cover, reorder_quantity)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+    return ReplenishmentReport(len(keys), len(suggested), int(quantity.sum()),
+                               time.perf_counter() - started, skipped)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compute purchase suggestions for the whole catalog.')
+    parser.add_argument('--db', help='database path (default: POS_DB_PATH or inventory.db)')
+    parser.add_argument('--window-days', type=int, default=WINDOW_DAYS, help='days of sales for the velocity')
+    parser.add_argument('--lead-time', type=float, default=LEAD_TIME_DAYS, help='supplier lead time in days')
+    parser.add_argument('--show', type=int, default=20, help='suggestions to list, largest first')
+    args = parser.parse_args()
+
+    if args.db:
+        db.configure(args.db)
+    try:
+        report = run(window_days=args.window_days, lead_time_days=args.lead_time)
+    except (RuntimeError, ValueError, sqlite3.Error) as e:
+        print(f'error: {e}', file=sys.stderr)
+        return 2
+    if report.skipped:
+        print(f"warning: {len(report.skipped):,} products skipped, their stock is not a whole number: "
+              f"{', '.join(report.skipped[:10])}{' ...' if len(report.skipped) > 10 else ''}", file=sys.stderr)
+    print(f'{report.products:,} products, {report.suggested:,} to reorder ({report.units:,} units) '
+          f'in {report.seconds:.2f} s')
+    for product_id, current, velocity, quantity in db.get_connection().execute('''
+        SELECT product_id, current_stock, daily_velocity, reorder_quantity
+        FROM purchase_suggestions ORDER BY reorder_quantity DESC LIMIT ?
+    ''', (args.show,)):
+        print(f'  {product_id}: stock {current}, {velocity:.2f}/day, order {quantity}')
+    db.close_all()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,252 @@
+"""Sales reporting from incrementally maintained rollup tables.
+
+Three rollups are kept: hour x product, day x category and day x customer.
+``update_rollups`` folds a range of sales into them and is called by
+``sales.record_basket`` inside the checkout transaction, so the rollups are
+always exactly as current as the sales. Reports then read O(buckets) rows
+instead of every sales line ever written. ``backfill`` rebuilds the rollups
+from the sales history in one pass over sale_id ranges. Buckets follow
+``sale_date`` as stored (SQLite's CURRENT_TIMESTAMP, i.e. UTC).
+
+Usage: python -m pos_core.reporting {backfill | daily | hourly DAY | categories | customers | products}
+"""
+import argparse
+import sys
+import time
+
+from pos_core import db
+
+ROLLUP_TABLES = (
+    '''
+    CREATE TABLE IF NOT EXISTS sales_rollup_hour_product (
+        hour TEXT NOT NULL,
+        product_id TEXT NOT NULL,
+        quantity INTEGER NOT NULL,
+        amount REAL NOT NULL,
+        line_count INTEGER NOT NULL,
+        PRIMARY KEY (hour, product_id)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS sales_rollup_day_category (
+        day TEXT NOT NULL,
+        category_id TEXT NOT NULL,
+        quantity INTEGER NOT NULL,
+        amount REAL NOT NULL,
+        line_count INTEGER NOT NULL,
+        PRIMARY KEY (day, category_id)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS sales_rollup_day_customer (
+        day TEXT NOT NULL,
+        customer_id TEXT NOT NULL,
+        baskets INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        amount REAL NOT NULL,
+        PRIMARY KEY (day, customer_id)
+    ) WITHOUT ROWID
+    ''',
+)
+
+# Each statement folds the sales with sale_id in (?, ?] into one rollup. Products
+# without a category and walk-in sales are bucketed under ''.
+ROLLUP_STATEMENTS = (
+    '''
+    INSERT INTO sales_rollup_hour_product (hour, product_id, quantity, amount, line_count)
+    SELECT strftime('%Y-%m-%d %H:00', h.sale_date), l.product_id,
+           SUM(l.quantity), SUM(l.total_price), COUNT(*)
+    FROM sales_header h
+    JOIN sales_lines l ON l.sale_id = h.sale_id
+    WHERE h.sale_id > ? AND h.sale_id <= ?
+    GROUP BY 1, 2
+    ON CONFLICT (hour, product_id) DO UPDATE
+    SET quantity = quantity + excluded.quantity,
+        amount = amount + excluded.amount,
+        line_count = line_count + excluded.line_count
+    ''',
+    '''
+    INSERT INTO sales_rollup_day_category (day, category_id, quantity, amount, line_count)
+    SELECT date(h.sale_date), IFNULL(p.category_id, ''),
+           SUM(l.quantity), SUM(l.total_price), COUNT(*)
+    FROM sales_header h
+    JOIN sales_lines l ON l.sale_id = h.sale_id
+    LEFT JOIN products p ON p.product_id = l.product_id
+    WHERE h.sale_id > ? AND h.sale_id <= ?
+    GROUP BY 1, 2
+    ON CONFLICT (day, category_id) DO UPDATE
+    SET quantity = quantity + excluded.quantity,
+        amount = amount + excluded.amount,
+        line_count = line_count + excluded.line_count
+    ''',
+    '''
+    INSERT INTO sales_rollup_day_customer (day, customer_id, baskets, quantity, amount)
+    SELECT date(h.sale_date), IFNULL(h.customer_id, ''),
+           COUNT(*), SUM((SELECT SUM(quantity) FROM sales_lines l WHERE l.sale_id = h.sale_id)),
+           SUM(h.total_amount)
+    FROM sales_header h
+    WHERE h.sale_id > ? AND h.sale_id <= ?
+    GROUP BY 1, 2
+    ON CONFLICT (day, customer_id) DO UPDATE
+    SET baskets = baskets + excluded.baskets,
+        quantity = quantity + excluded.quantity,
+        amount = amount + excluded.amount
+    ''',
+)
+
+BACKFILL_BATCH = 20_000  # Sales folded per transaction during a backfill
+
+
+def create_rollup_tables(conn):
+    """Create the rollup tables and fill them from the existing sales."""
+    for statement in ROLLUP_TABLES:
+        conn.execute(statement)
+    update_rollups(conn, 0, _last_sale_id(conn))
+
+
+def _last_sale_id(conn):
+    return conn.execute('SELECT IFNULL(MAX(sale_id), 0) FROM sales_header').fetchone()[0]
+
+
+def update_rollups(conn, after_sale_id, last_sale_id):
+    """Fold the sales with after_sale_id < sale_id <= last_sale_id into the rollups."""
+    for statement in ROLLUP_STATEMENTS:
+        conn.execute(statement, (after_sale_id, last_sale_id))
+
+
+def backfill(pool=None, batch=BACKFILL_BATCH, progress=None):
+    """Rebuild every rollup from the sales history; returns the number of sales covered.
+
+    The rollups are emptied and the current last sale_id taken in one
+    transaction; checkouts after that keep adding their own sales, so the
+    history up to that point is folded in batches of ``batch`` sales, each in
+    its own transaction, without holding up the lanes. A backfill that is
+    interrupted leaves the rollups short and should simply be run again.
+    """
+    pool = pool or db.get_pool()
+    with pool.transaction() as conn:
+        for table in ('sales_rollup_hour_product', 'sales_rollup_day_category', 'sales_rollup_day_customer'):
+            conn.execute(f'DELETE FROM {table}')
+        last_sale_id = _last_sale_id(conn)
+    for start in range(0, last_sale_id, batch):
+        end = min(start + batch, last_sale_id)
+        with pool.transaction() as conn:
+            update_rollups(conn, start, end)
+        if progress is not None:
+            progress(end, last_sale_id)
+    return last_sale_id
+
+
+def daily_totals(conn, start_day, end_day):
+    """Return (day, baskets, quantity, amount) for each day in [start_day, end_day]."""
+    return conn.execute('''
+        SELECT day, SUM(baskets), SUM(quantity), SUM(amount)
+        FROM sales_rollup_day_customer
+        WHERE day BETWEEN ? AND ?
+        GROUP BY day
+        ORDER BY day
+    ''', (start_day, end_day)).fetchall()
+
+
+def hourly_totals(conn, day):
+    """Return (hour, quantity, amount) for each hour of a day with sales."""
+    return conn.execute('''
+        SELECT hour, SUM(quantity), SUM(amount)
+        FROM sales_rollup_hour_product
+        WHERE hour BETWEEN ? AND ? || ' 23:00'
+        GROUP BY hour
+        ORDER BY hour
+    ''', (day, day)).fetchall()
+
+
+def category_totals(conn, start_day, end_day):
+    """Return (category_id, category_name, quantity, amount), best selling first."""
+    return conn.execute('''
+        SELECT r.category_id, c.category_name, SUM(r.quantity), SUM(r.amount)
+        FROM sales_rollup_day_category r
+        LEFT JOIN product_categories c ON c.category_id = r.category_id
+        WHERE r.day BETWEEN ? AND ?
+        GROUP BY r.category_id
+        ORDER BY SUM(r.amount) DESC
+    ''', (start_day, end_day)).fetchall()
+
+
+def customer_totals(conn, start_day, end_day, limit=20):
+    """Return (customer_id, customer_name, baskets, amount) for the top customers; walk-ins excluded."""
+    return conn.execute('''
+        SELECT r.customer_id, c.customer_name, SUM(r.baskets), SUM(r.amount)
+        FROM sales_rollup_day_customer r
+        LEFT JOIN customer_list c ON c.customer_id = r.customer_id
+        WHERE r.day BETWEEN ? AND ? AND r.customer_id != ''
+        GROUP BY r.customer_id
+        ORDER BY SUM(r.amount) DESC
+        LIMIT ?
+    ''', (start_day, end_day, limit)).fetchall()
+
+
+def product_totals(conn, start_day, end_day, limit=20):
+    """Return (product_id, product_name, quantity, amount) for the best selling products."""
+    return conn.execute('''
+        SELECT r.product_id, p.product_name, SUM(r.quantity), SUM(r.amount)
+        FROM sales_rollup_hour_product r
+        LEFT JOIN products p ON p.product_id = r.product_id
+        WHERE r.hour BETWEEN ? AND ? || ' 23:00'
+        GROUP BY r.product_id
+        ORDER BY SUM(r.amount) DESC
+        LIMIT ?
+    ''', (start_day, end_day, limit)).fetchall()
+
+
+def _print_rows(header, rows):
+    print('  '.join(f'{column:>14}' for column in header))
+    for row in rows:
+        print('  '.join(f'{value:>14.2f}' if isinstance(value, float) else f'{str(value):>14}' for value in row))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sales reports from the rollup tables.')
+    parser.add_argument('--db', help='database path (default: POS_DB_PATH or inventory.db)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('backfill', help='rebuild the rollups from the sales history')
+    for name, help_text in (('daily', 'baskets, units and revenue per day'),
+                            ('categories', 'revenue per category'),
+                            ('customers', 'top customers by revenue'),
+                            ('products', 'top products by revenue')):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('--from', dest='start', default='0000-01-01', help='first day, YYYY-MM-DD')
+        command.add_argument('--to', dest='end', default='9999-12-31', help='last day, YYYY-MM-DD')
+        if name in ('customers', 'products'):
+            command.add_argument('--limit', type=int, default=20)
+    hourly = commands.add_parser('hourly', help='units and revenue per hour of one day')
+    hourly.add_argument('day', help='YYYY-MM-DD')
+    args = parser.parse_args()
+
+    if args.db:
+        db.configure(args.db)
+    conn = db.get_connection()
+    if args.command == 'backfill':
+        started = time.perf_counter()
+
+        def progress(done, total):
+            print(f'\r{done:,} of {total:,} sales', end='', flush=True)
+
+        sales = backfill(progress=progress)
+        print(f'\rrolled up {sales:,} sales in {time.perf_counter() - started:.2f} s')
+    elif args.command == 'daily':
+        _print_rows(('day', 'baskets', 'units', 'amount'), daily_totals(conn, args.start, args.end))
+    elif args.command == 'hourly':
+        _print_rows(('hour', 'units', 'amount'), hourly_totals(conn, args.day))
+    elif args.command == 'categories':
+        _print_rows(('category_id', 'category', 'units', 'amount'), category_totals(conn, args.start, args.end))
+    elif args.command == 'customers':
+        _print_rows(('customer_id', 'customer', 'baskets', 'amount'),
+                    customer_totals(conn, args.start, args.end, args.limit))
+    else:
+        _print_rows(('product_id', 'product', 'units', 'amount'),
+                    product_totals(conn, args.start, args.end, args.limit))
+    db.close_all()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,186 @@
+import sqlite3
+
+from pos_core import db
+from pos_core.cart import to_cents
+from pos_core.catalog_cache import CHANGE_RETENTION, trim_change_log
+from pos_core.reporting import update_rollups
+from pos_core.stock import apply_deltas
+
+# One row per basket (receipt) and one row per cart line
+SALES_TABLES = (
+    '''
+    CREATE TABLE IF NOT EXISTS sales_header (
+        sale_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sale_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        customer_id TEXT,
+        line_count INTEGER NOT NULL DEFAULT 0,
+        total_amount REAL NOT NULL DEFAULT 0,
+        FOREIGN KEY (customer_id) REFERENCES customer_list(customer_id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS sales_lines (
+        sales_trans_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        sale_id INTEGER NOT NULL,
+        line_no INTEGER NOT NULL,
+        product_id TEXT NOT NULL,
+        quantity INTEGER NOT NULL,
+        unit_price REAL NOT NULL,
+        total_price REAL NOT NULL,
+        FOREIGN KEY (sale_id) REFERENCES sales_header(sale_id),
+        FOREIGN KEY (product_id) REFERENCES products(product_id)
+    )
+    ''',
+)
+
+# Read-only view with the columns of the old per-line sales table
+SALES_VIEW = '''
+    CREATE VIEW IF NOT EXISTS sales AS
+    SELECT l.sales_trans_id, l.product_id, l.quantity, l.unit_price, l.total_price,
+           h.sale_date, l.sale_id, h.customer_id
+    FROM sales_lines l
+    JOIN sales_header h ON h.sale_id = l.sale_id
+'''
+
+
+def _object_type(conn, name):
+    row = conn.execute('SELECT type FROM sqlite_master WHERE name = ?', (name,)).fetchone()
+    return row[0] if row else None
+
+
+def create_sales_tables(conn):
+    """Create sales_header/sales_lines and migrate the old per-line sales table.
+
+    Old rows carry no basket ID, so consecutive rows with the same sale_date and
+    customer are grouped into one basket; line IDs keep their sales_trans_id. The
+    old table is kept as sales_legacy and ``sales`` becomes a view over the new
+    tables so existing readers keep working.
+    """
+    for statement in SALES_TABLES:
+        conn.execute(statement)
+    if _object_type(conn, 'sales') == 'table':
+        _migrate_legacy_sales(conn)
+    conn.execute(SALES_VIEW)
+
+
+def _migrate_legacy_sales(conn):
+    has_customers = _object_type(conn, 'customer_sales') == 'table'
+    customer_join = ('LEFT JOIN customer_sales cs ON cs.sales_trans_id = s.sales_trans_id'
+                     if has_customers else '')
+    customer_column = 'cs.customer_id' if has_customers else 'NULL'
+    rows = conn.execute(f'''
+        SELECT s.sales_trans_id, s.product_id, s.quantity, s.unit_price, s.total_price,
+               s.sale_date, {customer_column}
+        FROM sales s
+        {customer_join}
+        ORDER BY s.sales_trans_id
+    ''').fetchall()
+
+    basket = None
+    lines = []
+
+    def flush():
+        if not lines:
+            return
+        sale_date, customer_id = basket
+        sale_id = conn.execute('''
+            INSERT INTO sales_header (sale_date, customer_id, line_count, total_amount)
+            VALUES (?, ?, ?, ?)
+        ''', (sale_date, customer_id, len(lines), sum(line[-1] for line in lines))).lastrowid
+        conn.executemany('''
+            INSERT INTO sales_lines (sales_trans_id, sale_id, line_no, product_id, quantity, unit_price, total_price)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [(line[0], sale_id, line_no) + line[1:] for line_no, line in enumerate(lines, 1)])
+        lines.clear()
+
+    for sales_trans_id, product_id, quantity, unit_price, total_price, sale_date, customer_id in rows:
+        if (sale_date, customer_id) != basket:
+            flush()
+            basket = (sale_date, customer_id)
+        lines.append((sales_trans_id, product_id, quantity, unit_price, total_price))
+    flush()
+
+    conn.execute('ALTER TABLE sales RENAME TO sales_legacy')
+
+
+def record_basket(lines, customer_id=None, pool=None):
+    """Write one checkout in a single transaction and return its sale_id.
+
+    ``lines`` holds (product_id, quantity, unit_price, total_price) tuples,
+    prices as Decimal (what Cart.sale_lines gives), str or float. They are
+    converted to integer cents and the basket total is added up in cents; each
+    amount meets float only when it is stored in its REAL column. The header,
+    the lines, the stock decrements and the ledger rows are each written with
+    one statement (``executemany``), the customer is linked once on the header,
+    and the reporting rollups are updated and the catalog change log trimmed in
+    the same transaction.
+    Raises InsufficientStockError, and writes nothing, if a line would take its
+    product's stock below zero.
+    """
+    pool = pool or db.get_pool()
+    with pool.transaction() as conn:
+        return _insert_baskets(conn, [(list(lines), customer_id, None)])[0]
+
+
+def record_baskets(baskets, pool=None):
+    """Write several checkouts in one transaction (group commit).
+
+    ``baskets`` holds (lines, customer_id) pairs as taken by record_basket, or
+    (lines, customer_id, sale_date) for sales made earlier, e.g. replayed from
+    a lane journal; sale_date is UTC 'YYYY-MM-DD HH:MM:SS' like CURRENT_TIMESTAMP.
+    Returns one entry per basket: its sale_id, or the ValueError (or
+    sqlite3.Error, e.g. a constraint) that refused it. The batch is first
+    written as a whole, a header per basket and one statement each for all
+    lines, stock decrements, ledger rows and rollups; if any basket is refused
+    it is written again one savepoint per basket, so only the refused baskets
+    are left out.
+    """
+    baskets = [(list(basket[0]), basket[1], basket[2] if len(basket) > 2 else None) for basket in baskets]
+    pool = pool or db.get_pool()
+    with pool.transaction() as conn:
+        try:
+            with pool.transaction():
+                return _insert_baskets(conn, baskets)
+        except (ValueError, sqlite3.Error):
+            pass
+        results = []
+        for basket in baskets:
+            try:
+                with pool.transaction():
+                    results.append(_insert_baskets(conn, [basket])[0])
+            except (ValueError, sqlite3.Error) as e:
+                results.append(e)
+        return results
+
+
+def _insert_baskets(conn, baskets):
+    sale_ids = []
+    sale_lines = []
+    mutations = []
+    for lines, customer_id, sale_date in baskets:
+        lines = [(product_id, quantity, to_cents(unit_price), to_cents(total_price))
+                 for product_id, quantity, unit_price, total_price in lines]
+        sale_id = conn.execute('''
+            INSERT INTO sales_header (sale_date, customer_id, line_count, total_amount)
+            VALUES (IFNULL(?, CURRENT_TIMESTAMP), ?, ?, ?)
+        ''', (sale_date, customer_id, len(lines), sum(line[3] for line in lines) / 100)).lastrowid
+        sale_ids.append(sale_id)
+        sale_lines += [(sale_id, line_no, product_id, quantity, unit_cents / 100, total_cents / 100)
+                       for line_no, (product_id, quantity, unit_cents, total_cents) in enumerate(lines, 1)]
+        mutations += [(product_id, -quantity, 'Sale', f'sale #{sale_id}') for product_id, quantity, _, _ in lines]
+
+    conn.executemany('''
+        INSERT INTO sales_lines (sale_id, line_no, product_id, quantity, unit_price, total_price)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', sale_lines)
+
+    # Guarded decrements: a lane cannot sell stock another lane just sold
+    apply_deltas(conn, mutations)
+
+    # Reporting rollups commit or roll back together with the sales
+    update_rollups(conn, sale_ids[0] - 1, sale_ids[-1])
+
+    # Every stock decrement logs a catalog change; trim the log here so it stays
+    # bounded however long the lanes run between inventory screen visits
+    trim_change_log(conn, CHANGE_RETENTION)
+    return sale_ids
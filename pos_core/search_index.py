@@ -0,0 +1,183 @@
+import threading
+from array import array
+
+GRAM = 3  # Length of the n-grams kept in the posting lists
+
+# Rows the index is built from: display columns first, then the category and price
+LOAD_QUERY = '''
+    SELECT products.product_id, products.product_name, products.sku,
+           IFNULL(stock_management.current_stock, 0) AS current_stock,
+           products.category_id, IFNULL(products.price, 0.0) AS price
+    FROM products
+    LEFT JOIN stock_management ON products.product_id = stock_management.product_id
+'''
+
+
+def _fields(product_id, product_name, sku):
+    """Lower-cased searchable fields of a product."""
+    return [str(value).lower() for value in (product_id, sku, product_name) if value is not None]
+
+
+def _grams(text):
+    return {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+
+class ProductSearchIndex:
+    """In-memory substring index over product ID, SKU and name.
+
+    Every field is split into trigrams; a query of three or more characters only
+    looks at the products holding its rarest trigram and confirms the match with a
+    plain substring test, so it behaves like ``LIKE '%term%'`` without a table scan.
+    Shorter queries scan the cached strings, which is cheap because almost every
+    product matches and the scan stops at ``limit``.
+
+    Product IDs and SKUs are also kept in an exact-match hash map with each
+    product's price, so a barcode scan resolves with one dict lookup.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._records = []      # doc -> (product_id, product_name, sku, current_stock) or None
+        self._haystacks = []    # doc -> '\0'-joined lower-cased fields
+        self._doc_category = [] # doc -> category_id
+        self._prices = []       # doc -> unit price
+        self._codes = {}        # upper-cased product_id or sku -> doc
+        self._docs = {}         # product_id -> doc
+        self._by_category = {}  # category_id -> {doc: None}, in insertion order
+        self._postings = {}     # trigram -> array of docs
+        self._dead = 0
+
+    def __len__(self):
+        return len(self._docs)
+
+    def load(self, rows):
+        """Add (product_id, product_name, sku, current_stock, category_id[, price]) rows."""
+        with self._lock:
+            for row in rows:
+                self._add(*row)
+
+    def _add(self, product_id, product_name, sku, current_stock, category_id, price=0.0):
+        if product_id in self._docs:
+            self._kill(self._docs[product_id])
+        doc = len(self._records)
+        fields = _fields(product_id, product_name, sku)
+        self._records.append((product_id, product_name, sku, current_stock or 0))
+        self._haystacks.append('\0'.join(fields))
+        self._doc_category.append(category_id)
+        self._prices.append(price or 0.0)
+        self._docs[product_id] = doc
+        self._by_category.setdefault(category_id, {})[doc] = None
+        for code in (product_id, sku):
+            if code is not None:
+                self._codes[str(code).upper()] = doc
+
+        postings = self._postings
+        for gram in {field[i:i + GRAM] for field in fields for i in range(len(field) - GRAM + 1)}:
+            posting = postings.get(gram)
+            if posting is None:
+                posting = postings[gram] = array('i')
+            posting.append(doc)
+
+    def _kill(self, doc):
+        # Posting lists are append-only; dead docs are skipped at query time
+        product_id, _, sku, _ = self._records[doc]
+        for code in (product_id, sku):
+            if code is not None and self._codes.get(str(code).upper()) == doc:
+                del self._codes[str(code).upper()]
+        self._records[doc] = None
+        self._haystacks[doc] = ''
+        del self._by_category[self._doc_category[doc]][doc]
+        self._dead += 1
+
+    def upsert(self, product_id, product_name, sku, current_stock, category_id, price=0.0):
+        """Add a product or replace its indexed fields; a stock-only change is applied in place."""
+        with self._lock:
+            doc = self._docs.get(product_id)
+            if (doc is not None and self._records[doc][1:3] == (product_name, sku)
+                    and self._doc_category[doc] == category_id and self._prices[doc] == (price or 0.0)):
+                # Every sale lands here: skip re-indexing when only the stock moved
+                self._records[doc] = self._records[doc][:3] + (current_stock or 0,)
+                return
+            self._add(product_id, product_name, sku, current_stock, category_id, price)
+            self._compact_if_needed()
+
+    def remove(self, product_id):
+        """Drop a product from the index."""
+        with self._lock:
+            doc = self._docs.pop(product_id, None)
+            if doc is not None:
+                self._kill(doc)
+                self._compact_if_needed()
+
+    def _compact_if_needed(self):
+        if self._dead > 1024 and self._dead > len(self._docs):
+            live = [(record + (self._doc_category[doc], self._prices[doc]))
+                    for doc, record in enumerate(self._records) if record is not None]
+            self._reset()
+            for row in live:
+                self._add(*row)
+
+    def lookup(self, code):
+        """Resolve an exact product ID or SKU, ignoring case.
+
+        Returns (product_id, product_name, sku, current_stock, price), or None.
+        """
+        with self._lock:
+            doc = self._codes.get(code.strip().upper())
+            if doc is None:
+                return None
+            return self._records[doc] + (self._prices[doc],)
+
+    def match(self, product_id, query, category_id=None):
+        """Return the product's row if search(query, category_id) would return it, else None."""
+        with self._lock:
+            doc = self._docs.get(product_id)
+            if doc is None or (category_id is not None and self._doc_category[doc] != category_id):
+                return None
+            if query.lower() not in self._haystacks[doc]:
+                return None
+            return self._records[doc]
+
+    def search(self, query, category_id=None, limit=None):
+        """Return (product_id, product_name, sku, current_stock) rows matching query."""
+        needle = query.lower()
+        with self._lock:
+            if category_id is not None:
+                in_category = self._by_category.get(category_id, {})
+            else:
+                in_category = None
+
+            if len(needle) >= GRAM:
+                candidates = None
+                for gram in _grams(needle):
+                    posting = self._postings.get(gram)
+                    if posting is None:
+                        return []
+                    if candidates is None or len(posting) < len(candidates):
+                        candidates = posting
+                if in_category is not None and len(in_category) < len(candidates):
+                    candidates = in_category
+                    in_category = None
+            elif in_category is not None:
+                candidates, in_category = in_category, None
+            else:
+                candidates = range(len(self._records))
+
+            records = self._records
+            haystacks = self._haystacks
+            results = []
+            for doc in candidates:
+                record = records[doc]
+                if record is None:
+                    continue
+                if in_category is not None and doc not in in_category:
+                    continue
+                if needle and needle not in haystacks[doc]:
+                    continue
+                results.append(record)
+                if limit is not None and len(results) >= limit:
+                    break
+            return results
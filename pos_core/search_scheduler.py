@@ -0,0 +1,138 @@
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+from pos_core import db
+
+logger = logging.getLogger(__name__)
+
+
+class SearchScheduler:
+    """Debounce search keystrokes and run the query off the Tk main thread.
+
+    ``query_fn(*args)`` runs on a worker thread and must not touch any widget; it
+    gets its own pooled connection through ``db.get_connection()``. Its result is
+    handed to ``on_results`` on the Tk thread through ``after()``. A newer request
+    supersedes older ones: queued requests are skipped, a running SQL query is
+    interrupted and late results are dropped. ``close()`` stops the worker and
+    drops whatever is pending; screens call it when they are closed.
+    """
+
+    def __init__(self, widget, query_fn, on_results, delay_ms=150, poll_ms=10, name='search'):
+        self.widget = widget
+        self.query_fn = query_fn
+        self.on_results = on_results
+        self.delay_ms = delay_ms
+        self.poll_ms = poll_ms
+        self.name = name
+        self.last_latency_ms = None
+
+        self._generation = 0      # Bumped for every request; only the newest is shown
+        self._running = None      # Generation the worker is executing, if any
+        self._lock = threading.Lock()  # Held while _running changes and while interrupting
+        self._closed = False
+        self._in_flight = 0
+        self._pending_after = None
+        self._polling_after = None
+        self._worker_conn = None
+        self._requests = queue.Queue()
+        self._results = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name=f'{name}-worker', daemon=True)
+        self._worker.start()
+
+    def schedule(self, *args):
+        """Run a search once typing pauses for the debounce delay."""
+        self._submit(args, self.delay_ms)
+
+    def run_now(self, *args):
+        """Run a search on the next idle cycle, e.g. after a filter change."""
+        self._submit(args, 0)
+
+    def _submit(self, args, delay):
+        if self._closed:
+            return
+        if self._pending_after is not None:
+            self.widget.after_cancel(self._pending_after)
+        self._generation += 1
+        self._pending_after = self.widget.after(delay, self._dispatch, self._generation, args)
+
+    def _dispatch(self, generation, args):
+        self._pending_after = None
+        if self._closed:
+            return
+        self._interrupt_stale(generation)
+        self._in_flight += 1
+        self._requests.put((generation, args, time.perf_counter()))
+        if self._polling_after is None:
+            self._polling_after = self.widget.after(self.poll_ms, self._poll)
+
+    def _interrupt_stale(self, generation):
+        # Abort a superseded query instead of waiting for its full scan. Under the
+        # lock the worker cannot move on to a newer query, so only the stale one
+        # is hit; an interrupt landing after its last statement finished is
+        # cleared by SQLite when the next statement starts.
+        with self._lock:
+            if self._running is not None and self._running < generation and self._worker_conn is not None:
+                self._worker_conn.interrupt()
+
+    def close(self):
+        """Stop the worker; pending and running searches are dropped.
+
+        Makes no Tk calls, so it is safe once the window is destroyed; callbacks
+        still scheduled with ``after()`` find the scheduler closed and return.
+        """
+        self._closed = True
+        self._generation += 1
+        self._interrupt_stale(self._generation)
+        self._requests.put(None)
+
+    def _run(self):
+        self._worker_conn = db.get_connection()
+        while True:
+            request = self._requests.get()
+            if request is None:
+                return
+            generation, args, queued_at = request
+            with self._lock:
+                if generation != self._generation:
+                    self._results.put((generation, args, None, None, 0.0))
+                    continue
+                self._running = generation
+            result = error = None
+            try:
+                result = self.query_fn(*args)
+            except sqlite3.OperationalError as e:
+                if 'interrupted' not in str(e):
+                    error = e
+            except Exception as e:
+                error = e
+            finally:
+                with self._lock:
+                    self._running = None
+            self._results.put((generation, args, result, error, (time.perf_counter() - queued_at) * 1000))
+
+    def _poll(self):
+        self._polling_after = None
+        if self._closed:
+            return
+        while True:
+            try:
+                generation, args, result, error, latency_ms = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._in_flight -= 1
+            if generation != self._generation:
+                logger.debug('%s %r superseded, result dropped', self.name, args)
+                continue
+            if error is not None:
+                logger.error('%s %r failed: %s', self.name, args, error)
+                continue
+            if result is None:
+                continue
+            self.last_latency_ms = latency_ms
+            logger.info('%s %r: %d rows in %.1f ms', self.name, args, len(result), latency_ms)
+            self.on_results(result)
+        if self._in_flight > 0:
+            self._polling_after = self.widget.after(self.poll_ms, self._poll)
@@ -0,0 +1,317 @@
+"""Checkout service shared by many lanes over a local socket.
+
+Lanes that each write to the database collide on SQLite's single write lock
+and wait in the busy handler. Here every checkout goes through one writer: the
+connection handlers price the basket from the in-memory catalog and queue it,
+and a single writer thread takes everything queued since its last commit and
+writes it in one transaction with record_baskets, which leaves out only the
+baskets that were refused (e.g. not enough stock). Lookups, searches and stock
+levels are answered from a CheckoutLane's catalog cache without touching the
+database; the writer polls the change log after each commit, and every
+``poll_interval`` seconds, so the cache also sees edits made elsewhere.
+
+The protocol is one JSON object per line in each direction. A request names an
+``op`` and its fields; the reply carries ``"ok": true`` and the result fields, or
+``"ok": false`` and an ``error`` message::
+
+    {"op": "checkout", "lines": [["SKU-0000001", 2], ["PID-00042", 1]], "customer_id": null}
+    {"ok": true, "sale_id": 1234, "total_cents": 2598}
+
+    lookup      code                        -> product (or null)
+    search      query, category_id, limit   -> rows
+    stock       product_ids                 -> stock (product_id -> current stock)
+    categories                              -> categories (category_id -> name)
+    checkout    lines, customer_id          -> sale_id, total_cents
+    stats                                   -> baskets, commits, refused, queued
+
+Usage: python -m pos_core.server [--db inventory.db] [--host 127.0.0.1] [--port 8765]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from pos_core import db, migrations
+from pos_core.cart import Cart
+from pos_core.checkout import CheckoutLane, UnknownProductError
+from pos_core.sales import record_baskets
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+MAX_BATCH = 64          # Most baskets written in one transaction
+POLL_INTERVAL = 0.5     # Seconds between polls for catalog edits made elsewhere
+LINE_LIMIT = 1 << 20    # Longest request or reply line, in bytes
+
+logger = logging.getLogger(__name__)
+
+
+class ServerError(ValueError):
+    """The checkout server refused a request; the message is the server's."""
+
+
+class CheckoutServer:
+    """Answer lane requests from the cached catalog and group-commit their checkouts.
+
+    All database work, writes and catalog polls alike, runs on one writer
+    thread, so the server never competes with itself for the write lock. With
+    ``group_window`` 0 a batch is whatever queued while the previous commit was
+    running, which adds no latency when lanes are idle; a few milliseconds
+    trade latency for fewer, larger transactions.
+    """
+
+    def __init__(self, pool=None, max_batch=MAX_BATCH, group_window=0.0, poll_interval=POLL_INTERVAL):
+        self.pool = pool or db.get_pool()
+        self.max_batch = max_batch
+        self.group_window = group_window
+        self.poll_interval = poll_interval
+        self.lane = CheckoutLane(self.pool)
+        self.baskets = 0
+        self.commits = 0
+        self.refused = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pos-writer')
+        self._queue = None
+        self._server = None
+        self._tasks = []
+        self._clients = set()
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """Load the catalog and start listening; returns the bound (host, port)."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self.lane.load)
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._writer()), asyncio.create_task(self._poller())]
+        self._server = await asyncio.start_server(self._handle, host, port, limit=LINE_LIMIT)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def close(self):
+        """Stop accepting requests, write the baskets already queued, then release the database."""
+        if self._server is not None:
+            self._server.close()
+        for writer in list(self._clients):
+            writer.close()
+        if self._queue is not None:
+            await self._queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._executor.shutdown(wait=True)
+        self.lane.close()
+
+    async def _handle(self, reader, writer):
+        self._clients.add(writer)
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    response = await self._dispatch(request)
+                    response['ok'] = True
+                except KeyError as e:
+                    response = {'ok': False, 'error': f'Missing field {e}'}
+                except (ValueError, TypeError) as e:
+                    response = {'ok': False, 'error': str(e)}
+                except sqlite3.Error as e:
+                    response = {'ok': False, 'error': f'Database error: {e}'}
+                except Exception as e:
+                    # Whatever went wrong, the lane must not wait for a reply that never comes
+                    logger.exception('Request %.200r failed', line)
+                    response = {'ok': False, 'error': f'Internal error: {e}'}
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            # The lane went away, or sent a line longer than LINE_LIMIT
+            pass
+        finally:
+            self._clients.discard(writer)
+            writer.close()
+
+    async def _dispatch(self, request):
+        op = request['op']
+        if op == 'checkout':
+            return await self.checkout(request['lines'], request.get('customer_id'))
+        if op == 'lookup':
+            product = self.lane.lookup(request['code'])
+            return {'product': dict(zip(('product_id', 'product_name', 'sku', 'current_stock', 'price'), product))
+                    if product else None}
+        if op == 'search':
+            return {'rows': self.lane.search(request.get('query', ''), request.get('category_id'),
+                                             limit=request.get('limit'))}
+        if op == 'stock':
+            return {'stock': {product_id: self.lane.stock_of(product_id) for product_id in request['product_ids']}}
+        if op == 'categories':
+            return {'categories': self.lane.categories}
+        if op == 'stats':
+            return {'baskets': self.baskets, 'commits': self.commits, 'refused': self.refused,
+                    'queued': self._queue.qsize()}
+        raise ValueError(f'Unknown op: {op}')
+
+    async def checkout(self, lines, customer_id=None):
+        """Price ``(code, quantity)`` lines from the cache, queue the basket and wait for its commit."""
+        cart = Cart()
+        for code, quantity in lines:
+            product = self.lane.lookup(str(code))
+            if product is None:
+                raise UnknownProductError(str(code).strip())
+            product_id, product_name, _, current_stock, unit_price = product
+            # The cached stock turns obvious shortfalls away early; the writer's guard is the one that counts
+            cart.add(product_id, product_name, unit_price, int(quantity), stock=current_stock)
+        if not cart:
+            raise ValueError("Your cart is empty!")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((cart.sale_lines(), customer_id, future))
+        sale_id = await future
+        return {'sale_id': sale_id, 'total_cents': cart.total_cents}
+
+    async def _writer(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            await self._fill(batch)
+            try:
+                results = await loop.run_in_executor(
+                    self._executor, self._write, [(lines, customer_id) for lines, customer_id, _ in batch])
+            except Exception as e:
+                # The transaction itself failed: none of the baskets were written
+                results = [e] * len(batch)
+            else:
+                self.commits += 1
+            for (_, _, future), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    self.refused += 1
+                    if not future.done():
+                        future.set_exception(result)
+                else:
+                    self.baskets += 1
+                    if not future.done():
+                        future.set_result(result)
+                self._queue.task_done()
+
+    async def _fill(self, batch):
+        # Take what is already queued, waiting up to group_window for more
+        deadline = asyncio.get_running_loop().time() + self.group_window
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                return
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                return
+
+    def _write(self, baskets):
+        # Runs on the writer thread
+        try:
+            results = record_baskets(baskets, pool=self.pool)
+        except sqlite3.Error as e:
+            if len(baskets) == 1:
+                raise
+            # The group's transaction failed as a whole: give every basket its own
+            # so one that cannot be written does not take the others down with it
+            logger.warning('Group commit of %d baskets failed, writing them one by one: %s', len(baskets), e)
+            results = []
+            for basket in baskets:
+                try:
+                    results.append(record_baskets([basket], pool=self.pool)[0])
+                except sqlite3.Error as basket_error:
+                    results.append(basket_error)
+        try:
+            # Pick up the new stock levels before the lanes hear back
+            self.lane.poll()
+        except sqlite3.Error as e:
+            # The baskets are committed either way; the poller catches up
+            logger.warning('Catalog poll after commit failed: %s', e)
+        return results
+
+    async def _poller(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            await loop.run_in_executor(self._executor, self.lane.poll)
+
+
+class CheckoutClient:
+    """One lane's connection to a CheckoutServer; each request waits for its reply."""
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+
+    @classmethod
+    async def connect(cls, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        reader, writer = await asyncio.open_connection(host, port, limit=LINE_LIMIT)
+        return cls(reader, writer)
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+
+    async def request(self, op, **fields):
+        """Send one request and return the reply fields; raises ServerError if it was refused."""
+        self._writer.write(json.dumps(dict(fields, op=op)).encode() + b'\n')
+        await self._writer.drain()
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionError('The checkout server closed the connection')
+        response = json.loads(line)
+        if not response.pop('ok'):
+            raise ServerError(response['error'])
+        return response
+
+    async def lookup(self, code):
+        return (await self.request('lookup', code=code))['product']
+
+    async def search(self, query, category_id=None, limit=None):
+        return (await self.request('search', query=query, category_id=category_id, limit=limit))['rows']
+
+    async def stock(self, product_ids):
+        return (await self.request('stock', product_ids=list(product_ids)))['stock']
+
+    async def checkout(self, lines, customer_id=None):
+        """Record a basket of (code, quantity) lines; returns {'sale_id': ..., 'total_cents': ...}."""
+        return await self.request('checkout', lines=[list(line) for line in lines], customer_id=customer_id)
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, **options):
+    server = CheckoutServer(**options)
+    host, port = await server.start(host, port)
+    print(f'listening on {host}:{port}', flush=True)
+    try:
+        await asyncio.Event().wait()  # Until interrupted
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Checkout service for many lanes with a single database writer.')
+    parser.add_argument('--db', help='database path (default: POS_DB_PATH or inventory.db)')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='0 picks a free port')
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH, help='most baskets per transaction')
+    parser.add_argument('--group-window', type=float, default=0.0,
+                        help='milliseconds to wait for more baskets before committing')
+    args = parser.parse_args(argv)
+
+    if args.db:
+        db.configure(args.db)
+    migrations.migrate()
+    try:
+        asyncio.run(serve(args.host, args.port, max_batch=args.max_batch, group_window=args.group_window / 1000))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f'error: {e}', file=sys.stderr)
+        return 2
+    finally:
+        db.close_all()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,196 @@
+from collections import namedtuple
+
+from pos_core import db
+
+# Applies a delta only if the result stays non-negative; rowcount 0 means it was refused
+GUARDED_UPDATE = '''
+    UPDATE stock_management
+    SET current_stock = IFNULL(current_stock, 0) + ?
+    WHERE product_id = ? AND IFNULL(current_stock, 0) + ? >= 0
+'''
+
+LEDGER_INSERT = '''
+    INSERT INTO stock_transactions (product_id, quantity, transaction_type, remarks)
+    VALUES (?, ?, ?, ?)
+'''
+
+# Product rows with their stock levels, as the inventory screen shows them
+STOCK_ROWS_QUERY = '''
+    SELECT p.product_id, p.product_name, p.sku, p.category_id, p.category_name,
+           s.current_stock, s.safety_stock, s.target_stock
+    FROM products p
+    LEFT JOIN stock_management s ON p.product_id = s.product_id
+'''
+
+# How each kind of manual stock movement changes the stock and is written to the ledger
+Adjustment = namedtuple('Adjustment', 'sign transaction_type remarks create_missing')
+
+ADJUSTMENTS = {
+    'add': Adjustment(1, 'add stock', 'Added stock to inventory', True),
+    'customer return': Adjustment(1, 'return from customer', 'Returned from customer', True),
+    'vendor return': Adjustment(-1, 'return to vendor', 'Returned to vendor', False),
+    'damaged': Adjustment(-1, 'damaged', 'Damaged removal', False),
+    'expired': Adjustment(-1, 'expired', 'Expired removal', False),
+    'manual add': Adjustment(1, 'manual add', 'Manual add adjustment', False),
+    'manual deduct': Adjustment(-1, 'manual deduct', 'Manual deduct adjustment', False),
+}
+
+
+class StockNotTrackedError(ValueError):
+    """The product has no stock_management row."""
+
+    def __init__(self, product_id):
+        super().__init__(f"Product {product_id} not found in stock management")
+        self.product_id = product_id
+
+
+class InsufficientStockError(ValueError):
+    """A deduction would take the stock below zero."""
+
+    def __init__(self, product_id, available, requested):
+        super().__init__(f"Not enough stock for {product_id}: {available} available, {requested} requested")
+        self.product_id = product_id
+        self.available = available
+        self.requested = requested
+
+
+def apply_deltas(conn, mutations, create_missing=False):
+    """Apply (product_id, delta, transaction_type, remarks) mutations in the caller's transaction.
+
+    Every delta is one guarded UPDATE and every mutation gets its ledger row, so
+    concurrent writers can neither lose an update nor drive stock negative. If
+    any delta is refused, InsufficientStockError or StockNotTrackedError is
+    raised and the caller's transaction should be rolled back. With
+    ``create_missing``, positive deltas for untracked products create their row.
+    """
+    mutations = list(mutations)
+    conn.execute('SAVEPOINT stock_deltas')
+    try:
+        changed = conn.executemany(GUARDED_UPDATE, [(delta, product_id, delta)
+                                                    for product_id, delta, _, _ in mutations]).rowcount
+        if changed != len(mutations):
+            # Redo the batch one row at a time to find the refused delta
+            conn.execute('ROLLBACK TO stock_deltas')
+            for product_id, delta, _, _ in mutations:
+                _apply_one(conn, product_id, delta, create_missing)
+        conn.executemany(LEDGER_INSERT, mutations)
+    except BaseException:
+        conn.execute('ROLLBACK TO stock_deltas')
+        conn.execute('RELEASE stock_deltas')
+        raise
+    conn.execute('RELEASE stock_deltas')
+
+
+def _apply_one(conn, product_id, delta, create_missing):
+    if conn.execute(GUARDED_UPDATE, (delta, product_id, delta)).rowcount:
+        return
+    row = conn.execute('SELECT IFNULL(current_stock, 0) FROM stock_management WHERE product_id = ?',
+                       (product_id,)).fetchone()
+    if row is not None:
+        raise InsufficientStockError(product_id, row[0], -delta)
+    if not create_missing or delta < 0:
+        raise StockNotTrackedError(product_id)
+    conn.execute('INSERT INTO stock_management (product_id, current_stock) VALUES (?, ?)', (product_id, delta))
+
+
+class StockService:
+    """Atomic stock mutations shared by the back office and the tills.
+
+    Each call runs in one ``BEGIN IMMEDIATE`` transaction holding both the
+    conditional stock UPDATE and its stock_transactions row. Given a
+    pos_core.ledger_writer.LedgerWriter, mutations go through it at its
+    durability level instead.
+    """
+
+    def __init__(self, pool=None, writer=None):
+        self.pool = pool
+        self.writer = writer
+
+    def _pool(self):
+        return self.pool or db.get_pool()
+
+    def apply(self, product_id, delta, transaction_type, remarks=None, create_missing=False):
+        """Change one product's stock by delta and return the new stock level (None if deferred)."""
+        if self.writer is not None:
+            self.writer.submit([(product_id, delta, transaction_type, remarks)], create_missing)
+            return None if self.writer.deferred else self.stock_of(product_id)
+        with self._pool().transaction() as conn:
+            apply_deltas(conn, [(product_id, delta, transaction_type, remarks)], create_missing)
+            return conn.execute('SELECT current_stock FROM stock_management WHERE product_id = ?',
+                                (product_id,)).fetchone()[0]
+
+    def apply_many(self, mutations, create_missing=False):
+        """Apply several (product_id, delta, transaction_type, remarks) mutations, all or nothing."""
+        if self.writer is not None:
+            self.writer.submit(mutations, create_missing)
+            return
+        with self._pool().transaction() as conn:
+            apply_deltas(conn, mutations, create_missing)
+
+    def adjust(self, product_id, quantity, kind, remarks=None):
+        """Record one of the ADJUSTMENTS for quantity units and return the new stock level.
+
+        quantity is always positive; the kind decides whether stock goes up or down.
+        """
+        if not product_id:
+            raise ValueError("No product selected")
+        adjustment = self._adjustment(kind)
+        quantity = self._quantity(quantity)
+        return self.apply(product_id, adjustment.sign * quantity, adjustment.transaction_type,
+                          remarks or adjustment.remarks, create_missing=adjustment.create_missing)
+
+    def adjust_many(self, lines, kind, remarks=None):
+        """Record the same kind of adjustment for (product_id, quantity) lines, all or nothing."""
+        adjustment = self._adjustment(kind)
+        self.apply_many([(product_id, adjustment.sign * self._quantity(quantity), adjustment.transaction_type,
+                          remarks or adjustment.remarks) for product_id, quantity in lines],
+                        create_missing=adjustment.create_missing)
+
+    @staticmethod
+    def _adjustment(kind):
+        try:
+            return ADJUSTMENTS[kind]
+        except KeyError:
+            raise ValueError(f"Unknown stock adjustment {kind!r}") from None
+
+    @staticmethod
+    def _quantity(quantity):
+        try:
+            quantity = int(quantity)
+        except (TypeError, ValueError):
+            raise ValueError(f"Quantity {quantity!r} is not a whole number") from None
+        if quantity <= 0:
+            raise ValueError("Quantity must be greater than zero")
+        return quantity
+
+    def stock_rows(self, search_term='', category_name=None):
+        """Return STOCK_ROWS_QUERY rows matching search_term, optionally in one category (by name)."""
+        query = STOCK_ROWS_QUERY + '''
+            WHERE (p.product_id LIKE ? OR p.product_name LIKE ? OR p.sku LIKE ? OR p.category_name LIKE ?)
+        '''
+        params = [f'%{search_term}%'] * 4
+        if category_name:
+            query += ' AND p.category_name = ?'
+            params.append(category_name)
+        return self._pool().connection().execute(query, params).fetchall()
+
+    def stock_rows_for(self, product_ids):
+        """Return {product_id: row} for the given products; missing products are left out."""
+        product_ids = list(dict.fromkeys(product_ids))
+        conn = self._pool().connection()
+        rows = {}
+        # Stay well under SQLite's limit on bound parameters
+        for start in range(0, len(product_ids), 500):
+            chunk = product_ids[start:start + 500]
+            rows.update((row[0], row) for row in conn.execute(
+                STOCK_ROWS_QUERY + f" WHERE p.product_id IN ({', '.join('?' * len(chunk))})", chunk))
+        return rows
+
+    def stock_of(self, product_id):
+        """Return the current stock of a product, or None if it is not tracked."""
+        row = self._pool().connection().execute(
+            'SELECT IFNULL(current_stock, 0) FROM stock_management WHERE product_id = ?', (product_id,)).fetchone()
+        return row[0] if row else None
+
+
+stock_service = StockService()
@@ -0,0 +1,217 @@
+from operator import itemgetter
+
+_DELETED = object()  # Tombstone left in _keys by delete() until the next compaction
+
+
+class TreeviewBinder:
+    """Keep a ttk.Treeview in sync with a keyed result set.
+
+    Rows are keyed by their primary key (the item iid is ``str(key)``), so a
+    refresh only inserts, updates or deletes the rows that actually changed and
+    the selection survives reloads. Result sets larger than ``virtual_threshold``
+    are virtualised: only the visible window plus ``buffer`` rows on each side
+    exist in the Treeview, and the scrollbar is driven over the full set.
+    ``upsert`` and ``delete`` touch at most the one affected Treeview row.
+    """
+
+    def __init__(self, tree, key=0, scrollbar=None, virtual_threshold=2000, buffer=100):
+        self.tree = tree
+        self.key = key if callable(key) else itemgetter(key)
+        self.scrollbar = scrollbar
+        self.virtual_threshold = virtual_threshold
+        self.buffer = buffer
+
+        self._keys = []    # Every key in display order, with tombstones for deleted ones
+        self._rows = {}    # key -> values
+        self._index = {}   # key -> position in _keys
+        self._deleted = 0  # Tombstones in _keys
+        self._shown = {}   # iid -> values currently materialised in the tree
+        self._order = []   # iids currently in the tree, top to bottom
+        self._start = 0    # Position in _keys of the first materialised row
+        self._end = 0      # Position in _keys just past the last materialised row
+        self._top = 0      # Position in _keys of the first visible row
+        self._recentre_pending = False
+
+        tree.configure(yscrollcommand=self._on_tree_scroll)
+        if scrollbar is not None:
+            scrollbar.configure(command=self.yview)
+
+    def __len__(self):
+        return len(self._rows)
+
+    @property
+    def virtual(self):
+        return len(self._rows) > self.virtual_threshold
+
+    def set_rows(self, rows):
+        """Show rows, keyed with the binder's key."""
+        key = self.key
+        self.set_items((key(row), row) for row in rows)
+
+    def set_items(self, items):
+        """Show (key, values) pairs, applying only the differences."""
+        self._keys = []
+        self._rows = {}
+        self._index = {}
+        self._deleted = 0
+        for key, values in items:
+            if key not in self._rows:
+                self._index[key] = len(self._keys)
+                self._keys.append(key)
+            self._rows[key] = tuple(values)
+        self._top = min(self._top, max(len(self._keys) - 1, 0))
+        self._render(self._top)
+
+    def upsert(self, row, key=None):
+        """Insert or update one row; costs one Treeview call at most."""
+        if key is None:
+            key = self.key(row)
+        values = tuple(row)
+        iid = str(key)
+        if key in self._rows:
+            self._rows[key] = values
+            if iid in self._shown and self._shown[iid] != values:
+                self.tree.item(iid, values=values)
+                self._shown[iid] = values
+            return
+        was_virtual = self.virtual
+        position = len(self._keys)
+        self._rows[key] = values
+        self._index[key] = position
+        self._keys.append(key)
+        if self.virtual != was_virtual:
+            self._render(self._top)
+            return
+        # New rows go last: add it only if the materialised window reaches the end of the list
+        if not self.virtual or (self._end == position and len(self._order) < self._window_size()):
+            self.tree.insert('', 'end', iid=iid, values=values)
+            self._shown[iid] = values
+            self._order.append(iid)
+            self._end = position + 1
+        self._update_scrollbar()
+
+    def delete(self, key):
+        """Remove one row."""
+        if self._rows.pop(key, None) is None:
+            return
+        self._keys[self._index.pop(key)] = _DELETED
+        self._deleted += 1
+        iid = str(key)
+        if iid in self._shown:
+            self.tree.delete(iid)
+            del self._shown[iid]
+            self._order.remove(iid)
+        if self._deleted > 64 and self._deleted > len(self._keys) // 4:
+            self._compact()
+        self._update_scrollbar()
+
+    def _compact(self):
+        """Drop the tombstones, keeping the window on the same rows."""
+        def live_before(position):
+            return position - sum(1 for key in self._keys[:position] if key is _DELETED)
+
+        self._start, self._end, self._top = (live_before(self._start), live_before(self._end),
+                                             live_before(self._top))
+        self._keys = [key for key in self._keys if key is not _DELETED]
+        self._index = {key: position for position, key in enumerate(self._keys)}
+        self._deleted = 0
+        self._top = max(0, min(self._top, len(self._keys) - 1))
+
+    def clear(self):
+        self.set_items(())
+
+    def values(self, key):
+        """Return the values bound to key, or None."""
+        return self._rows.get(key)
+
+    def _visible_rows(self):
+        first, last = (float(f) for f in self.tree.yview())
+        if self._order and last - first < 1:
+            return max(1, round((last - first) * len(self._order)))
+        return int(self.tree.cget('height')) or 10
+
+    def _window_size(self):
+        if not self.virtual:
+            return len(self._keys)
+        return self._visible_rows() + 2 * self.buffer
+
+    def _render(self, top):
+        total = len(self._keys)
+        size = self._window_size()
+        start = max(0, min(top - self.buffer, total - size)) if self.virtual else 0
+        end = min(total, start + size)
+        self._start = start
+        self._end = end
+        self._top = top
+
+        tree = self.tree
+        wanted = [(str(key), self._rows[key]) for key in self._keys[start:end] if key is not _DELETED]
+        wanted_iids = {iid for iid, _ in wanted}
+
+        stale = [iid for iid in self._order if iid not in wanted_iids]
+        if stale:
+            tree.delete(*stale)
+            for iid in stale:
+                del self._shown[iid]
+
+        kept = [iid for iid in self._order if iid in wanted_iids]
+        in_order = kept == [iid for iid, _ in wanted if iid in self._shown]
+        for position, (iid, values) in enumerate(wanted):
+            shown = self._shown.get(iid)
+            if shown is None:
+                tree.insert('', position if in_order else 'end', iid=iid, values=values)
+            elif shown != values:
+                tree.item(iid, values=values)
+            self._shown[iid] = values
+        if not in_order:
+            for position, (iid, _) in enumerate(wanted):
+                tree.move(iid, '', position)
+        self._order = [iid for iid, _ in wanted]
+
+        if self.virtual and end > start:
+            tree.yview_moveto((top - start) / (end - start))
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        if self.scrollbar is None:
+            return
+        total = len(self._keys)
+        if not total:
+            self.scrollbar.set(0, 1)
+            return
+        if not self.virtual:
+            self.scrollbar.set(*self.tree.yview())
+            return
+        visible = self._visible_rows()
+        self.scrollbar.set(self._top / total, min(1.0, (self._top + visible) / total))
+
+    def _on_tree_scroll(self, first, last):
+        if not self.virtual:
+            if self.scrollbar is not None:
+                self.scrollbar.set(first, last)
+            return
+        shown = len(self._order)
+        self._top = self._start + int(float(first) * shown + 0.5)
+        self._update_scrollbar()
+        # Slide the window once the view gets close to either edge of the buffer
+        near_top = self._start > 0 and self._top - self._start < self.buffer // 2
+        near_end = (self._start + shown < len(self._keys)
+                    and self._start + shown - self._top < self._visible_rows() + self.buffer // 2)
+        if (near_top or near_end) and not self._recentre_pending:
+            self._recentre_pending = True
+            self.tree.after_idle(self._recentre)
+
+    def _recentre(self):
+        self._recentre_pending = False
+        self._render(self._top)
+
+    def yview(self, *args):
+        """Scrollbar command; positions are relative to the full result set."""
+        if not self.virtual:
+            return self.tree.yview(*args)
+        if args and args[0] == 'moveto':
+            total = len(self._keys)
+            top = int(float(args[1]) * total)
+            self._render(max(0, min(top, total - 1)))
+        else:
+            self.tree.yview(*args)
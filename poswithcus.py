@@ -1,534 +1,477 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import sqlite3
-
-# Path to the database file
-db_path = 'inventory.db'
-
-# Global variables
-selected_button = None  # Currently selected category button
-selected_category_id = None  # Currently selected category ID
-cart_items = []  # List to store cart items as dictionaries
-
-customer_info = {}  # Dictionary to store customer information after adding
-
-# Function to create necessary tables
-def create_tables():
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    # Create sales table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS sales (
-            sales_trans_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            product_id TEXT NOT NULL,
-            quantity INTEGER NOT NULL,
-            unit_price REAL NOT NULL,
-            total_price REAL NOT NULL,
-            sale_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (product_id) REFERENCES products(product_id)
-        );
-    ''')
-
-    # Create customer_list table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS customer_list (
-            customer_id TEXT PRIMARY KEY,
-            customer_name TEXT NOT NULL,
-            mobile_number TEXT NOT NULL UNIQUE
-        );
-    ''')
-
-    # Create customer_sales table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS customer_sales (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            sales_trans_id INTEGER NOT NULL,
-            customer_id TEXT NOT NULL,
-            FOREIGN KEY (sales_trans_id) REFERENCES sales(sales_trans_id),
-            FOREIGN KEY (customer_id) REFERENCES customer_list(customer_id)
-        );
-    ''')
-
-    conn.commit()
-    conn.close()
-
-# Initialize database tables
-create_tables()
-
-# Function to search products
-def search_products(search_query):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    if selected_category_id:
-        cursor.execute('''
-            SELECT products.product_id, products.product_name, products.sku,
-                   IFNULL(stock_management.current_stock, 0) AS current_stock
-            FROM products
-            LEFT JOIN stock_management ON products.product_id = stock_management.product_id
-            WHERE products.category_id = ? AND
-                  (products.product_id LIKE ? OR products.sku LIKE ? OR products.product_name LIKE ?)
-        ''', (selected_category_id, f'%{search_query}%', f'%{search_query}%', f'%{search_query}%'))
-    else:
-        cursor.execute('''
-            SELECT products.product_id, products.product_name, products.sku,
-                   IFNULL(stock_management.current_stock, 0) AS current_stock
-            FROM products
-            LEFT JOIN stock_management ON products.product_id = stock_management.product_id
-            WHERE products.product_id LIKE ? OR products.sku LIKE ? OR products.product_name LIKE ?
-        ''', (f'%{search_query}%', f'%{search_query}%', f'%{search_query}%'))
-
-    products = cursor.fetchall()
-    conn.close()
-
-    # Clear and repopulate the product list
-    for item in product_list.get_children():
-        product_list.delete(item)
-
-    for product in products:
-        product_list.insert("", "end", values=product)
-
-# Function to filter products by category
-def filter_products_by_category(category_id):
-    global selected_category_id
-    selected_category_id = category_id
-    search_products('')  # Refresh product list
-
-# Function to highlight selected category button
-def highlight_button(button):
-    global selected_button
-    if selected_button:
-        selected_button.config(bg="SystemButtonFace")
-    button.config(bg="light blue")
-    selected_button = button
-
-# Function to show all categories
-def show_all_categories(btn):
-    global selected_category_id
-    selected_category_id = None
-    search_products('')
-    highlight_button(btn)
-
-# Function to add product to cart
-def add_to_cart():
-    selected_item = product_list.selection()
-    if selected_item:
-        product_id, product_name, sku, current_stock = product_list.item(selected_item)['values']
-        quantity = quantity_var.get()
-
-        # Check stock availability
-        if quantity > current_stock:
-            messagebox.showwarning("Insufficient Stock", f"Only {current_stock} units available.")
-            return
 
-        # Check if product is already in cart
-        for item in cart_items:
-            if item['product_id'] == product_id:
-                total_quantity = item['quantity'] + quantity
-                if total_quantity > current_stock:
-                    messagebox.showwarning("Insufficient Stock", f"Only {current_stock} units available.")
-                    return
-                item['quantity'] = total_quantity
-                item['total_price'] = item['unit_price'] * item['quantity']
-                break
-        else:
-            # Fetch unit price
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
-            cursor.execute('SELECT price FROM products WHERE product_id = ?', (product_id,))
-            result = cursor.fetchone()
-            unit_price = result[0] if result else 0.0
-            conn.close()
-
-            total_price = unit_price * quantity
-            cart_items.append({
-                'product_id': product_id,
-                'product_name': product_name,
-                'unit_price': unit_price,
-                'quantity': quantity,
-                'total_price': total_price
-            })
-
-        # Update cart display
-        update_cart_display()
-
-        # Reset selection and quantity
-        product_list.selection_remove(selected_item)
-        cart_list.selection_remove(cart_list.selection())
-        quantity_var.set(1)
-
-# Function to update cart item quantity
-def update_cart():
-    selected_item = cart_list.selection()
-    if selected_item:
-        current_qty = quantity_var.get()
-        item_index = cart_list.index(selected_item)
-        cart_item = cart_items[item_index]
-
-        # Check stock availability
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT IFNULL(current_stock, 0) FROM stock_management WHERE product_id = ?', (cart_item['product_id'],))
-        result = cursor.fetchone()
-        current_stock = result[0] if result else 0
-        conn.close()
-
-        if current_qty > current_stock:
-            messagebox.showwarning("Insufficient Stock", f"Only {current_stock} units available.")
-            return
+from pos_core import db
+from pos_core import instrumentation
+from pos_core import migrations
+from pos_core.cart import ADDED, CLEARED, REMOVED, format_cents
+from pos_core.checkout import CheckoutLane, UnknownProductError
+from pos_core.journal import open_lane_journal
+from pos_core.latency import LatencyTimer
+from pos_core.search_scheduler import SearchScheduler
+from pos_core.table_binder import TreeviewBinder
+
+SEARCH_LIMIT = 1000  # Maximum number of rows shown in the product list
+SCAN_BUDGET_MS = 5  # Target end-to-end latency of one barcode scan
+CATALOG_POLL_MS = 1000  # How often to pick up catalog edits made elsewhere
+
+
+class PosApp:
+    """Till screen with customers; the sale itself is kept by a CheckoutLane."""
+
+    def __init__(self, root, lane=None, catalog=None):
+        self.root = root
+        self.root.title("POS Interface")
+        self.root.geometry("1200x950")
+
+        self.selected_button = None  # Currently selected category button
+        self.selected_category_id = None  # Currently selected category ID
+        self.category_buttons = []  # One button per category, rebuilt when categories change
+
+        # Bring the database schema up to date, then load the catalog once, or
+        # use the catalog cache shared by the main menu's screens; later edits
+        # are picked up from the change log
+        if lane is None:
+            migrations.migrate()
+            # Sales go to a local journal first when POS_JOURNAL_DIR is set
+            lane = CheckoutLane(journal=open_lane_journal(), catalog=catalog)
+            lane.load()
+        self.lane = lane
+        self.cart = lane.cart
+
+        # Times every scan from Enter to the redrawn cart
+        self.scan_timer = LatencyTimer(SCAN_BUDGET_MS)
+
+        self.build()
+
+        # Initialize product list
+        self.search_products('')
+        self.scan_entry.focus_set()
+
+        # Keep the product list and category buttons in step with edits made elsewhere
+        # A catalog shared by the main menu is polled by the menu
+        self.poll_job = None
+        self.lane.subscribe(self.on_catalog_change)
+        if self.lane.owns_catalog:
+            self.poll_catalog()
+
+    def build(self):
+        root = self.root
+
+        # Configure grid layout
+        root.columnconfigure(0, weight=1, minsize=200)
+        root.columnconfigure(1, weight=2, minsize=400)
+        root.columnconfigure(2, weight=2, minsize=400)
 
-        cart_item['quantity'] = current_qty
-        cart_item['total_price'] = cart_item['unit_price'] * current_qty
-
-        update_cart_display()
-
-        # Reset selection and quantity
-        cart_list.selection_remove(selected_item)
-        product_list.selection_remove(product_list.selection())
-        quantity_var.set(1)
-
-# Function to remove item from cart
-def remove_from_cart():
-    selected_item = cart_list.selection()
-    if selected_item:
-        item_index = cart_list.index(selected_item)
-        del cart_items[item_index]
-        update_cart_display()
-        cart_list.selection_remove(selected_item)
-
-# Function to update cart display
-def update_cart_display():
-    # Clear and repopulate cart list
-    for item in cart_list.get_children():
-        cart_list.delete(item)
-
-    total_cost = 0.0
-    for item in cart_items:
-        cart_list.insert("", "end", values=(item['product_name'], item['unit_price'], item['quantity'], item['total_price']))
-        total_cost += item['total_price']
-
-    total_label.config(text=f"Total: ${total_cost:.2f}")
-
-# Function to record sale and update stock
-def record_sale_and_update_stock():
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    try:
-        for item in cart_items:
-            product_id = item['product_id']
-            quantity = item['quantity']
-            unit_price = item['unit_price']
-            total_price = item['total_price']
-
-            # Record sale
-            cursor.execute('''
-                INSERT INTO sales (product_id, quantity, unit_price, total_price)
-                VALUES (?, ?, ?, ?)
-            ''', (product_id, quantity, unit_price, total_price))
-
-            sales_trans_id = cursor.lastrowid
-
-            # Update stock
-            cursor.execute('''
-                UPDATE stock_management
-                SET current_stock = current_stock - ?
-                WHERE product_id = ?
-            ''', (quantity, product_id))
-
-            # Log stock transaction
-            cursor.execute('''
-                INSERT INTO stock_transactions (product_id, quantity, transaction_type, remarks)
-                VALUES (?, ?, ?, ?)
-            ''', (product_id, -quantity, 'Sale', 'sales'))
-
-            # Link sale to customer if applicable
-            if customer_info:
-                cursor.execute('''
-                    INSERT INTO customer_sales (sales_trans_id, customer_id)
-                    VALUES (?, ?)
-                ''', (sales_trans_id, customer_info['customer_id']))
-
-        conn.commit()
-    except Exception as e:
-        conn.rollback()
-        messagebox.showerror("Error", f"An error occurred: {e}")
-    finally:
-        conn.close()
-
-# Function to handle checkout
-def checkout():
-    if not cart_items:
-        messagebox.showwarning("Warning", "Your cart is empty!")
-        return
-
-    summary = "Sales Summary:\n"
-    total_sales = 0.0
-    for item in cart_items:
-        summary += f"{item['product_name']}: Quantity {item['quantity']}, Total ${item['total_price']:.2f}\n"
-        total_sales += item['total_price']
-
-    summary += f"\nTotal Sale Amount: ${total_sales:.2f}"
-
-    if customer_info:
-        summary += f"\n\nCustomer: {customer_info['customer_name']} ({customer_info['mobile_number']})"
-
-    record_sale_and_update_stock()
-    messagebox.showinfo("Checkout", summary)
-
-    # Reset cart and customer info
-    clear_cart()
-    search_products(search_entry.get())
-    clear_customer_info()
-
-# Function to clear the cart
-def clear_cart():
-    global cart_items
-    cart_items = []
-    update_cart_display()
-    quantity_var.set(1)
-    cart_list.selection_remove(cart_list.selection())
-    product_list.selection_remove(product_list.selection())
-
-# Function to handle product selection
-def on_product_select(event):
-    cart_list.selection_remove(cart_list.selection())
-
-# Function to handle cart selection
-def on_cart_select(event):
-    product_list.selection_remove(product_list.selection())
-
-# Function to add customer
-def add_customer():
-    mobile_number = customer_mobile_var.get()
-    if not mobile_number:
-        messagebox.showwarning("Warning", "Please enter a mobile number.")
-        return
-
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    cursor.execute('SELECT customer_id, customer_name FROM customer_list WHERE mobile_number = ?', (mobile_number,))
-    result = cursor.fetchone()
-
-    if result:
-        # Existing customer
-        customer_id, customer_name = result
-        customer_info['customer_id'] = customer_id
-        customer_info['customer_name'] = customer_name
-        customer_info['mobile_number'] = mobile_number
-        customer_label.config(text=f"Customer: {customer_name} ({mobile_number})")
-
-        messagebox.showinfo("Customer Assigned", f"Customer {customer_name} assigned to the current cart.")
-    else:
-        # New customer
-        def save_new_customer():
-            customer_name = name_entry.get()
-            if not customer_name:
-                messagebox.showwarning("Warning", "Please enter the customer's name.")
-                return
-            try:
-                conn_inner = sqlite3.connect(db_path)
-                cursor_inner = conn_inner.cursor()
-
-                # Generate new customer_id using SQL
-                cursor_inner.execute("""
-                    SELECT MAX(CAST(SUBSTR(customer_id, 5) AS INTEGER)) 
-                    FROM customer_list 
-                    WHERE customer_id LIKE 'cus-%'
-                """)
-                result = cursor_inner.fetchone()
-                if result[0]:
-                    new_num = result[0] + 1
-                else:
-                    new_num = 1
-                customer_id = f"cus-{new_num:06d}"
-
-                # Insert new customer with customer_id
-                cursor_inner.execute('''
-                    INSERT INTO customer_list (customer_id, customer_name, mobile_number)
-                    VALUES (?, ?, ?)
-                ''', (customer_id, customer_name, mobile_number))
-                conn_inner.commit()
-
-                customer_info['customer_id'] = customer_id
-                customer_info['customer_name'] = customer_name
-                customer_info['mobile_number'] = mobile_number
-
-                customer_label.config(text=f"Customer: {customer_name} ({mobile_number})")
-
-                new_customer_window.destroy()
-
-                messagebox.showinfo("Customer Added", f"Customer {customer_name} added and assigned to the current cart.")
+        # Searches are debounced and run on a worker thread
+        self.search_scheduler = SearchScheduler(root, self.query_products, self.show_products, name="pos search")
 
-            except Exception as e:
-                conn_inner.rollback()
-                messagebox.showerror("Error", f"An error occurred: {e}")
-            finally:
-                conn_inner.close()
+        # 1st Column: Categories and Search Bar
+        self.frame_categories = tk.Frame(root, bd=2, relief="sunken")
+        self.frame_categories.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
 
-        new_customer_window = tk.Toplevel(root)
-        new_customer_window.title("New Customer")
-        tk.Label(new_customer_window, text="Enter Customer Name:").pack(pady=5)
-        name_entry = tk.Entry(new_customer_window)
-        name_entry.pack(pady=5)
-        tk.Button(new_customer_window, text="Save", command=save_new_customer).pack(pady=5)
-
-    conn.close()
-
-# Function to clear customer info
-def clear_customer_info():
-    global customer_info
-    customer_info = {}
-    customer_mobile_var.set('')
-    customer_label.config(text="Customer:")
-
-# Main window setup
-root = tk.Tk()
-root.title("POS Interface")
-root.geometry("1200x950")
-
-# Configure grid layout
-root.columnconfigure(0, weight=1, minsize=200)
-root.columnconfigure(1, weight=2, minsize=400)
-root.columnconfigure(2, weight=2, minsize=400)
-
-# 1st Column: Categories and Search Bar
-frame_categories = tk.Frame(root, bd=2, relief="sunken")
-frame_categories.grid(row=0, column=0, sticky="nsew", padx=5, pady=5)
-
-# Search Bar
-search_label = tk.Label(frame_categories, text="Search (ID, SKU, Name):")
-search_label.pack(pady=5)
-search_entry = tk.Entry(frame_categories)
-search_entry.pack(pady=5, padx=5, fill="x")
-
-def on_search(event):
-    search_query = search_entry.get()
-    search_products(search_query)
-
-search_entry.bind('<KeyRelease>', on_search)
-
-# Categories Label
-categories_label = tk.Label(frame_categories, text="Product Categories", font=("Arial", 14))
-categories_label.pack(pady=10)
-
-# All Categories Button
-btn_all_categories = tk.Button(frame_categories, text="All Categories", height=2, width=20)
-btn_all_categories.config(command=lambda btn=btn_all_categories: show_all_categories(btn))
-btn_all_categories.pack(pady=5)
-
-# Fetch and display categories
-conn = sqlite3.connect(db_path)
-cursor = conn.cursor()
-cursor.execute("SELECT category_id, category_name FROM product_categories")
-categories = cursor.fetchall()
-conn.close()
-
-for category in categories:
-    category_id, category_name = category
-    btn_category = tk.Button(frame_categories, text=category_name, height=2, width=20)
-    btn_category.config(command=lambda cid=category_id, btn=btn_category: (filter_products_by_category(cid), highlight_button(btn)))
-    btn_category.pack(pady=5)
-
-# 2nd Column: Product List and Quantity
-frame_product = tk.Frame(root, bd=2, relief="sunken")
-frame_product.grid(row=0, column=1, sticky="nsew", padx=5, pady=5)
+        # Search Bar
+        tk.Label(self.frame_categories, text="Search (ID, SKU, Name):").pack(pady=5)
+        self.search_entry = tk.Entry(self.frame_categories)
+        self.search_entry.pack(pady=5, padx=5, fill="x")
+        self.search_entry.bind('<KeyRelease>', self.on_search)
+
+        # Categories Label
+        tk.Label(self.frame_categories, text="Product Categories", font=("Arial", 14)).pack(pady=10)
 
-columns = ("Product ID", "Product Name", "SKU", "Stock")
-product_list = ttk.Treeview(frame_product, columns=columns, show="headings")
+        # All Categories Button
+        self.btn_all_categories = tk.Button(self.frame_categories, text="All Categories", height=2, width=20)
+        self.btn_all_categories.config(command=lambda: self.show_all_categories(self.btn_all_categories))
+        self.btn_all_categories.pack(pady=5)
+
+        # Display the cached categories
+        self.show_category_buttons()
 
-product_list.column("Product ID", width=80)
-product_list.column("Product Name", width=150)
-product_list.column("SKU", width=80)
-product_list.column("Stock", width=60)
+        # 2nd Column: Product List and Quantity
+        frame_product = tk.Frame(root, bd=2, relief="sunken")
+        frame_product.grid(row=0, column=1, sticky="nsew", padx=5, pady=5)
 
-for col in columns:
-    product_list.heading(col, text=col)
-product_list.pack(padx=5, pady=5, fill="both", expand=True)
+        # Scan input: a barcode scanner types the code and presses Enter
+        frame_scan = tk.Frame(frame_product)
+        frame_scan.pack(padx=5, pady=5, fill="x")
 
-product_list.bind('<<TreeviewSelect>>', on_product_select)
-
-# Quantity and Buttons
-frame_quantity = tk.Frame(frame_product)
-frame_quantity.pack(pady=10)
-
-quantity_label = tk.Label(frame_quantity, text="Quantity:")
-quantity_label.grid(row=1, column=0, padx=5)
-quantity_var = tk.IntVar(value=1)
-quantity_entry = tk.Entry(frame_quantity, textvariable=quantity_var, width=5)
-quantity_entry.grid(row=1, column=1)
-
-btn_minus = tk.Button(frame_quantity, text="-", width=2, command=lambda: quantity_var.set(max(quantity_var.get() - 1, 1)))
-btn_minus.grid(row=1, column=2)
-btn_plus = tk.Button(frame_quantity, text="+", width=2, command=lambda: quantity_var.set(quantity_var.get() + 1))
-btn_plus.grid(row=1, column=3)
-
-btn_add_to_cart = tk.Button(frame_quantity, text="Add to Cart", width=15, command=add_to_cart)
-btn_add_to_cart.grid(row=2, column=0, pady=10)
-
-btn_update_cart = tk.Button(frame_quantity, text="Update Cart", width=15, command=update_cart)
-btn_update_cart.grid(row=2, column=1, pady=10)
+        tk.Label(frame_scan, text="Scan (SKU / ID):").pack(side=tk.LEFT)
+        self.scan_var = tk.StringVar()
+        self.scan_entry = tk.Entry(frame_scan, textvariable=self.scan_var)
+        self.scan_entry.pack(side=tk.LEFT, padx=5, fill="x", expand=True)
+        self.scan_entry.bind('<Return>', self.scan_item)
+
+        self.scan_status_label = tk.Label(frame_product, text="", anchor="w")
+        self.scan_status_label.pack(padx=5, fill="x")
+
+        columns = ("Product ID", "Product Name", "SKU", "Stock")
+        self.product_list = ttk.Treeview(frame_product, columns=columns, show="headings")
+
+        self.product_list.column("Product ID", width=80)
+        self.product_list.column("Product Name", width=150)
+        self.product_list.column("SKU", width=80)
+        self.product_list.column("Stock", width=60)
+
+        for col in columns:
+            self.product_list.heading(col, text=col)
+        self.product_list.pack(padx=5, pady=5, fill="both", expand=True)
+
+        self.product_list.bind('<<TreeviewSelect>>', self.on_product_select)
+
+        # Rows are keyed by product ID and refreshed by diffing
+        self.product_binder = TreeviewBinder(self.product_list)
+
+        # Quantity and Buttons
+        frame_quantity = tk.Frame(frame_product)
+        frame_quantity.pack(pady=10)
+
+        tk.Label(frame_quantity, text="Quantity:").grid(row=1, column=0, padx=5)
+        self.quantity_var = tk.IntVar(value=1)
+        tk.Entry(frame_quantity, textvariable=self.quantity_var, width=5).grid(row=1, column=1)
+
+        tk.Button(frame_quantity, text="-", width=2,
+                  command=lambda: self.quantity_var.set(max(self.quantity_var.get() - 1, 1))).grid(row=1, column=2)
+        tk.Button(frame_quantity, text="+", width=2,
+                  command=lambda: self.quantity_var.set(self.quantity_var.get() + 1)).grid(row=1, column=3)
+
+        tk.Button(frame_quantity, text="Add to Cart", width=15, command=self.add_to_cart).grid(row=2, column=0, pady=10)
+        tk.Button(frame_quantity, text="Update Cart", width=15, command=self.update_cart).grid(row=2, column=1, pady=10)
+        tk.Button(frame_quantity, text="Remove", width=15, command=self.remove_from_cart).grid(row=2, column=2, pady=10)
+
+        # 3rd Column: Cart and Customer Info
+        frame_cart = tk.Frame(root, bd=2, relief="sunken")
+        frame_cart.grid(row=0, column=2, sticky="nsew", padx=5, pady=5)
+
+        cart_columns = ("Product Name", "Unit Price", "Quantity", "Total Price")
+        self.cart_list = ttk.Treeview(frame_cart, columns=cart_columns, show="headings")
+
+        self.cart_list.column("Product Name", width=150)
+        self.cart_list.column("Unit Price", width=80)
+        self.cart_list.column("Quantity", width=80)
+        self.cart_list.column("Total Price", width=100)
+
+        for col in cart_columns:
+            self.cart_list.heading(col, text=col)
+        self.cart_list.pack(padx=5, pady=5, fill="both", expand=True)
+
+        self.cart_list.bind('<<TreeviewSelect>>', self.on_cart_select)
+
+        # Cart rows are keyed by product ID; each cart change redraws only its own row
+        self.cart.subscribe(self.on_cart_change)
+
+        # Total and Customer Info
+        frame_total = tk.Frame(frame_cart)
+        frame_total.pack(pady=10)
+
+        self.total_label = tk.Label(frame_total, text="Total: $0.00", font=("Arial", 14))
+        self.total_label.grid(row=0, column=0, padx=5)
+
+        tk.Label(frame_total, text="Promo Code:").grid(row=1, column=0, padx=5)
+        self.promo_entry = tk.Entry(frame_total)
+        self.promo_entry.grid(row=1, column=1)
+
+        tk.Label(frame_total, text="Customer Mobile:").grid(row=2, column=0, padx=5)
+        self.customer_mobile_var = tk.StringVar()
+        self.customer_mobile_entry = ttk.Combobox(frame_total, textvariable=self.customer_mobile_var)
+        self.customer_mobile_entry.grid(row=2, column=1)
+        self.customer_mobile_entry.bind("<KeyRelease>", self.suggest_customers)
+
+        tk.Button(frame_total, text="Add Customer", command=self.add_customer).grid(row=2, column=2, padx=5)
+
+        self.customer_label = tk.Label(frame_total, text="Customer:")
+        self.customer_label.grid(row=3, column=0, columnspan=3, pady=5)
+
+        # Sales Control Buttons
+        frame_sales_controls = tk.Frame(frame_cart)
+        frame_sales_controls.pack(pady=10)
+
+        tk.Button(frame_sales_controls, text="New Sale", width=15,
+                  command=lambda: [self.clear_cart(), self.clear_customer_info()]).pack(side=tk.LEFT, padx=5)
+        tk.Button(frame_sales_controls, text="Clear Cart", width=15, command=self.clear_cart).pack(side=tk.LEFT, padx=5)
+        tk.Button(frame_sales_controls, text="Checkout", width=15, command=self.checkout).pack(side=tk.LEFT, padx=5)
+
+    # Function to search products (runs on the search worker thread)
+    @instrumentation.action('search_products')
+    def query_products(self, search_query, category_id):
+        return self.lane.search(search_query, category_id, limit=SEARCH_LIMIT)
+
+    # Function to refresh the product list right away
+    def search_products(self, search_query):
+        self.search_scheduler.run_now(search_query, self.selected_category_id)
+
+    # Function to debounce searches while typing
+    def on_search(self, event):
+        self.search_scheduler.schedule(self.search_entry.get(), self.selected_category_id)
+
+    # Function to show search results in the product list
+    def show_products(self, products):
+        # Apply only the differences to the product list
+        self.product_binder.set_rows(products)
+
+    # Function to filter products by category
+    def filter_products_by_category(self, category_id):
+        self.selected_category_id = category_id
+        self.search_products('')  # Refresh product list
+
+    # Function to highlight selected category button
+    def highlight_button(self, button):
+        if self.selected_button:
+            self.selected_button.config(bg="SystemButtonFace")
+        button.config(bg="light blue")
+        self.selected_button = button
+
+    # Function to show all categories
+    def show_all_categories(self, btn):
+        self.selected_category_id = None
+        self.search_products('')
+        self.highlight_button(btn)
+
+    # Function to put a product in the cart, adding to its line if it is already there
+    def add_item_to_cart(self, code, quantity):
+        try:
+            with instrumentation.action('add_to_cart'):
+                return self.lane.add(code, quantity)
+        except ValueError as ve:
+            messagebox.showwarning("Warning", str(ve))
+            return None
+
+    # Function to add product to cart
+    def add_to_cart(self):
+        selected_item = self.product_list.selection()
+        if selected_item:
+            product_id = self.product_list.item(selected_item)['values'][0]
+
+            # Price and stock come from the in-memory index, not another query
+            if self.add_item_to_cart(product_id, self.quantity_var.get()) is None:
+                return
 
-btn_remove_from_cart = tk.Button(frame_quantity, text="Remove", width=15, command=remove_from_cart)
-btn_remove_from_cart.grid(row=2, column=2, pady=10)
+            # Reset selection and quantity
+            self.product_list.selection_remove(selected_item)
+            self.cart_list.selection_remove(self.cart_list.selection())
+            self.quantity_var.set(1)
+
+    # Function to add a scanned SKU or product ID to the cart; scanning it again adds one more
+    def scan_item(self, event=None):
+        self.scan_timer.start()
+        code = self.scan_var.get()
+        self.scan_var.set('')
+        if not code.strip():
+            return
 
-# 3rd Column: Cart and Customer Info
-frame_cart = tk.Frame(root, bd=2, relief="sunken")
-frame_cart.grid(row=0, column=2, sticky="nsew", padx=5, pady=5)
-
-cart_columns = ("Product Name", "Unit Price", "Quantity", "Total Price")
-cart_list = ttk.Treeview(frame_cart, columns=cart_columns, show="headings")
+        try:
+            with instrumentation.action('scan_item'):
+                line = self.lane.scan(code)
+        except UnknownProductError as e:
+            self.root.bell()
+            self.scan_status_label.config(text=str(e))
+            return
+        except ValueError as ve:
+            messagebox.showwarning("Warning", str(ve))
+            return
 
-cart_list.column("Product Name", width=150)
-cart_list.column("Unit Price", width=80)
-cart_list.column("Quantity", width=80)
-cart_list.column("Total Price", width=100)
+        # Include drawing the updated cart in the measurement
+        self.cart_list.see(line.product_id)
+        self.root.update_idletasks()
+        self.scan_timer.stop()
+        self.scan_status_label.config(text=f"Scanned {line.product_name}: {self.scan_timer.summary()}")
+
+    # Function to update cart item quantity
+    def update_cart(self):
+        selected_item = self.cart_list.selection()
+        if selected_item:
+            # Cart rows are keyed by product ID; stock is checked against the cached catalog
+            try:
+                with instrumentation.action('update_cart'):
+                    self.lane.set_quantity(selected_item[0], self.quantity_var.get())
+            except ValueError as ve:
+                messagebox.showwarning("Warning", str(ve))
+                return
 
-for col in cart_columns:
-    cart_list.heading(col, text=col)
-cart_list.pack(padx=5, pady=5, fill="both", expand=True)
+            # Reset selection and quantity
+            self.cart_list.selection_remove(selected_item)
+            self.product_list.selection_remove(self.product_list.selection())
+            self.quantity_var.set(1)
+
+    # Function to remove item from cart
+    def remove_from_cart(self):
+        selected_item = self.cart_list.selection()
+        if selected_item:
+            self.lane.remove(selected_item[0])
+
+    # Function to redraw only the cart row that changed, and the total
+    def on_cart_change(self, event, line):
+        if event == CLEARED:
+            self.cart_list.delete(*self.cart_list.get_children())
+        elif event == REMOVED:
+            self.cart_list.delete(line.product_id)
+        else:
+            values = (line.product_name, format_cents(line.unit_cents), line.quantity, format_cents(line.total_cents))
+            if event == ADDED:
+                self.cart_list.insert('', 'end', iid=line.product_id, values=values)
+            else:
+                self.cart_list.item(line.product_id, values=values)
+
+        self.total_label.config(text=f"Total: ${format_cents(self.cart.total_cents)}")
+
+    # Function to handle checkout
+    def checkout(self):
+        if not self.cart:
+            messagebox.showwarning("Warning", "Your cart is empty!")
+            return
 
-cart_list.bind('<<TreeviewSelect>>', on_cart_select)
+        try:
+            # Record the whole basket, its stock updates and the customer link in one transaction
+            with instrumentation.action('checkout'):
+                receipt = self.lane.complete()
+        except Exception as e:
+            # Keep the cart if the sale was refused, e.g. another lane sold the last units
+            messagebox.showerror("Error", f"An error occurred: {e}")
+            return
+        messagebox.showinfo("Checkout", receipt.summary)
+
+        # The lane has started a new sale; reset the screen to match
+        self.clear_cart()
+        self.search_products(self.search_entry.get())
+        self.clear_customer_info()
+        self.scan_entry.focus_set()
+
+    # Function to clear the cart
+    def clear_cart(self):
+        self.cart.clear()
+        self.quantity_var.set(1)
+        self.cart_list.selection_remove(self.cart_list.selection())
+        self.product_list.selection_remove(self.product_list.selection())
+
+    # Function to show one button per category, keeping the current selection if it still exists
+    def show_category_buttons(self):
+        if self.selected_button in self.category_buttons:
+            self.selected_button = None
+        for button in self.category_buttons:
+            button.destroy()
+        self.category_buttons.clear()
+
+        for category_id, category_name in self.lane.categories.items():
+            btn_category = tk.Button(self.frame_categories, text=category_name, height=2, width=20)
+            btn_category.config(command=lambda cid=category_id, btn=btn_category: (
+                self.filter_products_by_category(cid), self.highlight_button(btn)))
+            btn_category.pack(pady=5)
+            self.category_buttons.append(btn_category)
+            if category_id == self.selected_category_id:
+                self.highlight_button(btn_category)
+
+        if self.selected_category_id is not None and self.selected_category_id not in self.lane.categories:
+            self.show_all_categories(self.btn_all_categories)
+
+    # Function to refresh the category buttons and product list after catalog changes; the
+    # list is searched again only if a changed product could join or leave it
+    def on_catalog_change(self, product_ids, categories_changed):
+        if categories_changed:
+            self.show_category_buttons()
+        query = self.search_entry.get()
+        if product_ids is None:
+            self.search_products(query)
+            return
+        # Results come in index order, where new and renamed products go last
+        full = len(self.product_binder) >= SEARCH_LIMIT
+        for product_id in product_ids:
+            row = self.lane.match(product_id, query, self.selected_category_id)
+            shown = self.product_binder.values(product_id)
+            if shown is None:
+                if row is not None and not full:
+                    self.search_products(query)
+                    return
+            elif row is None or row[:3] != shown[:3]:
+                self.search_products(query)
+                return
+            else:
+                self.product_binder.upsert(row)  # Only its stock changed
+
+    # Function to check for catalog changes, then check again later
+    @instrumentation.action('poll_catalog')
+    def poll_catalog(self):
+        self.lane.poll()
+        self.poll_job = self.root.after(CATALOG_POLL_MS, self.poll_catalog)
+
+    # Function to handle product selection
+    def on_product_select(self, event):
+        self.cart_list.selection_remove(self.cart_list.selection())
+
+    # Function to handle cart selection
+    def on_cart_select(self, event):
+        self.product_list.selection_remove(self.product_list.selection())
+
+    # Function to show the customer assigned to the cart
+    def show_customer(self, customer):
+        self.customer_label.config(text=f"Customer: {customer.customer_name} ({customer.mobile_number})")
+
+    # Function to add customer
+    def add_customer(self):
+        mobile_number = self.customer_mobile_var.get().strip()
+        if not mobile_number:
+            messagebox.showwarning("Warning", "Please enter a mobile number.")
+            return
 
-# Total and Customer Info
-frame_total = tk.Frame(frame_cart)
-frame_total.pack(pady=10)
+        # Served from the LRU cache for regulars, otherwise one indexed lookup
+        customer = self.lane.assign_customer(mobile_number)
 
-total_label = tk.Label(frame_total, text="Total: $0.00", font=("Arial", 14))
-total_label.grid(row=0, column=0, padx=5)
+        if customer:
+            # Existing customer
+            self.show_customer(customer)
+            messagebox.showinfo("Customer Assigned", f"Customer {customer.customer_name} assigned to the current cart.")
+            return
 
-promo_label = tk.Label(frame_total, text="Promo Code:")
-promo_label.grid(row=1, column=0, padx=5)
-promo_entry = tk.Entry(frame_total)
-promo_entry.grid(row=1, column=1)
+        # New customer
+        new_customer_window = tk.Toplevel(self.root)
+        new_customer_window.title("New Customer")
+        tk.Label(new_customer_window, text="Enter Customer Name:").pack(pady=5)
+        name_entry = tk.Entry(new_customer_window)
+        name_entry.pack(pady=5)
 
-customer_mobile_label = tk.Label(frame_total, text="Customer Mobile:")
-customer_mobile_label.grid(row=2, column=0, padx=5)
-customer_mobile_var = tk.StringVar()
-customer_mobile_entry = tk.Entry(frame_total, textvariable=customer_mobile_var)
-customer_mobile_entry.grid(row=2, column=1)
+        def save_new_customer():
+            customer_name = name_entry.get()
+            if not customer_name:
+                messagebox.showwarning("Warning", "Please enter the customer's name.")
+                return
+            try:
+                # The customer ID comes from the sequence table, not a scan of customer_list
+                customer = self.lane.register_customer(customer_name, mobile_number)
+            except Exception as e:
+                messagebox.showerror("Error", f"An error occurred: {e}")
+                return
 
-btn_add_customer = tk.Button(frame_total, text="Add Customer", command=add_customer)
-btn_add_customer.grid(row=2, column=2, padx=5)
+            self.show_customer(customer)
+            new_customer_window.destroy()
+            messagebox.showinfo("Customer Added", f"Customer {customer_name} added and assigned to the current cart.")
 
-customer_label = tk.Label(frame_total, text="Customer:")
-customer_label.grid(row=3, column=0, columnspan=3, pady=5)
+        tk.Button(new_customer_window, text="Save", command=save_new_customer).pack(pady=5)
 
-# Sales Control Buttons
-frame_sales_controls = tk.Frame(frame_cart)
-frame_sales_controls.pack(pady=10)
+    # Function to suggest registered numbers while a mobile number is typed
+    def suggest_customers(self, event=None):
+        matches = self.lane.customers.find_by_prefix(self.customer_mobile_var.get(), limit=10)
+        self.customer_mobile_entry['values'] = [customer.mobile_number for customer in matches]
 
-btn_new_sales = tk.Button(frame_sales_controls, text="New Sale", width=15, command=lambda: [clear_cart(), clear_customer_info()])
-btn_new_sales.pack(side=tk.LEFT, padx=5)
+    # Function to clear customer info
+    def clear_customer_info(self):
+        self.lane.clear_customer()
+        self.customer_mobile_var.set('')
+        self.customer_label.config(text="Customer:")
 
-btn_clear_cart = tk.Button(frame_sales_controls, text="Clear Cart", width=15, command=clear_cart)
-btn_clear_cart.pack(side=tk.LEFT, padx=5)
+    # Function to stop polling and the search worker and release the lane's connection
+    def close(self):
+        if self.poll_job is not None:
+            try:
+                self.root.after_cancel(self.poll_job)
+            except tk.TclError:
+                pass  # The window is already gone
+        self.search_scheduler.close()
+        self.lane.close()
 
-btn_checkout = tk.Button(frame_sales_controls, text="Checkout", width=15, command=checkout)
-btn_checkout.pack(side=tk.LEFT, padx=5)
 
-# Initialize product list
-search_products('')
+if __name__ == "__main__":
+    root = tk.Tk()
+    app = PosApp(root)
+    root.mainloop()
 
-root.mainloop()
+    # Close the pooled database connections when the app closes
+    app.close()
+    db.close_all()
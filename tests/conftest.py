@@ -0,0 +1,54 @@
+import pytest
+
+from pos_core import migrations
+from pos_core.db import ConnectionPool
+from pos_core.stock import apply_deltas
+
+PRODUCTS = (
+    ('PID-00001', 'APPLE', 'SKU-1', 1.50, 10),
+    ('PID-00002', 'BANANA', 'SKU-2', 0.25, 10),
+    ('PID-00003', 'CHERRY', 'SKU-3', 3.00, 0),
+)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'inventory.db')
+
+
+@pytest.fixture
+def pool(db_path):
+    """A pool on a fresh, fully migrated database."""
+    pool = ConnectionPool(db_path)
+    migrations.migrate(pool)
+    yield pool
+    pool.close_all()
+
+
+@pytest.fixture
+def store(pool):
+    """PRODUCTS in one category, their opening stock booked through the ledger."""
+    with pool.transaction() as conn:
+        conn.execute("INSERT INTO product_categories (category_id, category_name) VALUES ('PC-001', 'FRUIT')")
+        conn.executemany('''
+            INSERT INTO products (product_id, product_name, sku, category_id, category_name, price)
+            VALUES (?, ?, ?, 'PC-001', 'FRUIT', ?)
+        ''', [product[:4] for product in PRODUCTS])
+        conn.executemany('INSERT INTO stock_management (product_id, current_stock) VALUES (?, 0)',
+                         [product[:1] for product in PRODUCTS])
+        apply_deltas(conn, [(product_id, stock, 'add stock', 'opening stock')
+                            for product_id, _, _, _, stock in PRODUCTS if stock])
+    return pool
+
+
+def stock_of(pool, product_id):
+    row = pool.connection().execute('SELECT current_stock FROM stock_management WHERE product_id = ?',
+                                    (product_id,)).fetchone()
+    return row[0] if row else None
+
+
+def ledger_rows(pool, product_id=None):
+    if product_id is None:
+        return pool.connection().execute('SELECT COUNT(*) FROM stock_transactions').fetchone()[0]
+    return pool.connection().execute('SELECT COUNT(*) FROM stock_transactions WHERE product_id = ?',
+                                     (product_id,)).fetchone()[0]
@@ -0,0 +1,79 @@
+from decimal import Decimal
+
+import pytest
+
+from pos_core.cart import ADDED, CHANGED, CLEARED, REMOVED, Cart, format_cents, to_cents
+from pos_core.stock import InsufficientStockError
+
+
+def test_prices_become_cents_rounding_half_up():
+    assert to_cents(12.5) == 1250
+    assert to_cents('0.125') == 13
+    assert to_cents(2.675) == 268  # The float's shortest repr, not its binary value, is rounded
+    assert to_cents(Decimal('0.1') + Decimal('0.2')) == 30
+    assert to_cents(0.1 + 0.2) == 30
+    assert format_cents(1250) == '12.50'
+    assert format_cents(-5) == '-0.05'
+
+
+def test_totals_follow_every_change():
+    cart = Cart()
+    cart.add('PID-00001', 'APPLE', 0.10, 3)
+    cart.add('PID-00002', 'BANANA', '0.20')
+    assert (cart.total_cents, cart.units, cart.total) == (50, 4, Decimal('0.50'))
+
+    line = cart.add('PID-00001', 'APPLE', 0.10, 2)  # Same product: same line, one more change
+    assert (len(cart), line.quantity, line.total_cents, cart.total_cents) == (2, 5, 50, 70)
+
+    cart.set_quantity('PID-00002', 4)
+    assert (cart.total_cents, cart.units) == (130, 9)
+
+    assert cart.remove('PID-00001') is line
+    assert cart.remove('PID-00001') is None
+    assert (cart.total_cents, cart.units, 'PID-00001' in cart) == (80, 4, False)
+
+    cart.clear()
+    assert (len(cart), cart.total_cents, cart.units) == (0, 0, 0)
+
+
+def test_lines_keep_the_order_they_were_added_in():
+    cart = Cart()
+    for product_id in ('PID-00003', 'PID-00001', 'PID-00002'):
+        cart.add(product_id, product_id, 1)
+    cart.add('PID-00003', 'PID-00003', 1)
+    assert [line.product_id for line in cart] == ['PID-00003', 'PID-00001', 'PID-00002']
+
+
+def test_listeners_see_each_change():
+    cart = Cart()
+    events = []
+    cart.subscribe(lambda event, line: events.append((event, line and line.product_id)))
+
+    cart.add('PID-00001', 'APPLE', 1.50)
+    cart.add('PID-00001', 'APPLE', 1.50)
+    cart.set_quantity('PID-00001', 5)
+    cart.remove('PID-00001')
+    cart.clear()
+
+    assert events == [(ADDED, 'PID-00001'), (CHANGED, 'PID-00001'), (CHANGED, 'PID-00001'),
+                      (REMOVED, 'PID-00001'), (CLEARED, None)]
+
+
+def test_quantities_are_checked_and_nothing_changes_when_refused():
+    cart = Cart()
+    with pytest.raises(ValueError):
+        cart.add('PID-00001', 'APPLE', 1.50, 0)
+    cart.add('PID-00001', 'APPLE', 1.50, 2, stock=3)
+    with pytest.raises(InsufficientStockError):
+        cart.add('PID-00001', 'APPLE', 1.50, 2, stock=3)
+    with pytest.raises(InsufficientStockError):
+        cart.add('PID-00002', 'BANANA', 0.25, 1, stock=0)
+    with pytest.raises(ValueError):
+        cart.set_quantity('PID-00001', -1)
+    assert (len(cart), cart.get('PID-00001').quantity, cart.total_cents) == (1, 2, 300)
+
+
+def test_sale_lines_carry_exact_decimal_prices():
+    cart = Cart()
+    cart.add('PID-00001', 'APPLE', 0.10, 3)
+    assert cart.sale_lines() == [('PID-00001', 3, Decimal('0.10'), Decimal('0.30'))]
@@ -0,0 +1,12 @@
+from pos_core.catalog_cache import may_match
+
+
+def test_may_match_errs_towards_a_match():
+    assert may_match('rice', 'PID-00001', 'Sunny RICE 1kg', None)
+    assert may_match('', 'PID-00001', None)
+    assert not may_match('', None, None)
+    assert not may_match('tea', 'PID-00001', 'SUNNY RICE 1KG', 'SKU-100')
+    assert may_match('sku-1', 'PID-00001', None, 'SKU-100')
+    # LIKE wildcards are not interpreted: the database decides
+    assert may_match('t_a', 'PID-00001', 'SUNNY RICE 1KG')
+    assert may_match('%', 'PID-00001')
@@ -0,0 +1,44 @@
+from pos_core.catalog_cache import CatalogCache
+from pos_core.checkout import CheckoutLane
+
+
+def test_lane_indexes_a_shared_catalog_and_leaves_it_open(store):
+    catalog = CatalogCache(store)
+    catalog.load()
+    changes = []
+    catalog.subscribe(lambda product_ids, categories_changed: changes.append(product_ids))
+
+    lane = CheckoutLane(store, catalog=catalog)
+    lane.load()
+    assert lane.lookup('SKU-2')[:2] == ('PID-00002', 'BANANA')
+
+    # Another screen renames a product; one poll of the shared cache updates the lane's index
+    store.connection().execute("UPDATE products SET product_name = 'PLANTAIN' WHERE product_id = 'PID-00002'")
+    assert catalog.poll()
+    assert lane.lookup('SKU-2')[1] == 'PLANTAIN'
+    assert changes == [{'PID-00002'}]
+
+    lane.close()
+    store.connection().execute("UPDATE products SET price = 2.00 WHERE product_id = 'PID-00001'")
+    assert catalog.poll()
+    assert catalog.products['PID-00001'].price == 2.00
+    assert lane.lookup('SKU-1')[4] == 1.50  # The closed lane no longer follows the cache
+    catalog.close()
+
+
+def test_sale_on_a_shared_catalog_updates_every_subscriber(store):
+    catalog = CatalogCache(store)
+    catalog.load()
+    lane = CheckoutLane(store, catalog=catalog)
+    lane.load()
+    changes = []
+    catalog.subscribe(lambda product_ids, categories_changed: changes.append(product_ids))
+
+    lane.add('SKU-1', 3)
+    lane.complete()
+
+    assert catalog.products['PID-00001'].current_stock == 7
+    assert lane.stock_of('PID-00001') == 7
+    assert changes == [{'PID-00001'}]
+    lane.close()
+    catalog.close()
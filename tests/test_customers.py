@@ -0,0 +1,51 @@
+import sqlite3
+
+import pytest
+
+from pos_core.customers import Customer, CustomerDirectory
+
+
+def test_lookup_by_mobile_number(pool):
+    directory = CustomerDirectory(pool=pool)
+    ann = directory.create('ANN', ' 0771234567 ')
+
+    assert ann == Customer('cus-000001', 'ANN', '0771234567')
+    assert directory.lookup('0771234567') == ann
+    assert directory.lookup(' 0771234567') == ann
+    assert directory.lookup('0779999999') is None
+    # A fresh directory has nothing cached and finds the customer through the index
+    assert CustomerDirectory(pool=pool).lookup('0771234567') == ann
+
+
+def test_cache_is_bounded_and_can_be_forgotten(pool):
+    directory = CustomerDirectory(cache_size=2, pool=pool)
+    for n in range(3):
+        directory.create(f'C{n}', f'07700000{n}')
+    assert list(directory._cache) == ['077000001', '077000002']
+
+    pool.connection().execute("UPDATE customer_list SET customer_name = 'RENAMED' WHERE mobile_number = '077000002'")
+    assert directory.lookup('077000002').customer_name == 'C2'
+    directory.forget('077000002')
+    assert directory.lookup('077000002').customer_name == 'RENAMED'
+
+
+def test_find_by_prefix(pool):
+    directory = CustomerDirectory(pool=pool)
+    for mobile in ('0771000001', '0771000002', '0772000001', '0781000001'):
+        directory.create('X', mobile)
+
+    assert [c.mobile_number for c in directory.find_by_prefix('0771')] == ['0771000001', '0771000002']
+    assert [c.mobile_number for c in directory.find_by_prefix('077', limit=2)] == ['0771000001', '0771000002']
+    assert directory.find_by_prefix('079') == []
+    assert directory.find_by_prefix('  ') == []
+
+
+def test_customer_ids_only_grow(pool):
+    directory = CustomerDirectory(pool=pool)
+    first = directory.create('ANN', '0771')
+    pool.connection().execute('DELETE FROM customer_list WHERE customer_id = ?', (first.customer_id,))
+
+    assert directory.create('BEN', '0772').customer_id == 'cus-000002'
+    with pytest.raises(sqlite3.IntegrityError):
+        directory.create('BEN AGAIN', '0772')
+    assert directory.create('CAT', '0773').customer_id == 'cus-000003'
@@ -0,0 +1,107 @@
+import datetime
+import sqlite3
+import sys
+
+import pytest
+
+from pos_core import db, forecasting
+from pos_core.sales import record_baskets
+
+np = pytest.importorskip('numpy')
+
+DAY = datetime.date(2026, 3, 1)
+
+
+def day(n):
+    return DAY + datetime.timedelta(days=n)
+
+
+def sell(pool, *sales):
+    """Book (day number, product_id, quantity) sales, one basket each."""
+    results = record_baskets([([(product_id, quantity, 1.00, quantity * 1.00)], None, f'{day(n)} 12:00:00')
+                              for n, product_id, quantity in sales], pool=pool)
+    assert all(isinstance(result, int) for result in results)
+
+
+def product_ids(pool):
+    return np.array([row[0] for row in pool.connection().execute(
+        'SELECT product_id FROM stock_management ORDER BY product_id')], dtype=str)
+
+
+def assert_state_is_a_full_fold(pool, last_day):
+    """The kept state matches folding every day from the first sale in one go."""
+    conn = pool.connection()
+    ids = product_ids(pool)
+    kept, _ = forecasting.latest_state(conn, ids)
+    full = forecasting.fold_days(forecasting.empty_state(ids), forecasting.demand_matrix(conn, ids, DAY, last_day))
+    assert kept.last_day == last_day
+    np.testing.assert_allclose(kept.level, full.level)
+    np.testing.assert_allclose(kept.variance, full.variance)
+    np.testing.assert_array_equal(kept.window, full.window)
+    np.testing.assert_array_equal(kept.seen, full.seen)
+
+
+def test_demand_matrix_reads_the_rollup(store):
+    sell(store, (0, 'PID-00001', 2), (0, 'PID-00001', 1), (2, 'PID-00002', 4))
+    store.connection().execute("INSERT INTO products (product_id, product_name, sku) VALUES ('PID-00009', 'FIG', 'F')")
+    ids = np.array(['PID-00001', 'PID-00002'])
+
+    matrix = forecasting.demand_matrix(store.connection(), ids, DAY, day(3))
+    np.testing.assert_array_equal(matrix, [[3, 0], [0, 0], [0, 4], [0, 0]])
+    np.testing.assert_array_equal(forecasting.demand_matrix(store.connection(), ids, day(1), day(1)), [[0, 0]])
+
+
+def test_nightly_runs_fold_only_the_new_days(store):
+    sell(store, (0, 'PID-00001', 2), (1, 'PID-00001', 1), (1, 'PID-00002', 3), (3, 'PID-00002', 1))
+
+    first = forecasting.run(store, as_of=day(2))
+    assert (first.first_day, first.last_day, first.days, first.products) == (DAY, day(1), 2, 3)
+    nightly = forecasting.run(store, as_of=day(4))
+    assert (nightly.first_day, nightly.last_day, nightly.days) == (day(2), day(3), 2)
+    assert forecasting.run(store, as_of=day(4)).days == 0
+    assert_state_is_a_full_fold(store, day(3))
+
+    conn = store.connection()
+    assert conn.execute('SELECT COUNT(*) FROM demand_forecasts WHERE run_date = ?',
+                        (day(4).isoformat(),)).fetchone()[0] == 3
+    assert forecasting.apply_proposals(store) == 3
+
+
+def test_sales_synced_late_are_folded_in(store):
+    sell(store, (0, 'PID-00001', 2), (1, 'PID-00001', 1), (2, 'PID-00002', 3))
+    forecasting.run(store, as_of=day(1))
+    forecasting.run(store, as_of=day(3))
+
+    # A lane journal syncs a sale made on a day the last run already folded
+    sell(store, (2, 'PID-00001', 4), (3, 'PID-00002', 1))
+    report = forecasting.run(store, as_of=day(4))
+
+    assert (report.first_day, report.last_day) == (day(1), day(3))
+    assert_state_is_a_full_fold(store, day(3))
+    # The state that missed the late sale is not used again
+    assert store.connection().execute('SELECT run_date FROM forecast_runs WHERE state IS NOT NULL '
+                                      'ORDER BY run_date').fetchall() == [(day(1).isoformat(),),
+                                                                         (day(4).isoformat(),)]
+
+
+def test_sales_synced_late_before_every_kept_state_start_over(store):
+    sell(store, (0, 'PID-00001', 2), (1, 'PID-00002', 1))
+    forecasting.run(store, as_of=day(2))
+
+    sell(store, (0, 'PID-00002', 5))
+    report = forecasting.run(store, as_of=day(2))
+
+    assert (report.first_day, report.last_day, report.days) == (DAY, day(1), 2)
+    assert_state_is_a_full_fold(store, day(1))
+
+
+def test_main_reports_database_errors(tmp_path, monkeypatch, capsys):
+    path = str(tmp_path / 'empty.db')
+    sqlite3.connect(path).close()
+    monkeypatch.setattr(db, '_pool', None)
+    monkeypatch.setattr(db, 'DB_PATH', db.DB_PATH)
+    monkeypatch.setattr(sys, 'argv', ['forecasting', '--db', path])
+
+    assert forecasting.main() == 2
+    assert 'no such table' in capsys.readouterr().err
+    db.close_all()
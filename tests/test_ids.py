@@ -0,0 +1,91 @@
+import threading
+
+from pos_core.ids import CATEGORY_IDS, PRODUCT_IDS, IdAllocator
+
+
+def add_product(pool, allocator, name):
+    with pool.transaction() as conn:
+        product_id = allocator.allocate()
+        conn.execute("INSERT INTO products (product_id, product_name, sku, category_id, category_name, price) "
+                     "VALUES (?, ?, ?, 'PC-001', 'FRUIT', 1.0)", (product_id, name, 'SKU-' + name))
+    return product_id
+
+
+def delete_product(pool, allocator, product_id):
+    pool.connection().execute('DELETE FROM products WHERE product_id = ?', (product_id,))
+    allocator.release(product_id)
+
+
+def sequence_rows(pool):
+    return pool.connection().execute('SELECT COUNT(*) FROM id_sequences').fetchone()[0]
+
+
+def test_peek_only_reads(store):
+    store.connection().execute("DELETE FROM products WHERE product_id = 'PID-00002'")
+    allocator = IdAllocator(PRODUCT_IDS, pool=store)
+    conn = store.connection()
+    changes = conn.total_changes
+
+    # Before seeding it works out the first gap without writing the sequence
+    assert allocator.peek() == 'PID-00002'
+    assert (sequence_rows(store), conn.total_changes) == (0, changes)
+
+    assert add_product(store, allocator, 'PEAR') == 'PID-00002'
+    assert allocator.peek() == 'PID-00004'
+    assert IdAllocator(PRODUCT_IDS, reuse_gaps=False, pool=store).peek() == 'PID-00004'
+
+
+def test_deleted_id_is_reused_first(store):
+    allocator = IdAllocator(PRODUCT_IDS, pool=store)
+    assert add_product(store, allocator, 'PEAR') == 'PID-00004'
+    assert add_product(store, allocator, 'PLUM') == 'PID-00005'
+
+    delete_product(store, allocator, 'PID-00002')
+    assert allocator.peek() == 'PID-00002'
+    assert add_product(store, allocator, 'KIWI') == 'PID-00002'
+    assert add_product(store, allocator, 'LIME') == 'PID-00006'
+
+
+def test_failed_insert_gives_the_id_back(store):
+    allocator = IdAllocator(PRODUCT_IDS, pool=store)
+    try:
+        with store.transaction():
+            allocator.allocate()
+            raise RuntimeError('insert failed')
+    except RuntimeError:
+        pass
+    assert add_product(store, allocator, 'PEAR') == 'PID-00004'
+
+
+def test_ids_taken_outside_the_allocator_are_skipped(store):
+    allocator = IdAllocator(PRODUCT_IDS, pool=store)
+    allocator.seed()
+    store.connection().execute("INSERT INTO products (product_id, product_name, sku) VALUES ('PID-00004', 'FIG', 'F')")
+
+    assert add_product(store, allocator, 'PEAR') == 'PID-00005'
+    assert IdAllocator(CATEGORY_IDS, pool=store).allocate() == 'PC-002'
+
+
+def test_concurrent_allocations_never_share_an_id(store):
+    allocator = IdAllocator(PRODUCT_IDS, pool=store)
+    issued = []
+    errors = []
+    lock = threading.Lock()
+
+    def clerk(n):
+        try:
+            mine = [add_product(store, allocator, f'ITEM-{n}-{i}') for i in range(25)]
+        except Exception as e:  # Reported below; a failing thread would otherwise pass silently
+            errors.append(e)
+            return
+        with lock:
+            issued.extend(mine)
+
+    threads = [threading.Thread(target=clerk, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sorted(issued) == [PRODUCT_IDS.format(n) for n in range(4, 104)]
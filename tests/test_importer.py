@@ -0,0 +1,77 @@
+import sqlite3
+
+import pytest
+
+from pos_core.catalog_cache import CatalogCache
+from pos_core.importer import ProductImporter
+from tests.conftest import stock_of
+
+
+def test_import_skips_ids_already_in_the_catalog(store):
+    importer = ProductImporter(pool=store)
+    importer.product_ids.allocate_block(1)  # Seeds the sequence at PID-00004
+    store.connection().execute("INSERT INTO products (product_id, sku) VALUES ('PID-00005', 'BY-HAND')")
+
+    report = importer.import_rows([('PEAR', 'SKU-4', 'FRUIT', '2.00', '', '5', '', ''),
+                                   ('PLUM', 'SKU-5', 'FRUIT', '1.00', '', '', '', '')])
+
+    assert (report.imported, report.rejects) == (2, [])
+    ids = dict(store.connection().execute("SELECT sku, product_id FROM products WHERE sku IN ('SKU-4', 'SKU-5')"))
+    assert ids == {'SKU-4': 'PID-00006', 'SKU-5': 'PID-00007'}
+    assert stock_of(store, 'PID-00006') == 5
+
+
+@pytest.mark.parametrize('price', ['nan', 'inf', '-1', 'n/a', ''])
+def test_bad_prices_are_rejected(store, price):
+    report = ProductImporter(pool=store).import_rows([('PEAR', 'SKU-4', 'FRUIT', price, '', '', '', '')])
+    assert report.imported == 0
+    assert report.rejects[0].reason.startswith('price')
+
+
+def test_duplicate_skus_in_the_catalog_and_the_file_are_rejected(store):
+    report = ProductImporter(pool=store).import_rows([('PEAR', 'sku-1', 'FRUIT', '1', '', '', '', ''),
+                                                      ('PLUM', 'SKU-4', 'FRUIT', '1', '', '', '', ''),
+                                                      ('FIG', 'SKU-4', 'FRUIT', '1', '', '', '', '')])
+    assert report.imported == 1
+    assert [(reject.line, reject.reason) for reject in report.rejects] == \
+        [(2, 'duplicate SKU SKU-1'), (4, 'duplicate SKU SKU-4')]
+
+
+def test_skus_of_a_failed_chunk_stay_importable(store, monkeypatch):
+    importer = ProductImporter(pool=store, chunk_size=1, create_categories=True)
+    insert = importer._insert
+
+    def fail_second_chunk(conn, valid):
+        if valid[0][1] == 'SKU-5':
+            raise sqlite3.OperationalError('disk I/O error')
+        insert(conn, valid)
+
+    monkeypatch.setattr(importer, '_insert', fail_second_chunk)
+    with pytest.raises(sqlite3.OperationalError):
+        importer.import_rows([('PEAR', 'SKU-4', 'FRUIT', '1', '', '', '', ''),
+                              ('PLUM', 'SKU-5', 'NEW', '1', '', '', '', '')])
+    assert 'SKU-4' in importer._skus
+    assert 'SKU-5' not in importer._skus
+    assert 'NEW' not in importer._categories
+    assert store.connection().execute("SELECT COUNT(*) FROM products WHERE sku = 'SKU-5'").fetchone()[0] == 0
+
+
+def test_import_logs_one_change_per_table_and_caches_reload(store):
+    cache = CatalogCache(store)
+    cache.load()
+    before = store.connection().execute('SELECT MAX(change_id) FROM catalog_changes').fetchone()[0]
+
+    ProductImporter(pool=store).import_rows([(f'ITEM {n}', f'NEW-{n}', 'FRUIT', '1', '', '1', '', '')
+                                             for n in range(50)])
+
+    changes = store.connection().execute('SELECT table_name, row_key FROM catalog_changes WHERE change_id > ?',
+                                         (before,)).fetchall()
+    assert sorted(changes) == [('products', None), ('stock_management', None)]
+    assert cache.poll()
+    assert len(cache.products) == 53
+    cache.close()
+
+    # The per-row triggers are back for ordinary edits
+    store.connection().execute("UPDATE products SET price = 2 WHERE product_id = 'PID-00001'")
+    assert store.connection().execute('SELECT row_key FROM catalog_changes ORDER BY change_id DESC LIMIT 1') \
+        .fetchone() == ('PID-00001',)
@@ -0,0 +1,94 @@
+import pytest
+
+from pos_core import instrumentation
+from pos_core.db import ConnectionPool
+from pos_core.instrumentation import BUCKETS_MS, Histogram, Metrics
+
+
+@pytest.fixture
+def metrics(tmp_path):
+    """Collection switched on, writing under tmp_path; switched off again afterwards."""
+    metrics = instrumentation.enable(str(tmp_path / 'pos.prom'), slow_ms=0, interval=3600)
+    yield metrics
+    instrumentation.disable()
+
+
+def test_histogram_buckets_hold_their_upper_bound():
+    histogram = Histogram()
+    for ms in (0.05, 0.1, 0.11, 2.5, 10_000, 20_000):
+        histogram.observe(ms)
+
+    assert histogram.counts[0] == 2           # le 0.1 ms
+    assert histogram.counts[1] == 1           # le 0.25 ms
+    assert histogram.counts[BUCKETS_MS.index(2.5)] == 1
+    assert histogram.counts[len(BUCKETS_MS) - 1] == 1   # le 10 s
+    assert histogram.counts[len(BUCKETS_MS)] == 1       # above every bound
+    assert (histogram.count, histogram.sum_ms) == (6, pytest.approx(30_002.76))
+
+
+def test_render_writes_cumulative_buckets_in_seconds(tmp_path):
+    metrics = Metrics(str(tmp_path / 'pos.prom'), app='lane')
+    metrics.observe_statement('SELECT 1', 'execute', 0.2)
+    metrics.observe_statement('SELECT 1', 'execute', 3)
+
+    lines = metrics.render().splitlines()
+    labels = 'app="lane",statement="SELECT 1",phase="execute"'
+    assert f'pos_sql_statement_seconds_bucket{{{labels},le="0.0001"}} 0' in lines
+    assert f'pos_sql_statement_seconds_bucket{{{labels},le="0.00025"}} 1' in lines
+    assert f'pos_sql_statement_seconds_bucket{{{labels},le="0.005"}} 2' in lines
+    assert f'pos_sql_statement_seconds_bucket{{{labels},le="+Inf"}} 2' in lines
+    assert f'pos_sql_statement_seconds_count{{{labels}}} 2' in lines
+
+    metrics.write()
+    with open(metrics.path, encoding='utf-8') as f:
+        assert f.read() == metrics.render()
+
+
+def test_labels_fold_whitespace_placeholder_lists_and_savepoint_names():
+    label = instrumentation._label
+
+    assert label('SELECT *\n    FROM products\n    WHERE product_id IN (?, ?,?)') == \
+        'SELECT * FROM products WHERE product_id IN (?, ...)'
+    assert label('INSERT INTO t VALUES (?,?), (?, ?)') == 'INSERT INTO t VALUES (?, ...), (?, ...)'
+    assert label('SELECT ? FROM t') == 'SELECT ? FROM t'
+    assert label('SAVEPOINT sp_12') == label('SAVEPOINT sp_3') == 'SAVEPOINT sp_N'
+    assert label('RELEASE sp_7') == 'RELEASE sp_N'
+
+
+def test_statements_past_the_label_limit_are_counted_as_other(tmp_path, monkeypatch):
+    monkeypatch.setattr(instrumentation, 'MAX_STATEMENT_LABELS', 3)
+    metrics = Metrics(str(tmp_path / 'pos.prom'))
+    for n in range(5):
+        metrics.observe_statement(f'SELECT {n}', 'execute', 1)
+    metrics.observe_statement('SELECT 0', 'execute', 1)
+
+    counts = {label: histogram.count for (label, _), histogram in metrics.statements.items()}
+    assert counts == {'SELECT 0': 2, 'SELECT 1': 1, 'SELECT 2': 1, 'other': 2}
+
+
+def test_slow_action_is_logged_with_its_statements(metrics, db_path):
+    pool = ConnectionPool(db_path)
+    conn = pool.connection()
+
+    with instrumentation.action('checkout'):
+        conn.execute('SELECT ? + 1', (41,)).fetchone()
+    metrics.slow_ms = 60_000
+    with instrumentation.action('scan'):
+        conn.execute('SELECT 2').fetchone()
+    pool.close_all()
+
+    with open(metrics.slow_log, encoding='utf-8') as f:
+        log = f.read()
+    assert 'slow action checkout' in log and 'in 1 statements' in log
+    assert 'SELECT 41 + 1' in log      # As SQLite ran it, with the parameters bound
+    assert 'scan' not in log
+    assert metrics.slow_actions == {'checkout': 1}
+    assert (metrics.actions['checkout'].count, metrics.actions['scan'].count) == (1, 1)
+    assert metrics.statements[('SELECT ? + 1', 'execute')].count == 1
+    assert 'pos_ui_slow_actions_total{app="' in metrics.render()
+
+
+def test_action_does_nothing_when_switched_off():
+    assert instrumentation._metrics is None
+    with instrumentation.action('idle'):
+        pass
@@ -0,0 +1,108 @@
+import logging
+import os
+import shutil
+from decimal import Decimal
+
+from pos_core.db import ConnectionPool
+from pos_core.journal import JournalSyncer, LaneJournal, rejected, retry_rejected
+from tests.conftest import stock_of
+
+APPLE = [('PID-00001', 1, 1.50, 1.50)]
+CHERRY = [('PID-00003', 1, 3.00, 3.00)]
+
+
+def sales(pool):
+    return pool.connection().execute('SELECT COUNT(*) FROM sales_header').fetchone()[0]
+
+
+def test_torn_last_entry_is_dropped_on_open(store, tmp_path):
+    path = str(tmp_path / 'lane')
+    journal = LaneJournal(path, 'LANE', store)
+    for _ in range(3):
+        journal.append(APPLE)
+    journal.close()
+    segment = os.path.join(path, os.listdir(path)[0])
+    with open(segment, 'ab') as f:
+        f.write(b'{"seq":4,"at":"2024-')  # The crash hit mid-write
+
+    journal = LaneJournal(path, 'LANE', store)
+    assert journal.last_seq == 3
+    assert journal.append(APPLE) == 4
+    assert [entry['seq'] for entry in journal.entries_after(0)] == [1, 2, 3, 4]
+    journal.close()
+
+
+def test_sync_books_each_basket_once(store, tmp_path):
+    journal = LaneJournal(str(tmp_path / 'lane'), 'LANE', store)
+    for _ in range(5):
+        journal.append(APPLE)
+
+    assert JournalSyncer(journal, store, batch=2).sync() == 5
+    # A second syncer, e.g. the sync command run while the lane was up, finds nothing to do
+    assert JournalSyncer(journal, store).sync() == 0
+    assert sales(store) == 5
+    assert stock_of(store, 'PID-00001') == 5
+    journal.close()
+
+
+def test_refused_basket_is_kept_for_retry(store, tmp_path):
+    journal = LaneJournal(str(tmp_path / 'lane'), 'LANE', store)
+    journal.append(APPLE)
+    journal.append(CHERRY)
+    JournalSyncer(journal, store).sync()
+
+    assert [(lane_id, seq) for lane_id, seq, _, _ in rejected(store)] == [('LANE', 2)]
+    store.connection().execute("UPDATE stock_management SET current_stock = 1 WHERE product_id = 'PID-00003'")
+    assert retry_rejected(store) == (1, 0)
+    assert stock_of(store, 'PID-00003') == 0
+    journal.close()
+
+
+def test_lost_directory_continues_after_the_synced_sequence(store, tmp_path):
+    path = str(tmp_path / 'lane')
+    journal = LaneJournal(path, 'LANE', store)
+    journal.append(APPLE)
+    journal.append(APPLE)
+    JournalSyncer(journal, store).sync()
+    journal.close()
+    shutil.rmtree(path)
+
+    journal = LaneJournal(path, 'LANE', store)
+    assert journal.append(APPLE) == 3
+    assert JournalSyncer(journal, store).sync() == 1
+    assert sales(store) == 3
+    journal.close()
+
+
+def test_reused_sequence_number_is_logged_not_dropped_silently(store, tmp_path, caplog):
+    path = str(tmp_path / 'lane')
+    journal = LaneJournal(path, 'LANE', store)
+    journal.append(APPLE)
+    JournalSyncer(journal, store).sync()
+    journal.close()
+    shutil.rmtree(path)
+
+    # The database cannot be read when the lane starts again, so numbering restarts at 1
+    unreachable = ConnectionPool(str(tmp_path / 'elsewhere.db'))
+    with caplog.at_level(logging.WARNING, logger='pos_core.journal'):
+        journal = LaneJournal(path, 'LANE', unreachable)
+        journal.append(CHERRY)
+        assert JournalSyncer(journal, store).sync() == 0
+    unreachable.close_all()
+
+    errors = [record.getMessage() for record in caplog.records if record.levelno == logging.ERROR]
+    assert len(errors) == 2
+    assert 'numbering from 1' in errors[0]
+    assert 'basket 1 NOT booked' in errors[1] and 'PID-00003' in errors[1]
+    assert sales(store) == 1
+    journal.close()
+
+
+def test_decimal_prices_survive_the_journal(store, tmp_path):
+    journal = LaneJournal(str(tmp_path / 'lane'), 'LANE', store)
+    journal.append([('PID-00001', 1, Decimal('0.10'), Decimal('0.10')),
+                    ('PID-00002', 2, Decimal('0.10'), Decimal('0.20'))])
+
+    assert JournalSyncer(journal, store).sync() == 1
+    assert store.connection().execute('SELECT total_amount FROM sales_header').fetchone()[0] == 0.3
+    journal.close()
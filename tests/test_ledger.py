@@ -0,0 +1,34 @@
+from pos_core import ledger
+from pos_core.stock import StockService
+from tests.conftest import stock_of
+
+
+def test_rebuild_finds_no_discrepancy_when_stock_follows_the_ledger(store):
+    StockService(store).apply('PID-00002', -3, 'damaged')
+    report = ledger.rebuild(store)
+    assert report.discrepancies == []
+    assert report.ledger_rows == 3
+
+
+def test_rebuild_reports_and_fixes_stock_changed_behind_the_ledger(store):
+    store.connection().execute("UPDATE stock_management SET current_stock = 99 WHERE product_id = 'PID-00001'")
+    store.connection().execute("DELETE FROM stock_management WHERE product_id = 'PID-00002'")
+
+    report = ledger.rebuild(store)
+    assert sorted(report.discrepancies) == [('PID-00001', 99, 10), ('PID-00002', None, 10)]
+    assert stock_of(store, 'PID-00001') == 99
+
+    fixed = ledger.rebuild(store, fix=True)
+    assert fixed.fixed
+    assert (stock_of(store, 'PID-00001'), stock_of(store, 'PID-00002')) == (10, 10)
+    assert ledger.rebuild(store).discrepancies == []
+
+
+def test_balance_after_a_snapshot_adds_only_the_later_rows(store):
+    service = StockService(store)
+    service.apply('PID-00001', -4, 'damaged')
+    assert ledger.take_snapshots(store) > 0
+    service.apply('PID-00001', 2, 'manual add')
+    conn = store.connection()
+    assert conn.execute("SELECT balance FROM stock_snapshots WHERE product_id = 'PID-00001'").fetchone() == (6,)
+    assert ledger.balance_of(conn, 'PID-00001') == 8 == stock_of(store, 'PID-00001')
@@ -0,0 +1,83 @@
+import logging
+import time
+
+import pytest
+
+from pos_core.ledger_writer import DEFERRED, FULL, NORMAL, LedgerWriter
+from pos_core.stock import InsufficientStockError
+from tests.conftest import ledger_rows, stock_of
+
+
+def test_deferred_mutations_are_flushed_on_close(store):
+    writer = LedgerWriter(store, DEFERRED, flush_rows=1000, flush_ms=60_000)
+    before = ledger_rows(store)
+    writer.submit([('PID-00001', -2, 'damaged', 'dropped')])
+    writer.submit([('PID-00002', -3, 'damaged', 'dropped'), ('PID-00001', 1, 'add stock', 'found')])
+
+    assert writer.pending == 3
+    assert stock_of(store, 'PID-00001') == 10
+    writer.close()
+
+    assert writer.pending == 0
+    assert (stock_of(store, 'PID-00001'), stock_of(store, 'PID-00002')) == (9, 7)
+    assert ledger_rows(store) == before + 3
+    with pytest.raises(ValueError):
+        writer.submit([('PID-00001', -1, 'damaged', 'dropped')])
+
+
+def test_deferred_buffer_is_flushed_once_flush_rows_pile_up(store):
+    writer = LedgerWriter(store, DEFERRED, flush_rows=2, flush_ms=60_000)
+    writer.submit([('PID-00001', -1, 'damaged', '')])
+    writer.submit([('PID-00001', -1, 'damaged', '')])
+
+    deadline = time.monotonic() + 10
+    while stock_of(store, 'PID-00001') != 8:
+        assert time.monotonic() < deadline, 'the buffer was not flushed'
+        time.sleep(0.01)
+    writer.close()
+
+
+def test_refused_deferred_mutations_are_kept_and_logged(store, caplog):
+    writer = LedgerWriter(store, DEFERRED, flush_rows=1000, flush_ms=60_000)
+    before = ledger_rows(store, 'PID-00003')
+    writer.submit([('PID-00001', -4, 'damaged', ''), ('PID-00003', -1, 'damaged', 'none left'),
+                   ('PID-00002', -1, 'damaged', '')])
+
+    with caplog.at_level(logging.WARNING, logger='pos_core.ledger_writer'):
+        writer.close()
+
+    # Only the refused deduction is left out of the flush
+    assert (stock_of(store, 'PID-00001'), stock_of(store, 'PID-00002'), stock_of(store, 'PID-00003')) == (6, 9, 0)
+    assert ledger_rows(store, 'PID-00003') == before
+    [(mutation, error)] = writer.refused
+    assert mutation == ('PID-00003', -1, 'damaged', 'none left')
+    assert isinstance(error, InsufficientStockError)
+    assert 'PID-00003' in caplog.text and 'refused' in caplog.text
+
+
+def test_normal_writes_commit_before_returning_and_raise_refusals(store):
+    writer = LedgerWriter(store, NORMAL)
+    assert writer.pool is store
+
+    writer.submit([('PID-00001', -1, 'damaged', '')])
+    assert stock_of(store, 'PID-00001') == 9
+    with pytest.raises(InsufficientStockError):
+        writer.submit([('PID-00001', -1, 'damaged', ''), ('PID-00003', -1, 'damaged', '')])
+    assert stock_of(store, 'PID-00001') == 9
+    writer.close()
+
+
+def test_full_writes_through_a_pool_with_synchronous_full(store):
+    writer = LedgerWriter(store, FULL)
+
+    assert writer.pool is not store
+    assert writer.pool.connection().execute('PRAGMA synchronous').fetchone()[0] == 2  # FULL
+    assert store.connection().execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+    writer.submit([('PID-00001', -1, 'damaged', '')])
+    assert stock_of(store, 'PID-00001') == 9
+    writer.close()
+
+
+def test_unknown_durability_is_refused(store):
+    with pytest.raises(ValueError):
+        LedgerWriter(store, 'eventual')
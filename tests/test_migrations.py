@@ -0,0 +1,59 @@
+import sqlite3
+
+import pytest
+
+from pos_core import migrations
+from pos_core.db import ConnectionPool
+
+
+def test_fresh_database_is_migrated_to_the_latest_version(pool):
+    latest = migrations.MIGRATIONS[-1].version
+    conn = pool.connection()
+    assert migrations.current_version(conn) == latest
+    assert [row[0] for row in conn.execute('SELECT version FROM schema_version ORDER BY version')] == \
+        [migration.version for migration in migrations.MIGRATIONS]
+
+
+def test_migrate_runs_each_migration_once(pool):
+    assert migrations.migrate(pool) == migrations.MIGRATIONS[-1].version
+    assert pool.connection().execute('SELECT COUNT(*) FROM schema_version').fetchone()[0] == \
+        len(migrations.MIGRATIONS)
+
+
+def test_duplicate_skus_are_renamed_and_made_unique(db_path):
+    # A database from before the migrations, with the same SKU on three products
+    conn = sqlite3.connect(db_path)
+    conn.executescript('''
+        CREATE TABLE products (product_id TEXT PRIMARY KEY, product_name TEXT, sku TEXT, category_id TEXT,
+                               category_name TEXT, price REAL, description TEXT);
+        INSERT INTO products (product_id, product_name, sku) VALUES
+            ('PID-00001', 'A', 'DUP'), ('PID-00002', 'B', 'DUP'), ('PID-00003', 'C', 'DUP'),
+            ('PID-00004', 'D', 'ONLY'), ('PID-00005', 'E', NULL), ('PID-00006', 'F', NULL);
+    ''')
+    conn.close()
+
+    pool = ConnectionPool(db_path)
+    migrations.migrate(pool)
+    skus = dict(pool.connection().execute('SELECT product_id, sku FROM products'))
+    pool.close_all()
+
+    assert skus == {
+        'PID-00001': 'DUP',
+        'PID-00002': 'DUP-PID-00002',
+        'PID-00003': 'DUP-PID-00003',
+        'PID-00004': 'ONLY',
+        'PID-00005': None,
+        'PID-00006': None,
+    }
+
+
+def test_unique_sku_index_refuses_a_duplicate(store):
+    with pytest.raises(sqlite3.IntegrityError):
+        store.connection().execute("INSERT INTO products (product_id, sku) VALUES ('PID-00009', 'SKU-1')")
+
+
+def test_hot_queries_use_their_indexes(store):
+    results = migrations.check_query_plans(store.connection())
+    assert results
+    failed = [(check.query, plan) for _, check, plan, ok in results if not ok]
+    assert failed == []
@@ -0,0 +1,77 @@
+import pytest
+
+from pos_core.importer import ProductImporter
+from pos_core.receiving import GoodsReceiving, ReceiptError
+from tests.conftest import stock_of
+
+
+def test_receipt_raises_stock_and_books_the_ledger(store):
+    reference = GoodsReceiving(store).receive([('sku-1', 5), (' SKU-3 ', '2')], 'delivery')
+
+    assert (stock_of(store, 'PID-00001'), stock_of(store, 'PID-00003')) == (15, 2)
+    assert store.connection().execute('SELECT COUNT(*) FROM stock_transactions WHERE remarks = ?',
+                                      (reference,)).fetchone()[0] == 2
+
+
+def test_invalid_lines_reject_the_whole_receipt(store):
+    with pytest.raises(ReceiptError) as rejected:
+        GoodsReceiving(store).receive([('SKU-1', 5), ('NOPE', 1), ('SKU-2', 0), ('SKU-2', 'x')])
+    assert [(p.line, p.reason) for p in rejected.value.problems] == [
+        (2, 'unknown SKU'), (3, 'quantity must be greater than zero'), (4, "quantity 'x' is not a whole number")]
+    assert stock_of(store, 'PID-00001') == 10
+
+
+def test_sku_map_follows_edits_made_after_it_was_loaded(store):
+    receiving = GoodsReceiving(store)
+    assert receiving.lookup('SKU-1') == ('PID-00001', 'APPLE')
+
+    conn = store.connection()
+    conn.execute("UPDATE products SET sku = 'SKU-1B' WHERE product_id = 'PID-00001'")
+    conn.execute("INSERT INTO products (product_id, product_name, sku) VALUES ('PID-00004', 'PEAR', 'SKU-1')")
+    assert receiving.lookup('SKU-1') == ('PID-00004', 'PEAR')
+    assert receiving.lookup('sku-1b') == ('PID-00001', 'APPLE')
+
+    conn.execute("DELETE FROM products WHERE product_id = 'PID-00002'")
+    assert receiving.lookup('SKU-2') is None
+
+    ProductImporter(pool=store).import_rows([('PLUM', 'SKU-5', 'FRUIT', '1', '', '', '', '')])
+    assert receiving.lookup('SKU-5')[1] == 'PLUM'
+
+
+def test_lower_case_sku_added_after_loading_is_found(store):
+    receiving = GoodsReceiving(store)
+    assert receiving.lookup('PEAR-1') is None
+    store.connection().execute(
+        "INSERT INTO products (product_id, product_name, sku) VALUES ('PID-00004', 'PEAR', 'pear-1')")
+    assert receiving.lookup('PEAR-1') == ('PID-00004', 'PEAR')
+
+
+def test_change_log_is_read_once_per_receipt(store):
+    receiving = GoodsReceiving(store)
+    statements = []
+    store.connection().set_trace_callback(statements.append)
+    try:
+        receiving.validate([('SKU-1', 1), ('SKU-2', 2), ('NOPE', 1)])
+        receiving.receive([('SKU-1', 1), ('SKU-2', 2), ('SKU-3', 3)])
+    finally:
+        store.connection().set_trace_callback(None)
+    assert sum('MAX(change_id)' in statement for statement in statements) == 2
+    assert not any('upper(sku)' in statement for statement in statements)
+
+
+def test_product_deleted_after_validation_gets_no_stock_row(store, monkeypatch):
+    receiving = GoodsReceiving(store)
+    resolve = receiving._resolve
+
+    def delete_after_resolving(lines):
+        resolved = resolve(lines)
+        store.connection().execute("DELETE FROM stock_management WHERE product_id = 'PID-00003'")
+        store.connection().execute("DELETE FROM products WHERE product_id = 'PID-00003'")
+        return resolved
+
+    monkeypatch.setattr(receiving, '_resolve', delete_after_resolving)
+    with pytest.raises(ReceiptError) as rejected:
+        receiving.receive([('SKU-1', 1), ('SKU-3', 4)])
+    assert rejected.value.problems[0][1:] == ('SKU-3', 'product was deleted')
+    assert stock_of(store, 'PID-00003') is None
+    assert stock_of(store, 'PID-00001') == 10
@@ -0,0 +1,52 @@
+import sqlite3
+import sys
+
+from pos_core import db, replenishment
+
+
+def set_stock(pool, rows):
+    pool.connection().executemany(
+        'UPDATE stock_management SET current_stock = ?, safety_stock = ?, target_stock = ? WHERE product_id = ?',
+        [(current, safety, target, product_id) for product_id, current, safety, target in rows])
+
+
+def suggestions(pool):
+    return dict(pool.connection().execute('SELECT product_id, reorder_quantity FROM purchase_suggestions'))
+
+
+def test_products_at_their_reorder_point_are_ordered_up_to_target(store):
+    set_stock(store, [('PID-00001', 10, 5, 50), ('PID-00002', 6, 5, 50), ('PID-00003', 0, 0, 0)])
+    # 28 units in the window is 1 a day, so APPLE's reorder point is 5 + 7 = 12
+    store.connection().execute("""
+        INSERT INTO sales_rollup_hour_product (hour, product_id, quantity, amount, line_count)
+        VALUES ('2024-06-20 10:00', 'PID-00001', 28, 42.0, 28)
+    """)
+
+    report = replenishment.run(store, as_of='2024-06-28 00:00:00')
+
+    assert (report.products, report.suggested, report.units, report.skipped) == (3, 1, 40, [])
+    assert suggestions(store) == {'PID-00001': 40}
+
+
+def test_stock_that_is_not_a_whole_number_is_skipped(store):
+    set_stock(store, [('PID-00001', 2.5, 5, 50), ('PID-00002', 0, '', 50), ('PID-00003', 0, 'lots', 20)])
+    store.connection().execute("INSERT INTO stock_management (product_id, current_stock, safety_stock, target_stock) "
+                               "VALUES ('PID-00004', NULL, 1, 8)")
+
+    report = replenishment.run(store)
+
+    assert sorted(report.skipped) == ['PID-00001', 'PID-00002', 'PID-00003']
+    assert report.products == 1
+    assert suggestions(store) == {'PID-00004': 8}
+
+
+def test_main_reports_database_errors(tmp_path, monkeypatch, capsys):
+    path = str(tmp_path / 'empty.db')
+    sqlite3.connect(path).close()
+    monkeypatch.setattr(db, '_pool', None)
+    monkeypatch.setattr(db, 'DB_PATH', db.DB_PATH)
+    monkeypatch.setattr(sys, 'argv', ['replenishment', '--db', path])
+
+    assert replenishment.main() == 2
+    assert 'no such table' in capsys.readouterr().err
+    db.close_all()
@@ -0,0 +1,79 @@
+import sys
+
+import pytest
+
+from pos_core import db, reporting, sales
+from pos_core.customers import CustomerDirectory
+from pos_core.sales import record_basket, record_baskets
+
+ROLLUPS = ('sales_rollup_hour_product', 'sales_rollup_day_category', 'sales_rollup_day_customer')
+
+
+@pytest.fixture
+def sold(store):
+    """Three baskets over two days, two of them by a known customer."""
+    ann = CustomerDirectory(pool=store).create('ANN', '0771234567')
+    record_baskets([
+        ([('PID-00001', 2, 1.50, 3.00)], ann.customer_id, '2026-03-01 09:15:00'),
+        ([('PID-00002', 4, 0.25, 1.00), ('PID-00001', 1, 1.50, 1.50)], None, '2026-03-01 10:40:00'),
+        ([('PID-00002', 1, 0.25, 0.25)], ann.customer_id, '2026-03-02 09:05:00'),
+    ], pool=store)
+    return store
+
+
+def rollup_rows(pool):
+    conn = pool.connection()
+    return {table: conn.execute(f'SELECT * FROM {table} ORDER BY 1, 2').fetchall() for table in ROLLUPS}
+
+
+def test_reports_read_the_rollups_kept_by_checkout(sold):
+    conn = sold.connection()
+
+    assert reporting.daily_totals(conn, '0000-01-01', '9999-12-31') == [
+        ('2026-03-01', 2, 7, 5.50), ('2026-03-02', 1, 1, 0.25)]
+    assert reporting.daily_totals(conn, '2026-03-02', '2026-03-02') == [('2026-03-02', 1, 1, 0.25)]
+    assert reporting.hourly_totals(conn, '2026-03-01') == [('2026-03-01 09:00', 2, 3.00), ('2026-03-01 10:00', 5, 2.50)]
+    assert reporting.category_totals(conn, '2026-03-01', '2026-03-02') == [('PC-001', 'FRUIT', 8, 5.75)]
+    assert reporting.customer_totals(conn, '2026-03-01', '2026-03-02') == [('cus-000001', 'ANN', 2, 3.25)]
+    assert reporting.product_totals(conn, '2026-03-01', '2026-03-02') == [
+        ('PID-00001', 'APPLE', 3, 4.50), ('PID-00002', 'BANANA', 5, 1.25)]
+    assert reporting.product_totals(conn, '2026-03-01', '2026-03-02', limit=1) == [('PID-00001', 'APPLE', 3, 4.50)]
+
+
+def test_refused_basket_leaves_the_rollups_alone(sold):
+    before = rollup_rows(sold)
+    with pytest.raises(ValueError):
+        record_basket([('PID-00003', 1, 3.00, 3.00)], pool=sold)
+    assert rollup_rows(sold) == before
+
+
+def test_backfill_rebuilds_the_same_rollups(sold):
+    kept = rollup_rows(sold)
+    progress = []
+
+    assert reporting.backfill(sold, batch=2, progress=lambda done, total: progress.append((done, total))) == 3
+    assert progress == [(2, 3), (3, 3)]
+    assert rollup_rows(sold) == kept
+
+
+def test_daily_report(sold, db_path, monkeypatch, capsys):
+    monkeypatch.setattr(db, '_pool', None)
+    monkeypatch.setattr(db, 'DB_PATH', db.DB_PATH)
+    monkeypatch.setattr(sys, 'argv', ['reporting', '--db', db_path, 'daily', '--from', '2026-03-01'])
+
+    assert reporting.main() == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].split() == ['day', 'baskets', 'units', 'amount']
+    assert [line.split() for line in lines[1:]] == [['2026-03-01', '2', '7', '5.50'], ['2026-03-02', '1', '1', '0.25']]
+
+
+def test_checkouts_keep_the_change_log_trimmed(store, monkeypatch):
+    monkeypatch.setattr(sales, 'CHANGE_RETENTION', 5)
+    conn = store.connection()
+
+    for _ in range(4):
+        record_basket([('PID-00001', 1, 1.50, 1.50), ('PID-00002', 1, 0.25, 0.25)], pool=store)
+        assert conn.execute('SELECT COUNT(*) FROM catalog_changes').fetchone()[0] <= 5
+    # The newest changes, those of the last sale, are the ones kept
+    assert conn.execute('SELECT row_key FROM catalog_changes ORDER BY change_id DESC LIMIT 2').fetchall() == [
+        ('PID-00002',), ('PID-00001',)]
@@ -0,0 +1,59 @@
+import pytest
+
+from pos_core.cart import Cart
+from pos_core.sales import record_basket, record_baskets
+from pos_core.stock import InsufficientStockError
+from tests.conftest import ledger_rows, stock_of
+
+
+def test_record_basket_writes_header_lines_stock_ledger_and_rollups(store):
+    sale_id = record_basket([('PID-00001', 2, 1.50, 3.00), ('PID-00002', 4, 0.25, 1.00)], 'cus-000001', pool=store)
+
+    conn = store.connection()
+    assert conn.execute('SELECT customer_id, line_count, total_amount FROM sales_header WHERE sale_id = ?',
+                        (sale_id,)).fetchone() == ('cus-000001', 2, 4.00)
+    assert conn.execute('SELECT product_id, quantity FROM sales_lines WHERE sale_id = ? ORDER BY line_no',
+                        (sale_id,)).fetchall() == [('PID-00001', 2), ('PID-00002', 4)]
+    assert stock_of(store, 'PID-00001') == 8
+    assert stock_of(store, 'PID-00002') == 6
+    assert conn.execute("SELECT product_id, quantity FROM stock_transactions WHERE transaction_type = 'Sale' "
+                        'ORDER BY product_id').fetchall() == [('PID-00001', -2), ('PID-00002', -4)]
+    assert conn.execute('SELECT SUM(quantity), SUM(amount) FROM sales_rollup_hour_product').fetchone() == (6, 4.00)
+
+
+def test_refused_basket_writes_nothing(store):
+    before = ledger_rows(store)
+    with pytest.raises(InsufficientStockError):
+        record_basket([('PID-00001', 1, 1.50, 1.50), ('PID-00003', 1, 3.00, 3.00)], pool=store)
+
+    conn = store.connection()
+    assert conn.execute('SELECT COUNT(*) FROM sales_header').fetchone()[0] == 0
+    assert conn.execute('SELECT COUNT(*) FROM sales_lines').fetchone()[0] == 0
+    assert stock_of(store, 'PID-00001') == 10
+    assert ledger_rows(store) == before
+
+
+def test_group_commit_leaves_out_only_the_refused_basket(store):
+    results = record_baskets([
+        ([('PID-00001', 1, 1.50, 1.50)], None),
+        ([('PID-00003', 1, 3.00, 3.00)], None),
+        ([('PID-00002', 2, 0.25, 0.50)], None),
+    ], pool=store)
+
+    assert isinstance(results[1], InsufficientStockError)
+    assert all(isinstance(sale_id, int) for sale_id in (results[0], results[2]))
+    assert store.connection().execute('SELECT COUNT(*) FROM sales_header').fetchone()[0] == 2
+    assert (stock_of(store, 'PID-00001'), stock_of(store, 'PID-00002'), stock_of(store, 'PID-00003')) == (9, 8, 0)
+
+
+def test_basket_total_is_added_up_in_cents(store):
+    cart = Cart()
+    cart.add('PID-00001', 'APPLE', 0.10)
+    cart.add('PID-00002', 'BANANA', 0.10, 2)
+    assert 0.1 + 0.2 != 0.3  # What adding up the float line totals used to store
+
+    sale_id = record_basket(cart.sale_lines(), pool=store)
+    conn = store.connection()
+    assert conn.execute('SELECT total_amount FROM sales_header WHERE sale_id = ?', (sale_id,)).fetchone()[0] == 0.3
+    assert conn.execute('SELECT unit_price, total_price FROM sales_lines WHERE sale_id = ? ORDER BY line_no',
+                        (sale_id,)).fetchall() == [(0.1, 0.1), (0.1, 0.2)]
@@ -0,0 +1,103 @@
+from pos_core.search_index import ProductSearchIndex
+
+ROWS = (
+    ('PID-00001', 'SUNNY RICE 1KG', 'SKU-100', 12, 'PC-001', 2.50),
+    ('PID-00002', 'GOLDEN TEA 250G', 'SKU-200', 0, 'PC-002', 4.00),
+    ('PID-00003', 'VALLEY RICE 5KG', 'SKU-300', 7, 'PC-001', 9.75),
+)
+
+
+def index_of(rows=ROWS):
+    index = ProductSearchIndex()
+    index.load(rows)
+    return index
+
+
+def ids(rows):
+    return [row[0] for row in rows]
+
+
+def test_trigram_search_matches_substrings_of_every_field():
+    index = index_of()
+
+    assert ids(index.search('rice')) == ['PID-00001', 'PID-00003']
+    assert ids(index.search('LEY RI')) == ['PID-00003']
+    assert ids(index.search('sku-2')) == ['PID-00002']
+    assert ids(index.search('pid-00003')) == ['PID-00003']
+    assert index.search('rice 9kg') == []
+    assert index.search('rice')[0] == ('PID-00001', 'SUNNY RICE 1KG', 'SKU-100', 12)
+
+
+def test_short_terms_scan_and_stop_at_the_limit():
+    index = index_of()
+
+    assert ids(index.search('')) == ['PID-00001', 'PID-00002', 'PID-00003']
+    assert ids(index.search('g')) == ['PID-00001', 'PID-00002', 'PID-00003']
+    assert ids(index.search('te')) == ['PID-00002']
+    assert ids(index.search('', limit=2)) == ['PID-00001', 'PID-00002']
+
+
+def test_category_filter():
+    index = index_of()
+
+    assert ids(index.search('', category_id='PC-001')) == ['PID-00001', 'PID-00003']
+    assert ids(index.search('rice', category_id='PC-002')) == []
+    assert ids(index.search('tea', category_id='PC-002')) == ['PID-00002']
+    assert index.search('', category_id='PC-999') == []
+
+
+def test_upsert_reindexes_changed_fields():
+    index = index_of()
+
+    # A stock-only change keeps the product where it is
+    index.upsert('PID-00001', 'SUNNY RICE 1KG', 'SKU-100', 3, 'PC-001', 2.50)
+    assert index.lookup('sku-100') == ('PID-00001', 'SUNNY RICE 1KG', 'SKU-100', 3, 2.50)
+
+    index.upsert('PID-00001', 'SUNNY NOODLES 1KG', 'SKU-101', 3, 'PC-002', 2.75)
+    assert ids(index.search('rice')) == ['PID-00003']
+    assert ids(index.search('noodles', category_id='PC-002')) == ['PID-00001']
+    assert index.lookup('SKU-100') is None
+    assert index.lookup(' sku-101 ') == ('PID-00001', 'SUNNY NOODLES 1KG', 'SKU-101', 3, 2.75)
+    assert len(index) == 3
+
+    index.upsert('PID-00004', 'ZEST SOAP', 'SKU-400', 1, 'PC-002')
+    assert ids(index.search('soap')) == ['PID-00004']
+    assert len(index) == 4
+
+
+def test_remove_drops_the_product_everywhere():
+    index = index_of()
+
+    index.remove('PID-00001')
+    index.remove('PID-00009')  # Unknown products are ignored
+
+    assert ids(index.search('rice')) == ['PID-00003']
+    assert ids(index.search('', category_id='PC-001')) == ['PID-00003']
+    assert index.lookup('PID-00001') is None
+    assert len(index) == 2
+
+
+def test_compaction_keeps_the_live_products():
+    rows = [(f'PID-{i:05d}', f'ITEM {i}', f'SKU-{i}', i, 'PC-001', 1.0) for i in range(3000)]
+    index = index_of(rows)
+    for product_id, *_ in rows[:2500]:
+        index.remove(product_id)
+
+    assert len(index) == 500
+    assert ids(index.search('item 2999')) == ['PID-02999']
+    assert index.lookup('SKU-2500')[0] == 'PID-02500'
+    assert index.search('item 10 ') == []
+
+
+def test_match_agrees_with_search():
+    index = index_of()
+
+    assert index.match('PID-00003', 'ley ri') == ('PID-00003', 'VALLEY RICE 5KG', 'SKU-300', 7)
+    assert index.match('PID-00003', '', category_id='PC-001')[0] == 'PID-00003'
+    assert index.match('PID-00003', 'rice', category_id='PC-002') is None
+    assert index.match('PID-00002', 'rice') is None
+    assert index.match('PID-00009', '') is None
+    for query in ('', 'ri', 'rice', 'sku-', 'tea'):
+        for category_id in (None, 'PC-001', 'PC-002'):
+            found = {row[0] for row in index.search(query, category_id)}
+            assert found == {product_id for product_id, *_ in ROWS if index.match(product_id, query, category_id)}
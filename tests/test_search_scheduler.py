@@ -0,0 +1,97 @@
+import time
+
+import pytest
+
+from pos_core import db
+from pos_core.search_scheduler import SearchScheduler
+
+# Counts far enough to run for many seconds unless it is interrupted
+SLOW_QUERY = '''
+    WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n LIMIT 300000000)
+    SELECT count(*) FROM n
+'''
+
+
+class Widget:
+    """Stands in for a Tk widget: after() callbacks run when run_pending() is called."""
+
+    def __init__(self):
+        self.jobs = {}
+        self.last_job = 0
+
+    def after(self, delay, callback, *args):
+        self.last_job += 1
+        self.jobs[self.last_job] = (callback, args)
+        return self.last_job
+
+    def after_cancel(self, job):
+        self.jobs.pop(job, None)
+
+    def run_pending(self):
+        jobs, self.jobs = self.jobs, {}
+        for callback, args in jobs.values():
+            callback(*args)
+
+
+def wait_for(condition, widget=None, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        if widget is not None:
+            widget.run_pending()
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def process_pool(db_path, monkeypatch):
+    monkeypatch.setattr(db, '_pool', None)
+    monkeypatch.setattr(db, 'DB_PATH', db.DB_PATH)
+    yield db.configure(db_path)
+    db.close_all()
+
+
+def query(term):
+    if term == 'slow':
+        return db.get_connection().execute(SLOW_QUERY).fetchall()
+    return [term]
+
+
+def test_newer_search_interrupts_the_stale_query_only(process_pool):
+    widget = Widget()
+    shown = []
+    scheduler = SearchScheduler(widget, query, shown.append)
+
+    scheduler.run_now('slow')
+    widget.run_pending()
+    wait_for(lambda: scheduler._running is not None)
+    started = time.monotonic()
+    scheduler.run_now('apple')
+    widget.run_pending()
+    wait_for(lambda: shown, widget)
+
+    assert shown == [['apple']]
+    assert time.monotonic() - started < 5  # The slow query was cut short
+
+    # With nothing stale running, a new search runs to the end
+    scheduler.run_now('banana')
+    wait_for(lambda: len(shown) == 2, widget)
+    assert shown[1] == ['banana']
+    scheduler.close()
+
+
+def test_close_stops_the_worker_and_drops_pending_results(process_pool):
+    widget = Widget()
+    shown = []
+    scheduler = SearchScheduler(widget, query, shown.append)
+
+    scheduler.run_now('slow')
+    widget.run_pending()
+    wait_for(lambda: scheduler._running is not None)
+    scheduler.close()
+    scheduler._worker.join(5)
+    assert not scheduler._worker.is_alive()
+
+    scheduler.run_now('apple')  # Ignored once closed
+    widget.run_pending()
+    widget.run_pending()
+    assert shown == []
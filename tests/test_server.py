@@ -0,0 +1,90 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from pos_core import server as server_module
+from pos_core.server import CheckoutClient, CheckoutServer, ServerError
+from tests.conftest import stock_of
+
+
+async def checkouts(pool, baskets, **options):
+    """Ring up each basket on its own lane at once; returns each reply or the ServerError."""
+    server = CheckoutServer(pool, **options)
+    host, port = await server.start('127.0.0.1', 0)
+    clients = [await CheckoutClient.connect(host, port) for _ in baskets]
+
+    async def ring_up(client, lines):
+        try:
+            return await client.checkout(lines)
+        except ServerError as e:
+            return e
+
+    try:
+        return await asyncio.gather(*(ring_up(client, lines) for client, lines in zip(clients, baskets)))
+    finally:
+        for client in clients:
+            await client.close()
+        await server.close()
+
+
+def test_group_commit_writes_every_basket(store):
+    replies = asyncio.run(checkouts(store, [[('SKU-1', 1)], [('SKU-2', 2)], [('SKU-1', 3)]], group_window=0.05))
+
+    assert all(isinstance(reply['sale_id'], int) for reply in replies)
+    assert (stock_of(store, 'PID-00001'), stock_of(store, 'PID-00002')) == (6, 8)
+
+
+def test_basket_that_cannot_be_written_fails_alone(store):
+    store.connection().execute('''
+        CREATE TRIGGER refuse_banana BEFORE INSERT ON sales_lines WHEN NEW.product_id = 'PID-00002'
+        BEGIN SELECT RAISE(ABORT, 'banana refused'); END
+    ''')
+    replies = asyncio.run(checkouts(store, [[('SKU-1', 1)], [('SKU-2', 1)], [('SKU-1', 1)]], group_window=0.05))
+
+    assert isinstance(replies[1], ServerError)
+    assert 'banana refused' in str(replies[1])
+    assert isinstance(replies[0]['sale_id'], int) and isinstance(replies[2]['sale_id'], int)
+    assert (stock_of(store, 'PID-00001'), stock_of(store, 'PID-00002')) == (8, 10)
+
+
+def test_every_lane_gets_an_error_reply_when_the_database_fails(store, monkeypatch):
+    def failing_write(baskets, pool=None):
+        raise sqlite3.OperationalError('disk I/O error')
+
+    monkeypatch.setattr(server_module, 'record_baskets', failing_write)
+    replies = asyncio.run(checkouts(store, [[('SKU-1', 1)], [('SKU-2', 1)], [('SKU-1', 2)]], group_window=0.05))
+
+    assert len(replies) == 3
+    for reply in replies:
+        assert isinstance(reply, ServerError)
+        assert str(reply) == 'Database error: disk I/O error'
+    assert stock_of(store, 'PID-00001') == 10
+
+
+def test_lane_keeps_its_connection_after_a_failed_checkout(store, monkeypatch):
+    record_baskets = server_module.record_baskets
+    calls = []
+
+    def fail_once(baskets, pool=None):
+        calls.append(baskets)
+        if len(calls) == 1:
+            raise sqlite3.OperationalError('database is locked')
+        return record_baskets(baskets, pool=pool)
+
+    monkeypatch.setattr(server_module, 'record_baskets', fail_once)
+
+    async def two_checkouts():
+        server = CheckoutServer(store)
+        host, port = await server.start('127.0.0.1', 0)
+        client = await CheckoutClient.connect(host, port)
+        try:
+            with pytest.raises(ServerError):
+                await client.checkout([('SKU-1', 1)])
+            return await client.checkout([('SKU-1', 1)])
+        finally:
+            await client.close()
+            await server.close()
+
+    assert isinstance(asyncio.run(two_checkouts())['sale_id'], int)
+    assert stock_of(store, 'PID-00001') == 9
@@ -0,0 +1,65 @@
+import threading
+
+import pytest
+
+from pos_core import ledger
+from pos_core.db import ConnectionPool
+from pos_core.stock import InsufficientStockError, StockNotTrackedError, StockService
+from tests.conftest import ledger_rows, stock_of
+
+
+def test_deduction_below_zero_is_refused_and_writes_nothing(store):
+    service = StockService(store)
+    before = ledger_rows(store, 'PID-00001')
+    with pytest.raises(InsufficientStockError) as refused:
+        service.apply('PID-00001', -11, 'damaged')
+    assert (refused.value.available, refused.value.requested) == (10, 11)
+    assert stock_of(store, 'PID-00001') == 10
+    assert ledger_rows(store, 'PID-00001') == before
+
+
+def test_apply_returns_the_new_stock_and_books_the_ledger(store):
+    service = StockService(store)
+    assert service.apply('PID-00001', -10, 'damaged') == 0
+    assert service.adjust('PID-00001', 3, 'add') == 3
+    assert ledger.balance_of(store.connection(), 'PID-00001') == 3
+
+
+def test_apply_many_is_all_or_nothing(store):
+    service = StockService(store)
+    with pytest.raises(InsufficientStockError):
+        service.apply_many([('PID-00001', -5, 'damaged', None), ('PID-00002', -50, 'damaged', None)])
+    assert (stock_of(store, 'PID-00001'), stock_of(store, 'PID-00002')) == (10, 10)
+
+
+def test_untracked_product_is_created_only_for_additions(store):
+    service = StockService(store)
+    store.connection().execute("INSERT INTO products (product_id, sku) VALUES ('PID-00009', 'SKU-9')")
+    with pytest.raises(StockNotTrackedError):
+        service.adjust('PID-00009', 1, 'manual add')
+    assert service.adjust('PID-00009', 4, 'add') == 4
+    with pytest.raises(ValueError):
+        service.adjust('PID-00009', 0, 'add')
+
+
+def test_concurrent_deductions_lose_no_update_and_never_go_negative(store, db_path):
+    def worker():
+        pool = ConnectionPool(db_path)
+        service = StockService(pool)
+        for _ in range(10):
+            try:
+                service.apply('PID-00001', -1, 'Sale')
+            except InsufficientStockError:
+                pass
+        pool.close_all()
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # 40 attempts on 10 units: exactly 10 succeed
+    assert stock_of(store, 'PID-00001') == 0
+    assert ledger_rows(store, 'PID-00001') == 11
+    assert ledger.rebuild(store).discrepancies == []
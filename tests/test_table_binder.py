@@ -0,0 +1,106 @@
+from pos_core.table_binder import TreeviewBinder
+
+
+class FakeTree:
+    """The part of ttk.Treeview the binder uses, counting the calls that change rows."""
+
+    def __init__(self, height=20):
+        self.rows = {}
+        self.order = []
+        self.height = height
+        self.calls = 0
+        self.first = 0.0
+
+    def configure(self, **options):
+        pass
+
+    def cget(self, option):
+        return self.height
+
+    def yview(self, *args):
+        if not self.order:
+            return 0.0, 1.0
+        return self.first, min(1.0, self.first + self.height / len(self.order))
+
+    def yview_moveto(self, fraction):
+        self.first = fraction
+
+    def after_idle(self, fn):
+        fn()
+
+    def insert(self, parent, index, iid, values):
+        self.calls += 1
+        self.rows[iid] = values
+        self.order.insert(len(self.order) if index == 'end' else index, iid)
+
+    def item(self, iid, values):
+        self.calls += 1
+        self.rows[iid] = values
+
+    def delete(self, *iids):
+        self.calls += 1
+        for iid in iids:
+            del self.rows[iid]
+            self.order.remove(iid)
+
+    def move(self, iid, parent, index):
+        self.calls += 1
+        self.order.remove(iid)
+        self.order.insert(index, iid)
+
+
+def rows(count, start=0):
+    return [(f'P{i:05d}', f'product {i}', i) for i in range(start, start + count)]
+
+
+def test_set_rows_applies_only_the_differences():
+    tree = FakeTree()
+    binder = TreeviewBinder(tree)
+    binder.set_rows(rows(10))
+    tree.calls = 0
+    changed = rows(10)
+    changed[3] = ('P00003', 'renamed', 3)
+    binder.set_rows(changed)
+    assert tree.calls == 1
+    assert tree.rows['P00003'] == ('P00003', 'renamed', 3)
+
+
+def test_upsert_and_delete_touch_one_row():
+    tree = FakeTree()
+    binder = TreeviewBinder(tree)
+    binder.set_rows(rows(100))
+    tree.calls = 0
+    binder.upsert(('P00100', 'new', 100))
+    binder.delete('P00050')
+    assert tree.calls == 2
+    assert tree.order[-1] == 'P00100'
+    assert 'P00050' not in tree.order
+    assert len(binder) == 100
+
+
+def test_virtual_list_only_materialises_the_window():
+    tree = FakeTree()
+    binder = TreeviewBinder(tree, virtual_threshold=500, buffer=50)
+    binder.set_rows(rows(10_000))
+    assert len(tree.order) < 200
+    tree.calls = 0
+    # A row far below the window: nothing to draw
+    binder.upsert(('P10000', 'new', 10000))
+    binder.delete('P09000')
+    assert tree.calls == 0
+    assert len(binder) == 10_000
+
+
+def test_compaction_keeps_the_rows_and_their_order():
+    tree = FakeTree()
+    binder = TreeviewBinder(tree, virtual_threshold=100_000)
+    binder.set_rows(rows(1000))
+    for i in range(0, 1000, 2):
+        binder.delete(f'P{i:05d}')
+    binder.upsert(('P01000', 'new', 1000))
+    expected = [f'P{i:05d}' for i in range(1, 1000, 2)] + ['P01000']
+    assert tree.order == expected
+    # Tombstones left since the last compaction are skipped
+    assert [key for key in binder._keys if isinstance(key, str)] == expected
+    assert len(binder._keys) < 1000
+    assert all(binder._keys[position] == key for key, position in binder._index.items())